@@ -0,0 +1 @@
+"""聊天记录总结插件的性能基准测试"""
@@ -0,0 +1,214 @@
+"""
+性能基准测试
+在不同规模的合成群聊历史上测量消息文本提取、消息处理、提示词构建、抽取式预选和完整的总结命令，
+结果写入 JSON 文件，便于在版本之间比较
+
+用法：
+    python -m benchmarks.run --sizes 100 1000 10000 100000 --latency 0.05 --output bench.json
+    python -m benchmarks.run --baseline old.json --output new.json
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import logging
+import platform
+import argparse
+import statistics
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+from unittest.mock import patch
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import main
+from main import EnhancedChatSummary
+from chatsummary import ExtractiveSelector
+from benchmarks.synthetic import generate_history, SyntheticPlatform, MockProvider, MockContext, MockEvent
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+
+
+def plugin_version() -> str:
+    """读取 metadata.yaml 中的插件版本"""
+    path = os.path.join(os.path.dirname(__file__), '..', 'metadata.yaml')
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            match = re.search(r'^version:\s*(\S+)', f.read(), re.M)
+        return match.group(1) if match else "unknown"
+    except OSError:
+        return "unknown"
+
+
+def make_plugin(provider: MockProvider, size: int, config: Optional[Dict[str, Any]] = None) -> EnhancedChatSummary:
+    """创建关闭缓存和增量总结的插件实例，每次运行都完整执行总结流程"""
+    plugin_config = {
+        "max_records": size,
+        "cooldown_seconds": 0,
+        "message_store": {"path": ":memory:"},
+        "archive": {"enabled": False},
+        "cache": {"enabled": False},
+        "rolling_summary": {"enabled": False},
+        "coalescing": {"enabled": False},
+    }
+    plugin_config.update(config or {})
+    return EnhancedChatSummary(MockContext(provider), plugin_config)
+
+
+async def measure(func: Callable[[], Awaitable[Any]], repeat: int) -> List[float]:
+    """执行若干次并返回每次的耗时（秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def result(name: str, size: int, timings: List[float], **extra) -> Dict[str, Any]:
+    """整理一项测量结果"""
+    best = min(timings)
+    entry = {
+        "benchmark": name,
+        "size": size,
+        "repeat": len(timings),
+        "best": best,
+        "mean": statistics.mean(timings),
+        "throughput": size / best if best > 0 else None,
+    }
+    entry.update(extra)
+    return entry
+
+
+async def bench_size(size: int, repeat: int, llm_latency: float, api_latency: float,
+                     e2e: bool, config: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """测量一种规模下的所有基准"""
+    history = generate_history(size)
+    newest_first = history[::-1]
+    provider = MockProvider(llm_latency)
+    plugin = make_plugin(provider, size, config)
+    results = []
+
+    async def extract():
+        for msg in history:
+            plugin._extract_message_text(msg['message'])
+    results.append(result("extract_message_text", size, await measure(extract, repeat)))
+
+    lines: List[str] = []
+
+    async def process():
+        lines[:] = await plugin._process_messages(None, newest_first)
+    results.append(result("process_messages", size, await measure(process, repeat)))
+
+    prompt = plugin._load_prompt()
+
+    async def build_prompt():
+        packed, _ = plugin.token_estimator.pack_recent(lines, plugin._prompt_budget(prompt))
+        return f"{prompt}\n\n" + plugin._render_records(packed)
+    results.append(result("prompt_build", size, await measure(build_prompt, repeat)))
+
+    selector = ExtractiveSelector(estimate=plugin.token_estimator.count)
+
+    async def extractive_select():
+        return selector.select(lines, plugin._prompt_budget(prompt))
+    results.append(result("extractive_select", size, await measure(extractive_select, repeat)))
+
+    if e2e:
+        timings = []
+        calls = []
+        with patch.object(main, 'ASTRBOT_AVAILABLE', True):
+            for _ in range(repeat):
+                provider = MockProvider(llm_latency)
+                plugin = make_plugin(provider, size, config)
+                event = MockEvent(SyntheticPlatform(history, api_latency))
+                start = time.perf_counter()
+                outputs = [output async for output in plugin.summary(event, size)]
+                timings.append(time.perf_counter() - start)
+                calls.append(provider.calls)
+                if not outputs or "出错" in outputs[-1]:
+                    raise RuntimeError(f"End-to-end summary failed: {outputs}")
+        results.append(result("summary_end_to_end", size, timings, llm_calls=max(calls),
+                              llm_latency=llm_latency, api_latency=api_latency))
+    return results
+
+
+async def run_benchmarks(sizes: List[int], repeat: int = 3, llm_latency: float = 0.0,
+                         api_latency: float = 0.0, e2e_max: int = 100000,
+                         config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """运行基准测试
+
+    Args:
+        sizes: 合成历史的消息数量
+        repeat: 每项基准的重复次数，结果取最优值
+        llm_latency: 模拟LLM调用的延迟（秒）
+        api_latency: 模拟历史消息接口的延迟（秒）
+        e2e_max: 执行完整总结命令的最大消息数量
+        config: 覆盖插件配置
+
+    Returns:
+        可写入 JSON 的测量报告
+    """
+    results = []
+    for size in sizes:
+        results.extend(await bench_size(size, repeat, llm_latency, api_latency, size <= e2e_max, config))
+    return {
+        "version": plugin_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": int(time.time()),
+        "results": results,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """与基准报告比较，返回每项的耗时变化"""
+    previous = {(entry["benchmark"], entry["size"]): entry for entry in baseline.get("results", [])}
+    lines = []
+    for entry in report["results"]:
+        old = previous.get((entry["benchmark"], entry["size"]))
+        if old is None or not old["best"]:
+            continue
+        change = (entry["best"] - old["best"]) / old["best"] * 100
+        lines.append(f"{entry['benchmark']:<22} {entry['size']:>7}  "
+                     f"{old['best'] * 1000:10.2f}ms -> {entry['best'] * 1000:10.2f}ms  {change:+7.1f}%")
+    return lines
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the chat summary pipeline on synthetic histories")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="History sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark, the best is reported")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mock LLM latency in seconds")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="Mock history API latency in seconds")
+    parser.add_argument("--e2e-max", type=int, default=100000, help="Largest size for end-to-end runs")
+    parser.add_argument("--config", help="JSON file overriding the plugin config")
+    parser.add_argument("--output", default="bench_results.json", help="Result JSON file")
+    parser.add_argument("--baseline", help="Previous result JSON file to compare against")
+    args = parser.parse_args(argv)
+
+    logging.getLogger("astrbot.plugin.chatsummary").setLevel(logging.WARNING)
+    config = None
+    if args.config:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+    report = asyncio.run(run_benchmarks(args.sizes, args.repeat, args.latency, args.api_latency,
+                                        args.e2e_max, config))
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for entry in report["results"]:
+        throughput = f"{entry['throughput']:12.0f} msg/s" if entry["throughput"] else ""
+        print(f"{entry['benchmark']:<22} {entry['size']:>7}  {entry['best'] * 1000:10.2f}ms  {throughput}")
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            print("\n".join(["", f"Compared with {args.baseline}:"] + compare(report, json.load(f))))
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
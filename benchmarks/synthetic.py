@@ -0,0 +1,162 @@
+"""
+合成群聊历史生成模块
+生成 OneBot 格式的群聊历史，以及按序号分页返回历史的模拟平台和可配置延迟的模拟LLM提供商
+"""
+
+import bisect
+import random
+import asyncio
+from typing import Dict, Any, List, Optional
+
+TOPICS = [
+    "今晚八点开会，记得带电脑", "有人知道这个 bug 怎么修吗", "Python 3.12 的新特性挺有意思",
+    "周末去爬山吗", "这家店的拉面不错", "deadline 是下周五", "刚提交了 PR，帮忙 review 一下",
+    "服务器又挂了", "哈哈哈哈哈", "收到", "+1", "明天几点出发？", "我觉得可以用 asyncio 重写",
+    "那个 API 的 rate limit 是多少", "新版本已经发布了", "晚安",
+]
+WORDS = ["ok", "lol", "nice", "GPU", "CI", "docker", "merge", "release", "typo", "LGTM"]
+
+
+def _segments(rng: random.Random, seq: int) -> List[Dict[str, Any]]:
+    """按真实群聊的比例生成一条消息的消息段"""
+    roll = rng.random()
+    text = rng.choice(TOPICS)
+    if rng.random() < 0.3:
+        text = f"{text} {rng.choice(WORDS)}"
+    if roll < 0.55:
+        return [{'type': 'text', 'data': {'text': text}}]
+    if roll < 0.65:
+        return [{'type': 'face', 'data': {'id': str(rng.randint(1, 300))}}]
+    if roll < 0.75:
+        return [{'type': 'image', 'data': {'file': f'{seq:08x}.jpg', 'url': f'https://example.com/{seq}.jpg'}}]
+    if roll < 0.85:
+        return [
+            {'type': 'reply', 'data': {'id': str(max(1, seq - rng.randint(1, 20)))}},
+            {'type': 'at', 'data': {'qq': str(10000 + rng.randint(1, 30))}},
+            {'type': 'text', 'data': {'text': text}},
+        ]
+    if roll < 0.88:
+        return [{'type': 'forward', 'data': {'id': f'forward-{seq}'}}]
+    return [
+        {'type': 'text', 'data': {'text': text}},
+        {'type': 'face', 'data': {'id': str(rng.randint(1, 300))}},
+        {'type': 'image', 'data': {'file': f'{seq:08x}.png'}},
+        {'type': 'text', 'data': {'text': rng.choice(WORDS)}},
+    ]
+
+
+def generate_history(size: int, seed: int = 0, senders: int = 30, start_seq: int = 1,
+                     start_time: int = 1700000000) -> List[Dict[str, Any]]:
+    """生成合成群聊历史
+
+    Args:
+        size: 消息数量
+        seed: 随机种子，相同的参数总是生成相同的历史
+        senders: 发言人数量
+        start_seq: 第一条消息的序号
+        start_time: 第一条消息的时间戳
+
+    Returns:
+        按从旧到新排序的 OneBot 群消息列表
+    """
+    rng = random.Random(seed)
+    nicknames = [f"群友{index:02d}" if index % 3 else f"Member{index:02d}" for index in range(senders)]
+    messages = []
+    now = start_time
+    for offset in range(size):
+        seq = start_seq + offset
+        # 消息间隔呈长尾分布，大部分消息集中在热烈讨论中
+        now += int(rng.expovariate(1 / 40))
+        sender = rng.randrange(senders)
+        messages.append({
+            'message_id': seq,
+            'message_seq': seq,
+            'real_id': seq,
+            'time': now,
+            'message_type': 'group',
+            'sender': {'user_id': str(10001 + sender), 'nickname': nicknames[sender]},
+            'message': _segments(rng, seq),
+        })
+    return messages
+
+
+class SyntheticPlatform:
+    """模拟 get_group_msg_history 接口，按序号向前分页返回合成历史"""
+
+    def __init__(self, messages: List[Dict[str, Any]], latency: float = 0.0):
+        """初始化模拟平台
+
+        Args:
+            messages: 按从旧到新排序的消息
+            latency: 每次接口调用的模拟延迟（秒）
+        """
+        self.messages = messages
+        self.seqs = [msg['message_seq'] for msg in messages]
+        self.latency = latency
+        self.calls = 0
+
+    async def call_action(self, action: str, group_id: Any = None, message_seq: int = 0,
+                          count: int = 20, **kwargs) -> Dict[str, Any]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        end = bisect.bisect_right(self.seqs, message_seq) if message_seq else len(self.seqs)
+        return {'messages': self.messages[max(0, end - count):end]}
+
+
+class MockProvider:
+    """可配置延迟的模拟LLM提供商"""
+
+    def __init__(self, latency: float = 0.0, model: str = "mock-model"):
+        self.latency = latency
+        self.model = model
+        self.calls = 0
+        self.input_chars = 0
+
+    async def text_chat(self, input: str, max_tokens: Optional[int] = None,
+                        temperature: Optional[float] = None, **kwargs):
+        self.calls += 1
+        self.input_chars += len(input)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        class Response:
+            completion_text = f"【今日速览】模拟总结 {self.calls}"
+        return Response()
+
+    def get_model(self) -> str:
+        return self.model
+
+
+class MockContext:
+    """只提供LLM提供商的模拟插件上下文"""
+
+    def __init__(self, provider: MockProvider):
+        self.provider = provider
+
+    def get_using_provider(self) -> MockProvider:
+        return self.provider
+
+
+class MockEvent:
+    """模拟群消息事件"""
+
+    def __init__(self, platform: SyntheticPlatform, group_id: str = "bench", sender_id: str = "10001"):
+        self.bot = type('Bot', (), {'api': platform})()
+        self.group_id = group_id
+        self.sender_id = sender_id
+
+    def get_group_id(self) -> str:
+        return self.group_id
+
+    def get_sender_id(self) -> str:
+        return self.sender_id
+
+    def get_self_id(self) -> str:
+        return "20000"
+
+    def plain_result(self, text: str) -> str:
+        return text
+
+    def stop_event(self) -> None:
+        pass
@@ -0,0 +1,94 @@
+"""聊天记录总结插件的核心组件包"""
+
+from .store import MessageStore, SyncState, Checkpoint, message_seq
+from .fetcher import PagedHistoryFetcher, MessageStream, message_key, reply_target
+from .history import HistorySync
+from .summarizer import MapReduceSummarizer
+from .topics import TopicSegmenter, TopicSummarizer
+from .extractive import ExtractiveSelector
+from .filters import MessageFilter
+from .formatting import MessageFormatter
+from .compaction import TranscriptCompactor, CompactionStats
+from .tokens import TokenEstimator, heuristic_tokens
+from .cache import SummaryCache, CacheKey, prompt_hash
+from .rolling import RollingSummarizer
+from .concurrency import SingleFlight, CooldownTracker
+from .settings import ConfigService, WatchedFile, PromptConfig, AdminConfig
+from .llm import LLMExecutor, LLMError, LatencyTracker, is_transient
+from .scheduler import (
+    PrecomputeScheduler, ActivityTracker, GroupActivity, CallBudget, BudgetExhausted, current_budget,
+)
+from .jobqueue import FairJobQueue, QueueTicket, QueueRejected
+from .archive import SummaryArchive, ArchivedSummary, SearchQuery, parse_query
+from .rendering import (
+    SummaryRenderer, StructuredSummary, STRUCTURED_OUTPUT_PROMPT, parse_structured, normalize_format,
+)
+from .streaming import SummaryStream, ParagraphChunker, current_stream
+from .metrics import (
+    MetricsSink, PrometheusRegistry, PrometheusFileExporter, PrometheusHTTPExporter,
+    StageTrace, current_trace, trace_stage,
+)
+
+__all__ = [
+    "MessageStore",
+    "SyncState",
+    "Checkpoint",
+    "message_seq",
+    "PagedHistoryFetcher",
+    "MessageStream",
+    "message_key",
+    "reply_target",
+    "HistorySync",
+    "MapReduceSummarizer",
+    "TopicSegmenter",
+    "TopicSummarizer",
+    "ExtractiveSelector",
+    "MessageFilter",
+    "MessageFormatter",
+    "TranscriptCompactor",
+    "CompactionStats",
+    "TokenEstimator",
+    "heuristic_tokens",
+    "SummaryCache",
+    "CacheKey",
+    "prompt_hash",
+    "RollingSummarizer",
+    "SingleFlight",
+    "CooldownTracker",
+    "ConfigService",
+    "WatchedFile",
+    "PromptConfig",
+    "AdminConfig",
+    "MetricsSink",
+    "PrometheusRegistry",
+    "PrometheusFileExporter",
+    "PrometheusHTTPExporter",
+    "StageTrace",
+    "current_trace",
+    "trace_stage",
+    "SummaryStream",
+    "ParagraphChunker",
+    "current_stream",
+    "LLMExecutor",
+    "LLMError",
+    "LatencyTracker",
+    "is_transient",
+    "PrecomputeScheduler",
+    "ActivityTracker",
+    "GroupActivity",
+    "CallBudget",
+    "BudgetExhausted",
+    "current_budget",
+    "SummaryRenderer",
+    "StructuredSummary",
+    "STRUCTURED_OUTPUT_PROMPT",
+    "parse_structured",
+    "normalize_format",
+    "FairJobQueue",
+    "QueueTicket",
+    "QueueRejected",
+    "SummaryArchive",
+    "ArchivedSummary",
+    "SearchQuery",
+    "parse_query",
+]
@@ -0,0 +1,337 @@
+"""
+总结归档模块
+将生成的每一份总结连同群组、时间窗口、模型和令牌数保存到SQLite，并建立FTS5全文索引，
+按关键词或日期查找过去的总结只需一次本地查询，不必为同一时间段重新调用LLM
+"""
+
+import os
+import re
+import sqlite3
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    id                INTEGER PRIMARY KEY,
+    group_id          TEXT    NOT NULL,
+    created_at        REAL    NOT NULL,
+    start_time        INTEGER NOT NULL,
+    end_time          INTEGER NOT NULL,
+    oldest_seq        INTEGER NOT NULL DEFAULT 0,
+    newest_seq        INTEGER NOT NULL DEFAULT 0,
+    message_count     INTEGER NOT NULL DEFAULT 0,
+    model             TEXT    NOT NULL DEFAULT '',
+    prompt_tokens     INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    digest            TEXT    NOT NULL,
+    summary           TEXT    NOT NULL,
+    UNIQUE (group_id, digest)
+);
+CREATE INDEX IF NOT EXISTS idx_summaries_group_end ON summaries (group_id, end_time);
+"""
+
+# 索引列保存分词后的文本，rowid 与 summaries.id 相同
+_FTS_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS summaries_fts USING fts5(tokens, tokenize='unicode61')"
+
+# 中日韩文字没有空格分词，按连续的二元组建立索引
+_CJK = r'[぀-ヿ㐀-䶿一-鿿豈-﫿가-힯]'
+_TOKEN_RE = re.compile(rf'({_CJK}+)|((?:(?!{_CJK})[^\W_])+)')
+
+_DATE_RE = re.compile(r'^(\d{4})-(\d{1,2})(?:-(\d{1,2}))?$')
+
+
+def tokenize(text: str) -> List[str]:
+    """将文本切分为索引词
+
+    中日韩文字连续片段切分为相邻的二元组，并在末尾追加最后一个字，使任意单字都是某个索引词的前缀；
+    其他文字按单词切分并转换为小写。
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        按出现顺序排列的索引词
+    """
+    tokens: List[str] = []
+    for cjk, word in _TOKEN_RE.findall(text):
+        if word:
+            tokens.append(word.lower())
+            continue
+        tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+        tokens.append(cjk[-1])
+    return tokens
+
+
+def _match_expression(keyword: str) -> str:
+    """将一个关键词转换为FTS5查询表达式，关键词的所有片段都必须出现"""
+    terms = []
+    for cjk, word in _TOKEN_RE.findall(keyword):
+        if word:
+            terms.append(f'"{word.lower()}"*')
+        elif len(cjk) == 1:
+            terms.append(f'"{cjk}"*')
+        else:
+            # 相邻二元组组成短语，保证原文中连续出现
+            terms.append('"' + " ".join(cjk[i:i + 2] for i in range(len(cjk) - 1)) + '"')
+    return " ".join(terms)
+
+
+def _parse_date(text: str) -> Optional[Tuple[datetime, datetime]]:
+    """解析 ``YYYY-MM-DD`` 或 ``YYYY-MM`` 形式的日期，返回本地时间的起止时刻"""
+    match = _DATE_RE.match(text)
+    if not match:
+        return None
+    year, month, day = int(match.group(1)), int(match.group(2)), match.group(3)
+    try:
+        if day is not None:
+            start = datetime(year, month, int(day))
+            return start, start + timedelta(days=1)
+        start = datetime(year, month, 1)
+    except ValueError:
+        return None
+    return start, datetime(year + month // 12, month % 12 + 1, 1)
+
+
+@dataclass
+class SearchQuery:
+    """解析后的搜索条件"""
+
+    keywords: List[str] = field(default_factory=list)
+    # 时间窗口与 [since, until) 有重叠的总结才会返回，为None表示不限制
+    since: Optional[float] = None
+    until: Optional[float] = None
+    # 指定编号时直接读取该总结
+    summary_id: Optional[int] = None
+
+
+def parse_query(text: str) -> SearchQuery:
+    """解析搜索文本
+
+    以空白分隔：``YYYY-MM-DD`` 和 ``YYYY-MM`` 表示一天或一个月，``起始..结束`` 表示日期区间
+    （任一端可以省略），``#编号`` 表示读取指定的总结，其余部分作为关键词，所有关键词都必须匹配。
+
+    Args:
+        text: 搜索文本
+
+    Returns:
+        搜索条件
+    """
+    query = SearchQuery()
+    for part in text.split():
+        if part.startswith("#") and part[1:].isdigit():
+            query.summary_id = int(part[1:])
+            continue
+        if ".." in part:
+            first, _, last = part.partition("..")
+            start = _parse_date(first) if first else None
+            end = _parse_date(last) if last else None
+            if (start or not first) and (end or not last) and (first or last):
+                if start:
+                    query.since = start[0].timestamp()
+                if end:
+                    query.until = end[1].timestamp()
+                continue
+        day = _parse_date(part)
+        if day is not None:
+            query.since, query.until = day[0].timestamp(), day[1].timestamp()
+            continue
+        query.keywords.append(part)
+    return query
+
+
+@dataclass(frozen=True)
+class ArchivedSummary:
+    """归档的总结"""
+
+    id: int
+    group_id: str
+    created_at: float
+    start_time: int
+    end_time: int
+    message_count: int
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    summary: str
+
+    def snippet(self, keywords: List[str], width: int = 80) -> str:
+        """截取总结中第一个关键词附近的片段
+
+        Args:
+            keywords: 关键词
+            width: 片段的最大长度
+
+        Returns:
+            单行片段，没有关键词或关键词不在原文中时从开头截取
+        """
+        text = " ".join(self.summary.split())
+        lowered = text.lower()
+        positions = [lowered.find(keyword.lower()) for keyword in keywords]
+        positions = [position for position in positions if position >= 0]
+        start = max(0, min(positions) - width // 4) if positions else 0
+        piece = text[start:start + width]
+        return ("…" if start > 0 else "") + piece + ("…" if start + width < len(text) else "")
+
+
+_COLUMNS = ('id, group_id, created_at, start_time, end_time, message_count, model, '
+            'prompt_tokens, completion_tokens, summary')
+
+
+class SummaryArchive:
+    """基于SQLite和FTS5的总结归档
+
+    所有方法都是同步的，并通过内部锁保证线程安全，异步调用方应通过 ``run_in_executor`` 在工作线程中调用。
+    SQLite 未编译 FTS5 时退回到对原文的 ``LIKE`` 匹配，结果相同但需要扫描群组的全部总结。
+    """
+
+    def __init__(self, db_path: str):
+        """初始化总结归档
+
+        Args:
+            db_path: 数据库文件路径，传入 ``:memory:`` 使用内存数据库
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        if db_path != ':memory:':
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        try:
+            self._conn.execute(_FTS_SCHEMA)
+            self.fts_enabled = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"SQLite FTS5 unavailable, summary search falls back to LIKE: {e}")
+            self.fts_enabled = False
+        self._conn.commit()
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def add(self, group_id: str, summary: str, start_time: int = 0, end_time: int = 0,
+            oldest_seq: int = 0, newest_seq: int = 0, message_count: int = 0, model: str = "",
+            prompt_tokens: int = 0, completion_tokens: int = 0,
+            created_at: Optional[float] = None) -> Optional[int]:
+        """归档一份总结
+
+        同一群组中内容完全相同的总结（例如缓存命中或合并请求的结果）只保存一次。
+
+        Args:
+            group_id: 群组ID
+            summary: 总结文本
+            start_time: 窗口中最早消息的时间戳，未知时为0，使用归档时间
+            end_time: 窗口中最新消息的时间戳，未知时为0，使用归档时间
+            oldest_seq: 窗口中最早消息的序号
+            newest_seq: 窗口中最新消息的序号
+            message_count: 总结的消息数量
+            model: 模型名称
+            prompt_tokens: 输入令牌数
+            completion_tokens: 输出令牌数
+            created_at: 归档时间，默认为当前时间
+
+        Returns:
+            新总结的编号，已经归档过时返回None
+        """
+        created_at = time.time() if created_at is None else created_at
+        end_time = int(end_time or created_at)
+        start_time = int(start_time or end_time)
+        digest = hashlib.sha1(summary.encode('utf-8')).hexdigest()
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.execute(
+                    'INSERT OR IGNORE INTO summaries (group_id, created_at, start_time, end_time, oldest_seq, '
+                    'newest_seq, message_count, model, prompt_tokens, completion_tokens, digest, summary) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (str(group_id), created_at, start_time, end_time, oldest_seq, newest_seq,
+                     message_count, model, prompt_tokens, completion_tokens, digest, summary)
+                )
+                if cursor.rowcount == 0:
+                    return None
+                summary_id = cursor.lastrowid
+                if self.fts_enabled:
+                    self._conn.execute('INSERT INTO summaries_fts (rowid, tokens) VALUES (?, ?)',
+                                       (summary_id, " ".join(tokenize(summary))))
+        return summary_id
+
+    def get(self, summary_id: int, group_id: Optional[str] = None) -> Optional[ArchivedSummary]:
+        """读取指定编号的总结
+
+        Args:
+            summary_id: 总结编号
+            group_id: 可选的群组ID，总结不属于该群组时视为不存在
+
+        Returns:
+            归档的总结，不存在时返回None
+        """
+        sql = f'SELECT {_COLUMNS} FROM summaries WHERE id = ?'
+        params: list = [summary_id]
+        if group_id is not None:
+            sql += ' AND group_id = ?'
+            params.append(str(group_id))
+        with self._lock:
+            row = self._conn.execute(sql, params).fetchone()
+        return ArchivedSummary(*row) if row else None
+
+    def search(self, keywords: Optional[List[str]] = None, group_id: Optional[str] = None,
+               since: Optional[float] = None, until: Optional[float] = None,
+               limit: int = 10) -> List[ArchivedSummary]:
+        """按关键词和日期搜索总结
+
+        Args:
+            keywords: 关键词，所有关键词都必须出现在总结中；中日韩文字按连续片段匹配，其他文字按单词前缀匹配
+            group_id: 可选的群组ID，只搜索该群组
+            since: 可选的起始时间戳，只返回时间窗口结束于此之后的总结
+            until: 可选的结束时间戳，只返回时间窗口开始于此之前的总结
+            limit: 最多返回的数量
+
+        Returns:
+            按时间窗口从新到旧排列的总结
+        """
+        keywords = [keyword for keyword in (keywords or []) if keyword.strip()]
+        conditions: List[str] = []
+        params: list = []
+        if keywords:
+            if self.fts_enabled:
+                # 只包含标点的关键词没有索引词，忽略
+                expressions = [expression for expression in map(_match_expression, keywords) if expression]
+                if not expressions:
+                    return []
+                conditions.append('id IN (SELECT rowid FROM summaries_fts WHERE summaries_fts MATCH ?)')
+                params.append(" AND ".join(f"({expression})" for expression in expressions))
+            else:
+                for keyword in keywords:
+                    conditions.append("summary LIKE ? ESCAPE '\\'")
+                    escaped = keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                    params.append(f'%{escaped}%')
+        if group_id is not None:
+            conditions.append('group_id = ?')
+            params.append(str(group_id))
+        if since is not None:
+            conditions.append('end_time >= ?')
+            params.append(int(since))
+        if until is not None:
+            conditions.append('start_time < ?')
+            params.append(int(until))
+
+        sql = f'SELECT {_COLUMNS} FROM summaries'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY end_time DESC, id DESC LIMIT ?'
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [ArchivedSummary(*row) for row in rows]
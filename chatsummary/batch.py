@@ -0,0 +1,307 @@
+"""
+批量总结模块
+为命令行工具展开目录、通配符和清单文件中的聊天记录，在进程池中流式解析文件，在并发限制内生成总结，
+原子地写出结果，并跳过内容哈希和总结设置都没有变化的输入
+"""
+
+import os
+import glob
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import tempfile
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .parsers import read_chat_lines
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+# 展开目录和通配符时读取的聊天记录文件扩展名
+CHAT_LOG_SUFFIXES = (".json", ".jsonl", ".txt", ".log")
+# 输出目录中记录已完成输入的状态文件
+STATE_FILE = ".chatsummary-batch.json"
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """分块计算文件内容的哈希"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_file(path: str, known_digest: Optional[str] = None) -> Tuple[str, Optional[List[str]]]:
+    """流式解析一个聊天记录文件，在工作进程中执行
+
+    格式化后的聊天记录行会完整序列化传回主进程，内存占用与该文件的消息条数成正比。
+
+    Args:
+        path: 文件路径
+        known_digest: 已有输出对应的内容哈希，与当前内容相同时不解析
+
+    Returns:
+        (内容哈希, 聊天记录行)，内容未变化时聊天记录行为None
+    """
+    digest = file_digest(path)
+    if digest == known_digest:
+        return digest, None
+    return digest, read_chat_lines(path)
+
+
+def _read_manifest(path: str) -> List[str]:
+    """读取清单文件，每行一个路径或通配符，也可以是 JSON 字符串数组；相对路径相对于清单所在目录"""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        entries = [str(entry) for entry in json.loads(text)]
+    else:
+        entries = [line.strip() for line in text.splitlines()
+                   if line.strip() and not line.lstrip().startswith("#")]
+    base = os.path.dirname(os.path.abspath(path))
+    return [entry if os.path.isabs(entry) else os.path.join(base, entry) for entry in entries]
+
+
+def expand_inputs(inputs: Iterable[str], manifest: Optional[str] = None,
+                  suffixes: Tuple[str, ...] = CHAT_LOG_SUFFIXES) -> List[Tuple[str, str]]:
+    """展开输入文件、目录、通配符和清单文件
+
+    Args:
+        inputs: 文件、目录或通配符
+        manifest: 可选的清单文件
+        suffixes: 展开目录和通配符时保留的文件扩展名
+
+    Returns:
+        (文件路径, 输出时使用的相对路径) 列表，按输入顺序去重
+
+    Raises:
+        FileNotFoundError: 输入的文件或目录不存在，或通配符没有匹配任何文件
+    """
+    patterns = list(inputs) + (_read_manifest(manifest) if manifest else [])
+    entries: List[Tuple[str, str]] = []
+    seen = set()
+
+    def add(path: str, relative: str) -> None:
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            entries.append((path, relative))
+
+    def add_directory(directory: str) -> None:
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(suffixes):
+                    path = os.path.join(root, name)
+                    add(path, os.path.relpath(path, directory))
+
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            add_directory(pattern)
+        elif os.path.isfile(pattern):
+            add(pattern, os.path.basename(pattern))
+        elif glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern, recursive=True))
+            if not matches:
+                raise FileNotFoundError(f"No files match {pattern}")
+            for path in matches:
+                if os.path.isdir(path):
+                    add_directory(path)
+                elif path.lower().endswith(suffixes):
+                    add(path, os.path.basename(path))
+        else:
+            raise FileNotFoundError(f"Input not found: {pattern}")
+    return entries
+
+
+@dataclass(frozen=True)
+class BatchItem:
+    """一个批量总结任务，同一次总结可以写出多种格式的输出"""
+    source: str
+    output: str
+    extra_outputs: Tuple[str, ...] = ()
+
+    @property
+    def outputs(self) -> Tuple[str, ...]:
+        return (self.output,) + self.extra_outputs
+
+
+def plan_outputs(entries: List[Tuple[str, str]], output_dir: str,
+                 suffix: Union[str, Sequence[str]]) -> List[BatchItem]:
+    """为每个输入确定输出路径，保留目录输入的相对结构
+
+    Args:
+        entries: :func:`expand_inputs` 的结果
+        output_dir: 输出目录
+        suffix: 输出文件扩展名，例如 ``.md``；给出多个扩展名时每个输入写出多个输出
+
+    Returns:
+        批量总结任务列表
+    """
+    suffixes = (suffix,) if isinstance(suffix, str) else tuple(suffix)
+    items = []
+    used = set()
+    for source, relative in entries:
+        stem = os.path.splitext(relative)[0]
+        if os.path.join(output_dir, f"{stem}_summary{suffixes[0]}") in used:
+            # 不同目录下的同名文件
+            tag = hashlib.sha1(os.path.abspath(source).encode('utf-8')).hexdigest()[:8]
+            stem = f"{stem}-{tag}"
+        outputs = tuple(os.path.join(output_dir, f"{stem}_summary{ext}") for ext in suffixes)
+        used.add(outputs[0])
+        items.append(BatchItem(source, outputs[0], outputs[1:]))
+    return items
+
+
+def atomic_write(path: str, text: str) -> None:
+    """先写入同目录下的临时文件再替换，中断时不会留下不完整的输出"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+    except Exception:
+        os.unlink(temp_path)
+        raise
+
+
+class BatchState:
+    """记录每个输出对应的输入内容哈希和总结设置"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.base = os.path.dirname(os.path.abspath(path))
+        self.entries: Dict[str, Dict[str, str]] = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get('outputs', {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable batch state {path}: {e}")
+
+    def _key(self, output: str) -> str:
+        return os.path.relpath(os.path.abspath(output), self.base)
+
+    def known_digest(self, output: str, settings: str) -> Optional[str]:
+        """获取输出仍然有效时对应的输入内容哈希
+
+        Args:
+            output: 输出路径
+            settings: 当前总结设置的指纹
+
+        Returns:
+            内容哈希，输出不存在或设置已变化时返回None
+        """
+        entry = self.entries.get(self._key(output))
+        if not entry or entry.get('settings') != settings or not os.path.exists(output):
+            return None
+        return entry.get('input')
+
+    def record(self, output: str, digest: str, settings: str) -> None:
+        self.entries[self._key(output)] = {'input': digest, 'settings': settings}
+
+    def save(self) -> None:
+        atomic_write(self.path, json.dumps({'outputs': self.entries}, ensure_ascii=False, indent=1))
+
+
+@dataclass
+class BatchResult:
+    """一个任务的执行结果"""
+    item: BatchItem
+    status: str
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+class BatchRunner:
+    """批量总结执行器
+
+    解析在进程池中进行，同时等待总结的已解析文件数不超过 ``2 × workers``，
+    避免成千上万个文件的聊天记录同时留在内存中；总结在 ``concurrency`` 个并发名额内进行。
+    """
+
+    def __init__(self, summarize: Callable[[List[str]], Awaitable[Union[str, Sequence[str]]]], settings: str,
+                 workers: int = 0, concurrency: int = 4, force: bool = False,
+                 progress: Optional[Callable[[BatchResult, int, int], None]] = None):
+        """初始化执行器
+
+        Args:
+            summarize: 为聊天记录行生成总结的函数，失败时抛出异常；任务有多个输出时返回与
+                :attr:`BatchItem.outputs` 一一对应的文本
+            settings: 影响总结结果的设置指纹，变化后所有输入都会重新总结
+            workers: 解析进程数，0表示在当前进程的工作线程中解析
+            concurrency: 同时进行的总结数
+            force: 是否忽略已有的输出重新总结
+            progress: 每个任务完成时调用，参数为 (结果, 已完成数, 总数)
+        """
+        self.summarize = summarize
+        self.settings = settings
+        self.workers = workers
+        self.concurrency = max(1, concurrency)
+        self.force = force
+        self.progress = progress
+
+    async def _process(self, item: BatchItem, state: BatchState, pool: Optional[Executor],
+                       parse_slots: asyncio.Semaphore, llm_slots: asyncio.Semaphore) -> BatchResult:
+        started = time.perf_counter()
+        loop = asyncio.get_event_loop()
+        known = None
+        if not self.force and all(os.path.exists(path) for path in item.extra_outputs):
+            known = state.known_digest(item.output, self.settings)
+        try:
+            async with parse_slots:
+                digest, lines = await loop.run_in_executor(pool, parse_file, item.source, known)
+                if lines is None:
+                    return BatchResult(item, "skipped", time.perf_counter() - started)
+                if not lines:
+                    return BatchResult(item, "empty", time.perf_counter() - started)
+                # 取得总结名额后才释放解析名额，限制等待总结的文件数
+                await llm_slots.acquire()
+            try:
+                summary = await self.summarize(lines)
+            finally:
+                llm_slots.release()
+            texts = [summary] if isinstance(summary, str) else list(summary)
+            for path, text in zip(item.outputs, texts):
+                await loop.run_in_executor(None, atomic_write, path, text)
+            state.record(item.output, digest, self.settings)
+            return BatchResult(item, "ok", time.perf_counter() - started)
+        except Exception as e:
+            logger.error(f"Error summarizing {item.source}: {e}")
+            return BatchResult(item, "failed", time.perf_counter() - started, str(e))
+
+    async def run(self, items: List[BatchItem], state: BatchState) -> List[BatchResult]:
+        """执行所有任务
+
+        Args:
+            items: 批量总结任务
+            state: 输出目录的状态记录，执行结束后保存
+
+        Returns:
+            按完成顺序排列的结果
+        """
+        pool = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 0 else None
+        parse_slots = asyncio.Semaphore(max(1, self.workers) * 2)
+        llm_slots = asyncio.Semaphore(self.concurrency)
+        results: List[BatchResult] = []
+        try:
+            tasks = [asyncio.ensure_future(self._process(item, state, pool, parse_slots, llm_slots))
+                     for item in items]
+            for future in asyncio.as_completed(tasks):
+                result = await future
+                results.append(result)
+                if self.progress is not None:
+                    self.progress(result, len(results), len(items))
+        finally:
+            # 中断时也保留已完成任务的记录
+            state.save()
+            if pool is not None:
+                pool.shutdown(wait=True)
+        return results
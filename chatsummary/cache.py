@@ -0,0 +1,197 @@
+"""
+总结结果缓存模块
+按群组、消息窗口、提示词和模型缓存生成的总结，支持内存LRU与可选的磁盘二级缓存
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Optional, Tuple
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+
+@dataclass(frozen=True)
+class CacheKey:
+    """总结缓存键"""
+
+    group_id: str
+    prompt_hash: str
+    model: str
+    oldest_id: str
+    newest_id: str
+    oldest_seq: int
+    newest_seq: int
+
+    @property
+    def scope(self) -> Tuple[str, str, str]:
+        """可以互相复用的缓存范围：同一群组、提示词和模型"""
+        return (self.group_id, self.prompt_hash, self.model)
+
+    def digest(self) -> str:
+        """缓存键的稳定哈希，用作磁盘缓存文件名"""
+        raw = json.dumps(asdict(self), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def prompt_hash(prompt: str) -> str:
+    """计算提示词的短哈希
+
+    Args:
+        prompt: 提示词
+
+    Returns:
+        十六进制哈希字符串
+    """
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]
+
+
+class SummaryCache:
+    """总结结果缓存
+
+    内存中使用带过期时间的LRU缓存；精确命中要求消息窗口首尾ID完全一致，
+    近似命中允许窗口首尾的消息序号各偏移不超过 ``tolerance`` 条。
+    启用磁盘缓存后，精确命中的结果还会以JSON文件形式持久化，供重启后复用。
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 600, tolerance: int = 0,
+                 disk_path: Optional[str] = None, disk_ttl: float = 86400):
+        """初始化缓存
+
+        Args:
+            max_entries: 内存中最多保留的条目数
+            ttl: 内存条目的有效期（秒）
+            tolerance: 近似命中允许的消息序号偏移量，0表示只允许精确命中
+            disk_path: 磁盘缓存目录，为None时不启用磁盘缓存
+            disk_ttl: 磁盘条目的有效期（秒）
+        """
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.tolerance = max(0, tolerance)
+        self.disk_path = disk_path
+        self.disk_ttl = disk_ttl
+        self._entries: "OrderedDict[CacheKey, Tuple[float, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(group_id: str, prompt: str, model: str,
+                 oldest: Tuple[str, int], newest: Tuple[str, int]) -> CacheKey:
+        """根据消息窗口构造缓存键
+
+        Args:
+            group_id: 群组ID
+            prompt: 总结提示词
+            model: 模型名称
+            oldest: 窗口中最旧消息的 (ID, 序号)
+            newest: 窗口中最新消息的 (ID, 序号)
+
+        Returns:
+            缓存键
+        """
+        return CacheKey(
+            str(group_id), prompt_hash(prompt), model or '',
+            str(oldest[0]), str(newest[0]), oldest[1], newest[1]
+        )
+
+    def _expired(self, stored_at: float, ttl: float) -> bool:
+        return time.time() - stored_at > ttl
+
+    def _get_memory(self, key: CacheKey) -> Optional[str]:
+        """从内存中查找精确或近似命中的条目"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if not self._expired(entry[0], self.ttl):
+                self._entries.move_to_end(key)
+                return entry[1]
+            del self._entries[key]
+
+        if self.tolerance <= 0:
+            return None
+        best: Optional[Tuple[int, CacheKey]] = None
+        for other, (stored_at, _) in self._entries.items():
+            if other.scope != key.scope or self._expired(stored_at, self.ttl):
+                continue
+            shift = max(abs(other.newest_seq - key.newest_seq), abs(other.oldest_seq - key.oldest_seq))
+            if shift <= self.tolerance and (best is None or shift < best[0]):
+                best = (shift, other)
+        if best is None:
+            return None
+        self._entries.move_to_end(best[1])
+        return self._entries[best[1]][1]
+
+    def _put_memory(self, key: CacheKey, summary: str) -> None:
+        self._entries[key] = (time.time(), summary)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_file(self, key: CacheKey) -> str:
+        return os.path.join(self.disk_path, f"{key.digest()}.json")
+
+    def _read_disk(self, key: CacheKey) -> Optional[str]:
+        """读取磁盘缓存（在工作线程中执行）"""
+        path = self._disk_file(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if self._expired(data.get('stored_at', 0), self.disk_ttl):
+                os.remove(path)
+                return None
+            return data.get('summary')
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Error reading summary cache file {path}: {e}")
+            return None
+
+    def _write_disk(self, key: CacheKey, summary: str) -> None:
+        """写入磁盘缓存（在工作线程中执行）"""
+        os.makedirs(self.disk_path, exist_ok=True)
+        path = self._disk_file(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'key': asdict(key), 'stored_at': time.time(), 'summary': summary},
+                          f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Error writing summary cache file {path}: {e}")
+
+    async def get(self, key: CacheKey) -> Optional[str]:
+        """查找缓存的总结
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存的总结，未命中时返回None
+        """
+        summary = self._get_memory(key)
+        if summary is None and self.disk_path:
+            loop = asyncio.get_event_loop()
+            summary = await loop.run_in_executor(None, self._read_disk, key)
+            if summary is not None:
+                self._put_memory(key, summary)
+        if summary is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return summary
+
+    async def put(self, key: CacheKey, summary: str) -> None:
+        """写入总结
+
+        Args:
+            key: 缓存键
+            summary: 总结文本
+        """
+        self._put_memory(key, summary)
+        if self.disk_path:
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self._write_disk, key, summary)
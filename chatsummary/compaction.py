@@ -0,0 +1,199 @@
+"""
+聊天记录压缩模块
+在不丢失信息的前提下缩短发送给LLM的聊天记录：发言人别名、按天分组的短时间戳、
+合并同一发言人的连续消息、去除重复刷屏和仅包含占位符的消息
+"""
+
+import re
+import logging
+from dataclasses import dataclass
+from typing import List, Dict, Optional, Callable, Tuple
+
+from .tokens import heuristic_tokens
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+# 与 EnhancedChatSummary._format_message 的输出格式对应：[YYYY-MM-DD HH:MM:SS]「昵称」: 内容
+LINE_RE = re.compile(r'^\[(\d{4}-\d{2}-\d{2}) (\d{2}):(\d{2}):(\d{2})\]「(.*?)」: (.*)$', re.S)
+# 只包含 [表情]、[图片] 等占位符的消息
+PLACEHOLDER_RE = re.compile(r'^(?:\s*\[[^\[\]\s]{1,16}\])+\s*$')
+
+LEGEND_PREFIX = "发言人对照（总结中请使用原名）："
+
+
+@dataclass
+class CompactionStats:
+    """一次压缩的统计信息"""
+    lines_in: int = 0
+    lines_out: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    tokens_in: int = 0
+    tokens_out: int = 0
+
+    @property
+    def bytes_saved(self) -> float:
+        """节省的字节比例（百分比）"""
+        return 100.0 * (self.bytes_in - self.bytes_out) / self.bytes_in if self.bytes_in else 0.0
+
+    @property
+    def tokens_saved(self) -> float:
+        """节省的令牌比例（百分比）"""
+        return 100.0 * (self.tokens_in - self.tokens_out) / self.tokens_in if self.tokens_in else 0.0
+
+
+@dataclass
+class _Entry:
+    """压缩过程中的一条消息"""
+    day: str
+    minute: int
+    sender: str
+    texts: List[str]
+    repeats: int = 1
+
+
+def alias_name(index: int) -> str:
+    """生成第 ``index`` 个发言人的别名：A..Z、AA..AZ、BA..
+
+    Args:
+        index: 从0开始的发言人序号
+
+    Returns:
+        别名
+    """
+    name = ""
+    index += 1
+    while index:
+        index, rest = divmod(index - 1, 26)
+        name = chr(ord('A') + rest) + name
+    return name
+
+
+class TranscriptCompactor:
+    """聊天记录压缩器
+
+    输入为按时间顺序排列的格式化聊天记录行，输出为压缩后的文本。
+    无法识别格式的行原样保留，因此可以安全地用于任何聊天记录。
+    """
+
+    def __init__(self, alias_senders: bool = True, merge_seconds: int = 120, drop_repeats: bool = True,
+                 repeat_window: int = 20, drop_placeholders: bool = True,
+                 estimate: Callable[[str], int] = heuristic_tokens):
+        """初始化压缩器
+
+        Args:
+            alias_senders: 是否用短别名代替发言人昵称，并在开头附上对照表
+            merge_seconds: 同一发言人相隔不超过该秒数的连续消息合并为一行，0表示不合并
+            drop_repeats: 是否去除与最近消息完全相同的重复消息，保留首条并标注重复次数
+            repeat_window: 查找重复消息的最近消息条数
+            drop_placeholders: 是否去除只包含占位符的消息
+            estimate: 令牌估算函数，用于统计节省的令牌
+        """
+        self.alias_senders = alias_senders
+        self.merge_seconds = merge_seconds
+        self.drop_repeats = drop_repeats
+        self.repeat_window = max(1, repeat_window)
+        self.drop_placeholders = drop_placeholders
+        self.estimate = estimate
+
+    def _entries(self, lines: List[str]) -> List[object]:
+        """解析聊天记录行并完成去重与合并，无法解析的行以原始字符串保留"""
+        entries: List[object] = []
+        recent: List[_Entry] = []
+        last: Optional[_Entry] = None
+        last_second = 0
+        for line in lines:
+            match = LINE_RE.match(line)
+            if match is None:
+                entries.append(line)
+                last = None
+                continue
+            day, hour, minute, second, sender, text = match.groups()
+            text = text.strip()
+            if not text or (self.drop_placeholders and PLACEHOLDER_RE.match(text)):
+                continue
+
+            if self.drop_repeats:
+                # 复读和刷屏只保留首条，并记录重复次数
+                original = next((entry for entry in recent
+                                 if len(entry.texts) == 1 and entry.texts[0] == text), None)
+                if original is not None:
+                    original.repeats += 1
+                    continue
+
+            total_minute = int(hour) * 60 + int(minute)
+            now = total_minute * 60 + int(second)
+            if (self.merge_seconds > 0 and last is not None and last.sender == sender
+                    and last.day == day and last.repeats == 1 and now - last_second <= self.merge_seconds):
+                last.texts.append(text)
+                last_second = now
+                continue
+
+            last = _Entry(day, total_minute, sender, [text])
+            last_second = now
+            entries.append(last)
+            recent.append(last)
+            if len(recent) > self.repeat_window:
+                recent.pop(0)
+        return entries
+
+    def compact(self, lines: List[str]) -> Tuple[str, CompactionStats]:
+        """压缩聊天记录
+
+        Args:
+            lines: 按时间顺序排列的聊天记录行
+
+        Returns:
+            (压缩后的文本, 统计信息)
+        """
+        entries = self._entries(lines)
+        aliases: Dict[str, str] = {}
+        body: List[str] = []
+        day = None
+        minute = None
+        for entry in entries:
+            if isinstance(entry, str):
+                body.append(entry)
+                continue
+            if entry.day != day:
+                day, minute = entry.day, None
+                body.append(f"--- {day} ---")
+            sender = entry.sender
+            if self.alias_senders:
+                sender = aliases.setdefault(sender, alias_name(len(aliases)))
+            # 与上一行处于同一分钟时省略时间
+            prefix = "" if entry.minute == minute else f"[{entry.minute // 60:02d}:{entry.minute % 60:02d}] "
+            minute = entry.minute
+            text = " / ".join(entry.texts)
+            if entry.repeats > 1:
+                text += f" ×{entry.repeats}"
+            body.append(f"{prefix}{sender}: {text}")
+
+        if aliases:
+            body.insert(0, LEGEND_PREFIX + "，".join(f"{alias}={name}" for name, alias in aliases.items()))
+
+        original = "\n".join(lines)
+        result = "\n".join(body)
+        stats = CompactionStats(
+            lines_in=len(lines),
+            lines_out=len(body),
+            bytes_in=len(original.encode('utf-8')),
+            bytes_out=len(result.encode('utf-8')),
+            tokens_in=self.estimate(original),
+            tokens_out=self.estimate(result),
+        )
+        return result, stats
+
+    def render(self, lines: List[str]) -> str:
+        """压缩聊天记录并记录节省比例
+
+        Args:
+            lines: 按时间顺序排列的聊天记录行
+
+        Returns:
+            压缩后的文本
+        """
+        result, stats = self.compact(lines)
+        logger.info(f"Compacted transcript: {stats.lines_in} -> {stats.lines_out} lines, "
+                    f"bytes -{stats.bytes_saved:.1f}%, tokens -{stats.tokens_saved:.1f}%")
+        return result
@@ -0,0 +1,120 @@
+"""
+并发控制模块
+提供相同请求合并执行的单飞（single-flight）机制和按群组、用户的冷却时间跟踪
+"""
+
+import time
+import asyncio
+import logging
+from typing import Dict, Any, Hashable, Callable, Awaitable, Optional, Tuple
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+
+class SingleFlight:
+    """合并执行相同的异步请求
+
+    同一个键（或被 ``match`` 判定为兼容的键）在执行期间到达的请求不会重复执行，
+    而是等待同一个任务的结果。任务独立于发起者运行，发起者被取消不会影响其他等待者。
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self.shared = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def _find(self, key: Hashable,
+              match: Optional[Callable[[Hashable], bool]]) -> Optional["asyncio.Future[Any]"]:
+        """查找正在执行的相同或兼容请求"""
+        task = self._calls.get(key)
+        if task is not None or match is None:
+            return task
+        for other, other_task in self._calls.items():
+            if match(other):
+                return other_task
+        return None
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]],
+                 match: Optional[Callable[[Hashable], bool]] = None) -> Any:
+        """执行请求，或等待正在执行的相同请求
+
+        Args:
+            key: 请求键
+            factory: 创建请求协程的函数，只有没有可合并的请求时才会调用
+            match: 可选的兼容判断函数，参数为正在执行的请求键
+
+        Returns:
+            请求结果
+        """
+        task = self._find(key, match)
+        if task is not None:
+            self.shared += 1
+            logger.debug(f"Joined in-flight request {key}")
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(factory())
+        self._calls[key] = task
+        task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(task)
+
+
+class CooldownTracker:
+    """按群组和用户跟踪命令冷却时间
+
+    每次检查和记录都是常数时间的字典操作，过期条目在字典增长到一定规模时批量清理。
+    """
+
+    def __init__(self, user_seconds: float = 0, group_seconds: float = 0, sweep_threshold: int = 1024):
+        """初始化冷却跟踪器
+
+        Args:
+            user_seconds: 同一群组内同一用户的冷却时间（秒），0表示不限制
+            group_seconds: 同一群组的冷却时间（秒），0表示不限制
+            sweep_threshold: 触发过期条目清理的条目数量
+        """
+        self.user_seconds = user_seconds
+        self.group_seconds = group_seconds
+        self.sweep_threshold = sweep_threshold
+        self._users: Dict[Tuple[str, str], float] = {}
+        self._groups: Dict[str, float] = {}
+
+    def remaining(self, group_id: str, user_id: str) -> float:
+        """获取剩余冷却时间
+
+        Args:
+            group_id: 群组ID
+            user_id: 用户ID
+
+        Returns:
+            剩余冷却秒数，0表示可以执行
+        """
+        now = time.monotonic()
+        remaining = 0.0
+        if self.user_seconds > 0:
+            last = self._users.get((group_id, user_id))
+            if last is not None:
+                remaining = max(remaining, last + self.user_seconds - now)
+        if self.group_seconds > 0:
+            last = self._groups.get(group_id)
+            if last is not None:
+                remaining = max(remaining, last + self.group_seconds - now)
+        return remaining
+
+    def record(self, group_id: str, user_id: str) -> None:
+        """记录一次命令执行
+
+        Args:
+            group_id: 群组ID
+            user_id: 用户ID
+        """
+        now = time.monotonic()
+        if self.user_seconds > 0:
+            self._users[(group_id, user_id)] = now
+            if len(self._users) > self.sweep_threshold:
+                self._users = {k: v for k, v in self._users.items() if v + self.user_seconds > now}
+        if self.group_seconds > 0:
+            self._groups[group_id] = now
+            if len(self._groups) > self.sweep_threshold:
+                self._groups = {k: v for k, v in self._groups.items() if v + self.group_seconds > now}
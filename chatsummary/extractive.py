@@ -0,0 +1,160 @@
+"""
+抽取式预选模块
+聊天记录超出令牌预算时，不再简单丢弃较早的消息，而是在本地用 TextRank 给每条消息打分，
+选出最重要的消息及其上下文（前一条消息和被回复的消息），按时间顺序组成发送给LLM的输入；
+安装了 numpy 时打分向量化进行，否则使用等价的纯 Python 实现
+"""
+
+import logging
+from typing import Callable, Dict, List, Optional, Sequence
+
+try:
+    import numpy
+except ImportError:  # 未安装 numpy 时逐项计算
+    numpy = None
+
+from .tokens import heuristic_tokens
+from .topics import hashed_counts, tfidf_arrays, tfidf_vectors
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+
+class ExtractiveSelector:
+    """基于 TextRank 的抽取式消息选择器
+
+    消息之间的边权为 TF-IDF 向量的余弦相似度，与越多其他消息内容相关的消息得分越高。
+    相似度矩阵 ``W = VVᵀ - I`` 不显式构造，每轮迭代只做两次稀疏矩阵与向量的乘法，
+    计算量与消息的 n-gram 总数成正比，上千条消息也能在几十毫秒内完成。
+    """
+
+    def __init__(self, context_lines: int = 1, damping: float = 0.85, iterations: int = 50,
+                 tolerance: float = 1e-6, dims: int = 4096,
+                 estimate: Callable[[str], int] = heuristic_tokens):
+        """初始化抽取式选择器
+
+        Args:
+            context_lines: 每条选中消息附带的前文条数
+            damping: TextRank 的阻尼系数
+            iterations: 最大迭代次数
+            tolerance: 两轮得分的变化量（L1）小于该值时停止迭代
+            dims: 特征哈希的维数
+            estimate: 令牌估算函数
+        """
+        self.context_lines = max(0, context_lines)
+        self.damping = damping
+        self.iterations = iterations
+        self.tolerance = tolerance
+        self.dims = dims
+        self.estimate = estimate
+
+    def rank(self, lines: Sequence[str]) -> List[float]:
+        """计算每条消息的 TextRank 得分
+
+        Args:
+            lines: 聊天记录行
+
+        Returns:
+            与各行对应的得分，总和为1
+        """
+        total = len(lines)
+        if total == 0:
+            return []
+        counts, _ = hashed_counts(lines, self.dims)
+        if numpy is not None:
+            return self._rank_numpy(counts).tolist()
+        return self._rank_python(counts)
+
+    def _rank_numpy(self, counts: List[Dict[int, int]]):
+        """向量化的 TextRank 迭代"""
+        total = len(counts)
+        rows, cols, weights = tfidf_arrays(counts, self.dims)
+
+        def similar(x):
+            # (VVᵀ - I)x，非空行的模长为1，空行的自身相似度为0
+            projected = numpy.bincount(cols, weights * x[rows], minlength=self.dims)
+            return numpy.bincount(rows, weights * projected[cols], minlength=total) - x * nonempty
+
+        nonempty = (numpy.bincount(rows, minlength=total) > 0).astype(numpy.float64)
+        degrees = similar(numpy.ones(total))
+        dangling = degrees <= 1e-12
+        inverse = numpy.where(dangling, 0.0, 1.0 / numpy.where(dangling, 1.0, degrees))
+        scores = numpy.full(total, 1.0 / total)
+        for _ in range(self.iterations):
+            # 没有相似消息的节点把得分均匀分给所有节点
+            updated = (1.0 - self.damping) / total + self.damping * (
+                similar(scores * inverse) + scores[dangling].sum() / total)
+            change = numpy.abs(updated - scores).sum()
+            scores = updated
+            if change < self.tolerance:
+                break
+        return scores
+
+    def _rank_python(self, counts: List[Dict[int, int]]) -> List[float]:
+        """与 ``_rank_numpy`` 等价的纯 Python 实现"""
+        total = len(counts)
+        vectors = tfidf_vectors(counts, self.dims)
+
+        def similar(x: List[float]) -> List[float]:
+            projected: Dict[int, float] = {}
+            for vector, value in zip(vectors, x):
+                if value:
+                    for key, weight in vector.items():
+                        projected[key] = projected.get(key, 0.0) + weight * value
+            return [sum(weight * projected.get(key, 0.0) for key, weight in vector.items())
+                    - (value if vector else 0.0)
+                    for vector, value in zip(vectors, x)]
+
+        degrees = similar([1.0] * total)
+        inverse = [0.0 if degree <= 1e-12 else 1.0 / degree for degree in degrees]
+        scores = [1.0 / total] * total
+        for _ in range(self.iterations):
+            leaked = sum(score for score, factor in zip(scores, inverse) if not factor)
+            spread = similar([score * factor for score, factor in zip(scores, inverse)])
+            updated = [(1.0 - self.damping) / total + self.damping * (value + leaked / total)
+                       for value in spread]
+            change = sum(abs(new - old) for new, old in zip(updated, scores))
+            scores = updated
+            if change < self.tolerance:
+                break
+        return scores
+
+    def select(self, lines: Sequence[str], budget: int, ids: Optional[Sequence[str]] = None,
+               replies: Optional[Sequence[Optional[str]]] = None) -> List[int]:
+        """在令牌预算内选出最重要的消息及其上下文
+
+        按得分从高到低依次尝试加入消息，连同其前文和被回复的消息一起计算令牌数；
+        整组放不下时只加入消息本身，仍然放不下时跳过。每行额外计一个换行令牌，与 ``pack_recent`` 一致。
+
+        Args:
+            lines: 按时间顺序排列的聊天记录行
+            budget: 令牌预算
+            ids: 可选的与各行对应的消息ID
+            replies: 可选的与各行对应的被回复消息ID
+
+        Returns:
+            选中的行下标，按时间顺序排列
+        """
+        costs = [self.estimate(line) + 1 for line in lines]
+        if sum(costs) <= budget:
+            return list(range(len(lines)))
+        scores = self.rank(lines)
+        index_of = {message_id: index for index, message_id in enumerate(ids or ())}
+
+        chosen = set()
+        used = 0
+        # 得分相同时优先选择较新的消息
+        for index in sorted(range(len(lines)), key=lambda i: (-scores[i], -i)):
+            if index in chosen:
+                continue
+            group = [index] + list(range(max(0, index - self.context_lines), index))
+            target = index_of.get(replies[index]) if replies is not None and replies[index] else None
+            if target is not None and target != index:
+                group.append(target)
+            for candidate in (group, [index]):
+                added = [i for i in dict.fromkeys(candidate) if i not in chosen]
+                cost = sum(costs[i] for i in added)
+                if used + cost <= budget:
+                    chosen.update(added)
+                    used += cost
+                    break
+        return sorted(chosen)
@@ -0,0 +1,216 @@
+"""
+分页历史消息获取模块
+按消息序号游标并发请求多页历史记录，去重后以消息流的形式产出
+"""
+
+import asyncio
+import logging
+from typing import List, Dict, Any, Callable, Awaitable, AsyncIterator, Optional, Set, Tuple
+
+from .store import message_seq, reply_target
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+# 平台历史接口调用函数，参数与 call_action('get_group_msg_history', ...) 一致
+FetchPage = Callable[..., Awaitable[Dict[str, Any]]]
+
+
+def message_key(msg: Dict[str, Any]) -> str:
+    """获取用于去重的消息键
+
+    Args:
+        msg: OneBot消息字典
+
+    Returns:
+        消息ID字符串
+    """
+    return str(msg.get('message_id', message_seq(msg)))
+
+
+class MessageStream:
+    """异步消息流包装器，记录已产出消息的ID和序号
+
+    ``ids``、``seqs``、``times`` 和 ``replies`` 与产出顺序一致（从新到旧），可用于确定消息窗口的首尾；
+    ``replies`` 记录每条消息回复的消息ID，没有回复时为None。
+    """
+
+    def __init__(self, source: AsyncIterator[Dict[str, Any]]):
+        """初始化消息流
+
+        Args:
+            source: 按从新到旧排序的原始异步消息迭代器
+        """
+        self._source = source
+        self.ids: List[str] = []
+        self.seqs: List[int] = []
+        self.times: List[int] = []
+        self.replies: List[Optional[str]] = []
+
+    @property
+    def count(self) -> int:
+        """已产出的消息数量"""
+        return len(self.seqs)
+
+    def bounds(self) -> Tuple[Tuple[str, int], Tuple[str, int]]:
+        """获取窗口首尾消息
+
+        Returns:
+            ((最旧消息ID, 序号), (最新消息ID, 序号))
+        """
+        return (self.ids[-1], self.seqs[-1]), (self.ids[0], self.seqs[0])
+
+    def truncate(self, count: int) -> None:
+        """只保留最新的 ``count`` 条消息的记录
+
+        Args:
+            count: 保留的消息数量
+        """
+        del self.ids[count:]
+        del self.seqs[count:]
+        del self.times[count:]
+        del self.replies[count:]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        async for msg in self._source:
+            self.ids.append(message_key(msg))
+            self.seqs.append(message_seq(msg))
+            self.times.append(int(msg.get('time', 0) or 0))
+            self.replies.append(reply_target(msg))
+            yield msg
+
+
+class PagedHistoryFetcher:
+    """并发分页获取群历史消息
+
+    OneBot类平台的 ``get_group_msg_history`` 通常每次只返回几十条消息，
+    超出部分会被静默截断。获取器先请求最新一页以确定序号起点和平台实际的分页大小，
+    随后按序号计算后续各页的游标，在信号量限制下并发请求，
+    并按从新到旧的顺序逐页产出去重后的消息，使调用方在最后一页到达前即可开始处理。
+    """
+
+    def __init__(self, page_size: int = 50, max_concurrency: int = 4):
+        """初始化获取器
+
+        Args:
+            page_size: 每页请求的消息数量
+            max_concurrency: 同时进行的最大请求数
+        """
+        self.page_size = max(1, page_size)
+        self.max_concurrency = max(1, max_concurrency)
+
+    async def _fetch_page(self, fetch_page: FetchPage, group_id: str, seq: int,
+                          semaphore: Optional[asyncio.Semaphore] = None) -> List[Dict[str, Any]]:
+        """请求一页历史消息
+
+        Args:
+            fetch_page: 平台历史接口调用函数
+            group_id: 群组ID
+            seq: 起始消息序号，0表示从最新消息开始
+            semaphore: 可选的并发限制信号量
+
+        Returns:
+            消息列表
+        """
+        if semaphore is not None:
+            async with semaphore:
+                return await self._fetch_page(fetch_page, group_id, seq)
+        result = await fetch_page(
+            'get_group_msg_history',
+            group_id=group_id,
+            message_seq=seq,
+            count=self.page_size
+        )
+        return (result or {}).get('messages', []) or []
+
+    def _take_new(self, page: List[Dict[str, Any]], seen: Set[str],
+                  lower_seq: Optional[int]) -> List[Dict[str, Any]]:
+        """按从新到旧的顺序筛选出未见过且序号大于 ``lower_seq`` 的消息"""
+        result = []
+        for msg in sorted(page, key=message_seq, reverse=True):
+            if lower_seq is not None and message_seq(msg) <= lower_seq:
+                continue
+            key = message_key(msg)
+            if key in seen:
+                continue
+            seen.add(key)
+            result.append(msg)
+        return result
+
+    async def iter_messages(self, fetch_page: FetchPage, group_id: str, count: int,
+                            start_seq: int = 0,
+                            stop_seq: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """从 ``start_seq`` 开始向前获取消息，按从新到旧的顺序产出
+
+        Args:
+            fetch_page: 平台历史接口调用函数
+            group_id: 群组ID
+            count: 最多产出的消息数量
+            start_seq: 起始序号，0表示从最新消息开始
+            stop_seq: 已同步的序号，不产出序号不大于它的消息
+
+        Yields:
+            去重后的消息字典
+        """
+        if count <= 0:
+            return
+        seen: Set[str] = set()
+        produced = 0
+
+        first = await self._fetch_page(fetch_page, group_id, start_seq)
+        for msg in self._take_new(first, seen, stop_seq):
+            yield msg
+            produced += 1
+            if produced >= count:
+                return
+        if not first:
+            return
+
+        oldest = min(message_seq(msg) for msg in first)
+        floor = max(stop_seq or 0, 0)
+        if oldest <= floor + 1:
+            return
+
+        # 平台实际返回的条数可能少于请求的条数，以此作为后续分页步长
+        stride = min(self.page_size, len(first))
+        sequential = not all('message_seq' in msg or 'real_id' in msg for msg in first)
+
+        anchors = []
+        anchor = oldest - 1
+        remaining = count - produced
+        while anchor > floor and len(anchors) * stride < remaining:
+            anchors.append(anchor)
+            if sequential:
+                break
+            anchor -= stride
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = [
+            asyncio.ensure_future(self._fetch_page(fetch_page, group_id, seq, semaphore))
+            for seq in anchors
+        ]
+        try:
+            for index, task in enumerate(tasks):
+                page = await task
+                # 下一页游标及之前的消息由下一页负责，最后一页只受停止序号约束
+                lower = anchors[index + 1] if index + 1 < len(tasks) else stop_seq
+                while True:
+                    fresh = self._take_new(page, seen, lower)
+                    for msg in fresh:
+                        yield msg
+                        produced += 1
+                        if produced >= count:
+                            return
+                    if not fresh:
+                        break
+                    # 本页返回不足导致与下一页之间出现空缺时，顺序补齐
+                    page_oldest = min(message_seq(msg) for msg in page)
+                    if page_oldest <= max(lower or 0, 0) + 1:
+                        break
+                    page = await self._fetch_page(fetch_page, group_id, page_oldest - 1, semaphore)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
@@ -0,0 +1,135 @@
+"""
+消息过滤模块
+在格式化之前按规则丢弃系统消息、机器人消息、命令消息和匹配指定正则表达式的消息
+"""
+
+import re
+import logging
+from typing import Dict, Any, List, Optional, Iterable, AsyncIterator, Pattern
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+# QQ 系统通知使用的账号
+SYSTEM_IDS = frozenset({"10000", "1000000"})
+# 非聊天消息的事件类型
+SYSTEM_POST_TYPES = frozenset({"notice", "request", "meta_event"})
+DEFAULT_COMMAND_PREFIXES = ("/", "!", "！", "#")
+
+
+class MessageFilter:
+    """消息过滤器
+
+    所有规则在初始化时构建一次：``ignore_patterns`` 合并为一个正则表达式，
+    机器人和系统账号保存在 frozenset 中。过滤只读取发送者和原始文本段，
+    不进行完整的文本提取，被丢弃的消息不会进入格式化和LLM。
+    """
+
+    def __init__(self, ignore_system: bool = True, ignore_bot: bool = True, ignore_commands: bool = True,
+                 ignore_patterns: Optional[List[str]] = None, bot_ids: Iterable[Any] = (),
+                 system_ids: Iterable[Any] = SYSTEM_IDS,
+                 command_prefixes: Iterable[str] = DEFAULT_COMMAND_PREFIXES):
+        """初始化消息过滤器
+
+        Args:
+            ignore_system: 是否忽略系统消息
+            ignore_bot: 是否忽略机器人消息（消息自带的 ``self_id`` 以及 ``bot_ids`` 中的账号）
+            ignore_commands: 是否忽略以命令前缀开头的消息
+            ignore_patterns: 忽略文本匹配这些正则表达式的消息，无效的表达式会被跳过
+            bot_ids: 额外的机器人账号
+            system_ids: 系统账号
+            command_prefixes: 命令前缀
+        """
+        self.ignore_system = ignore_system
+        self.ignore_bot = ignore_bot
+        self.ignore_commands = ignore_commands
+        self.bot_ids = frozenset(str(user_id) for user_id in bot_ids)
+        self.system_ids = frozenset(str(user_id) for user_id in system_ids)
+        self.command_prefixes = tuple(command_prefixes)
+        self.patterns: List[str] = []
+        self.pattern: Optional[Pattern] = self._compile(ignore_patterns or [])
+        self.dropped: Dict[str, int] = {}
+
+    def _compile(self, patterns: List[str]) -> Optional[Pattern]:
+        """将所有有效的表达式合并为一个正则表达式，每个表达式对应一个命名分组"""
+        valid = []
+        for pattern in patterns:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                logger.error(f"Invalid ignore pattern {pattern!r}: {e}")
+                continue
+            valid.append(pattern)
+        if not valid:
+            return None
+        self.patterns = valid
+        try:
+            return re.compile("|".join(f"(?P<_p{index}>{pattern})" for index, pattern in enumerate(valid)))
+        except re.error:
+            # 表达式之间的命名分组冲突时退回不区分规则的合并方式
+            return re.compile("|".join(f"(?:{pattern})" for pattern in valid))
+
+    @property
+    def active(self) -> bool:
+        """是否启用了任何规则"""
+        return (self.ignore_system or self.ignore_bot or self.ignore_commands
+                or self.pattern is not None)
+
+    @staticmethod
+    def _raw_text(msg: Dict[str, Any]) -> str:
+        """拼接消息中的文本段，字符串格式的消息直接返回，格式异常的消息段跳过"""
+        message = msg.get('message')
+        if isinstance(message, str):
+            return message
+        return "".join(str(segment['data'].get('text') or '') for segment in message or ()
+                       if isinstance(segment, dict) and segment.get('type') == 'text'
+                       and isinstance(segment.get('data'), dict))
+
+    def match(self, msg: Dict[str, Any], self_id: Optional[str] = None) -> Optional[str]:
+        """判断消息是否应被丢弃
+
+        Args:
+            msg: OneBot 消息字典
+            self_id: 当前机器人账号
+
+        Returns:
+            丢弃消息的规则名称，保留时返回None
+        """
+        sender_id = str((msg.get('sender') or {}).get('user_id', msg.get('user_id', '')))
+        if self.ignore_system and (sender_id in self.system_ids or msg.get('post_type') in SYSTEM_POST_TYPES):
+            return "system"
+        if self.ignore_bot and sender_id and (
+                sender_id in self.bot_ids or sender_id == str(msg.get('self_id', self_id or ''))):
+            return "bot"
+        if not self.ignore_commands and self.pattern is None:
+            return None
+        text = self._raw_text(msg).lstrip()
+        if self.ignore_commands and text.startswith(self.command_prefixes):
+            return "commands"
+        if self.pattern is not None:
+            match = self.pattern.search(text)
+            if match is not None:
+                if match.lastgroup and match.lastgroup.startswith("_p"):
+                    return f"pattern:{self.patterns[int(match.lastgroup[2:])]}"
+                return "patterns"
+        return None
+
+    async def stream(self, source: AsyncIterator[Dict[str, Any]], dropped: Optional[Dict[str, int]] = None,
+                     self_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """过滤消息流
+
+        Args:
+            source: 原始消息流
+            dropped: 可选的字典，按规则累加本次丢弃的消息数量
+            self_id: 当前机器人账号
+
+        Yields:
+            保留的消息
+        """
+        async for msg in source:
+            rule = self.match(msg, self_id)
+            if rule is None:
+                yield msg
+                continue
+            self.dropped[rule] = self.dropped.get(rule, 0) + 1
+            if dropped is not None:
+                dropped[rule] = dropped.get(rule, 0) + 1
@@ -0,0 +1,180 @@
+"""
+消息格式化模块
+将 OneBot 消息转换为聊天记录行，是每次总结中逐条消息执行的热路径
+"""
+
+import re
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Iterable, Iterator, AsyncIterator, Sequence, Tuple, Union
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+# 非文本消息段的分派表，未列出的类型输出为 [类型]
+SEGMENT_PLACEHOLDERS: Dict[str, str] = {
+    'face': '[表情]',
+    # 如果开启了图片文本提取功能，未来可以调用OCR服务
+    'image': '[图片]',
+}
+
+# 字符串格式（CQ 码）的消息中的消息段，以及 CQ 码的转义字符
+_CQ_RE = re.compile(r'\[CQ:([A-Za-z_]+)[^\]]*\]')
+_CQ_UNESCAPE = (('&#91;', '['), ('&#93;', ']'), ('&#44;', ','), ('&amp;', '&'))
+
+# 每处理这么多条异步消息让出一次事件循环，避免长时间占用
+YIELD_EVERY = 1000
+
+
+class MessageFormatter:
+    """聊天记录格式化器
+
+    消息段通过分派表转换并用 ``str.join`` 拼接；时间戳按小时缓存本地时间的日期和小时部分，
+    同一小时内的消息只需计算分钟和秒数。目标吞吐量为单核每秒格式化 20 万条以上的消息，
+    格式化 10 万条消息的合成历史记录应在 0.5 秒内完成。
+    """
+
+    def __init__(self, memo_size: int = 4096):
+        """初始化格式化器
+
+        Args:
+            memo_size: 时间戳缓存的最大小时数，超出后清空重建
+        """
+        self.memo_size = memo_size
+        self._hours: Dict[int, Tuple[str, int]] = {}
+
+    def timestamp(self, ts: int) -> str:
+        """格式化时间戳为 ``YYYY-MM-DD HH:MM:SS``
+
+        Args:
+            ts: Unix 时间戳（秒）
+
+        Returns:
+            本地时间字符串
+        """
+        ts = int(ts)
+        hour, offset = divmod(ts, 3600)
+        memo = self._hours.get(hour)
+        if memo is None:
+            if len(self._hours) >= self.memo_size:
+                self._hours.clear()
+            start = datetime.fromtimestamp(hour * 3600)
+            memo = (start.strftime('%Y-%m-%d %H:'), start.minute * 60 + start.second)
+            self._hours[hour] = memo
+        prefix, offset_in_hour = memo
+        offset += offset_in_hour
+        if offset >= 3600:
+            # 时区偏移不是整小时（如 +05:30）时，后半段属于下一个本地小时
+            return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
+        minute, second = divmod(offset, 60)
+        return f"{prefix}{minute:02d}:{second:02d}"
+
+    @staticmethod
+    def extract_text(segments: Union[str, Iterable[Dict[str, Any]]]) -> str:
+        """提取消息文本，每个消息段后跟一个空格
+
+        Args:
+            segments: 消息段列表，或 CQ 码格式的消息字符串
+
+        Returns:
+            提取的文本内容
+        """
+        if isinstance(segments, str):
+            return MessageFormatter._extract_cq_text(segments)
+        parts = []
+        append = parts.append
+        placeholders = SEGMENT_PLACEHOLDERS
+        for segment in segments or ():
+            if not isinstance(segment, dict):
+                continue
+            msg_type = segment.get('type', '')
+            if msg_type == 'text':
+                # 文本段最常见，不经过分派表
+                data = segment.get('data')
+                append(data.get('text', '') if isinstance(data, dict) else '')
+            else:
+                append(placeholders.get(msg_type) or f'[{msg_type}]')
+        if not parts:
+            return ""
+        parts.append("")
+        return " ".join(parts)
+
+    @staticmethod
+    def _extract_cq_text(message: str) -> str:
+        """提取 CQ 码格式消息的文本，CQ 码按消息段类型转换为占位符"""
+        parts = []
+        position = 0
+        for match in _CQ_RE.finditer(message):
+            parts.append(message[position:match.start()])
+            msg_type = match.group(1)
+            parts.append(SEGMENT_PLACEHOLDERS.get(msg_type) or f'[{msg_type}]')
+            position = match.end()
+        parts.append(message[position:])
+        parts = [part for part in parts if part]
+        if not parts:
+            return ""
+        text = " ".join(parts) + " "
+        for escaped, char in _CQ_UNESCAPE:
+            text = text.replace(escaped, char)
+        return text
+
+    def format(self, msg: Dict[str, Any]) -> str:
+        """格式化单条消息，单条消息格式异常时只丢弃该消息的文本，不影响其他消息
+
+        Args:
+            msg: 消息字典
+
+        Returns:
+            格式化后的聊天记录行
+        """
+        try:
+            sender = msg.get('sender', {}).get('nickname', 'Unknown')
+            return f"[{self.timestamp(msg.get('time', 0))}]「{sender}」: {self.extract_text(msg.get('message', []))}"
+        except Exception as e:
+            logger.warning(f"Error formatting message {msg.get('message_id', '')}: {e}")
+            sender = msg.get('sender')
+            sender = sender.get('nickname', 'Unknown') if isinstance(sender, dict) else 'Unknown'
+            try:
+                stamp = self.timestamp(msg.get('time', 0) or 0)
+            except (TypeError, ValueError, OverflowError, OSError):
+                stamp = self.timestamp(0)
+            return f"[{stamp}]「{sender}」: "
+
+    def iter_lines(self, messages: Sequence[Dict[str, Any]]) -> Iterator[str]:
+        """按从旧到新的顺序格式化从新到旧排序的消息列表，不复制列表
+
+        Args:
+            messages: 按从新到旧排序的消息列表
+
+        Yields:
+            聊天记录行
+        """
+        format_message = self.format
+        for msg in reversed(messages):
+            yield format_message(msg)
+
+    async def format_stream(self, messages: Union[Sequence[Dict[str, Any]],
+                                                  AsyncIterator[Dict[str, Any]]]) -> List[str]:
+        """格式化消息列表或异步消息流
+
+        Args:
+            messages: 按从新到旧排序的消息列表或异步消息流，传入消息流时每条消息到达后立即格式化
+
+        Returns:
+            按从旧到新排序的聊天记录行
+        """
+        if not hasattr(messages, '__aiter__'):
+            if not isinstance(messages, Sequence):
+                messages = list(messages)
+            return list(self.iter_lines(messages))
+
+        # 消息流的产出顺序是从新到旧，只能在结束后原地反转一次
+        lines: List[str] = []
+        append = lines.append
+        format_message = self.format
+        async for msg in messages:
+            append(format_message(msg))
+            if len(lines) % YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+        lines.reverse()
+        return lines
@@ -0,0 +1,150 @@
+"""
+消息历史增量同步模块
+每次命令只向平台拉取同步游标之后的新消息，其余部分从本地存储读取
+"""
+
+import asyncio
+import logging
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
+
+from .store import MessageStore, SyncState, message_seq
+from .fetcher import FetchPage, PagedHistoryFetcher
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+
+class HistorySync:
+    """群消息增量同步器
+
+    本地为每个群组维护一个连续的消息序号区间 ``[oldest_seq, newest_seq]``。
+    请求到来时先从最新消息向前翻页直到与 ``newest_seq`` 衔接，
+    若本地区间仍不足请求数量，再从 ``oldest_seq`` 向前回填。
+    """
+
+    def __init__(self, store: MessageStore, fetcher: PagedHistoryFetcher):
+        """初始化同步器
+
+        Args:
+            store: 本地消息存储
+            fetcher: 分页历史消息获取器
+        """
+        self.store = store
+        self.fetcher = fetcher
+
+    async def _run(self, func, *args):
+        """在工作线程中执行存储操作，避免阻塞事件循环"""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    async def _save_fresh(self, group_id: str, state: Optional[SyncState],
+                          fresh: List[Dict[str, Any]]) -> Tuple[int, int, int]:
+        """保存游标之后的新消息并推进同步区间
+
+        Returns:
+            (区间最新序号, 区间最旧序号, 新消息中最旧的序号)
+        """
+        newest_seq = max((message_seq(m) for m in fresh), default=state.newest_seq if state else 0)
+        fresh_oldest = min((message_seq(m) for m in fresh), default=newest_seq + 1)
+        if state and fresh_oldest <= state.newest_seq + 1:
+            # 新消息与本地区间衔接，沿用原有的区间起点
+            oldest_seq = state.oldest_seq
+        else:
+            # 首次同步或新消息过多导致出现断档，从新消息开始重建区间
+            oldest_seq = min(fresh_oldest, newest_seq)
+
+        await self._run(self.store.save_messages, group_id, fresh, newest_seq, oldest_seq)
+        return newest_seq, oldest_seq, fresh_oldest
+
+    async def stream(self, fetch_page: FetchPage, group_id: str,
+                     count: int) -> AsyncIterator[Dict[str, Any]]:
+        """同步群组消息，并按从新到旧的顺序产出最近的 ``count`` 条
+
+        新消息在到达时立即产出，随后依次产出本地已有的消息和回填的旧消息。
+
+        Args:
+            fetch_page: 平台历史接口调用函数
+            group_id: 群组ID
+            count: 需要的消息数量
+
+        Yields:
+            消息字典
+        """
+        group_id = str(group_id)
+        state = await self._run(self.store.get_state, group_id)
+
+        # 拉取游标之后的新消息
+        fresh: List[Dict[str, Any]] = []
+        stop_seq = state.newest_seq if state else None
+        async for msg in self.fetcher.iter_messages(fetch_page, group_id, count, stop_seq=stop_seq):
+            fresh.append(msg)
+            yield msg
+
+        newest_seq, oldest_seq, fresh_oldest = await self._save_fresh(group_id, state, fresh)
+        produced = len(fresh)
+        if produced >= count:
+            return
+
+        # 从本地读取新消息之前的部分
+        local = await self._run(self.store.latest, group_id, count, oldest_seq)
+        for msg in local:
+            if message_seq(msg) >= fresh_oldest:
+                continue
+            yield msg
+            produced += 1
+            if produced >= count:
+                break
+        logger.debug(f"History sync for group {group_id}: {len(fresh)} new, {produced - len(fresh)} local")
+        if produced >= count or oldest_seq <= 1:
+            return
+
+        # 本地连续区间不足时向前回填
+        backfill: List[Dict[str, Any]] = []
+        async for msg in self.fetcher.iter_messages(fetch_page, group_id, count - produced,
+                                                    start_seq=oldest_seq - 1):
+            backfill.append(msg)
+            yield msg
+        if backfill:
+            oldest_seq = min(oldest_seq, min(message_seq(m) for m in backfill))
+            await self._run(self.store.save_messages, group_id, backfill, newest_seq, oldest_seq)
+
+    async def ensure(self, fetch_page: FetchPage, group_id: str, count: int) -> Optional[SyncState]:
+        """同步新消息，并在本地连续区间不足 ``count`` 条时向前回填
+
+        与 ``stream`` 不同，本地已有的消息不会被读取，适合随后按索引查询本地存储的调用方。
+
+        Args:
+            fetch_page: 平台历史接口调用函数
+            group_id: 群组ID
+            count: 本地连续区间至少应包含的消息数量
+
+        Returns:
+            同步后的状态
+        """
+        group_id = str(group_id)
+        state = await self._run(self.store.get_state, group_id)
+        stop_seq = state.newest_seq if state else None
+        fresh = [msg async for msg in self.fetcher.iter_messages(fetch_page, group_id, count, stop_seq=stop_seq)]
+        newest_seq, oldest_seq, _ = await self._save_fresh(group_id, state, fresh)
+
+        stored = await self._run(self.store.count_range, group_id, oldest_seq)
+        if stored < count and oldest_seq > 1:
+            backfill = [msg async for msg in self.fetcher.iter_messages(fetch_page, group_id, count - stored,
+                                                                        start_seq=oldest_seq - 1)]
+            if backfill:
+                oldest_seq = min(oldest_seq, min(message_seq(m) for m in backfill))
+                await self._run(self.store.save_messages, group_id, backfill, newest_seq, oldest_seq)
+        logger.debug(f"History ensure for group {group_id}: {len(fresh)} new, {stored} local")
+        return await self._run(self.store.get_state, group_id)
+
+    async def sync(self, fetch_page: FetchPage, group_id: str, count: int) -> List[Dict[str, Any]]:
+        """同步并返回群组最近的消息
+
+        Args:
+            fetch_page: 平台历史接口调用函数
+            group_id: 群组ID
+            count: 需要的消息数量
+
+        Returns:
+            按从新到旧排序的消息列表
+        """
+        return [msg async for msg in self.stream(fetch_page, group_id, count)]
@@ -0,0 +1,251 @@
+"""
+总结任务队列模块
+所有群组的总结请求在全局队列中排队，同时执行的任务数有上限；按群组和用户限制未完成的请求数，
+较小的请求优先执行，排队过长时直接拒绝新请求，避免大量群组同时请求时所有人的等待时间一起失控
+"""
+
+import time
+import asyncio
+import itertools
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .metrics import MetricsSink
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+
+class QueueRejected(Exception):
+    """请求未被队列接受"""
+
+    def __init__(self, reason: str, limit: int):
+        """
+        Args:
+            reason: 拒绝原因：``user_quota``、``group_quota`` 或 ``overloaded``
+            limit: 触发拒绝的上限
+        """
+        super().__init__(f"Summary request rejected ({reason}, limit {limit})")
+        self.reason = reason
+        self.limit = limit
+
+
+class QueueTicket:
+    """一个排队中的总结请求
+
+    使用 ``async with ticket`` 等待执行名额，退出时释放。与已有任务兼容的请求作为跟随者加入该任务，
+    不占用执行名额，在任务开始执行时一起开始。
+    """
+
+    def __init__(self, queue: "FairJobQueue", group_id: str, user_id: str, count: int,
+                 seq: int, leader: Optional["QueueTicket"] = None):
+        self.queue = queue
+        self.group_id = group_id
+        self.user_id = user_id
+        self.count = count
+        self.seq = seq
+        self.leader = leader
+        self.followers: List["QueueTicket"] = []
+        self.enqueued_at = time.monotonic()
+        # waiting、running 或 done
+        self.state = "waiting"
+        self.started: "asyncio.Future[None]" = asyncio.get_event_loop().create_future()
+
+    @property
+    def position(self) -> int:
+        """当前排队位置，从1开始，0表示已经可以执行"""
+        if self.leader is not None:
+            return self.leader.position
+        return self.queue.position(self)
+
+    async def wait(self) -> float:
+        """等待执行名额
+
+        Returns:
+            等待的秒数
+        """
+        if self.leader is not None and self.leader.state != "waiting":
+            self.state = "running"
+        if self.state != "waiting":
+            return 0.0
+        try:
+            await asyncio.shield(self.started)
+        except asyncio.CancelledError:
+            self.release()
+            raise
+        return time.monotonic() - self.enqueued_at
+
+    def release(self) -> None:
+        """请求结束，释放执行名额或离开队列"""
+        self.queue._release(self)
+
+    async def __aenter__(self) -> "QueueTicket":
+        await self.wait()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.release()
+
+
+class FairJobQueue:
+    """公平的全局总结任务队列
+
+    执行名额空出时，从等待的任务中选出：正在执行的任务最少的群组优先，其次是消息数量较少的请求，
+    最后按到达顺序；等待超过 ``aging_seconds`` 的请求不再按消息数量排在后面，大请求不会一直等待。
+    """
+
+    def __init__(self, max_in_flight: int = 8, max_waiting: int = 100, group_quota: int = 3,
+                 user_quota: int = 1, aging_seconds: float = 30.0, metrics: Optional[MetricsSink] = None):
+        """初始化任务队列
+
+        Args:
+            max_in_flight: 同时执行的任务数
+            max_waiting: 等待的任务数达到该值时拒绝新请求，0表示不限制
+            group_quota: 每个群组未完成的任务数上限，0表示不限制
+            user_quota: 每个用户未完成的请求数上限，0表示不限制
+            aging_seconds: 等待超过该时间的请求不再按消息数量排序
+            metrics: 指标输出端
+        """
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_waiting = max_waiting
+        self.group_quota = group_quota
+        self.user_quota = user_quota
+        self.aging_seconds = aging_seconds
+        self.metrics = metrics or MetricsSink()
+        self._waiting: List[QueueTicket] = []
+        self._running = 0
+        self._group_running: Dict[str, int] = {}
+        # 每个群组未完成的任务（不含跟随者）
+        self._group_jobs: Dict[str, List[QueueTicket]] = {}
+        self._user_requests: Dict[Tuple[str, str], int] = {}
+        self._seq = itertools.count()
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiting)
+
+    def _key(self, ticket: QueueTicket, now: float) -> Tuple[int, int, int]:
+        aged = now - ticket.enqueued_at >= self.aging_seconds
+        return self._group_running.get(ticket.group_id, 0), 0 if aged else ticket.count, ticket.seq
+
+    def position(self, ticket: QueueTicket) -> int:
+        """获取等待中的任务在下一次选择时的排队位置，从1开始，0表示不在等待"""
+        if ticket.state != "waiting":
+            return 0
+        now = time.monotonic()
+        key = self._key(ticket, now)
+        return 1 + sum(1 for other in self._waiting if self._key(other, now) < key)
+
+    def submit(self, group_id: str, user_id: str, count: int,
+               join: Optional[Callable[[QueueTicket], bool]] = None) -> QueueTicket:
+        """提交一个总结请求
+
+        Args:
+            group_id: 群组ID
+            user_id: 用户ID
+            count: 请求的消息数量
+            join: 可选的兼容判断函数，参数为同一群组中未完成的任务；兼容时加入该任务而不是新建任务
+
+        Returns:
+            排队凭据，名额空闲时已经处于可执行状态
+
+        Raises:
+            QueueRejected: 超过用户或群组的请求上限，或者队列过长
+        """
+        user_key = (group_id, user_id)
+        if self.user_quota > 0 and self._user_requests.get(user_key, 0) >= self.user_quota:
+            self._reject("user_quota", self.user_quota)
+
+        jobs = self._group_jobs.setdefault(group_id, [])
+        leader = next((job for job in jobs if join is not None and join(job)), None)
+        if leader is None:
+            if self.group_quota > 0 and len(jobs) >= self.group_quota:
+                self._reject("group_quota", self.group_quota)
+            if self.max_waiting > 0 and len(self._waiting) >= self.max_waiting:
+                self._reject("overloaded", self.max_waiting)
+
+        ticket = QueueTicket(self, group_id, user_id, count, next(self._seq), leader)
+        self._user_requests[user_key] = self._user_requests.get(user_key, 0) + 1
+        if leader is not None:
+            leader.followers.append(ticket)
+            if leader.state != "waiting":
+                ticket.state = "running"
+                ticket.started.set_result(None)
+            return ticket
+
+        jobs.append(ticket)
+        self._waiting.append(ticket)
+        self._dispatch()
+        if ticket.state == "waiting":
+            logger.info(f"Queued summary for group {group_id} ({count} messages) at position {ticket.position}")
+        return ticket
+
+    def _reject(self, reason: str, limit: int) -> None:
+        self.metrics.increment("queue_rejections_total", reason=reason)
+        raise QueueRejected(reason, limit)
+
+    def _start(self, ticket: QueueTicket) -> None:
+        ticket.state = "running"
+        self._running += 1
+        self._group_running[ticket.group_id] = self._group_running.get(ticket.group_id, 0) + 1
+        for follower in (ticket,) + tuple(ticket.followers):
+            if follower.state == "waiting":
+                follower.state = "running"
+            if not follower.started.done():
+                follower.started.set_result(None)
+
+    def _dispatch(self) -> None:
+        """在有空闲名额时开始等待中的任务"""
+        while self._waiting and self._running < self.max_in_flight:
+            now = time.monotonic()
+            ticket = min(self._waiting, key=lambda waiting: self._key(waiting, now))
+            self._waiting.remove(ticket)
+            self._start(ticket)
+
+    def _release(self, ticket: QueueTicket) -> None:
+        if ticket.state == "done":
+            return
+        previous, ticket.state = ticket.state, "done"
+        user_key = (ticket.group_id, ticket.user_id)
+        remaining = self._user_requests.get(user_key, 0) - 1
+        if remaining > 0:
+            self._user_requests[user_key] = remaining
+        else:
+            self._user_requests.pop(user_key, None)
+
+        if ticket.leader is not None:
+            # 跟随者离开不影响任务本身
+            if ticket in ticket.leader.followers:
+                ticket.leader.followers.remove(ticket)
+            return
+
+        jobs = self._group_jobs.get(ticket.group_id, [])
+        followers = [follower for follower in ticket.followers if follower.state != "done"]
+        if previous == "waiting" and followers:
+            # 发起者取消了等待，由第一个跟随者接替它在队列中的位置
+            heir = followers[0]
+            heir.leader, heir.followers = None, followers[1:]
+            heir.seq, heir.enqueued_at = ticket.seq, ticket.enqueued_at
+            for follower in heir.followers:
+                follower.leader = heir
+            jobs[jobs.index(ticket)] = heir
+            self._waiting[self._waiting.index(ticket)] = heir
+            return
+
+        if ticket in jobs:
+            jobs.remove(ticket)
+        if not jobs:
+            self._group_jobs.pop(ticket.group_id, None)
+        if previous == "waiting":
+            self._waiting.remove(ticket)
+        else:
+            self._running -= 1
+            remaining = self._group_running.get(ticket.group_id, 0) - 1
+            if remaining > 0:
+                self._group_running[ticket.group_id] = remaining
+            else:
+                self._group_running.pop(ticket.group_id, None)
+            self._dispatch()
@@ -0,0 +1,239 @@
+"""
+LLM调用执行模块
+为LLM调用提供全局和按提供商的并发限制、超时、带抖动的指数退避重试，
+以及在主提供商响应慢于历史延迟分位数时向备用提供商发送对冲请求
+"""
+
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Sequence
+
+from .metrics import MetricsSink
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+# 视为临时错误的 HTTP 状态码
+TRANSIENT_STATUS = frozenset({408, 409, 425, 429, 500, 502, 503, 504, 529})
+# 各家 SDK 中表示临时错误的异常类名片段
+TRANSIENT_NAMES = ("Timeout", "RateLimit", "APIConnection", "InternalServer", "Overloaded", "ServiceUnavailable")
+
+
+class LLMError(Exception):
+    """LLM调用在重试后仍然失败"""
+
+
+def is_transient(error: BaseException) -> bool:
+    """判断异常是否为可以重试的临时错误
+
+    Args:
+        error: 异常
+
+    Returns:
+        是否可以重试
+    """
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, 'status_code', None) or getattr(error, 'status', None)
+    if isinstance(status, int) and status in TRANSIENT_STATUS:
+        return True
+    name = type(error).__name__
+    return any(part in name for part in TRANSIENT_NAMES)
+
+
+def provider_key(provider: Any) -> Hashable:
+    """获取提供商的标识，用于按提供商限制并发和统计延迟"""
+    try:
+        meta = provider.meta()
+        if getattr(meta, 'id', None):
+            return meta.id
+    except Exception:
+        pass
+    return getattr(provider, 'id', None) or id(provider)
+
+
+class LatencyTracker:
+    """记录最近若干次成功调用的延迟"""
+
+    def __init__(self, window: int = 100):
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """计算延迟分位数
+
+        Args:
+            fraction: 分位数，例如 0.95
+
+        Returns:
+            延迟（秒），没有样本时返回None
+        """
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+        return ordered[index]
+
+
+class LLMExecutor:
+    """LLM调用执行器
+
+    每次尝试都在全局和所属提供商的并发限制内进行，并受超时约束；
+    临时错误按带完全抖动的指数退避重试。提供了备用提供商且主提供商已有足够的延迟样本时，
+    主请求超过 ``hedge_percentile`` 分位延迟仍未返回，就向备用提供商发送相同的请求，
+    采用先成功的结果并取消另一个。
+    """
+
+    def __init__(self, max_concurrency: int = 8, per_provider_concurrency: int = 4, timeout: float = 30,
+                 retries: int = 2, backoff: float = 1.0, max_backoff: float = 10.0,
+                 hedge_percentile: float = 0.95, hedge_min_samples: int = 10,
+                 metrics: Optional[MetricsSink] = None):
+        """初始化执行器
+
+        Args:
+            max_concurrency: 所有提供商合计的最大并发调用数
+            per_provider_concurrency: 每个提供商的最大并发调用数
+            timeout: 单次尝试的超时时间（秒），0表示不限制
+            retries: 临时错误的最大重试次数
+            backoff: 第一次重试前退避的基准时间（秒）
+            max_backoff: 退避时间上限（秒）
+            hedge_percentile: 触发对冲请求的延迟分位数，0表示不发送对冲请求
+            hedge_min_samples: 发送对冲请求前主提供商至少需要的延迟样本数
+            metrics: 指标输出端
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.per_provider_concurrency = max(1, per_provider_concurrency)
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.metrics = metrics or MetricsSink()
+        self.latencies: Dict[Hashable, LatencyTracker] = {}
+        self._global: Optional[asyncio.Semaphore] = None
+        self._providers: Dict[Hashable, asyncio.Semaphore] = {}
+
+    def _semaphores(self, key: Hashable):
+        """获取全局和提供商的信号量，首次使用时在当前事件循环中创建"""
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.max_concurrency)
+        semaphore = self._providers.get(key)
+        if semaphore is None:
+            semaphore = self._providers[key] = asyncio.Semaphore(self.per_provider_concurrency)
+        return self._global, semaphore
+
+    def _delay(self, attempt: int) -> float:
+        """第 ``attempt`` 次重试前的退避时间，在 [0, 上限] 内均匀抖动"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    async def _attempt(self, call: Callable[[Any], Awaitable[str]], provider: Any) -> str:
+        """在并发限制和超时内执行一次调用"""
+        key = provider_key(provider)
+        global_semaphore, provider_semaphore = self._semaphores(key)
+        async with global_semaphore, provider_semaphore:
+            start = time.perf_counter()
+            if self.timeout and self.timeout > 0:
+                result = await asyncio.wait_for(call(provider), self.timeout)
+            else:
+                result = await call(provider)
+        self.latencies.setdefault(key, LatencyTracker()).add(time.perf_counter() - start)
+        return result
+
+    async def _with_retries(self, call: Callable[[Any], Awaitable[str]], provider: Any, retries: int) -> str:
+        """执行调用，临时错误按退避时间重试"""
+        attempt = 0
+        while True:
+            try:
+                return await self._attempt(call, provider)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.metrics.increment("llm_timeouts_total")
+                if attempt >= retries or not is_transient(e):
+                    raise
+                delay = self._delay(attempt)
+                attempt += 1
+                self.metrics.increment("llm_retries_total")
+                logger.warning(f"LLM call failed ({type(e).__name__}: {e}), retry {attempt}/{retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    def hedge_delay(self, provider: Any) -> Optional[float]:
+        """主提供商请求在多久之后仍未返回时发送对冲请求
+
+        Args:
+            provider: 主提供商
+
+        Returns:
+            等待时间（秒），样本不足或未启用对冲时返回None
+        """
+        if not self.hedge_percentile:
+            return None
+        tracker = self.latencies.get(provider_key(provider))
+        if tracker is None or len(tracker.samples) < self.hedge_min_samples:
+            return None
+        return tracker.percentile(self.hedge_percentile)
+
+    async def run(self, call: Callable[[Any], Awaitable[str]], providers: Sequence[Any],
+                  hedge: bool = True, retries: Optional[int] = None) -> str:
+        """执行一次LLM调用
+
+        Args:
+            call: 以提供商为参数发起调用的函数
+            providers: 主提供商，以及可选的备用提供商
+            hedge: 是否允许发送对冲请求
+            retries: 覆盖默认的最大重试次数
+
+        Returns:
+            调用结果
+
+        Raises:
+            LLMError: 所有尝试都失败
+        """
+        retries = self.retries if retries is None else retries
+        primary = providers[0]
+        backup = providers[1] if len(providers) > 1 else None
+        delay = self.hedge_delay(primary) if hedge and backup is not None else None
+        try:
+            if delay is None:
+                return await self._with_retries(call, primary, retries)
+            return await self._hedged(call, primary, backup, delay, retries)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            raise LLMError(f"{type(e).__name__}: {e}") from e
+
+    async def _hedged(self, call: Callable[[Any], Awaitable[str]], primary: Any, backup: Any,
+                      delay: float, retries: int) -> str:
+        """先发送主请求，超过等待时间仍未返回时再向备用提供商发送请求，采用先成功的结果"""
+        tasks: List[asyncio.Future] = [asyncio.ensure_future(self._with_retries(call, primary, retries))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                logger.info(f"LLM call exceeded {delay:.2f}s, sending hedged request")
+                self.metrics.increment("llm_hedges_total")
+                tasks.append(asyncio.ensure_future(self._with_retries(call, backup, retries)))
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if len(tasks) > 1:
+                            self.metrics.increment("llm_hedge_wins_total",
+                                                   provider="backup" if task is tasks[1] else "primary")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # 取消落后的请求并等待其退出，释放占用的并发名额
+            pending = [task for task in tasks if not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,366 @@
+"""
+指标模块
+记录总结命令各阶段的耗时和计数，通过可替换的指标输出端导出，内置 Prometheus 文本格式的文件和 HTTP 导出
+"""
+
+import os
+import time
+import asyncio
+import logging
+import tempfile
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Tuple, Optional, Iterator, AsyncIterator
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# 指标说明，用于 Prometheus 的 HELP 行
+METRIC_HELP: Dict[str, str] = {
+    "requests_total": "Summary commands by result",
+    "stage_seconds": "Time spent in each stage of a summary command",
+    "messages_fetched_total": "Messages read from history before filtering",
+    "messages_filtered_total": "Messages dropped by message filters, by rule",
+    "llm_calls_total": "LLM completion calls",
+    "llm_retries_total": "LLM attempts retried after a transient error",
+    "llm_timeouts_total": "LLM attempts that exceeded the timeout",
+    "llm_hedges_total": "Hedged LLM requests sent to the backup provider",
+    "llm_hedge_wins_total": "Hedged LLM calls by the provider that answered first",
+    "prompt_chars_total": "Characters sent to the LLM",
+    "prompt_tokens_total": "Estimated tokens sent to the LLM",
+    "precompute_jobs_total": "Background precompute jobs by result",
+    "queue_rejections_total": "Summary requests rejected by the job queue, by reason",
+    "cache_hits_total": "Summary cache hits",
+    "cache_misses_total": "Summary cache misses",
+    "extractive_selections_total": "Summaries whose records were shrunk by extractive selection",
+    "archived_summaries_total": "Summaries written to the archive",
+    "archive_searches_total": "Summary archive searches by result",
+    "errors_total": "Errors by stage",
+}
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class MetricsSink:
+    """指标输出端接口，默认实现丢弃所有指标
+
+    自定义输出端只需覆盖 ``increment`` 和 ``observe``，
+    需要定期写出的输出端再覆盖 ``flush``，需要常驻服务的输出端覆盖 ``start``。
+    """
+
+    def increment(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        """增加计数器
+
+        Args:
+            name: 指标名称
+            value: 增加的数值
+            **labels: 标签
+        """
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """记录一次观测值（如耗时）
+
+        Args:
+            name: 指标名称
+            value: 观测值
+            **labels: 标签
+        """
+
+    async def start(self) -> None:
+        """启动输出端，插件加载后或收到第一个事件时调用"""
+
+    async def flush(self) -> None:
+        """写出已记录的指标"""
+
+    async def close(self) -> None:
+        """释放输出端占用的资源"""
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = []
+    for key, value in items:
+        value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{key}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+class PrometheusRegistry(MetricsSink):
+    """在内存中汇总指标，并渲染为 Prometheus 文本格式
+
+    计数器按名称和标签累加，观测值汇总为直方图。
+    """
+
+    def __init__(self, namespace: str = "chatsummary", buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """初始化指标汇总
+
+        Args:
+            namespace: 指标名称前缀
+            buckets: 直方图的桶上界（秒）
+        """
+        self.namespace = namespace
+        self.buckets = tuple(sorted(buckets))
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, List[float]]] = {}
+
+    def increment(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        series = self.counters.setdefault(name, {})
+        key = _labels(labels)
+        series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        series = self.histograms.setdefault(name, {})
+        key = _labels(labels)
+        # 各桶的计数，最后两项为总和与总数
+        state = series.get(key)
+        if state is None:
+            state = series[key] = [0.0] * (len(self.buckets) + 2)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[index] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def value(self, name: str, **labels: Any) -> float:
+        """获取计数器的当前值，直方图返回观测次数
+
+        Args:
+            name: 指标名称
+            **labels: 标签
+
+        Returns:
+            当前值，不存在时为0
+        """
+        key = _labels(labels)
+        if name in self.histograms:
+            state = self.histograms[name].get(key)
+            return state[-1] if state else 0.0
+        return self.counters.get(name, {}).get(key, 0.0)
+
+    def render(self) -> str:
+        """渲染为 Prometheus 文本格式
+
+        Returns:
+            指标文本
+        """
+        lines: List[str] = []
+        for name in sorted(self.counters):
+            full = f"{self.namespace}_{name}"
+            lines.append(f"# HELP {full} {METRIC_HELP.get(name, name)}")
+            lines.append(f"# TYPE {full} counter")
+            for labels, value in sorted(self.counters[name].items()):
+                lines.append(f"{full}{_format_labels(labels)} {value:g}")
+        for name in sorted(self.histograms):
+            full = f"{self.namespace}_{name}"
+            lines.append(f"# HELP {full} {METRIC_HELP.get(name, name)}")
+            lines.append(f"# TYPE {full} histogram")
+            for labels, state in sorted(self.histograms[name].items()):
+                for bound, count in zip(self.buckets, state):
+                    lines.append(f"{full}_bucket{_format_labels(labels, ('le', f'{bound:g}'))} {count:g}")
+                lines.append(f"{full}_bucket{_format_labels(labels, ('le', '+Inf'))} {state[-1]:g}")
+                lines.append(f"{full}_sum{_format_labels(labels)} {state[-2]:.6f}")
+                lines.append(f"{full}_count{_format_labels(labels)} {state[-1]:g}")
+        return "\n".join(lines) + "\n"
+
+
+class PrometheusFileExporter(PrometheusRegistry):
+    """每次写出时将指标原子地写入文本文件，供 node_exporter 的 textfile 收集器读取"""
+
+    def __init__(self, path: str, **kwargs: Any):
+        """初始化文件导出
+
+        Args:
+            path: 指标文件路径，通常以 ``.prom`` 结尾
+            **kwargs: 传给 :class:`PrometheusRegistry` 的参数
+        """
+        super().__init__(**kwargs)
+        self.path = path
+
+    def _write(self, text: str) -> None:
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(temp_path, self.path)
+        except Exception:
+            os.unlink(temp_path)
+            raise
+
+    async def flush(self) -> None:
+        try:
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self._write, self.render())
+        except Exception as e:
+            logger.error(f"Error writing metrics file {self.path}: {e}")
+
+
+class PrometheusHTTPExporter(PrometheusRegistry):
+    """在本地 HTTP 端口上提供 ``/metrics``
+
+    插件加载后即启动；启动失败（如端口被占用）时只记录一次错误，之后不再重试。
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9464, **kwargs: Any):
+        """初始化 HTTP 导出
+
+        Args:
+            host: 监听地址
+            port: 监听端口，0表示由系统分配
+            **kwargs: 传给 :class:`PrometheusRegistry` 的参数
+        """
+        super().__init__(**kwargs)
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._starting = False
+        self.failed = False
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await asyncio.wait_for(reader.readline(), timeout=5)
+            # 读取并丢弃请求头
+            while (await asyncio.wait_for(reader.readline(), timeout=5)).strip():
+                pass
+            parts = request.decode('latin-1').split()
+            if len(parts) >= 2 and parts[1].split('?')[0] == "/metrics":
+                body = self.render().encode('utf-8')
+                status = "200 OK"
+            else:
+                body = b"Not Found\n"
+                status = "404 Not Found"
+            writer.write((f"HTTP/1.1 {status}\r\n"
+                          f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                          f"Content-Length: {len(body)}\r\n"
+                          f"Connection: close\r\n\r\n").encode('latin-1') + body)
+            await writer.drain()
+        except Exception as e:
+            logger.debug(f"Metrics request failed: {e}")
+        finally:
+            writer.close()
+
+    async def start(self) -> None:
+        """启动 HTTP 服务，已启动或启动失败过时不做任何事"""
+        if self._server is not None or self._starting or self.failed:
+            return
+        self._starting = True
+        try:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+            self.port = self._server.sockets[0].getsockname()[1]
+            logger.info(f"Metrics exporter listening on http://{self.host}:{self.port}/metrics")
+        except Exception as e:
+            self.failed = True
+            logger.error(f"Error starting metrics exporter on {self.host}:{self.port}, not retrying: {e}")
+        finally:
+            self._starting = False
+
+    async def flush(self) -> None:
+        await self.start()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+
+class StageTrace:
+    """一次总结命令的阶段耗时记录
+
+    同一阶段可以多次计时，耗时累加；``finish`` 时每个阶段向输出端报告一次。
+    """
+
+    def __init__(self, sink: MetricsSink):
+        self.sink = sink
+        self.stages: Dict[str, float] = {}
+        self.started = time.perf_counter()
+
+    def add(self, name: str, seconds: float) -> None:
+        """累加阶段耗时
+
+        Args:
+            name: 阶段名称
+            seconds: 耗时（秒）
+        """
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """为代码块计时，出现异常时按阶段计数错误
+
+        Args:
+            name: 阶段名称
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.sink.increment("errors_total", stage=name)
+            raise
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    async def timed(self, source: AsyncIterator[Any], name: str) -> AsyncIterator[Any]:
+        """为异步迭代器等待下一项的时间计时
+
+        Args:
+            source: 异步迭代器
+            name: 阶段名称
+
+        Yields:
+            原迭代器的各项
+        """
+        iterator = source.__aiter__()
+        while True:
+            start = time.perf_counter()
+            try:
+                item = await iterator.__anext__()
+            except StopAsyncIteration:
+                self.add(name, time.perf_counter() - start)
+                return
+            self.add(name, time.perf_counter() - start)
+            yield item
+
+    @property
+    def elapsed(self) -> float:
+        """从开始到现在的耗时（秒）"""
+        return time.perf_counter() - self.started
+
+    def finish(self) -> float:
+        """向输出端报告各阶段和整个命令的耗时
+
+        Returns:
+            整个命令的耗时（秒）
+        """
+        total = self.elapsed
+        for name, seconds in self.stages.items():
+            self.sink.observe("stage_seconds", seconds, stage=name)
+        self.sink.observe("stage_seconds", total, stage="total")
+        return total
+
+
+# 当前任务正在记录的阶段耗时，LLM调用等深层代码通过它找到所属的命令
+current_trace: ContextVar[Optional[StageTrace]] = ContextVar("chatsummary_trace", default=None)
+
+
+@contextmanager
+def trace_stage(name: str) -> Iterator[None]:
+    """在当前命令的阶段记录中为代码块计时，没有正在记录的命令时不做任何事
+
+    Args:
+        name: 阶段名称
+    """
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.stage(name):
+        yield
@@ -0,0 +1,98 @@
+"""
+OpenAI 兼容接口模块
+在没有 AstrBot 的环境（如命令行工具）中，通过 OpenAI 兼容的 Chat Completions 接口调用LLM，
+提供与 AstrBot 提供商相同的 ``text_chat`` 接口，只依赖标准库
+"""
+
+import os
+import json
+import asyncio
+import logging
+import urllib.error
+import urllib.request
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+DEFAULT_API_BASE = "https://api.openai.com/v1"
+
+
+class ProviderHTTPError(Exception):
+    """接口返回了错误状态码"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"HTTP {status_code}: {message}")
+        self.status_code = status_code
+
+
+class CompletionResponse:
+    """与 AstrBot 的 LLMResponse 相同的最小接口"""
+
+    def __init__(self, completion_text: str):
+        self.completion_text = completion_text
+
+
+class OpenAICompatibleProvider:
+    """OpenAI 兼容接口的LLM提供商"""
+
+    def __init__(self, model: str, api_key: str = "", api_base: str = DEFAULT_API_BASE,
+                 timeout: float = 120):
+        """初始化提供商
+
+        Args:
+            model: 模型名称
+            api_key: API 密钥，支持 ``${ENV_NAME}`` 形式的环境变量
+            api_base: 接口基础URL
+            timeout: HTTP 请求超时时间（秒）
+        """
+        self.model = model
+        self.api_key = os.path.expandvars(api_key or "")
+        self.api_base = (api_base or DEFAULT_API_BASE).rstrip("/")
+        self.timeout = timeout
+        self.id = f"openai-compatible:{self.api_base}:{model}"
+
+    def get_model(self) -> str:
+        return self.model
+
+    def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """发送请求（阻塞操作，在工作线程中执行）"""
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        request = urllib.request.Request(
+            f"{self.api_base}/chat/completions",
+            data=json.dumps(payload, ensure_ascii=False).encode('utf-8'),
+            headers=headers,
+            method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            body = e.read().decode('utf-8', errors='replace')[:500]
+            raise ProviderHTTPError(e.code, body) from None
+        except urllib.error.URLError as e:
+            raise ConnectionError(str(e.reason)) from None
+
+    async def text_chat(self, input: str, max_tokens: Optional[int] = None,
+                        temperature: Optional[float] = None) -> CompletionResponse:
+        """生成文本
+
+        Args:
+            input: 输入文本
+            max_tokens: 最大生成令牌数
+            temperature: 生成温度
+
+        Returns:
+            生成结果
+        """
+        payload: Dict[str, Any] = {"model": self.model, "messages": [{"role": "user", "content": input}]}
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        if temperature is not None:
+            payload["temperature"] = temperature
+        loop = asyncio.get_event_loop()
+        data = await loop.run_in_executor(None, self._post, payload)
+        try:
+            return CompletionResponse(data["choices"][0]["message"]["content"] or "")
+        except (KeyError, IndexError, TypeError):
+            raise ValueError(f"Unexpected completion response: {str(data)[:200]}")
@@ -0,0 +1,251 @@
+"""
+聊天记录导出文件解析模块
+以流式方式读取 OneBot 消息 JSON 数组、JSONL 和 QQ 纯文本导出，逐条产出记录，
+解析时不需要把整个文件或全部原始记录读入内存；记录统一为 OneBot 消息格式，交给 MessageFormatter 格式化。
+格式化后的聊天记录行仍会全部保留，内存占用与消息条数成正比
+"""
+
+import os
+import re
+import json
+import mmap
+import time
+import logging
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Union
+
+from .formatting import MessageFormatter
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+Record = Union[str, Dict[str, Any]]
+
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE_RE = re.compile(r'\s*')
+# 包装对象中的消息数组，例如 {"data": {"messages": [...]}}
+_MESSAGES_RE = re.compile(r'"messages"\s*:\s*\[')
+# QQ 纯文本导出中每条消息的标题行：日期 时间 昵称(QQ号) 或 昵称<邮箱>
+_QQ_HEADER_RE = re.compile(
+    r'^(\d{4}-\d{1,2}-\d{1,2} \d{1,2}:\d{2}:\d{2}) (.*?)(?:\((\d+)\)|<([^<>]*)>)?\s*$')
+# QQ 纯文本导出开头的说明行
+_QQ_BANNER_RE = re.compile(r'^(={8,}|消息记录|消息分组|消息对象)')
+
+
+def iter_json_array(f: TextIO, wrapped: bool = False, chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """逐个解析 JSON 数组中的元素，只在内存中保留当前元素和一个读取块
+
+    Args:
+        f: 以文本模式打开的文件
+        wrapped: 数组是否位于对象的 ``messages`` 字段中
+        chunk_size: 每次读取的字符数
+
+    Yields:
+        数组元素
+
+    Raises:
+        ValueError: 文件不是合法的 JSON 数组
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def fill(size: int = chunk_size) -> None:
+        nonlocal buffer, pos, eof
+        chunk = f.read(size)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    fill()
+    if buffer.startswith("\ufeff"):
+        pos = 1
+    if wrapped:
+        while True:
+            match = _MESSAGES_RE.search(buffer, pos)
+            if match:
+                pos = match.end()
+                break
+            if eof:
+                return
+            # 保留末尾可能被截断的字段名
+            pos = max(pos, len(buffer) - 64)
+            fill()
+    else:
+        pos = _WHITESPACE_RE.match(buffer, pos).end()
+        if buffer[pos:pos + 1] != "[":
+            raise ValueError("Expected a JSON array")
+        pos += 1
+
+    while True:
+        pos = _WHITESPACE_RE.match(buffer, pos).end()
+        if pos >= len(buffer):
+            if eof:
+                raise ValueError("Unterminated JSON array")
+            fill()
+            continue
+        char = buffer[pos]
+        if char == "]":
+            return
+        if char == ",":
+            pos += 1
+            continue
+        size = chunk_size
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                # 数字等值可能恰好在读取块的末尾被截断
+                if end < len(buffer) or eof:
+                    break
+            except json.JSONDecodeError:
+                if eof:
+                    raise ValueError(f"Invalid JSON near offset {pos}")
+            # 元素跨越多个读取块时逐次加倍读取量，避免反复解析同一段文本
+            fill(size)
+            size *= 2
+        yield item
+        pos = end
+
+
+def _iter_lines(path: str) -> Iterator[bytes]:
+    """通过内存映射逐行读取文件"""
+    if os.path.getsize(path) == 0:
+        return
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for line in iter(mapped.readline, b""):
+            yield line
+
+
+def iter_json_lines(path: str) -> Iterator[Any]:
+    """逐行解析 JSONL 文件，跳过无法解析的行
+
+    Args:
+        path: 文件路径
+
+    Yields:
+        每行的 JSON 值
+    """
+    for number, line in enumerate(_iter_lines(path), 1):
+        line = line.strip()
+        if number == 1 and line.startswith(b"\xef\xbb\xbf"):
+            line = line[3:]
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            logger.warning(f"Skipping invalid JSON on line {number} of {path}")
+
+
+def _qq_record(header: "re.Match", content: List[str]) -> Dict[str, Any]:
+    """将 QQ 纯文本导出中的一条消息转换为 OneBot 消息格式"""
+    moment, nickname, user_id, email = header.groups()
+    try:
+        timestamp = int(time.mktime(time.strptime(moment, "%Y-%m-%d %H:%M:%S")))
+    except ValueError:
+        timestamp = 0
+    return {
+        'time': timestamp,
+        'sender': {'nickname': nickname or user_id or email or 'Unknown', 'user_id': user_id or email or ''},
+        'message': [{'type': 'text', 'data': {'text': " ".join(content)}}],
+    }
+
+
+def iter_text_export(path: str) -> Iterator[Record]:
+    """逐条读取 QQ 纯文本导出，其他纯文本文件按行产出
+
+    QQ 导出中每条消息以 ``2024-01-01 12:00:00 昵称(QQ号)`` 开头，之后的行是消息内容，
+    多行内容合并为一行。
+
+    Args:
+        path: 文件路径
+
+    Yields:
+        QQ 消息转换成的 OneBot 消息，或不属于任何消息的文本行
+    """
+    header = None
+    content: List[str] = []
+    for number, raw in enumerate(_iter_lines(path), 1):
+        line = raw.decode('utf-8', errors='replace').rstrip("\r\n")
+        if number == 1:
+            line = line.lstrip("\ufeff")
+        match = _QQ_HEADER_RE.match(line)
+        if match:
+            if header is not None:
+                yield _qq_record(header, content)
+            header, content = match, []
+        elif header is not None:
+            if line.strip():
+                content.append(line.strip())
+        elif line.strip() and not _QQ_BANNER_RE.match(line.strip()):
+            yield line.rstrip()
+    if header is not None:
+        yield _qq_record(header, content)
+
+
+def iter_records(path: str) -> Iterator[Record]:
+    """根据文件内容选择解析方式，逐条读取聊天记录
+
+    Args:
+        path: 文件路径
+
+    Yields:
+        OneBot 消息字典或文本行
+    """
+    with open(path, 'rb') as f:
+        # 第一行最多读取 1MB，单行的大型 JSON 文件不会被整个读入
+        first_line = f.readline(1 << 20)
+        while first_line and not first_line.strip(b"\xef\xbb\xbf \t\r\n"):
+            first_line = f.readline(1 << 20)
+    stripped = first_line.lstrip(b"\xef\xbb\xbf").strip()
+
+    if stripped.startswith(b"["):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            yield from iter_json_array(f)
+    elif stripped.startswith(b"{"):
+        jsonl = path.lower().endswith(".jsonl")
+        if not jsonl:
+            try:
+                # 第一行是一条完整的消息时按 JSONL 读取，否则是包含消息数组的对象
+                first = json.loads(stripped)
+                jsonl = isinstance(first, dict) and 'messages' not in first and 'data' not in first
+            except ValueError:
+                jsonl = False
+        if jsonl:
+            yield from iter_json_lines(path)
+        else:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                yield from iter_json_array(f, wrapped=True)
+    else:
+        yield from iter_text_export(path)
+
+
+def read_chat_lines(path: str, formatter: Optional[MessageFormatter] = None) -> List[str]:
+    """读取聊天记录文件并格式化为按从旧到新排列的聊天记录行
+
+    原始记录逐条解析后即丢弃，但返回的聊天记录行全部在内存中，占用与消息条数成正比（通常明显小于原始文件）；
+    导出文件按从新到旧排列时，读取完成后原地反转。消息为 CQ 码字符串的导出同样支持。
+
+    Args:
+        path: 文件路径
+        formatter: 消息格式化器
+
+    Returns:
+        聊天记录行
+    """
+    formatter = formatter or MessageFormatter()
+    lines: List[str] = []
+    first_time = last_time = None
+    for record in iter_records(path):
+        if isinstance(record, dict):
+            timestamp = record.get('time', 0)
+            if first_time is None:
+                first_time = timestamp
+            last_time = timestamp
+            lines.append(formatter.format(record))
+        elif isinstance(record, str) and record.strip():
+            lines.append(record.rstrip())
+    if first_time is not None and last_time is not None and first_time > last_time:
+        lines.reverse()
+    return lines
@@ -0,0 +1,337 @@
+"""
+总结渲染模块
+要求LLM以 JSON 输出结构化总结，校验后用 ``data/templates`` 中的模板渲染为 Markdown、HTML 或纯文本；
+同一份结构化结果可以渲染为多种格式，不需要为每种格式再调用一次LLM。
+模板只加载和编译一次，安装了 jinja2 时使用 Jinja2 并启用字节码缓存，否则使用内置的简易模板引擎
+"""
+
+import os
+import re
+import json
+import time
+import html
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import jinja2
+except ImportError:  # 未安装 jinja2 时使用内置的简易模板引擎
+    jinja2 = None
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+# 插件自带的模板目录
+DEFAULT_TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                     'data', 'templates')
+
+# 各输出格式对应的模板文件
+FORMAT_TEMPLATES = {
+    "markdown": "markdown_template.md",
+    "html": "html_template.html",
+    "text": "text_template.txt",
+}
+# 输出格式的别名
+FORMAT_ALIASES = {"md": "markdown", "plain": "text", "txt": "text", "htm": "html"}
+
+# 追加在总结提示词之后，要求LLM输出结构化总结
+STRUCTURED_OUTPUT_PROMPT = (
+    "请只输出一个 JSON 对象，不要输出 JSON 以外的任何内容，字段如下：\n"
+    '{"title": "总结标题", "summary": "整体概述，可以分为多段", '
+    '"key_points": ["讨论要点"], "action_items": ["待办事项"], '
+    '"questions": ["尚未解决的问题"], "participants": ["主要参与者昵称"]}\n'
+    "没有内容的字段使用空数组。"
+)
+
+LIST_FIELDS = ("key_points", "action_items", "questions", "participants")
+
+_FENCE_RE = re.compile(r'^```[A-Za-z]*\s*\n(.*?)\n?```\s*$', re.S)
+
+
+def normalize_format(fmt: str) -> str:
+    """将输出格式名称统一为 ``markdown``、``html`` 或 ``text``
+
+    Raises:
+        ValueError: 不支持的输出格式
+    """
+    fmt = (fmt or "markdown").strip().lower()
+    fmt = FORMAT_ALIASES.get(fmt, fmt)
+    if fmt not in FORMAT_TEMPLATES:
+        raise ValueError(f"Unsupported output format: {fmt}")
+    return fmt
+
+
+@dataclass
+class StructuredSummary:
+    """结构化总结"""
+    summary: str
+    title: str = ""
+    key_points: List[str] = field(default_factory=list)
+    action_items: List[str] = field(default_factory=list)
+    questions: List[str] = field(default_factory=list)
+    participants: List[str] = field(default_factory=list)
+    # 是否从LLM输出的 JSON 中解析得到，为False时 summary 是原始输出
+    structured: bool = True
+
+
+def _string_list(value: Any) -> List[str]:
+    """将字段值整理为非空字符串列表"""
+    if value is None:
+        return []
+    if isinstance(value, (str, int, float)):
+        value = [value]
+    if not isinstance(value, list):
+        raise ValueError(f"Expected a list, got {type(value).__name__}")
+    items = []
+    for item in value:
+        if isinstance(item, dict):
+            # 部分模型会输出 {"content": "..."} 形式的条目
+            item = next((v for v in item.values() if isinstance(v, str)), "")
+        text = str(item).strip() if item is not None else ""
+        if text:
+            items.append(text)
+    return items
+
+
+def parse_structured(text: str) -> StructuredSummary:
+    """解析并校验LLM输出的结构化总结
+
+    允许输出被代码块包裹或前后带有说明文字；无法解析或缺少 ``summary`` 时，
+    整段输出作为 ``summary``，其余字段为空。
+
+    Args:
+        text: LLM输出
+
+    Returns:
+        结构化总结
+    """
+    raw = (text or "").strip()
+    candidate = raw
+    fenced = _FENCE_RE.match(candidate)
+    if fenced:
+        candidate = fenced.group(1).strip()
+    start, end = candidate.find("{"), candidate.rfind("}")
+    try:
+        if start < 0 or end <= start:
+            raise ValueError("No JSON object found")
+        data = json.loads(candidate[start:end + 1])
+        if not isinstance(data, dict):
+            raise ValueError("Expected a JSON object")
+        summary = data.get("summary")
+        if not isinstance(summary, str) or not summary.strip():
+            raise ValueError("Missing summary")
+        title = data.get("title")
+        return StructuredSummary(
+            summary=summary.strip(),
+            title=title.strip() if isinstance(title, str) else "",
+            **{name: _string_list(data.get(name)) for name in LIST_FIELDS})
+    except ValueError as e:
+        logger.debug(f"Summary is not valid structured output ({e}), rendering it as plain text")
+        return StructuredSummary(summary=raw, structured=False)
+
+
+# ---- 内置的简易模板引擎，支持 {{ 变量 }}、{% for %} 和 {% if %}，行为与 Jinja2 的 trim_blocks/lstrip_blocks 一致 ----
+
+_TOKEN_RE = re.compile(r'{{\s*(.*?)\s*}}|([ \t]*){%-?\s*(.*?)\s*-?%}(\n?)', re.S)
+_NAME_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$')
+_FOR_RE = re.compile(r'^for\s+([A-Za-z_][A-Za-z0-9_]*)\s+in\s+(.+)$')
+
+Node = Tuple[Any, ...]
+
+
+def _lookup(name: str, scope: Dict[str, Any]) -> Any:
+    value: Any = scope
+    for part in name.split("."):
+        if isinstance(value, dict):
+            value = value.get(part)
+        else:
+            value = getattr(value, part, None)
+        if value is None:
+            return None
+    return value
+
+
+class SimpleTemplate:
+    """内置模板引擎编译得到的模板"""
+
+    def __init__(self, source: str, name: str = "<template>", autoescape: bool = False):
+        self.name = name
+        self.escape: Callable[[str], str] = html.escape if autoescape else str
+        self.nodes = self._compile(source)
+
+    def _name(self, expression: str) -> str:
+        if not _NAME_RE.match(expression):
+            raise ValueError(f"Unsupported expression in {self.name}: {expression}")
+        return expression
+
+    def _compile(self, source: str) -> List[Node]:
+        root: List[Node] = []
+        # 每层为 (块类型, 节点列表, 块节点)
+        stack: List[Tuple[str, List[Node], Optional[list]]] = [("root", root, None)]
+        pos = 0
+        for match in _TOKEN_RE.finditer(source):
+            body = stack[-1][1]
+            text = source[pos:match.start()]
+            pos = match.end()
+            if match.group(1) is not None:
+                if text:
+                    body.append(("text", text))
+                body.append(("var", self._name(match.group(1))))
+                continue
+            indent, tag = match.group(2), match.group(3)
+            # 块标签前只有缩进时去掉缩进，标签后的换行总是去掉
+            if match.start() > 0 and source[match.start() - 1] != "\n":
+                text += indent
+            if text:
+                body.append(("text", text))
+            keyword = tag.split(None, 1)[0] if tag else ""
+            if keyword == "for":
+                loop = _FOR_RE.match(tag)
+                if not loop:
+                    raise ValueError(f"Invalid for tag in {self.name}: {tag}")
+                node = ["for", loop.group(1), self._name(loop.group(2).strip()), []]
+                body.append(node)
+                stack.append(("for", node[3], node))
+            elif keyword == "if":
+                node = ["if", self._name(tag[2:].strip()), [], []]
+                body.append(node)
+                stack.append(("if", node[2], node))
+            elif keyword == "else" and stack[-1][0] == "if":
+                _, _, node = stack.pop()
+                stack.append(("else", node[3], node))
+            elif keyword in ("endfor", "endif") and stack[-1][0] in (
+                    ("for",) if keyword == "endfor" else ("if", "else")):
+                stack.pop()
+            else:
+                raise ValueError(f"Unsupported tag in {self.name}: {tag}")
+        if len(stack) > 1:
+            raise ValueError(f"Unclosed {stack[-1][0]} block in {self.name}")
+        if source[pos:]:
+            root.append(("text", source[pos:]))
+        return root
+
+    def _render(self, nodes: Iterable[Node], scope: Dict[str, Any], out: List[str]) -> None:
+        for node in nodes:
+            kind = node[0]
+            if kind == "text":
+                out.append(node[1])
+            elif kind == "var":
+                value = _lookup(node[1], scope)
+                out.append("" if value is None else self.escape(str(value)))
+            elif kind == "for":
+                for item in _lookup(node[2], scope) or ():
+                    self._render(node[3], dict(scope, **{node[1]: item}), out)
+            else:
+                self._render(node[2] if _lookup(node[1], scope) else node[3], scope, out)
+
+    def render(self, **context: Any) -> str:
+        out: List[str] = []
+        self._render(self.nodes, context, out)
+        return "".join(out)
+
+
+class SummaryRenderer:
+    """使用模板将结构化总结渲染为各种输出格式
+
+    模板按 ``custom_templates_dir``、插件自带模板目录的顺序查找，
+    ``template`` 不是 ``default`` 时使用这些目录下同名子目录中的模板。
+    """
+
+    def __init__(self, custom_templates_dir: str = "", template: str = "default",
+                 cache_dir: Optional[str] = None, templates_dir: str = DEFAULT_TEMPLATES_DIR):
+        """初始化渲染器
+
+        Args:
+            custom_templates_dir: 自定义模板目录，其中的模板优先于自带模板
+            template: 模板名称
+            cache_dir: Jinja2 字节码缓存目录，为None时不缓存编译结果到磁盘
+            templates_dir: 自带模板目录
+        """
+        self.search_path = [path for path in (custom_templates_dir, templates_dir) if path]
+        self.template = template or "default"
+        self.cache_dir = cache_dir
+        self._templates: Dict[str, Any] = {}
+        self._environment = None
+
+    def template_name(self, fmt: str) -> str:
+        """获取输出格式对应的模板文件名"""
+        filename = FORMAT_TEMPLATES[normalize_format(fmt)]
+        return filename if self.template == "default" else f"{self.template}/{filename}"
+
+    def _jinja_environment(self):
+        if self._environment is None:
+            bytecode_cache = None
+            if self.cache_dir:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                bytecode_cache = jinja2.FileSystemBytecodeCache(self.cache_dir)
+            self._environment = jinja2.Environment(
+                loader=jinja2.FileSystemLoader(self.search_path),
+                bytecode_cache=bytecode_cache,
+                autoescape=jinja2.select_autoescape(["html", "htm"]),
+                trim_blocks=True,
+                lstrip_blocks=True,
+                keep_trailing_newline=True,
+                # 模板只编译一次，运行期间不再检查文件修改时间
+                auto_reload=False)
+        return self._environment
+
+    def _load(self, name: str):
+        """加载并编译模板，结果在渲染器的生命周期内复用
+
+        Raises:
+            FileNotFoundError: 所有模板目录中都没有该模板
+        """
+        template = self._templates.get(name)
+        if template is not None:
+            return template
+        if jinja2 is not None:
+            try:
+                template = self._jinja_environment().get_template(name)
+            except jinja2.TemplateNotFound:
+                raise FileNotFoundError(f"Template not found: {name}") from None
+        else:
+            for directory in self.search_path:
+                path = os.path.join(directory, *name.split("/"))
+                if os.path.isfile(path):
+                    with open(path, 'r', encoding='utf-8') as f:
+                        template = SimpleTemplate(f.read(), name, autoescape=name.endswith((".html", ".htm")))
+                    break
+            else:
+                raise FileNotFoundError(f"Template not found: {name}")
+        self._templates[name] = template
+        return template
+
+    def render(self, summary: StructuredSummary, fmt: str, title: str = "",
+               date: Optional[str] = None, **context: Any) -> str:
+        """渲染结构化总结
+
+        Args:
+            summary: 结构化总结
+            fmt: 输出格式，``markdown``、``html`` 或 ``text``
+            title: LLM没有给出标题时使用的标题
+            date: 显示的日期，默认为当前时间
+            **context: 其他模板变量
+
+        Returns:
+            渲染结果
+        """
+        values = dict(context)
+        values.update(
+            title=summary.title or title,
+            date=date or time.strftime("%Y-%m-%d %H:%M"),
+            summary=summary.summary,
+            key_points=summary.key_points,
+            action_items=summary.action_items,
+            questions=summary.questions,
+            participants=", ".join(summary.participants),
+        )
+        return self._load(self.template_name(fmt)).render(**values).strip() + "\n"
+
+    def render_all(self, summary: StructuredSummary, formats: Sequence[str],
+                   **context: Any) -> Dict[str, str]:
+        """将同一份结构化总结渲染为多种格式
+
+        Returns:
+            输出格式到渲染结果的映射
+        """
+        return {normalize_format(fmt): self.render(summary, fmt, **context) for fmt in formats}
@@ -0,0 +1,104 @@
+"""
+增量滚动总结模块
+基于每个群组的总结检查点，只总结检查点之后的新消息并合并到已有总结中
+"""
+
+import time
+import asyncio
+import logging
+from typing import List, Callable, Awaitable, Optional
+
+from .store import MessageStore, Checkpoint
+from .cache import prompt_hash
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+MERGE_PROMPT = (
+    "{prompt}\n\n以下是此前已经生成的群聊总结：\n\n{previous}\n\n"
+    "以下是在那之后群里新产生的聊天记录：\n\n{content}\n\n"
+    "请将新聊天记录中的内容合并到已有总结中，更新相应的板块，"
+    "输出一份完整的最新总结，结构和风格与已有总结保持一致，不要说明哪些内容是新增的。"
+)
+
+
+class RollingSummarizer:
+    """增量滚动总结器
+
+    检查点记录最近一次总结对应的消息序号区间。新的请求窗口满足以下条件时增量总结：
+
+    - 检查点的最新序号位于窗口内，且检查点覆盖了窗口的起点；
+    - 窗口起点相对检查点起点后移的距离与新消息的序号跨度大致相同，即窗口只是随新消息向前滑动，
+      而不是比检查点更短的窗口（否则检查点中早于窗口的内容会被当作窗口的总结返回）；
+    - 新消息条数不超过窗口长度的 ``max_new_ratio``，否则重新完整总结更划算。
+
+    区间完全相同时直接返回检查点中的总结；不满足条件时调用完整总结函数。
+    两种情况都以新窗口的区间重建检查点。
+    """
+
+    def __init__(self, store: MessageStore, complete: Callable[[str], Awaitable[str]],
+                 max_new_ratio: float = 0.5, render: Optional[Callable[[List[str]], str]] = None):
+        """初始化滚动总结器
+
+        Args:
+            store: 保存检查点的消息存储
+            complete: LLM调用函数
+            max_new_ratio: 允许增量总结的新消息占窗口的最大比例
+            render: 将新聊天记录行转换为发送给LLM的文本的函数，默认按换行拼接
+        """
+        self.store = store
+        self.complete = complete
+        self.max_new_ratio = max_new_ratio
+        self.render = render or "\n".join
+
+    async def _run(self, func, *args):
+        """在工作线程中执行存储操作，避免阻塞事件循环"""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    def _usable(self, checkpoint: Checkpoint, seqs: List[int]) -> bool:
+        """判断检查点能否用于当前窗口"""
+        window_oldest, window_newest = seqs[0], seqs[-1]
+        if not window_oldest <= checkpoint.newest_seq <= window_newest:
+            return False
+        if checkpoint.oldest_seq > window_oldest:
+            return False
+        # 被过滤的消息会在序号中留下空缺，允许少量偏差
+        tolerance = max(2, len(seqs) // 20)
+        if window_oldest - checkpoint.oldest_seq > window_newest - checkpoint.newest_seq + tolerance:
+            return False
+        new_count = sum(1 for seq in seqs if seq > checkpoint.newest_seq)
+        if new_count == 0:
+            return checkpoint.oldest_seq == window_oldest
+        return new_count <= len(seqs) * self.max_new_ratio
+
+    async def summarize(self, group_id: str, prompt: str, model: str, lines: List[str],
+                        seqs: List[int], full: Callable[[List[str]], Awaitable[str]]) -> str:
+        """生成窗口的总结，能复用检查点时只总结新消息
+
+        Args:
+            group_id: 群组ID
+            prompt: 总结提示词
+            model: 模型名称
+            lines: 按时间顺序排列的聊天记录行
+            seqs: 与 ``lines`` 一一对应的消息序号
+            full: 完整总结函数
+
+        Returns:
+            总结文本，格式与完整总结一致
+        """
+        key = prompt_hash(prompt)
+        checkpoint = await self._run(self.store.get_checkpoint, group_id, key, model)
+
+        if checkpoint is not None and self._usable(checkpoint, seqs):
+            new_lines = [line for line, seq in zip(lines, seqs) if seq > checkpoint.newest_seq]
+            if not new_lines:
+                return checkpoint.summary
+            logger.info(f"Rolling summary for group {group_id}: merging {len(new_lines)} new lines")
+            summary = await self.complete(MERGE_PROMPT.format(
+                prompt=prompt, previous=checkpoint.summary, content=self.render(new_lines)))
+        else:
+            summary = await full(lines)
+
+        await self._run(self.store.save_checkpoint, Checkpoint(
+            str(group_id), key, model, seqs[0], seqs[-1], summary, time.time()))
+        return summary
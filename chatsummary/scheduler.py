@@ -0,0 +1,351 @@
+"""
+后台预计算模块
+跟踪各群组的消息活跃度，在群聊空闲且处于允许的时间段时为最活跃的群组预先生成总结，
+结果写入总结缓存和滚动检查点，之后的总结命令可以直接使用；预计算受每日LLM调用预算限制，
+有交互请求正在执行时暂停
+"""
+
+import time
+import asyncio
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .metrics import MetricsSink
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+
+class BudgetExhausted(Exception):
+    """预计算的LLM调用预算已用完"""
+
+
+class CallBudget:
+    """每天可用的LLM调用次数，按本地日期重置"""
+
+    def __init__(self, daily_calls: int):
+        """初始化调用预算
+
+        Args:
+            daily_calls: 每天最多的调用次数，0表示不限制
+        """
+        self.daily_calls = daily_calls
+        self.used = 0
+        self._day: Optional[Tuple[int, int, int]] = None
+
+    def _roll(self, now: Optional[float] = None) -> None:
+        day = tuple(time.localtime(now)[:3])
+        if day != self._day:
+            self._day = day
+            self.used = 0
+
+    def remaining(self, now: Optional[float] = None) -> float:
+        """今天剩余的调用次数
+
+        Args:
+            now: 当前时间戳，默认为当前时间
+
+        Returns:
+            剩余次数，不限制时为无穷大
+        """
+        self._roll(now)
+        if not self.daily_calls:
+            return float("inf")
+        return max(0, self.daily_calls - self.used)
+
+    def charge(self, calls: int = 1) -> None:
+        """记录一次LLM调用
+
+        Args:
+            calls: 调用次数
+
+        Raises:
+            BudgetExhausted: 今天的预算已用完
+        """
+        if self.remaining() < calls:
+            raise BudgetExhausted(f"precompute budget of {self.daily_calls} LLM calls per day is exhausted")
+        self.used += calls
+
+
+# 当前任务使用的调用预算，只有预计算任务会设置，LLM调用前通过它扣减
+current_budget: ContextVar[Optional[CallBudget]] = ContextVar("chatsummary_budget", default=None)
+
+
+@dataclass
+class GroupActivity:
+    """一个群组的活跃度"""
+    group_id: str
+    # 按半衰期衰减的消息数，用于比较群组的活跃程度
+    score: float = 0.0
+    last_message_at: float = 0.0
+    # 上次预计算之后收到的消息数
+    pending: int = 0
+    last_precompute_at: float = 0.0
+    # 最近一次收到的群消息事件，预计算时用它访问平台接口
+    event: Any = None
+
+
+class ActivityTracker:
+    """按群组统计消息活跃度，每条消息只做常数时间的更新"""
+
+    def __init__(self, half_life: float = 86400.0):
+        """初始化活跃度统计
+
+        Args:
+            half_life: 活跃度分数的半衰期（秒）
+        """
+        self.half_life = half_life
+        self.groups: Dict[str, GroupActivity] = {}
+
+    def _decayed(self, activity: GroupActivity, now: float) -> float:
+        elapsed = max(0.0, now - activity.last_message_at)
+        return activity.score * 0.5 ** (elapsed / self.half_life)
+
+    def record(self, group_id: str, event: Any = None, now: Optional[float] = None) -> GroupActivity:
+        """记录群组收到了一条消息
+
+        Args:
+            group_id: 群组ID
+            event: 消息事件
+            now: 当前时间戳，默认为当前时间
+
+        Returns:
+            群组活跃度
+        """
+        now = time.time() if now is None else now
+        activity = self.groups.get(group_id)
+        if activity is None:
+            activity = self.groups[group_id] = GroupActivity(group_id)
+        activity.score = self._decayed(activity, now) + 1
+        activity.last_message_at = now
+        activity.pending += 1
+        if event is not None:
+            activity.event = event
+        return activity
+
+    def busiest(self, limit: int, allowed: Optional[Iterable[str]] = None,
+                now: Optional[float] = None) -> List[GroupActivity]:
+        """按当前活跃度从高到低返回群组
+
+        Args:
+            limit: 最多返回的群组数，0表示不限制
+            allowed: 可选的群组白名单
+            now: 当前时间戳，默认为当前时间
+
+        Returns:
+            群组活跃度列表
+        """
+        now = time.time() if now is None else now
+        allowed = set(allowed) if allowed else None
+        groups = [activity for activity in self.groups.values()
+                  if allowed is None or activity.group_id in allowed]
+        groups.sort(key=lambda activity: self._decayed(activity, now), reverse=True)
+        return groups[:limit] if limit else groups
+
+
+def parse_hours(ranges: Iterable[str]) -> List[Tuple[int, int]]:
+    """解析允许执行的时间段
+
+    Args:
+        ranges: 形如 ``"01:00-07:30"`` 的时间段，结束早于开始时表示跨过午夜
+
+    Returns:
+        以当天分钟数表示的 (开始, 结束) 列表
+
+    Raises:
+        ValueError: 时间段格式错误
+    """
+    parsed = []
+    for item in ranges:
+        try:
+            start, end = item.split("-")
+            minutes = []
+            for part in (start, end):
+                hour, minute = part.strip().split(":")
+                value = int(hour) * 60 + int(minute)
+                if not 0 <= value <= 24 * 60:
+                    raise ValueError(part)
+                minutes.append(value)
+        except ValueError:
+            raise ValueError(f"Invalid time range {item!r}, expected HH:MM-HH:MM")
+        parsed.append((minutes[0], minutes[1]))
+    return parsed
+
+
+def in_hours(hours: List[Tuple[int, int]], now: Optional[float] = None) -> bool:
+    """判断当前本地时间是否处于允许的时间段
+
+    Args:
+        hours: :func:`parse_hours` 的结果，为空表示全天允许
+        now: 当前时间戳，默认为当前时间
+
+    Returns:
+        是否允许执行
+    """
+    if not hours:
+        return True
+    local = time.localtime(now)
+    minute = local.tm_hour * 60 + local.tm_min
+    for start, end in hours:
+        if start <= end:
+            if start <= minute < end:
+                return True
+        elif minute >= start or minute < end:
+            return True
+    return False
+
+
+class PrecomputeScheduler:
+    """后台预计算调度器
+
+    每隔 ``interval`` 秒检查一次：处于允许的时间段、预算未用完且没有交互请求时，
+    按活跃度从高到低选出空闲超过 ``idle_seconds`` 且积累了至少 ``min_new_messages`` 条新消息的群组，
+    依次为每个窗口执行一次预计算。同一时间只执行一个预计算任务。
+    """
+
+    def __init__(self, run_job: Callable[[GroupActivity, int], Awaitable[bool]], windows: List[int],
+                 groups: Optional[Iterable[str]] = None, top_groups: int = 5,
+                 active_hours: Optional[Iterable[str]] = None, idle_seconds: float = 300,
+                 min_new_messages: int = 50, interval: float = 60, daily_llm_calls: int = 100,
+                 metrics: Optional[MetricsSink] = None):
+        """初始化调度器
+
+        Args:
+            run_job: 为群组生成指定消息数量总结的函数，成功时返回True
+            windows: 预计算的消息数量
+            groups: 可选的群组白名单，为空表示所有群组
+            top_groups: 每轮最多预计算的群组数
+            active_hours: 允许执行的时间段，为空表示全天
+            idle_seconds: 群组在最后一条消息之后需要空闲的时间（秒）
+            min_new_messages: 距上次预计算至少需要的新消息数
+            interval: 两轮检查的间隔（秒）
+            daily_llm_calls: 每天预计算最多使用的LLM调用次数，0表示不限制
+            metrics: 指标输出端
+        """
+        self.run_job = run_job
+        self.windows = sorted(set(windows))
+        self.groups = {str(group_id) for group_id in groups or []}
+        self.top_groups = top_groups
+        self.hours = parse_hours(active_hours or [])
+        self.idle_seconds = idle_seconds
+        self.min_new_messages = min_new_messages
+        self.interval = interval
+        self.budget = CallBudget(daily_llm_calls)
+        self.metrics = metrics or MetricsSink()
+        self.tracker = ActivityTracker()
+        self.interactive_requests = 0
+        self._task: Optional[asyncio.Future] = None
+
+    def record(self, group_id: str, event: Any = None, now: Optional[float] = None) -> None:
+        """记录群消息，首次调用时启动后台任务
+
+        Args:
+            group_id: 群组ID
+            event: 消息事件
+            now: 当前时间戳，默认为当前时间
+        """
+        if self.groups and group_id not in self.groups:
+            return
+        self.tracker.record(group_id, event, now)
+        self.start()
+
+    @contextmanager
+    def interactive(self) -> Iterator[None]:
+        """标记一个交互请求正在执行，期间不会开始新的预计算任务"""
+        self.interactive_requests += 1
+        try:
+            yield
+        finally:
+            self.interactive_requests -= 1
+
+    def due(self, now: Optional[float] = None) -> List[GroupActivity]:
+        """选出本轮需要预计算的群组
+
+        Args:
+            now: 当前时间戳，默认为当前时间
+
+        Returns:
+            按活跃度从高到低排列的群组
+        """
+        now = time.time() if now is None else now
+        if not in_hours(self.hours, now) or self.budget.remaining(now) <= 0:
+            return []
+        return [activity for activity in self.tracker.busiest(self.top_groups, self.groups or None, now)
+                if activity.event is not None
+                and activity.pending >= self.min_new_messages
+                and now - activity.last_message_at >= self.idle_seconds]
+
+    async def _job(self, activity: GroupActivity, count: int) -> bool:
+        """在独立任务中执行预计算，任务内的LLM调用从本调度器的预算中扣减"""
+        async def run():
+            current_budget.set(self.budget)
+            return await self.run_job(activity, count)
+        return await asyncio.ensure_future(run())
+
+    async def tick(self, now: Optional[float] = None) -> int:
+        """执行一轮检查
+
+        Args:
+            now: 当前时间戳，默认为当前时间
+
+        Returns:
+            本轮完成的预计算任务数
+        """
+        completed = 0
+        for activity in self.due(now):
+            pending = activity.pending
+            for count in self.windows:
+                if self.interactive_requests:
+                    # 有交互请求时让出LLM配额，下一轮再继续
+                    logger.debug("Deferring precompute while interactive requests are running")
+                    return completed
+                if self.budget.remaining(now) <= 0:
+                    return completed
+                try:
+                    ok = await self._job(activity, count)
+                except BudgetExhausted:
+                    self.metrics.increment("precompute_jobs_total", result="budget")
+                    logger.info("Precompute budget exhausted for today")
+                    return completed
+                except Exception as e:
+                    logger.error(f"Error precomputing summary for group {activity.group_id}: {e}")
+                    ok = False
+                if not ok and self.budget.remaining(now) <= 0:
+                    # 总结流程会把预算耗尽的异常转换为失败结果
+                    self.metrics.increment("precompute_jobs_total", result="budget")
+                    logger.info("Precompute budget exhausted for today")
+                    return completed
+                self.metrics.increment("precompute_jobs_total", result="ok" if ok else "error")
+                if ok:
+                    completed += 1
+            # 只扣除本轮开始前的消息，执行期间到达的消息留到下一轮
+            activity.pending = max(0, activity.pending - pending)
+            activity.last_precompute_at = time.time() if now is None else now
+        if completed:
+            logger.info(f"Precomputed {completed} summaries, {self.budget.used} LLM calls used today")
+        return completed
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"Error in precompute scheduler: {e}")
+
+    def start(self) -> None:
+        """启动后台任务，已启动时不做任何事"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self) -> None:
+        """停止后台任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,149 @@
+"""
+配置文件服务模块
+将提示词和管理员配置文件加载为不可变对象，按文件的修改时间和大小判断是否需要重新加载，
+重新加载在工作线程中进行，避免在事件循环中执行阻塞的磁盘读写
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, Generic, Optional, Tuple, TypeVar
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+DEFAULT_PROMPT = 'Default prompt'
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class PromptConfig:
+    """提示词配置"""
+    prompt: str = DEFAULT_PROMPT
+
+    @classmethod
+    def parse(cls, data: Dict[str, Any]) -> "PromptConfig":
+        return cls(prompt=data.get('prompt', DEFAULT_PROMPT))
+
+
+@dataclass(frozen=True)
+class AdminConfig:
+    """管理员配置，账号统一保存为字符串"""
+    admins: FrozenSet[str] = frozenset()
+
+    @classmethod
+    def parse(cls, data: Dict[str, Any]) -> "AdminConfig":
+        return cls(admins=frozenset(str(user_id) for user_id in data.get('admins_id', [])))
+
+
+class WatchedFile(Generic[T]):
+    """按修改时间缓存的 JSON 配置文件
+
+    ``value`` 总是返回已加载的对象，不进行任何磁盘操作；
+    ``refresh`` 在距离上次检查超过 ``check_interval`` 秒后，
+    于工作线程中检查文件状态，只有修改时间或大小变化时才重新解析。
+    """
+
+    def __init__(self, path: str, parse: Callable[[Dict[str, Any]], T], default: T,
+                 check_interval: float = 2.0):
+        """初始化配置文件
+
+        Args:
+            path: 文件路径
+            parse: 将 JSON 对象转换为配置对象的函数
+            default: 文件不存在或无法解析时使用的配置对象
+            check_interval: 两次检查文件状态的最小间隔（秒），0表示每次都检查
+        """
+        self.path = path
+        self.parse = parse
+        self.default = default
+        self.check_interval = check_interval
+        self._value: T = default
+        self._signature: Optional[Tuple[int, int]] = None
+        self._checked_at: Optional[float] = None
+        self.loads = 0
+
+    @property
+    def value(self) -> T:
+        """已加载的配置对象，从未加载过时同步加载一次"""
+        if self._checked_at is None:
+            self.load()
+        return self._value
+
+    def load(self) -> T:
+        """检查文件状态，发生变化时重新解析（阻塞操作）
+
+        Returns:
+            最新的配置对象
+        """
+        self._checked_at = time.monotonic()
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self._signature = None
+            self._value = self.default
+            return self._value
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return self._value
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._value = self.parse(json.load(f))
+            self.loads += 1
+        except Exception as e:
+            logger.error(f"Error loading {self.path}: {e}")
+            self._value = self.default
+        self._signature = signature
+        return self._value
+
+    async def refresh(self) -> T:
+        """在需要时于工作线程中重新检查文件
+
+        Returns:
+            最新的配置对象
+        """
+        if self._checked_at is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return self._value
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.load)
+
+
+class ConfigService:
+    """插件配置文件服务，管理提示词和管理员列表"""
+
+    def __init__(self, config_path: str, admin_config_path: str, check_interval: float = 2.0):
+        """初始化配置服务
+
+        Args:
+            config_path: 包含提示词的配置文件路径
+            admin_config_path: 管理员配置文件路径
+            check_interval: 两次检查文件状态的最小间隔（秒）
+        """
+        self.prompt_file: WatchedFile[PromptConfig] = WatchedFile(
+            config_path, PromptConfig.parse, PromptConfig(), check_interval)
+        self.admin_file: WatchedFile[AdminConfig] = WatchedFile(
+            admin_config_path, AdminConfig.parse, AdminConfig(), check_interval)
+
+    async def refresh(self) -> None:
+        """在工作线程中检查所有配置文件是否有更新"""
+        await asyncio.gather(self.prompt_file.refresh(), self.admin_file.refresh())
+
+    @property
+    def prompt(self) -> str:
+        """当前提示词"""
+        return self.prompt_file.value.prompt
+
+    def is_admin(self, user_id: Any) -> bool:
+        """检查用户是否是管理员
+
+        Args:
+            user_id: 用户ID
+
+        Returns:
+            是否为管理员
+        """
+        return str(user_id) in self.admin_file.value.admins
@@ -0,0 +1,364 @@
+"""
+本地消息存储模块
+使用SQLite按群组和消息ID持久化聊天记录，按发言人和回复关系建立索引，并记录每个群组的同步游标和总结检查点
+"""
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Iterable
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    group_id   TEXT    NOT NULL,
+    message_id TEXT    NOT NULL,
+    seq        INTEGER NOT NULL,
+    time       INTEGER NOT NULL DEFAULT 0,
+    sender_id  TEXT,
+    payload    TEXT    NOT NULL,
+    reply_to   TEXT,
+    PRIMARY KEY (group_id, message_id)
+);
+CREATE INDEX IF NOT EXISTS idx_messages_group_seq ON messages (group_id, seq);
+CREATE TABLE IF NOT EXISTS sync_state (
+    group_id   TEXT PRIMARY KEY,
+    newest_seq INTEGER NOT NULL,
+    oldest_seq INTEGER NOT NULL,
+    updated_at REAL    NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    group_id    TEXT    NOT NULL,
+    prompt_hash TEXT    NOT NULL,
+    model       TEXT    NOT NULL,
+    oldest_seq  INTEGER NOT NULL,
+    newest_seq  INTEGER NOT NULL,
+    summary     TEXT    NOT NULL,
+    updated_at  REAL    NOT NULL,
+    PRIMARY KEY (group_id, prompt_hash, model)
+);
+"""
+
+# 按发言人和回复关系查找消息的索引，需在旧数据库补充 reply_to 列之后创建
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_messages_group_sender_seq ON messages (group_id, sender_id, seq);
+CREATE INDEX IF NOT EXISTS idx_messages_group_reply ON messages (group_id, reply_to) WHERE reply_to IS NOT NULL;
+"""
+
+# SQLite 单条语句的参数数量限制较低，IN 查询按批执行
+_IN_BATCH = 500
+
+
+def message_seq(msg: Dict[str, Any]) -> int:
+    """获取消息在群内的序号
+
+    优先使用 ``message_seq``，其次 ``real_id``，最后退回到 ``message_id``。
+
+    Args:
+        msg: OneBot消息字典
+
+    Returns:
+        消息序号，无法解析时返回0
+    """
+    for key in ('message_seq', 'real_id', 'message_id'):
+        value = msg.get(key)
+        if value is None:
+            continue
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            continue
+    return 0
+
+
+def reply_target(msg: Dict[str, Any]) -> Optional[str]:
+    """获取消息回复的消息ID
+
+    Args:
+        msg: OneBot消息字典
+
+    Returns:
+        被回复消息的ID字符串，不是回复消息时返回None
+    """
+    message = msg.get('message')
+    if isinstance(message, list):
+        for segment in message:
+            if isinstance(segment, dict) and segment.get('type') == 'reply':
+                target = segment.get('data', {}).get('id')
+                return str(target) if target is not None else None
+    return None
+
+
+@dataclass(frozen=True)
+class SyncState:
+    """群组同步状态，记录本地已连续同步的消息序号区间"""
+
+    group_id: str
+    newest_seq: int
+    oldest_seq: int
+    updated_at: float
+
+
+@dataclass(frozen=True)
+class Checkpoint:
+    """群组总结检查点，记录最近一次总结及其覆盖的消息序号区间"""
+
+    group_id: str
+    prompt_hash: str
+    model: str
+    oldest_seq: int
+    newest_seq: int
+    summary: str
+    updated_at: float
+
+
+class MessageStore:
+    """基于SQLite的群消息存储
+
+    所有方法都是同步的，并通过内部锁保证线程安全，
+    异步调用方应通过 ``run_in_executor`` 在工作线程中调用。
+    """
+
+    def __init__(self, db_path: str, max_messages_per_group: int = 5000):
+        """初始化消息存储
+
+        Args:
+            db_path: 数据库文件路径，传入 ``:memory:`` 使用内存数据库
+            max_messages_per_group: 每个群组最多保留的消息数量
+        """
+        self.db_path = db_path
+        self.max_messages_per_group = max_messages_per_group
+        self._lock = threading.Lock()
+
+        if db_path != ':memory:':
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+        self._conn.executescript(_INDEXES)
+        self._conn.commit()
+
+    def _migrate(self) -> None:
+        """为旧版本创建的数据库补充 reply_to 列，并从已保存的消息中回填"""
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(messages)')}
+        if 'reply_to' in columns:
+            return
+        self._conn.execute('ALTER TABLE messages ADD COLUMN reply_to TEXT')
+        rows = self._conn.execute(
+            "SELECT rowid, payload FROM messages WHERE payload LIKE '%\"reply\"%'").fetchall()
+        updates = [(reply_target(json.loads(payload)), rowid) for rowid, payload in rows]
+        self._conn.executemany('UPDATE messages SET reply_to = ? WHERE rowid = ?',
+                               [update for update in updates if update[0] is not None])
+        logger.info(f"Added reply_to column to message store {self.db_path} ({len(updates)} replies)")
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def get_state(self, group_id: str) -> Optional[SyncState]:
+        """获取群组的同步状态
+
+        Args:
+            group_id: 群组ID
+
+        Returns:
+            同步状态，从未同步过时返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT newest_seq, oldest_seq, updated_at FROM sync_state WHERE group_id = ?',
+                (str(group_id),)
+            ).fetchone()
+        if row is None:
+            return None
+        return SyncState(str(group_id), row[0], row[1], row[2])
+
+    def save_messages(self, group_id: str, messages: Iterable[Dict[str, Any]],
+                      newest_seq: int, oldest_seq: int) -> int:
+        """写入消息并更新同步游标
+
+        消息与游标在同一个事务中写入，避免游标指向未落盘的消息。
+
+        Args:
+            group_id: 群组ID
+            messages: OneBot消息字典
+            newest_seq: 本地连续区间中最新的消息序号
+            oldest_seq: 本地连续区间中最旧的消息序号
+
+        Returns:
+            写入的消息数量
+        """
+        group_id = str(group_id)
+        rows = [
+            (
+                group_id,
+                str(msg.get('message_id', message_seq(msg))),
+                message_seq(msg),
+                int(msg.get('time', 0) or 0),
+                str(msg.get('sender', {}).get('user_id', '')),
+                json.dumps(msg, ensure_ascii=False, separators=(',', ':')),
+                reply_target(msg),
+            )
+            for msg in messages
+        ]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO messages '
+                    '(group_id, message_id, seq, time, sender_id, payload, reply_to) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    rows
+                )
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO sync_state (group_id, newest_seq, oldest_seq, updated_at) '
+                    'VALUES (?, ?, ?, ?)',
+                    (group_id, newest_seq, oldest_seq, time.time())
+                )
+                self._prune(group_id)
+        return len(rows)
+
+    def _prune(self, group_id: str) -> None:
+        """删除超出保留数量的旧消息，并相应收缩同步区间（需在锁内调用）"""
+        row = self._conn.execute(
+            'SELECT seq FROM messages WHERE group_id = ? ORDER BY seq DESC LIMIT 1 OFFSET ?',
+            (group_id, self.max_messages_per_group)
+        ).fetchone()
+        if row is None:
+            return
+        self._conn.execute('DELETE FROM messages WHERE group_id = ? AND seq <= ?', (group_id, row[0]))
+        self._conn.execute(
+            'UPDATE sync_state SET oldest_seq = MAX(oldest_seq, ?) WHERE group_id = ?',
+            (row[0] + 1, group_id)
+        )
+
+    def count_range(self, group_id: str, oldest_seq: int) -> int:
+        """统计序号不小于 ``oldest_seq`` 的本地消息数量
+
+        Args:
+            group_id: 群组ID
+            oldest_seq: 起始序号
+
+        Returns:
+            消息数量
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT COUNT(*) FROM messages WHERE group_id = ? AND seq >= ?',
+                (str(group_id), oldest_seq)
+            ).fetchone()
+        return row[0]
+
+    def latest(self, group_id: str, count: int, oldest_seq: Optional[int] = None) -> List[Dict[str, Any]]:
+        """读取最近的消息
+
+        Args:
+            group_id: 群组ID
+            count: 消息数量
+            oldest_seq: 可选的序号下限，只返回连续区间内的消息
+
+        Returns:
+            消息列表，按从新到旧排序，与 ``get_group_msg_history`` 的处理约定一致
+        """
+        sql = 'SELECT payload FROM messages WHERE group_id = ?'
+        params: List[Any] = [str(group_id)]
+        if oldest_seq is not None:
+            sql += ' AND seq >= ?'
+            params.append(oldest_seq)
+        sql += ' ORDER BY seq DESC LIMIT ?'
+        params.append(count)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def by_sender(self, group_id: str, sender_id: str, count: int, oldest_seq: Optional[int] = None,
+                  with_replies: bool = True) -> List[Dict[str, Any]]:
+        """读取某个发言人最近的消息，可选附带与这些消息相关的回复
+
+        通过 ``(group_id, sender_id, seq)`` 索引只读取该发言人的消息，不扫描整个群的历史；
+        附带回复时再按消息ID和 ``reply_to`` 索引找出这些消息回复的消息以及回复这些消息的消息。
+
+        Args:
+            group_id: 群组ID
+            sender_id: 发言人ID
+            count: 发言人的消息数量
+            oldest_seq: 可选的序号下限，只查找连续区间内该发言人的消息
+            with_replies: 是否附带相关的回复
+
+        Returns:
+            消息列表，按从新到旧排序
+        """
+        group_id = str(group_id)
+        sql = 'SELECT message_id, seq, reply_to, payload FROM messages WHERE group_id = ? AND sender_id = ?'
+        params: List[Any] = [group_id, str(sender_id)]
+        if oldest_seq is not None:
+            sql += ' AND seq >= ?'
+            params.append(oldest_seq)
+        sql += ' ORDER BY seq DESC LIMIT ?'
+        params.append(count)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            found = {row[0]: (row[1], row[3]) for row in rows}
+            if with_replies and rows:
+                # 回复这些消息的消息，以及这些消息回复的消息
+                lookups = [('reply_to', list(found)),
+                           ('message_id', sorted({row[2] for row in rows if row[2] and row[2] not in found}))]
+                for column, keys in lookups:
+                    for start in range(0, len(keys), _IN_BATCH):
+                        batch = keys[start:start + _IN_BATCH]
+                        related = self._conn.execute(
+                            f'SELECT message_id, seq, payload FROM messages WHERE group_id = ? '
+                            f'AND {column} IN ({",".join("?" * len(batch))})',
+                            [group_id] + batch
+                        ).fetchall()
+                        for message_id, seq, payload in related:
+                            found.setdefault(message_id, (seq, payload))
+        ordered = sorted(found.values(), key=lambda item: item[0], reverse=True)
+        return [json.loads(payload) for _, payload in ordered]
+
+    def get_checkpoint(self, group_id: str, prompt_hash: str, model: str) -> Optional[Checkpoint]:
+        """获取群组的总结检查点
+
+        Args:
+            group_id: 群组ID
+            prompt_hash: 提示词哈希
+            model: 模型名称
+
+        Returns:
+            检查点，不存在时返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT oldest_seq, newest_seq, summary, updated_at FROM checkpoints '
+                'WHERE group_id = ? AND prompt_hash = ? AND model = ?',
+                (str(group_id), prompt_hash, model)
+            ).fetchone()
+        if row is None:
+            return None
+        return Checkpoint(str(group_id), prompt_hash, model, row[0], row[1], row[2], row[3])
+
+    def save_checkpoint(self, checkpoint: Checkpoint) -> None:
+        """保存群组的总结检查点
+
+        Args:
+            checkpoint: 检查点
+        """
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO checkpoints '
+                    '(group_id, prompt_hash, model, oldest_seq, newest_seq, summary, updated_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (checkpoint.group_id, checkpoint.prompt_hash, checkpoint.model,
+                     checkpoint.oldest_seq, checkpoint.newest_seq, checkpoint.summary,
+                     checkpoint.updated_at)
+                )
@@ -0,0 +1,142 @@
+"""
+流式输出模块
+将LLM逐步生成的文本按段落切分为若干条消息，尽快发送第一段，缩短用户等待第一条回复的时间
+"""
+
+import re
+import asyncio
+import logging
+from contextvars import ContextVar
+from typing import List, Optional, AsyncIterator
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+# 句末标点或换行，第一段在足够长后可以在这里截断
+_SENTENCE_END_RE = re.compile(r'[。！？!?；;…]|\.(?=\s)|\n')
+
+
+class ParagraphChunker:
+    """按段落切分流式文本
+
+    第一段在出现段落边界，或累计超过 ``first_chunk_chars`` 后遇到句末时立即输出；
+    之后的段落累计到 ``min_chunk_chars`` 再在段落边界输出，避免连续发送过多短消息。
+    没有段落边界的长文本在超过 ``max_chunk_chars`` 后于最后一个换行或句末处截断。
+    """
+
+    def __init__(self, first_chunk_chars: int = 80, min_chunk_chars: int = 300, max_chunk_chars: int = 1500):
+        """初始化切分器
+
+        Args:
+            first_chunk_chars: 第一段在句末截断所需的最少字符数
+            min_chunk_chars: 之后每段的最少字符数
+            max_chunk_chars: 没有段落边界时每段的最多字符数
+        """
+        self.first_chunk_chars = first_chunk_chars
+        self.min_chunk_chars = min_chunk_chars
+        self.max_chunk_chars = max(max_chunk_chars, min_chunk_chars)
+        self.chunks = 0
+        # 已经输出的原始文本长度（含被去掉的首尾空白），用于与最终结果比对
+        self.delivered = 0
+        self._buffer = ""
+
+    def _cut(self) -> int:
+        """返回当前缓冲区可以输出的长度，0表示继续等待"""
+        buffer = self._buffer
+        if self.chunks == 0:
+            boundary = buffer.find("\n\n")
+            if boundary > 0:
+                return boundary + 2
+            if len(buffer) >= self.first_chunk_chars:
+                for match in _SENTENCE_END_RE.finditer(buffer, self.first_chunk_chars - 1):
+                    return match.end()
+        else:
+            boundary = buffer.rfind("\n\n")
+            if boundary >= self.min_chunk_chars:
+                return boundary + 2
+        if len(buffer) >= self.max_chunk_chars:
+            window = buffer[:self.max_chunk_chars]
+            boundary = window.rfind("\n")
+            if boundary <= 0:
+                ends = list(_SENTENCE_END_RE.finditer(window))
+                boundary = ends[-1].start() if ends else self.max_chunk_chars - 1
+            return boundary + 1
+        return 0
+
+    def feed(self, delta: str) -> List[str]:
+        """加入新生成的文本
+
+        Args:
+            delta: 新生成的文本片段
+
+        Returns:
+            可以立即发送的段落
+        """
+        self._buffer += delta
+        ready = []
+        while True:
+            cut = self._cut()
+            if cut <= 0:
+                break
+            chunk, self._buffer = self._buffer[:cut].strip(), self._buffer[cut:]
+            self.delivered += cut
+            if chunk:
+                ready.append(chunk)
+                self.chunks += 1
+        return ready
+
+    def flush(self) -> Optional[str]:
+        """取出剩余的文本
+
+        Returns:
+            剩余文本，没有时返回None
+        """
+        self.delivered += len(self._buffer)
+        rest, self._buffer = self._buffer.strip(), ""
+        if not rest:
+            return None
+        self.chunks += 1
+        return rest
+
+
+class SummaryStream:
+    """总结文本的流式通道
+
+    生成总结的任务通过 ``put`` 写入文本片段，发送方通过 ``iterate`` 在任务结束前逐个读取。
+    """
+
+    def __init__(self):
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self.started = False
+
+    def put(self, delta: str) -> None:
+        """写入新生成的文本片段
+
+        Args:
+            delta: 文本片段
+        """
+        if delta:
+            self.started = True
+            self._queue.put_nowait(delta)
+
+    async def iterate(self, task: "asyncio.Future") -> AsyncIterator[str]:
+        """读取文本片段，直到生成任务结束且队列为空
+
+        Args:
+            task: 生成总结的任务
+
+        Yields:
+            文本片段
+        """
+        while not task.done():
+            getter = asyncio.ensure_future(self._queue.get())
+            done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                yield getter.result()
+            else:
+                getter.cancel()
+        while not self._queue.empty():
+            yield self._queue.get_nowait()
+
+
+# 当前任务的流式通道，最后一次LLM调用通过它把生成的文本交给发送方
+current_stream: ContextVar[Optional[SummaryStream]] = ContextVar("chatsummary_stream", default=None)
@@ -0,0 +1,157 @@
+"""
+分层映射-归约总结模块
+将较长的聊天记录按令牌预算切分为多个分块，并发生成分块摘要后再逐层归约为最终总结
+"""
+
+import asyncio
+import logging
+from typing import List, Callable, Awaitable, Optional
+
+from .tokens import heuristic_tokens
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+# LLM调用函数，输入完整提示文本，返回生成结果
+Complete = Callable[[str], Awaitable[str]]
+
+MAP_PROMPT = (
+    "以下是一段群聊记录的第 {index}/{total} 部分。请按时间顺序提取这一部分中的主要话题、"
+    "重要信息、通知、结论和有趣的发言，保留关键人物和细节，使用简洁的要点列出，不要添加评价。\n\n{content}"
+)
+
+COMBINE_PROMPT = (
+    "以下是同一段群聊记录中相邻几部分的要点摘要，按时间顺序排列。"
+    "请将它们合并为一份要点摘要，去除重复内容，保留所有重要信息和关键人物。\n\n{content}"
+)
+
+REDUCE_PROMPT = "{prompt}\n\n以下是按时间顺序排列的各部分聊天记录要点摘要，请据此完成总结：\n\n{content}"
+
+
+class MapReduceSummarizer:
+    """分层映射-归约总结器
+
+    映射阶段在并发限制下为每个分块生成要点摘要，
+    归约阶段在摘要总量超出预算时先分组合并，直到可以一次生成最终总结。
+    总耗时随分块数除以并发数增长，而不是随输入总长度增长。
+    """
+
+    def __init__(self, complete: Complete, chunk_tokens: int = 3000, max_concurrency: int = 4,
+                 estimate: Callable[[str], int] = heuristic_tokens,
+                 render: Optional[Callable[[List[str]], str]] = None,
+                 final_complete: Optional[Complete] = None):
+        """初始化总结器
+
+        Args:
+            complete: LLM调用函数
+            chunk_tokens: 每个分块的令牌预算
+            max_concurrency: 同时进行的LLM调用数
+            estimate: 令牌估算函数
+            render: 将一组聊天记录行转换为发送给LLM的文本的函数，默认按换行拼接
+            final_complete: 生成最终总结的LLM调用函数（例如流式输出），默认与 ``complete`` 相同
+        """
+        self.complete = complete
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.max_concurrency = max(1, max_concurrency)
+        self.estimate = estimate
+        self.render = render or "\n".join
+        self.final_complete = final_complete or complete
+
+    def needs_split(self, lines: List[str]) -> bool:
+        """判断聊天记录是否超出单个分块的预算
+
+        Args:
+            lines: 聊天记录行
+
+        Returns:
+            是否需要分块总结
+        """
+        return sum(self.estimate(line) + 1 for line in lines) > self.chunk_tokens
+
+    def split(self, lines: List[str]) -> List[List[str]]:
+        """按令牌预算将聊天记录切分为连续的分块
+
+        单行超出预算时独占一个分块。
+
+        Args:
+            lines: 聊天记录行
+
+        Returns:
+            分块列表
+        """
+        chunks: List[List[str]] = []
+        current: List[str] = []
+        used = 0
+        for line in lines:
+            cost = self.estimate(line) + 1
+            if current and used + cost > self.chunk_tokens:
+                chunks.append(current)
+                current, used = [], 0
+            current.append(line)
+            used += cost
+        if current:
+            chunks.append(current)
+        return chunks
+
+    async def _gather(self, prompts: List[str]) -> List[str]:
+        """在并发限制下执行一批LLM调用，结果顺序与输入一致"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(prompt: str) -> str:
+            async with semaphore:
+                return await self.complete(prompt)
+
+        return list(await asyncio.gather(*(run(prompt) for prompt in prompts)))
+
+    def _group(self, parts: List[str]) -> List[List[str]]:
+        """将相邻的摘要按预算分组，每组至少两项以保证归约收敛"""
+        groups: List[List[str]] = []
+        current: List[str] = []
+        used = 0
+        for part in parts:
+            cost = self.estimate(part) + 2
+            if len(current) >= 2 and used + cost > self.chunk_tokens:
+                groups.append(current)
+                current, used = [], 0
+            current.append(part)
+            used += cost
+        if current:
+            if len(current) == 1 and groups:
+                groups[-1].append(current[0])
+            else:
+                groups.append(current)
+        return groups
+
+    async def summarize(self, prompt: str, lines: List[str]) -> str:
+        """生成聊天记录的总结
+
+        Args:
+            prompt: 总结提示词
+            lines: 按时间顺序排列的聊天记录行
+
+        Returns:
+            最终总结文本
+        """
+        chunks = self.split(lines)
+        if len(chunks) <= 1:
+            return await self.final_complete(f"{prompt}\n\n" + self.render(lines))
+
+        total = len(chunks)
+        logger.info(f"Map-reduce summary: {len(lines)} lines in {total} chunks")
+        parts = await self._gather([
+            MAP_PROMPT.format(index=index, total=total, content=self.render(chunk))
+            for index, chunk in enumerate(chunks, 1)
+        ])
+
+        # 摘要总量超出预算时逐层合并
+        level = 0
+        while True:
+            groups = self._group(parts)
+            if len(groups) <= 1:
+                break
+            level += 1
+            logger.debug(f"Map-reduce combine level {level}: {len(parts)} parts in {len(groups)} groups")
+            parts = await self._gather([
+                COMBINE_PROMPT.format(content="\n\n".join(group)) for group in groups
+            ])
+
+        return await self.final_complete(REDUCE_PROMPT.format(prompt=prompt, content="\n\n".join(parts)))
@@ -0,0 +1,122 @@
+"""
+令牌估算模块
+提供面向中日韩文本的快速令牌估算，可选使用 tiktoken 精确计数，并按令牌预算打包聊天记录
+"""
+
+import re
+import logging
+from functools import lru_cache
+from typing import List, Tuple, Optional
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+# 中日韩文字、假名、谚文以及全角符号，通常每个字符至少对应一个令牌
+_CJK_RE = re.compile(r'[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]')
+# 连续的拉丁字母和数字，平均约4个字符对应一个令牌
+_WORD_RE = re.compile(r'[A-Za-z0-9_]+')
+_SPACE_RE = re.compile(r'\s')
+
+
+def heuristic_tokens(text: str) -> int:
+    """使用启发式规则估算令牌数
+
+    中日韩字符按每字一个令牌计算，拉丁单词按每4个字符一个令牌计算，
+    其余非空白字符（标点、符号、表情）各按一个令牌计算。
+
+    Args:
+        text: 文本
+
+    Returns:
+        估算的令牌数
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    words = 0
+    word_chars = 0
+    for match in _WORD_RE.finditer(text):
+        length = match.end() - match.start()
+        word_chars += length
+        words += (length + 3) // 4
+    spaces = len(_SPACE_RE.findall(text))
+    others = len(text) - cjk - word_chars - spaces
+    return cjk + words + max(others, 0)
+
+
+class TokenEstimator:
+    """令牌估算器
+
+    默认使用启发式估算；``backend`` 为 ``tiktoken`` 且已安装 tiktoken 时使用精确计数，
+    未安装时自动退回启发式估算。单行文本的计数结果会被缓存，
+    重复出现的聊天记录行（例如同一窗口被多次总结）不会重复计算。
+    """
+
+    def __init__(self, backend: str = "heuristic", model: Optional[str] = None, cache_size: int = 65536):
+        """初始化令牌估算器
+
+        Args:
+            backend: 估算后端，``heuristic`` 或 ``tiktoken``
+            model: 模型名称，用于选择 tiktoken 编码
+            cache_size: 计数缓存的最大条目数
+        """
+        self.backend = "heuristic"
+        self._encoding = None
+        if backend == "tiktoken":
+            try:
+                import tiktoken
+                try:
+                    self._encoding = tiktoken.encoding_for_model(model or "")
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding("cl100k_base")
+                self.backend = "tiktoken"
+            except ImportError:
+                logger.warning("tiktoken is not installed, falling back to heuristic token estimation")
+        self._count_cached = lru_cache(maxsize=cache_size)(self._count)
+
+    def _count(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return heuristic_tokens(text)
+
+    def count(self, text: str, cache: bool = True) -> int:
+        """估算文本的令牌数
+
+        Args:
+            text: 文本
+            cache: 是否缓存计数结果，只出现一次的长文本（如完整提示）应关闭
+
+        Returns:
+            令牌数
+        """
+        return self._count_cached(text) if cache else self._count(text)
+
+    def count_lines(self, lines: List[str]) -> int:
+        """估算按换行拼接后的多行文本的令牌数
+
+        Args:
+            lines: 文本行
+
+        Returns:
+            令牌数
+        """
+        return sum(self._count_cached(line) for line in lines) + max(len(lines) - 1, 0)
+
+    def pack_recent(self, lines: List[str], budget: int) -> Tuple[List[str], int]:
+        """从最新的一行开始向前选取，尽可能多地保留能放入预算的聊天记录
+
+        Args:
+            lines: 按时间顺序排列的聊天记录行
+            budget: 令牌预算
+
+        Returns:
+            (按时间顺序排列的保留行, 已使用的令牌数)
+        """
+        used = 0
+        start = len(lines)
+        for index in range(len(lines) - 1, -1, -1):
+            cost = self._count_cached(lines[index]) + 1
+            if used + cost > budget:
+                break
+            used += cost
+            start = index
+        return lines[start:], used
@@ -0,0 +1,391 @@
+"""
+话题切分模块
+群聊中常有几段对话交错进行。在本地按字符 n-gram 的 TF-IDF 相似度、回复关系和时间间隔
+将聊天记录切分为若干话题，每个话题单独并发总结，再按话题组装为最终总结；
+安装了 numpy 时 TF-IDF 权重向量化计算，否则使用等价的纯 Python 实现
+"""
+
+import re
+import math
+import zlib
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy
+except ImportError:  # 未安装 numpy 时逐项计算 TF-IDF 权重
+    numpy = None
+
+from .summarizer import Complete, MapReduceSummarizer
+from .tokens import heuristic_tokens
+
+logger = logging.getLogger("astrbot.plugin.chatsummary")
+
+# 聊天记录行的时间和发言人前缀，以及 [图片]、[reply] 等消息段占位符
+_PREFIX_RE = re.compile(r'^\[[^\]]*\]「[^」]*」:\s*')
+_PLACEHOLDER_RE = re.compile(r'\[[^\[\]\s]{1,12}\]')
+_CJK = r'[぀-ヿ㐀-䶿一-鿿豈-﫿가-힯]'
+_NGRAM_RE = re.compile(rf'({_CJK}+)|((?:(?!{_CJK})[^\W_]){{2,}})')
+
+TOPIC_PROMPT = (
+    "以下是群聊中围绕同一个话题的一段对话（话题 {index}/{total}，共 {count} 条消息）。"
+    "请先单独用一行写出不超过15个字的话题标题，格式为「话题：标题」，然后按以下要求总结这段讨论：\n\n"
+    "{instructions}\n\n{content}"
+)
+
+# 调用方没有提供总结提示词时使用的话题总结要求
+TOPIC_INSTRUCTIONS = "用简洁的要点总结这段讨论的主要内容、结论和关键人物，不要添加评价。"
+
+_TITLE_RE = re.compile(r'^\s*(?:[#*]+\s*)?话题\s*[:：]\s*(.+?)\s*$')
+
+
+def ngrams(line: str) -> List[str]:
+    """提取聊天记录行中消息文本的字符 n-gram
+
+    中日韩文字切分为相邻的二元组（单字片段保留单字），其他文字按两个字符以上的单词切分并转换为小写。
+
+    Args:
+        line: 聊天记录行
+
+    Returns:
+        n-gram 列表
+    """
+    text = _PLACEHOLDER_RE.sub(" ", _PREFIX_RE.sub("", line, count=1))
+    grams: List[str] = []
+    for cjk, word in _NGRAM_RE.findall(text):
+        if word:
+            grams.append(word.lower())
+        elif len(cjk) == 1:
+            grams.append(cjk)
+        else:
+            grams.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+    return grams
+
+
+def hashed_counts(lines: Sequence[str], dims: int) -> Tuple[List[Dict[int, int]], List[int]]:
+    """将每行的 n-gram 哈希到固定维数
+
+    Args:
+        lines: 聊天记录行
+        dims: 特征哈希的维数
+
+    Returns:
+        (各行的词频, 各行的 n-gram 数)
+    """
+    counts: List[Dict[int, int]] = []
+    sizes: List[int] = []
+    cache: Dict[str, int] = {}
+    for line in lines:
+        row: Dict[int, int] = {}
+        grams = ngrams(line)
+        for gram in grams:
+            key = cache.get(gram)
+            if key is None:
+                key = cache[gram] = zlib.crc32(gram.encode('utf-8')) % dims
+            row[key] = row.get(key, 0) + 1
+        counts.append(row)
+        sizes.append(len(grams))
+    return counts, sizes
+
+
+def tfidf_arrays(counts: List[Dict[int, int]], dims: int):
+    """用 numpy 向量化计算归一化的 TF-IDF 向量（对数词频），需要已安装 numpy
+
+    Args:
+        counts: 各行的词频
+        dims: 特征哈希的维数
+
+    Returns:
+        稀疏矩阵的 (行下标, 列下标, 权重) 三个数组，按行排列
+    """
+    total = len(counts)
+    sizes = numpy.array([len(values) for values in counts], dtype=numpy.int64)
+    nonzero = int(sizes.sum())
+    rows = numpy.repeat(numpy.arange(total), sizes)
+    cols = numpy.fromiter((key for values in counts for key in values), numpy.int64, nonzero)
+    tf = numpy.fromiter((count for values in counts for count in values.values()), numpy.float64, nonzero)
+    df = numpy.bincount(cols, minlength=dims)
+    weights = (1.0 + numpy.log(tf)) * (numpy.log((1.0 + total) / (1.0 + df[cols])) + 1.0)
+    norms = numpy.sqrt(numpy.bincount(rows, weights * weights, minlength=total))
+    weights /= numpy.where(norms > 0, norms, 1.0)[rows]
+    return rows, cols, weights
+
+
+def tfidf_vectors(counts: List[Dict[int, int]], dims: int) -> List[Dict[int, float]]:
+    """计算归一化的 TF-IDF 向量（对数词频），安装了 numpy 时向量化计算
+
+    Args:
+        counts: 各行的词频
+        dims: 特征哈希的维数
+
+    Returns:
+        各行的稀疏向量，没有 n-gram 的行为空字典
+    """
+    if numpy is not None:
+        rows, cols, weights = tfidf_arrays(counts, dims)
+        offsets = numpy.cumsum([len(values) for values in counts])[:-1]
+        return [dict(zip(keys.tolist(), values.tolist()))
+                for keys, values in zip(numpy.split(cols, offsets), numpy.split(weights, offsets))]
+
+    total = len(counts)
+    df: Dict[int, int] = {}
+    for values in counts:
+        for key in values:
+            df[key] = df.get(key, 0) + 1
+    idf = {key: math.log((1.0 + total) / (1.0 + value)) + 1.0 for key, value in df.items()}
+    vectors = []
+    for values in counts:
+        vector = {key: (1.0 + math.log(count)) * idf[key] for key, count in values.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        vectors.append({key: weight / norm for key, weight in vector.items()} if norm else {})
+    return vectors
+
+
+class _Centroids:
+    """话题质心
+
+    聊天消息很短，向量极其稀疏，逐条分配时用稀疏字典计算相似度比稠密矩阵运算更快；质心的模长增量维护。
+    """
+
+    def __init__(self, vectors: List[Dict[int, float]]):
+        self.vectors = vectors
+        self.centroids: List[Dict[int, float]] = []
+        self.norms: List[float] = []
+
+    def new(self, index: int) -> int:
+        self.centroids.append(dict(self.vectors[index]))
+        self.norms.append(1.0 if self.vectors[index] else 0.0)
+        return len(self.centroids) - 1
+
+    def _dot(self, centroid: Dict[int, float], vector: Dict[int, float]) -> float:
+        if len(centroid) < len(vector):
+            centroid, vector = vector, centroid
+        return sum(weight * centroid.get(key, 0.0) for key, weight in vector.items())
+
+    def add(self, topic: int, index: int) -> None:
+        centroid, vector = self.centroids[topic], self.vectors[index]
+        dot = self._dot(centroid, vector)
+        for key, weight in vector.items():
+            centroid[key] = centroid.get(key, 0.0) + weight
+        squared = self.norms[topic] ** 2 + 2 * dot + (1.0 if vector else 0.0)
+        self.norms[topic] = math.sqrt(max(squared, 0.0))
+
+    def similarities(self, index: int, topics: Sequence[int]) -> List[float]:
+        vector = self.vectors[index]
+        return [self._dot(self.centroids[topic], vector) / self.norms[topic] if self.norms[topic] else 0.0
+                for topic in topics]
+
+    def merge(self, target: int, source: int) -> None:
+        centroid = self.centroids[target]
+        for key, weight in self.centroids[source].items():
+            centroid[key] = centroid.get(key, 0.0) + weight
+        self.norms[target] = math.sqrt(sum(weight * weight for weight in centroid.values()))
+
+    def similarity(self, first: int, second: int) -> float:
+        norm = self.norms[first] * self.norms[second]
+        return self._dot(self.centroids[first], self.centroids[second]) / norm if norm else 0.0
+
+
+class TopicSegmenter:
+    """基于 TF-IDF 相似度、回复关系和时间间隔的话题切分器
+
+    按时间顺序逐条分配消息：回复某条消息的消息归入被回复消息的话题；其余消息与最近仍活跃的话题比较质心的
+    余弦相似度，超过阈值时归入最相似的话题，内容较多但与所有话题都不相似时开始新话题，
+    内容很少的消息（如“好的”“哈哈”）不开始新话题，而是跟随上一条消息。
+    相邻消息间隔超过 ``max_gap_seconds`` 时所有话题结束。最后将消息过少的话题并入最相似的话题，
+    合并质心相似的话题，并把话题数限制在 ``max_topics`` 以内。
+    """
+
+    def __init__(self, similarity_threshold: float = 0.15, max_gap_seconds: int = 1800,
+                 min_topic_lines: int = 5, max_topics: int = 8, min_terms: int = 3,
+                 active_topics: int = 8, merge_threshold: float = 0.3, dims: int = 4096):
+        """初始化话题切分器
+
+        Args:
+            similarity_threshold: 消息归入已有话题所需的最低余弦相似度
+            max_gap_seconds: 相邻消息间隔超过该值时开始新话题，0表示不按时间切分
+            min_topic_lines: 少于该条数的话题并入其他话题
+            max_topics: 最多保留的话题数
+            min_terms: n-gram 数少于该值的消息视为内容过少，与所有话题都不相似时跟随上一条消息
+            active_topics: 参与比较的最近活跃话题数
+            merge_threshold: 切分完成后质心相似度达到该值的两个话题合并为一个
+            dims: 特征哈希的维数
+        """
+        self.similarity_threshold = similarity_threshold
+        self.max_gap_seconds = max_gap_seconds
+        self.min_topic_lines = max(1, min_topic_lines)
+        self.max_topics = max(1, max_topics)
+        self.min_terms = min_terms
+        self.active_topics = max(1, active_topics)
+        self.merge_threshold = merge_threshold
+        self.dims = dims
+
+    def segment(self, lines: Sequence[str], times: Optional[Sequence[int]] = None,
+                ids: Optional[Sequence[str]] = None,
+                replies: Optional[Sequence[Optional[str]]] = None) -> List[List[int]]:
+        """将聊天记录切分为话题
+
+        Args:
+            lines: 按时间顺序排列的聊天记录行
+            times: 可选的与各行对应的消息时间戳
+            ids: 可选的与各行对应的消息ID
+            replies: 可选的与各行对应的被回复消息ID
+
+        Returns:
+            各话题包含的行下标，话题按第一条消息的顺序排列，下标按时间顺序排列
+        """
+        if not lines:
+            return []
+        counts, sizes = hashed_counts(lines, self.dims)
+        centroids = _Centroids(tfidf_vectors(counts, self.dims))
+        index_of = {message_id: index for index, message_id in enumerate(ids or ())}
+
+        assignment: List[int] = []
+        last_seen: List[int] = []
+        for index in range(len(lines)):
+            gap = (times is not None and index > 0 and self.max_gap_seconds > 0
+                   and times[index] and times[index - 1]
+                   and times[index] - times[index - 1] > self.max_gap_seconds)
+            target = index_of.get(replies[index]) if replies is not None and replies[index] else None
+            topic = None
+            if target is not None and target < index:
+                topic = assignment[target]
+            elif index > 0 and not gap:
+                # 按最近出现的顺序选出仍然活跃的话题
+                active = sorted(range(len(last_seen)), key=last_seen.__getitem__, reverse=True)
+                active = active[:self.active_topics]
+                if sizes[index]:
+                    similarities = centroids.similarities(index, active)
+                    best = max(range(len(active)), key=similarities.__getitem__)
+                    if similarities[best] >= self.similarity_threshold:
+                        topic = active[best]
+                if topic is None and sizes[index] < self.min_terms:
+                    # 内容过少的消息不开始新话题
+                    topic = assignment[index - 1]
+            if topic is None:
+                topic = centroids.new(index)
+                last_seen.append(index)
+            else:
+                centroids.add(topic, index)
+                last_seen[topic] = index
+            assignment.append(topic)
+
+        members: Dict[int, List[int]] = {}
+        for index, topic in enumerate(assignment):
+            members.setdefault(topic, []).append(index)
+        self._merge(members, centroids, assignment)
+        return sorted(members.values(), key=lambda indexes: indexes[0])
+
+    def _merge(self, members: Dict[int, List[int]], centroids, assignment: List[int]) -> None:
+        """合并话题：过小的话题并入最相似的话题，交错且质心足够相似的话题两两合并，直到话题数不超过上限"""
+        while len(members) > 1:
+            smallest = min(members, key=lambda topic: (len(members[topic]), members[topic][0]))
+            if len(members[smallest]) < self.min_topic_lines or len(members) > self.max_topics:
+                others = [topic for topic in members if topic != smallest]
+                scores = [centroids.similarity(smallest, topic) for topic in others]
+                best = max(range(len(others)), key=scores.__getitem__)
+                if scores[best] > 0:
+                    target = others[best]
+                else:
+                    # 没有共同内容时并入时间上紧邻的前一个话题
+                    first = members[smallest][0]
+                    target = next((assignment[index] for index in range(first - 1, -1, -1)
+                                   if assignment[index] != smallest), others[0])
+                source = smallest
+            else:
+                # 同一段讨论在开始阶段可能被拆成几个交错的话题，质心相似时合并；时间上不重叠的话题保持分开
+                pairs = [(centroids.similarity(first, second), first, second)
+                         for first in members for second in members
+                         if first < second and members[first][0] < members[second][-1]
+                         and members[second][0] < members[first][-1]]
+                score, target, source = max(pairs, default=(0.0, None, None))
+                if score < self.merge_threshold or target is None:
+                    break
+                if len(members[source]) > len(members[target]):
+                    target, source = source, target
+            centroids.merge(target, source)
+            members[target] = sorted(members[target] + members.pop(source))
+            for index in members[target]:
+                assignment[index] = target
+
+
+class TopicSummarizer:
+    """按话题并发总结聊天记录
+
+    每个话题单独调用一次LLM（话题过长时在话题内分块总结），各话题的总结按话题首条消息的顺序组装，
+    不再进行最后一次合并调用；只切分出一个话题时返回None，由调用方按原方式总结。
+    """
+
+    def __init__(self, complete: Complete, segmenter: TopicSegmenter, chunk_tokens: int = 3000,
+                 max_concurrency: int = 4, estimate: Callable[[str], int] = heuristic_tokens,
+                 render: Optional[Callable[[List[str]], str]] = None):
+        """初始化话题总结器
+
+        Args:
+            complete: LLM调用函数
+            segmenter: 话题切分器
+            chunk_tokens: 单个话题一次总结的令牌预算，超出时在话题内分块总结
+            max_concurrency: 同时总结的话题数
+            estimate: 令牌估算函数
+            render: 将一组聊天记录行转换为发送给LLM的文本的函数，默认按换行拼接
+        """
+        self.complete = complete
+        self.segmenter = segmenter
+        self.max_concurrency = max(1, max_concurrency)
+        self.render = render or "\n".join
+        self.map_reduce = MapReduceSummarizer(complete, chunk_tokens, max_concurrency, estimate, self.render)
+
+    async def summarize(self, lines: List[str], times: Optional[Sequence[int]] = None,
+                        ids: Optional[Sequence[str]] = None,
+                        replies: Optional[Sequence[Optional[str]]] = None,
+                        prompt: Optional[str] = None) -> Optional[str]:
+        """切分话题并生成按话题组织的总结
+
+        Args:
+            lines: 按时间顺序排列的聊天记录行
+            times: 可选的与各行对应的消息时间戳
+            ids: 可选的与各行对应的消息ID
+            replies: 可选的与各行对应的被回复消息ID
+            prompt: 可选的总结提示词，作为每个话题的总结要求，默认为 ``TOPIC_INSTRUCTIONS``
+
+        Returns:
+            按话题组织的总结，只有一个话题时返回None
+        """
+        loop = asyncio.get_running_loop()
+        # 切分是纯CPU计算，放到工作线程中避免阻塞事件循环
+        topics = await loop.run_in_executor(None, self.segmenter.segment, lines, times, ids, replies)
+        if len(topics) <= 1:
+            return None
+        total = len(topics)
+        logger.info(f"Topic summary: {len(lines)} lines in {total} topics "
+                    f"({', '.join(str(len(topic)) for topic in topics)})")
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        instructions = prompt or TOPIC_INSTRUCTIONS
+
+        async def run(index: int, topic: List[int]) -> str:
+            topic_lines = [lines[position] for position in topic]
+            async with semaphore:
+                if self.map_reduce.needs_split(topic_lines):
+                    # 话题本身过长时先分块提取要点，再按话题提示词总结
+                    topic_prompt = TOPIC_PROMPT.format(index=index, total=total, count=len(topic),
+                                                       instructions=instructions, content="").rstrip()
+                    return await self.map_reduce.summarize(topic_prompt, topic_lines)
+                return await self.complete(TOPIC_PROMPT.format(
+                    index=index, total=total, count=len(topic), instructions=instructions,
+                    content=self.render(topic_lines)))
+
+        parts = await asyncio.gather(*(run(index, topic) for index, topic in enumerate(topics, 1)))
+        return "\n\n".join(self._section(index, len(topic), part.strip())
+                           for index, (topic, part) in enumerate(zip(topics, parts), 1))
+
+    @staticmethod
+    def _section(index: int, count: int, text: str) -> str:
+        """将一个话题的总结整理为带标题的段落"""
+        first, _, rest = text.partition("\n")
+        match = _TITLE_RE.match(first)
+        if match:
+            title, text = match.group(1).strip("「」*# "), rest.strip()
+        else:
+            title = f"话题{index}"
+        return f"【{title}】（{count} 条消息）\n{text}"
@@ -3,21 +3,32 @@
 """
 Enhanced Chat Summary CLI Tool
 
-命令行工具，允许直接从终端使用聊天总结功能
+命令行工具，允许直接从终端使用聊天总结功能，支持批量总结目录、通配符和清单文件中的聊天记录，
+以及用 ``search`` 子命令搜索插件归档的总结
 """
 
 import os
 import sys
 import json
+import time
+import asyncio
+import dataclasses
 import argparse
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 # 添加项目根目录到系统路径
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
 # 导入主模块
 from main import EnhancedChatSummary
+from chatsummary.batch import (
+    BatchItem, BatchResult, BatchRunner, BatchState, STATE_FILE, expand_inputs, plan_outputs,
+)
+from chatsummary.cache import prompt_hash
+from chatsummary.archive import SummaryArchive, parse_query
+from chatsummary.rendering import normalize_format
+from chatsummary.openai_compat import OpenAICompatibleProvider, DEFAULT_API_BASE
 from i18n.i18n import get_i18n_manager, _
 
 # 设置日志
@@ -78,34 +89,52 @@ def load_config(config_path: Optional[str] = None) -> Dict[str, Any]:
     return default_config
 
 
-def parse_arguments():
+def parse_formats(value: str) -> List[str]:
+    """解析以逗号分隔的输出格式列表"""
+    try:
+        formats = [normalize_format(fmt) for fmt in value.split(",") if fmt.strip()]
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    if not formats:
+        raise argparse.ArgumentTypeError(_("at least one output format is required"))
+    return list(dict.fromkeys(formats))
+
+
+def parse_arguments(argv: Optional[List[str]] = None):
     """解析命令行参数"""
     parser = argparse.ArgumentParser(
         description=_("Enhanced Chat Summary CLI Tool")
     )
     
     parser.add_argument(
-        "input_file", 
-        help=_("Input chat log file path")
+        "inputs",
+        nargs="*",
+        help=_("Input chat log files, directories or glob patterns")
+    )
+    
+    parser.add_argument(
+        "-m", "--manifest",
+        help=_("File listing input paths or glob patterns, one per line"),
+        default=None
     )
     
     parser.add_argument(
         "-o", "--output", 
-        help=_("Output file path"), 
+        help=_("Output file path for a single input, otherwise the output directory"), 
         default=None
     )
     
     parser.add_argument(
         "-f", "--format",
-        help=_("Output format (markdown, html, plain)"),
-        choices=["markdown", "html", "plain"],
+        help=_("Output formats (markdown, html, plain), comma-separated to write several formats from one summary"),
+        type=parse_formats,
         default=None
     )
     
     parser.add_argument(
         "-l", "--language",
         help=_("Language for the summary"),
-        choices=["en_US", "zh_CN"],
+        choices=["en_US", "zh_CN", "ja_JP"],
         default=None
     )
     
@@ -115,19 +144,238 @@ def parse_arguments():
         default=None
     )
     
+    parser.add_argument(
+        "-j", "--jobs",
+        help=_("Worker processes used to parse input files, 0 parses in threads"),
+        type=int,
+        default=min(4, os.cpu_count() or 1)
+    )
+    
+    parser.add_argument(
+        "--concurrency",
+        help=_("Summaries generated concurrently"),
+        type=int,
+        default=None
+    )
+    
+    parser.add_argument(
+        "--force",
+        help=_("Summarize inputs again even if their output is up to date"),
+        action="store_true"
+    )
+    
+    parser.add_argument("--model", help=_("LLM model name"), default=None)
+    parser.add_argument("--api-base", help=_("OpenAI-compatible API base URL"), default=None)
+    parser.add_argument("--api-key", help=_("API key, defaults to the OPENAI_API_KEY environment variable"),
+                        default=None)
+    
     parser.add_argument(
         "-v", "--verbose",
         help=_("Enable verbose logging"),
         action="store_true"
     )
     
-    return parser.parse_args()
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.manifest:
+        parser.error(_("at least one input or --manifest is required"))
+    return args
+
+
+def parse_search_arguments(argv: List[str]):
+    """解析 ``search`` 子命令的参数"""
+    parser = argparse.ArgumentParser(
+        prog="cli.py search",
+        description=_("Search archived summaries by keyword or date")
+    )
+    parser.add_argument(
+        "terms",
+        nargs="*",
+        help=_("Keywords, dates (2024-05-01, 2024-05, 2024-05-01..2024-05-07) or #id")
+    )
+    parser.add_argument("-c", "--config", help=_("Path to configuration file"), default=None)
+    parser.add_argument("--archive", help=_("Path to the summary archive database"), default=None)
+    parser.add_argument("-g", "--group", help=_("Only search summaries of this group"), default=None)
+    parser.add_argument("-n", "--limit", help=_("Maximum number of results"), type=int, default=10)
+    parser.add_argument("--full", help=_("Print the full summaries instead of snippets"), action="store_true")
+    parser.add_argument("--json", help=_("Print results as JSON lines"), action="store_true")
+    parser.add_argument("-v", "--verbose", help=_("Enable verbose logging"), action="store_true")
+    args = parser.parse_args(argv)
+    if not args.terms:
+        parser.error(_("at least one keyword, date or #id is required"))
+    return args
+
+
+def run_search(args, config: Dict[str, Any]) -> int:
+    """在总结归档中搜索并输出结果
+    
+    Args:
+        args: ``search`` 子命令的参数
+        config: 配置
+        
+    Returns:
+        进程退出码，没有找到结果时为1
+    """
+    path = args.archive or config.get("archive", {}).get(
+        "path", os.path.join("data", "chatsummary", "archive.db"))
+    if not os.path.exists(path):
+        logger.error(_("Summary archive not found: {}").format(path))
+        return 1
+    
+    query = parse_query(" ".join(args.terms))
+    archive = SummaryArchive(path)
+    try:
+        started = time.perf_counter()
+        if query.summary_id is not None:
+            entry = archive.get(query.summary_id, args.group)
+            results = [entry] if entry is not None else []
+        else:
+            results = archive.search(query.keywords, args.group, query.since, query.until, args.limit)
+        elapsed = (time.perf_counter() - started) * 1000
+    finally:
+        archive.close()
+    
+    full = args.full or query.summary_id is not None
+    for entry in results:
+        if args.json:
+            print(json.dumps(dataclasses.asdict(entry), ensure_ascii=False))
+            continue
+        start = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.start_time))
+        end = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.end_time))
+        print(f"#{entry.id} [{entry.group_id}] {start} ~ {end} ({entry.message_count} messages, "
+              f"{entry.model or '-'}, {entry.prompt_tokens}+{entry.completion_tokens} tokens)")
+        print(entry.summary if full else entry.snippet(query.keywords))
+        print()
+    print(_("Found {count} summaries in {ms:.1f} ms").format(count=len(results), ms=elapsed), file=sys.stderr)
+    return 0 if results else 1
+
+
+class CLIContext:
+    """命令行环境中替代AstrBot上下文，只提供LLM提供商"""
+    
+    def __init__(self, provider):
+        self.provider = provider
+    
+    def get_using_provider(self):
+        return self.provider
+
+
+def output_suffix(summary_format: str) -> str:
+    """根据输出格式确定文件扩展名"""
+    summary_format = normalize_format(summary_format)
+    return ".md" if summary_format == "markdown" else ".html" if summary_format == "html" else ".txt"
+
+
+def output_formats(config: Dict[str, Any]) -> List[str]:
+    """获取配置的输出格式列表，``summary_format`` 可以是单个格式或格式列表"""
+    formats = config.get("summary_format", "markdown")
+    if isinstance(formats, str):
+        formats = formats.split(",")
+    return list(dict.fromkeys(normalize_format(fmt) for fmt in formats)) or ["markdown"]
 
 
-def main():
+def plugin_config(config: Dict[str, Any], concurrency: int) -> Dict[str, Any]:
+    """由命令行配置生成插件配置，关闭依赖群组和消息事件的功能"""
+    merged = dict(config)
+    output = dict(config.get("output", {}))
+    # 命令行默认要求结构化输出，同一次生成渲染为所有需要的格式
+    output.setdefault("structured", True)
+    output.setdefault("custom_templates_dir", config.get("advanced", {}).get("custom_templates_dir", ""))
+    output.setdefault("template_cache_dir", "")
+    merged.update({
+        "output": output,
+        "message_store": {"enabled": False},
+        "cache": {"enabled": False},
+        "rolling_summary": {"enabled": False},
+        "coalescing": {"enabled": False},
+        "cooldown_seconds": 0,
+    })
+    llm = dict(config.get("llm", {}))
+    llm["max_concurrency"] = concurrency
+    llm["per_provider_concurrency"] = concurrency
+    merged["llm"] = llm
+    return merged
+
+
+def print_progress(result: BatchResult, done: int, total: int) -> None:
+    """在标准错误输出中显示进度"""
+    line = f"[{done}/{total}] {result.status:<7} {result.item.source}"
+    if result.status == "ok":
+        line += f" -> {', '.join(result.item.outputs)} ({result.seconds:.1f}s)"
+    elif result.error:
+        line += f": {result.error}"
+    print(line, file=sys.stderr, flush=True)
+
+
+async def run_batch(args, config: Dict[str, Any], provider) -> int:
+    """执行批量总结
+    
+    Args:
+        args: 命令行参数
+        config: 配置
+        provider: LLM提供商
+        
+    Returns:
+        进程退出码
+    """
+    entries = expand_inputs(args.inputs, args.manifest)
+    if not entries:
+        logger.error(_("No input files found"))
+        return 1
+    
+    formats = output_formats(config)
+    suffixes = [output_suffix(fmt) for fmt in formats]
+    if (len(entries) == 1 and args.output and not os.path.isdir(args.output)
+            and os.path.splitext(args.output)[1]):
+        # 单个输入且指定了输出文件，其他格式写到同名的其他扩展名文件
+        stem = os.path.splitext(args.output)[0]
+        items = [BatchItem(entries[0][0], args.output, tuple(stem + suffix for suffix in suffixes[1:]))]
+        state_dir = os.path.dirname(args.output) or "."
+    else:
+        state_dir = args.output or "."
+        items = plan_outputs(entries, state_dir, suffixes)
+    
+    concurrency = args.concurrency or config.get("llm", {}).get("max_concurrency", 4)
+    summarizer = EnhancedChatSummary(CLIContext(provider), plugin_config(config, concurrency))
+    settings = prompt_hash(json.dumps({
+        "prompt": summarizer._load_prompt(),
+        "model": provider.get_model(),
+        "max_tokens": summarizer.llm_max_tokens,
+        "temperature": summarizer.llm_temperature,
+        "mode": summarizer.summarization_mode,
+        "formats": formats,
+        "template": summarizer.renderer.template,
+    }, sort_keys=True, ensure_ascii=False))
+    
+    async def summarize(chat_lines: List[str]) -> List[str]:
+        # 只调用一次LLM，再渲染为每种输出格式
+        summary = await summarizer.summarize_records(chat_lines)
+        return [summarizer.render_summary(summary, fmt) for fmt in formats]
+    
+    runner = BatchRunner(summarize, settings, workers=args.jobs,
+                         concurrency=concurrency, force=args.force, progress=print_progress)
+    results = await runner.run(items, BatchState(os.path.join(state_dir, STATE_FILE)))
+    
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+    print(_("Summarized {ok}, skipped {skipped}, empty {empty}, failed {failed}").format(
+        ok=counts.get("ok", 0), skipped=counts.get("skipped", 0),
+        empty=counts.get("empty", 0), failed=counts.get("failed", 0)))
+    return 1 if counts.get("failed") else 0
+
+
+def main(argv: Optional[List[str]] = None):
     """主函数"""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "search":
+        # 搜索归档的总结，不需要LLM提供商
+        args = parse_search_arguments(argv[1:])
+        if args.verbose:
+            logging.getLogger().setLevel(logging.DEBUG)
+        sys.exit(run_search(args, load_config(args.config)))
+    
     # 解析命令行参数
-    args = parse_arguments()
+    args = parse_arguments(argv)
     
     # 设置日志级别
     if args.verbose:
@@ -145,44 +393,20 @@ def main():
         config["summary_format"] = args.format
     
     # 如果设置了语言，初始化i18n
-    get_i18n_manager(config["language"])
+    get_i18n_manager(config.get("language", "en_US"))
     
-    # 检查输入文件
-    if not os.path.exists(args.input_file):
-        logger.error(_("Input file not found: {}").format(args.input_file))
-        sys.exit(1)
-    
-    # 设置输出文件
-    output_file = args.output
-    if not output_file:
-        # 根据输入文件名和格式生成输出文件名
-        base_name = os.path.splitext(os.path.basename(args.input_file))[0]
-        ext = ".md" if config["summary_format"] == "markdown" else ".html" if config["summary_format"] == "html" else ".txt"
-        output_file = f"{base_name}_summary{ext}"
-    
-    # 创建总结实例
-    summarizer = EnhancedChatSummary(config)
+    llm_config = config.get("llm", {})
+    provider = OpenAICompatibleProvider(
+        model=args.model or llm_config.get("model", "gpt-3.5-turbo"),
+        api_key=args.api_key or llm_config.get("api_key") or os.environ.get("OPENAI_API_KEY", ""),
+        api_base=args.api_base or llm_config.get("api_base") or DEFAULT_API_BASE,
+        timeout=llm_config.get("timeout", 120)
+    )
     
     try:
-        # 读取输入文件
-        with open(args.input_file, "r", encoding="utf-8") as f:
-            chat_data = f.read()
-        
-        # 生成聊天摘要
-        logger.info(_("Generating summary for {}").format(args.input_file))
-        summary = summarizer.generate_summary(chat_data)
-        
-        # 保存到文件
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(summary)
-        
-        logger.info(_("Summary saved to {}").format(output_file))
-        
-        # 打印成功信息
-        print(_("Summary successfully generated and saved to {}").format(output_file))
-        
-    except Exception as e:
-        logger.error(_("Error generating summary: {}").format(str(e)))
+        sys.exit(asyncio.run(run_batch(args, config, provider)))
+    except FileNotFoundError as e:
+        logger.error(_("Input file not found: {}").format(str(e)))
         sys.exit(1)
 
 
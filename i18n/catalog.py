@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+翻译目录模块
+在第一次查询时才加载语言文件，加载时将每种语言与回退语言合并为一个字典，
+查询只需一次字典访问；格式占位符在加载时预先解析，编译结果可以保存为缓存文件，加快下次启动
+"""
+
+import os
+import json
+import string
+import logging
+import tempfile
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 设置日志记录器
+logger = logging.getLogger("chat_summary.i18n")
+
+# 语言文件所在目录
+I18N_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 查询不到的键依次在这些语言中查找
+DEFAULT_FALLBACKS = ("zh_CN", "en_US")
+
+# 缓存文件格式版本，编译结果的结构变化时递增
+CACHE_VERSION = 1
+
+_FORMATTER = string.Formatter()
+
+# 预解析的占位符：(字面文本, 字段名)，字段名为None表示结尾的字面文本
+Segments = List[Tuple[str, Optional[str]]]
+
+
+def normalize_language(lang: Optional[str]) -> str:
+    """将语言代码统一为语言文件使用的形式，例如 ``ja-JP`` 转换为 ``ja_JP``"""
+    if not lang:
+        return ""
+    parts = lang.strip().replace("-", "_").split("_")
+    if len(parts) == 2:
+        return f"{parts[0].lower()}_{parts[1].upper()}"
+    return lang.strip()
+
+
+class Message(str):
+    """包含格式占位符的翻译文本，占位符在编译时解析"""
+
+    def __new__(cls, text: str, segments: Optional[Segments]):
+        message = super().__new__(cls, text)
+        # 为None时占位符带有格式说明或转换，使用 str.format 格式化
+        message.segments = segments
+        return message
+
+    def render(self, values: Dict[str, Any]) -> str:
+        """填入参数，缺少参数时返回原始文本"""
+        try:
+            if self.segments is None:
+                return str.format(self, **values)
+            parts = []
+            for literal, name in self.segments:
+                parts.append(literal)
+                if name is not None:
+                    parts.append(str(values[name]))
+            return "".join(parts)
+        except (KeyError, IndexError):
+            return str(self)
+
+
+def compile_text(text: str) -> Any:
+    """编译一条翻译文本
+
+    Returns:
+        没有占位符时返回文本本身，否则返回 :class:`Message`
+    """
+    try:
+        parsed = list(_FORMATTER.parse(text))
+    except ValueError:
+        # 花括号不成对，按普通文本处理
+        return text
+    if all(name is None for _, name, _, _ in parsed):
+        return text
+    segments: Optional[Segments] = []
+    for literal, name, spec, conversion in parsed:
+        if name is not None and (spec or conversion or not name.isidentifier()):
+            segments = None
+            break
+        segments.append((literal, name))
+    return Message(text, segments)
+
+
+class Catalog:
+    """翻译目录
+
+    语言文件是 ``目录/语言代码.json``。每种语言编译为一个合并了回退链的字典：
+    自身的翻译优先，其次是 ``fallbacks`` 中的语言，最后是其他所有语言。
+    """
+
+    def __init__(self, directory: str = I18N_DIR, fallbacks: Iterable[str] = DEFAULT_FALLBACKS,
+                 cache_path: Optional[str] = None,
+                 translations: Optional[Dict[str, Dict[str, Any]]] = None):
+        """初始化翻译目录，不进行任何磁盘读写
+
+        Args:
+            directory: 语言文件目录
+            fallbacks: 回退语言，按优先级排列
+            cache_path: 编译结果的缓存文件，为None时不使用缓存
+            translations: 直接提供的翻译数据，提供时不读取语言文件
+        """
+        self.directory = directory
+        self.fallbacks = tuple(fallbacks)
+        self.cache_path = cache_path
+        self._raw = translations
+        self._languages: Optional[List[str]] = sorted(translations) if translations is not None else None
+        self._compiled: Dict[Tuple[str, ...], Dict[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def languages(self) -> List[str]:
+        """获取可用的语言代码"""
+        if self._languages is None:
+            try:
+                self._languages = sorted(name[:-5] for name in os.listdir(self.directory)
+                                         if name.endswith(".json"))
+            except OSError as e:
+                logger.error(f"Error listing translations in {self.directory}: {e}")
+                self._languages = []
+        return self._languages
+
+    def raw(self) -> Dict[str, Dict[str, Any]]:
+        """获取未经合并的原始翻译数据"""
+        if self._raw is None:
+            raw = {}
+            for lang in self.languages():
+                try:
+                    with open(os.path.join(self.directory, f"{lang}.json"), 'r', encoding='utf-8') as f:
+                        raw[lang] = json.load(f)
+                except Exception as e:
+                    logger.error(f"Failed to load translation file {lang}.json: {e}")
+                    raw[lang] = {}
+            self._raw = raw
+        return self._raw
+
+    def _chain(self, lang: str, fallbacks: Tuple[str, ...]) -> List[str]:
+        chain = [lang] + [code for code in fallbacks if code != lang]
+        return chain + [code for code in self.languages() if code not in chain]
+
+    def _signature(self) -> Dict[str, List[int]]:
+        """语言文件的修改时间和大小，用于判断缓存是否有效"""
+        signature = {}
+        for lang in self.languages():
+            stat = os.stat(os.path.join(self.directory, f"{lang}.json"))
+            signature[lang] = [stat.st_mtime_ns, stat.st_size]
+        return signature
+
+    def _load_cache(self, fallbacks: Tuple[str, ...],
+                    signature: Dict[str, List[int]]) -> Optional[Dict[str, Dict[str, Any]]]:
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable translation cache {self.cache_path}: {e}")
+            return None
+        if (data.get("version") != CACHE_VERSION or data.get("fallbacks") != list(fallbacks)
+                or data.get("sources") != signature):
+            return None
+        compiled = {}
+        for lang, entries in data["languages"].items():
+            compiled[lang] = {
+                key: value if isinstance(value, str) else Message(
+                    value[0], None if value[1] is None else [tuple(segment) for segment in value[1]])
+                for key, value in entries.items()
+            }
+        return compiled
+
+    def _save_cache(self, fallbacks: Tuple[str, ...], signature: Dict[str, List[int]],
+                    compiled: Dict[str, Dict[str, Any]]) -> None:
+        languages = {
+            lang: {key: value if not isinstance(value, Message) else [str(value), value.segments]
+                   for key, value in entries.items()}
+            for lang, entries in compiled.items()
+        }
+        data = {"version": CACHE_VERSION, "fallbacks": list(fallbacks), "sources": signature,
+                "languages": languages}
+        try:
+            directory = os.path.dirname(self.cache_path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.cache_path)
+        except Exception as e:
+            logger.warning(f"Failed to write translation cache {self.cache_path}: {e}")
+
+    def _compile(self, fallbacks: Tuple[str, ...]) -> Dict[str, Dict[str, Any]]:
+        signature = None
+        if self.cache_path and self._raw is None:
+            try:
+                signature = self._signature()
+                cached = self._load_cache(fallbacks, signature)
+                if cached is not None:
+                    return cached
+            except OSError as e:
+                logger.warning(f"Translation cache disabled: {e}")
+                signature = None
+
+        raw = self.raw()
+        compiled_texts = {
+            lang: {key: compile_text(value) for key, value in entries.items() if isinstance(value, str)}
+            for lang, entries in raw.items()
+        }
+        compiled = {}
+        for lang in raw:
+            merged: Dict[str, Any] = {}
+            for code in reversed(self._chain(lang, fallbacks)):
+                merged.update(compiled_texts.get(code, {}))
+            compiled[lang] = merged
+        if signature is not None:
+            self._save_cache(fallbacks, signature, compiled)
+        return compiled
+
+    def lookup(self, lang: str, fallbacks: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """获取语言合并了回退链的翻译字典
+
+        Args:
+            lang: 语言代码，不可用时使用第一个可用的回退语言
+            fallbacks: 回退语言，默认为目录的回退语言
+
+        Returns:
+            翻译键到文本的字典，包含占位符的文本为 :class:`Message`
+        """
+        fallbacks = self.fallbacks if fallbacks is None else tuple(fallbacks)
+        compiled = self._compiled.get(fallbacks)
+        if compiled is None:
+            with self._lock:
+                compiled = self._compiled.get(fallbacks)
+                if compiled is None:
+                    compiled = self._compile(fallbacks)
+                    self._compiled[fallbacks] = compiled
+        if lang in compiled:
+            return compiled[lang]
+        for code in fallbacks:
+            if code in compiled:
+                return compiled[code]
+        return next(iter(compiled.values()), {})
+
+    def translate(self, lang: str, key: str, default: Optional[Any] = None,
+                  fallbacks: Optional[Iterable[str]] = None, **kwargs: Any) -> Any:
+        """翻译一个键
+
+        Args:
+            lang: 语言代码
+            key: 翻译键
+            default: 所有语言都没有该键时的返回值，为None时返回键本身
+            fallbacks: 回退语言
+            **kwargs: 格式化参数
+
+        Returns:
+            翻译后的文本
+        """
+        text = self.lookup(lang, fallbacks).get(key)
+        if text is None:
+            text = default if default is not None else key
+            if kwargs and isinstance(text, str):
+                text = compile_text(text)
+        if kwargs and isinstance(text, Message):
+            return text.render(kwargs)
+        return text
+
+
+_catalog: Optional[Catalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> Catalog:
+    """获取进程内共享的翻译目录，同一进程中的所有插件实例只加载一次语言文件"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = Catalog()
+    return _catalog
+
+
+def configure_catalog(cache_path: Optional[str]) -> None:
+    """设置共享翻译目录的缓存文件，只在目录还没有加载时生效"""
+    catalog = get_catalog()
+    if not catalog._compiled:
+        catalog.cache_path = cache_path or None
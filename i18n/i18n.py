@@ -5,16 +5,23 @@
 本模块提供了插件的国际化支持功能，允许在不同语言环境下使用插件
 """
 
-import os
-import json
 import logging
 from typing import Dict, Optional, Any
 
+from .catalog import get_catalog, normalize_language
+
 # 设置日志记录器
 logger = logging.getLogger("chat_summary.i18n")
 
+# 查询不到的键依次在这些语言中查找
+FALLBACK_LANGUAGES = ("en_US", "zh_CN")
+
 class I18nManager:
-    """国际化管理器类，处理文本本地化和翻译"""
+    """国际化管理器类，处理文本本地化和翻译
+    
+    与 :class:`i18n.I18n` 共享同一个翻译目录，每种语言在加载时与回退语言合并，
+    查询缺失的键不需要逐个扫描其他语言。
+    """
     
     def __init__(self, lang_code: str = "en_US"):
         """
@@ -23,36 +30,21 @@ class I18nManager:
         Args:
             lang_code: 语言代码，默认为"en_US"
         """
-        self.lang_code = lang_code
-        self.translations: Dict[str, Dict[str, str]] = {}
-        self.current_translations: Dict[str, str] = {}
-        self._load_translations()
+        self.catalog = get_catalog()
+        self.lang_code = normalize_language(lang_code) or "en_US"
+        self._current: Optional[Dict[str, Any]] = None
     
-    def _load_translations(self) -> None:
-        """加载所有可用的翻译文件"""
-        try:
-            # 获取当前目录路径（i18n文件夹）
-            i18n_dir = os.path.dirname(os.path.abspath(__file__))
-            
-            # 搜索目录中的所有JSON文件
-            for filename in os.listdir(i18n_dir):
-                if filename.endswith(".json"):
-                    lang_code = filename.replace(".json", "")
-                    file_path = os.path.join(i18n_dir, filename)
-                    
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            self.translations[lang_code] = json.load(f)
-                            logger.debug(f"Loaded translation: {lang_code}")
-                    except Exception as e:
-                        logger.error(f"Failed to load translation file {filename}: {str(e)}")
-            
-            # 加载当前语言的翻译
+    @property
+    def translations(self) -> Dict[str, Dict[str, Any]]:
+        """各语言未经合并的翻译数据"""
+        return self.catalog.raw()
+    
+    @property
+    def current_translations(self) -> Dict[str, Any]:
+        """当前语言合并了回退语言的翻译字典，第一次访问时加载"""
+        if self._current is None:
             self._set_language(self.lang_code)
-        except Exception as e:
-            logger.error(f"Error loading translations: {str(e)}")
-            # 确保至少有一个空字典防止后续操作失败
-            self.current_translations = {}
+        return self._current
     
     def _set_language(self, lang_code: str) -> None:
         """
@@ -61,28 +53,15 @@ class I18nManager:
         Args:
             lang_code: 语言代码
         """
-        if lang_code in self.translations:
-            self.lang_code = lang_code
-            self.current_translations = self.translations[lang_code]
-            logger.info(f"Language set to: {lang_code}")
-        else:
-            # 如果请求的语言不可用，回退到英语
-            fallback = "en_US"
-            if fallback in self.translations:
-                self.lang_code = fallback
-                self.current_translations = self.translations[fallback]
-                logger.warning(f"Requested language {lang_code} not available, falling back to {fallback}")
-            else:
-                # 如果连英语也不可用，使用任何可用的语言
-                if self.translations:
-                    first_available = next(iter(self.translations.keys()))
-                    self.lang_code = first_available
-                    self.current_translations = self.translations[first_available]
-                    logger.warning(f"Falling back to available language: {first_available}")
-                else:
-                    # 如果没有任何翻译可用
-                    self.current_translations = {}
-                    logger.error("No translations available")
+        if lang_code not in self.catalog.languages():
+            # 如果请求的语言不可用，回退到英语或任何可用的语言
+            fallback = next((code for code in FALLBACK_LANGUAGES if code in self.catalog.languages()),
+                            next(iter(self.catalog.languages()), lang_code))
+            logger.warning(f"Requested language {lang_code} not available, falling back to {fallback}")
+            lang_code = fallback
+        self.lang_code = lang_code
+        self._current = self.catalog.lookup(lang_code, FALLBACK_LANGUAGES)
+        logger.info(f"Language set to: {lang_code}")
     
     def get_text(self, key: str, default: Optional[str] = None) -> str:
         """
@@ -95,15 +74,9 @@ class I18nManager:
         Returns:
             本地化的文本字符串
         """
-        if key in self.current_translations:
-            return self.current_translations[key]
-        
-        # 在其他可用语言中查找
-        for lang, translations in self.translations.items():
-            if lang != self.lang_code and key in translations:
-                text = translations[key]
-                logger.debug(f"Key '{key}' not found in {self.lang_code}, using value from {lang}")
-                return text
+        text = self.current_translations.get(key)
+        if text is not None:
+            return text
         
         # 如果所有语言都没有这个键，返回默认值或键本身
         if default is not None:
@@ -120,7 +93,8 @@ class I18nManager:
         Returns:
             是否成功切换语言
         """
-        if lang_code in self.translations:
+        lang_code = normalize_language(lang_code)
+        if lang_code in self.catalog.languages():
             self._set_language(lang_code)
             return True
         return False
@@ -133,12 +107,9 @@ class I18nManager:
             语言代码及其元数据的字典
         """
         result = {}
-        for lang_code in self.translations.keys():
+        for lang_code, translations in self.translations.items():
             # 尝试获取语言的元数据（如果存在）
-            meta = {}
-            if lang_code in self.translations and "_meta" in self.translations[lang_code]:
-                meta = self.translations[lang_code]["_meta"]
-            
+            meta = translations.get("_meta", {})
             result[lang_code] = {
                 "name": meta.get("name", lang_code),
                 "native_name": meta.get("native_name", lang_code),
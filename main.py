@@ -4,10 +4,10 @@
 """
 
 import os
-import json
-from datetime import datetime
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional, Union, Type
+from contextlib import nullcontext
+from typing import List, Dict, Any, Optional, Union, Type, AsyncIterator, Iterable, Tuple
 import time
 
 # 定义模拟类型，使它们在不导入AstrBot的情况下也能使用
@@ -39,15 +39,54 @@ except ImportError:
     # 定义模拟的函数和类
     Context = MockContext
     Star = MockStar
-    filter = type('MockFilter', (), {'command': lambda x: lambda y: y})
+    filter = type('MockFilter', (), {
+        'command': lambda x: lambda y: y,
+        'event_message_type': lambda *args, **kwargs: lambda y: y,
+        'EventMessageType': type('MockEventMessageType', (), {'GROUP_MESSAGE': 'group_message'}),
+    })
     register = lambda *args, **kwargs: lambda cls: cls
 
 # 导入国际化支持
-from i18n import I18n
+from i18n import I18n, configure_catalog
+from chatsummary import (
+    MessageStore, HistorySync, PagedHistoryFetcher, MessageStream, MapReduceSummarizer,
+    SummaryCache, RollingSummarizer, SingleFlight, CooldownTracker, TokenEstimator,
+    TranscriptCompactor, MessageFilter, MessageFormatter, ConfigService,
+    MetricsSink, PrometheusRegistry, PrometheusFileExporter, PrometheusHTTPExporter,
+    StageTrace, current_trace, trace_stage, SummaryStream, ParagraphChunker, current_stream,
+    LLMExecutor, PrecomputeScheduler, GroupActivity, current_budget,
+    SummaryRenderer, STRUCTURED_OUTPUT_PROMPT, parse_structured, normalize_format,
+    FairJobQueue, QueueRejected, SummaryArchive, parse_query, TopicSegmenter, TopicSummarizer,
+    ExtractiveSelector,
+)
 
 # 设置日志
 logger = logging.getLogger("astrbot.plugin.chatsummary")
 
+# 生成总结失败时返回给用户的提示前缀
+SUMMARY_ERROR_PREFIX = "生成总结时出错: "
+
+# 分块总结时每个分块的最小令牌预算，上下文窗口配置过小时以此兜底
+MIN_CHUNK_TOKENS = 512
+
+# 用户总结附加在总结提示词之前的说明
+USER_SUMMARY_PROMPT = (
+    "以下聊天记录包含群成员「{name}」最近的发言，以及回复这些发言或被这些发言回复的消息。"
+    "请只总结「{name}」的观点、提出的问题、做出的决定和参与的讨论，其他人的消息仅作为上下文。\n\n{prompt}"
+)
+
+# 调试模式中各阶段的显示名称，按执行顺序排列
+STAGE_NAMES = [
+    ("queue", "排队等待"),
+    ("fetch", "获取消息"),
+    ("format", "过滤与格式化"),
+    ("prompt", "构建提示词"),
+    ("summarize", "生成总结"),
+    ("llm", "其中 LLM 调用累计"),
+    ("first_chunk", "首段送达前"),
+    ("send", "发送"),
+]
+
 # 插件类定义
 @register("astrbot_enhanced_chatsummary", "jokeryuyc", 
          "增强版聊天记录总结插件，支持多语言和更多功能", "1.0.3", 
@@ -70,8 +109,9 @@ class EnhancedChatSummary(MockStar if not ASTRBOT_AVAILABLE else Star):
         self.context = context
         self.config = config or {}
         
-        # 初始化i18n
-        self.i18n = I18n(self.config.get("language", "zh_CN"))
+        # 初始化i18n，翻译目录在第一次查询时加载，同一进程中的插件实例共享
+        configure_catalog(self.config.get("i18n_cache_path", os.path.join('data', 'chatsummary', 'i18n_cache.json')))
+        self.i18n = I18n(self.config.get("language", self.config.get("default_language", "zh_CN")))
         
         # 获取配置项
         self.max_records = self.config.get("max_records", 300)
@@ -81,26 +121,288 @@ class EnhancedChatSummary(MockStar if not ASTRBOT_AVAILABLE else Star):
         # 配置文件路径
         self.config_path = os.path.join('data', 'config', 'config.json')
         self.admin_config_path = os.path.join('data', 'config', 'admin_config.json')
+        self.config_service = ConfigService(
+            self.config_path, self.admin_config_path,
+            check_interval=self.config.get("config_check_interval", 2.0)
+        )
+        
+        # 消息格式化器，缓存时间戳格式化结果
+        self.formatter = MessageFormatter()
+        
+        # 消息过滤规则，初始化时编译一次
+        filter_config = self.config.get("message_filters", {})
+        self.message_filter = MessageFilter(
+            ignore_system=filter_config.get("ignore_system", True),
+            ignore_bot=filter_config.get("ignore_bot", True),
+            ignore_commands=filter_config.get("ignore_commands", True),
+            ignore_patterns=filter_config.get("ignore_patterns", []),
+            bot_ids=filter_config.get("bot_ids", []),
+            command_prefixes=filter_config.get("command_prefixes", ["/", "!", "！", "#"])
+        )
+        
+        # 本地消息存储配置，首次获取消息时才打开数据库
+        store_config = self.config.get("message_store", {})
+        self.message_store_enabled = store_config.get("enabled", True)
+        self.message_store_path = store_config.get(
+            "path", os.path.join('data', 'chatsummary', 'messages.db'))
+        self.max_stored_messages = store_config.get("max_messages_per_group", 5000)
+        self._history_sync: Optional[HistorySync] = None
+        
+        # 用户总结配置，按发言人索引从本地存储中查找某个群成员的发言
+        user_summary_config = self.config.get("user_summary", {})
+        self.user_summary_default_count = user_summary_config.get("default_count", 50)
+        self.user_summary_scan_limit = user_summary_config.get("scan_limit", 2000)
+        self.user_summary_with_replies = user_summary_config.get("with_replies", True)
+        
+        # 总结归档配置，首次归档或搜索时才打开数据库
+        archive_config = self.config.get("archive", {})
+        self.archive_enabled = archive_config.get("enabled", True)
+        self.archive_path = archive_config.get("path", os.path.join('data', 'chatsummary', 'archive.db'))
+        self.archive_search_limit = archive_config.get("search_limit", 5)
+        self._archive: Optional[SummaryArchive] = None
+        
+        # 分页获取配置
+        fetch_config = self.config.get("history_fetch", {})
+        self.history_fetcher = PagedHistoryFetcher(
+            page_size=fetch_config.get("page_size", 50),
+            max_concurrency=fetch_config.get("max_concurrency", 4)
+        )
+        
+        # LLM调用与令牌预算配置
+        llm_config = self.config.get("llm", {})
+        self.llm_max_tokens = llm_config.get("max_tokens", 2000)
+        self.llm_temperature = llm_config.get("temperature", 0.7)
+        self.llm_hedge_provider_id = llm_config.get("hedge_provider_id", "")
+        self.context_window = llm_config.get("context_window", 8192)
+        self.token_estimator = TokenEstimator(
+            backend=llm_config.get("tokenizer", "heuristic"),
+            model=llm_config.get("model")
+        )
+        
+        # 聊天记录压缩配置，压缩发生在发送给LLM之前
+        compaction_config = self.config.get("compaction", {})
+        self.compactor = None
+        if compaction_config.get("enabled", False):
+            self.compactor = TranscriptCompactor(
+                alias_senders=compaction_config.get("alias_senders", True),
+                merge_seconds=compaction_config.get("merge_seconds", 120),
+                drop_repeats=compaction_config.get("drop_repeats", True),
+                repeat_window=compaction_config.get("repeat_window", 20),
+                drop_placeholders=compaction_config.get("drop_placeholders", True),
+                # 统计针对整段聊天记录，只出现一次，不写入令牌计数缓存
+                estimate=lambda text: self.token_estimator.count(text, cache=False)
+            )
+        
+        # 流式输出配置，最后一次LLM调用的结果按段落逐步发送
+        streaming_config = self.config.get("streaming", {})
+        self.streaming_enabled = streaming_config.get("enabled", False)
+        self.streaming_first_chunk_chars = streaming_config.get("first_chunk_chars", 80)
+        self.streaming_min_chunk_chars = streaming_config.get("min_chunk_chars", 300)
+        self.streaming_max_chunk_chars = streaming_config.get("max_chunk_chars", 1500)
+        
+        # 长记录分块总结配置，分块预算不超过上下文窗口扣除输出和提示模板后的余量
+        summarization_config = self.config.get("summarization", {})
+        self.summarization_mode = summarization_config.get("mode", "auto")
+        chunk_tokens = min(summarization_config.get("chunk_tokens", 3000),
+                           self.context_window - self.llm_max_tokens - 256)
+        if chunk_tokens < MIN_CHUNK_TOKENS:
+            logger.warning(
+                f"Chunk budget {chunk_tokens} is too small (context_window={self.context_window}, "
+                f"max_tokens={self.llm_max_tokens}), using {MIN_CHUNK_TOKENS}")
+            chunk_tokens = MIN_CHUNK_TOKENS
+        self.map_reduce = MapReduceSummarizer(
+            self._complete,
+            chunk_tokens=chunk_tokens,
+            max_concurrency=summarization_config.get("max_concurrency", 4),
+            estimate=self.token_estimator.count,
+            render=self._render_records,
+            final_complete=self._complete_final
+        )
+        
+        # 话题切分配置，交错进行的多段对话切分为话题后并发总结
+        topics_config = self.config.get("topics", {})
+        self.topic_summarizer: Optional[TopicSummarizer] = None
+        self.topics_min_lines = topics_config.get("min_lines", 40)
+        if topics_config.get("enabled", False):
+            self.topic_summarizer = TopicSummarizer(
+                self._complete,
+                TopicSegmenter(
+                    similarity_threshold=topics_config.get("similarity_threshold", 0.15),
+                    max_gap_seconds=topics_config.get("max_gap_seconds", 1800),
+                    min_topic_lines=topics_config.get("min_topic_lines", 5),
+                    max_topics=topics_config.get("max_topics", 8)
+                ),
+                chunk_tokens=chunk_tokens,
+                max_concurrency=summarization_config.get("max_concurrency", 4),
+                estimate=self.token_estimator.count,
+                render=self._render_records
+            )
+        
+        # 抽取式预选配置，聊天记录超出预算时选出最重要的消息及其上下文，代替丢弃较早的记录
+        extractive_config = self.config.get("extractive", {})
+        self.extractive_selector: Optional[ExtractiveSelector] = None
+        self.extractive_max_tokens = extractive_config.get("max_tokens", 0)
+        if extractive_config.get("enabled", False):
+            self.extractive_selector = ExtractiveSelector(
+                context_lines=extractive_config.get("context_lines", 1),
+                estimate=self.token_estimator.count
+            )
+        
+        # 增量滚动总结配置，检查点依赖本地消息存储
+        rolling_config = self.config.get("rolling_summary", {})
+        self.rolling_enabled = rolling_config.get("enabled", True)
+        self.rolling_max_new_ratio = rolling_config.get("max_new_ratio", 0.5)
+        self._rolling_summarizer: Optional[RollingSummarizer] = None
+        
+        # 总结结果缓存配置
+        cache_config = self.config.get("cache", {})
+        self.summary_cache: Optional[SummaryCache] = None
+        if cache_config.get("enabled", True):
+            disk_path = None
+            if cache_config.get("disk_enabled", False):
+                disk_path = cache_config.get("disk_path", os.path.join('data', 'chatsummary', 'cache'))
+            self.summary_cache = SummaryCache(
+                max_entries=cache_config.get("max_entries", 256),
+                ttl=cache_config.get("ttl_seconds", 600),
+                tolerance=cache_config.get("tolerance", 0),
+                disk_path=disk_path,
+                disk_ttl=cache_config.get("disk_ttl_seconds", 86400)
+            )
+        
+        # 相同请求合并执行与冷却时间
+        coalescing_config = self.config.get("coalescing", {})
+        self.coalescing_enabled = coalescing_config.get("enabled", True)
+        self.coalescing_count_tolerance = coalescing_config.get("count_tolerance", 0.1)
+        self.summary_flights = SingleFlight()
+        self.cooldowns = CooldownTracker(
+            user_seconds=self.config.get("cooldown_seconds", 60),
+            group_seconds=self.config.get("group_cooldown_seconds", 0)
+        )
+        
+        # 输出格式配置，启用结构化输出时LLM返回 JSON，再用模板渲染为配置的格式
+        output_config = self.config.get("output", {})
+        self.output_format = normalize_format(output_config.get("format", "markdown"))
+        self.structured_output = output_config.get("structured", False)
+        self.renderer = SummaryRenderer(
+            custom_templates_dir=output_config.get("custom_templates_dir", ""),
+            template=output_config.get("template", "default"),
+            cache_dir=output_config.get("template_cache_dir", os.path.join('data', 'chatsummary', 'templates'))
+        )
+        
+        # 指标输出端，可替换为任意 MetricsSink 实现
+        self.metrics = self._create_metrics_sink(self.config.get("metrics", {}))
+        self._start_metrics()
+        
+        # 全局总结任务队列，限制同时执行的任务数和每个群组、用户未完成的请求数
+        queue_config = self.config.get("queue", {})
+        self.job_queue: Optional[FairJobQueue] = None
+        if queue_config.get("enabled", True):
+            self.job_queue = FairJobQueue(
+                max_in_flight=queue_config.get("max_in_flight", 8),
+                max_waiting=queue_config.get("max_waiting", 100),
+                group_quota=queue_config.get("group_quota", 3),
+                user_quota=queue_config.get("user_quota", 1),
+                aging_seconds=queue_config.get("aging_seconds", 30),
+                metrics=self.metrics
+            )
+        
+        # 后台预计算配置，结果写入总结缓存和滚动检查点
+        self.precompute = self._create_precompute_scheduler(self.config.get("precompute", {}))
+        
+        # LLM调用执行器：并发限制、超时、重试与对冲请求
+        self.llm_executor = LLMExecutor(
+            max_concurrency=llm_config.get("max_concurrency", 8),
+            per_provider_concurrency=llm_config.get("per_provider_concurrency", 4),
+            timeout=llm_config.get("timeout", 30),
+            retries=llm_config.get("max_retries", 2),
+            backoff=llm_config.get("retry_backoff", 1.0),
+            max_backoff=llm_config.get("retry_max_backoff", 10.0),
+            hedge_percentile=llm_config.get("hedge_percentile", 0.95),
+            hedge_min_samples=llm_config.get("hedge_min_samples", 10),
+            metrics=self.metrics
+        )
         
         logger.info(f"EnhancedChatSummary plugin initialized with max_records={self.max_records}")
 
+    def _create_metrics_sink(self, metrics_config: Dict[str, Any]) -> MetricsSink:
+        """根据配置创建指标输出端
+        
+        Args:
+            metrics_config: 指标配置
+            
+        Returns:
+            指标输出端，未启用时返回丢弃所有指标的输出端
+        """
+        if not metrics_config.get("enabled", False):
+            return MetricsSink()
+        exporter = metrics_config.get("exporter", "file")
+        if exporter == "file":
+            return PrometheusFileExporter(
+                metrics_config.get("file_path", os.path.join('data', 'chatsummary', 'metrics.prom')))
+        if exporter == "http":
+            return PrometheusHTTPExporter(
+                host=metrics_config.get("http_host", "127.0.0.1"),
+                port=metrics_config.get("http_port", 9464))
+        return PrometheusRegistry()
+
+    def _start_metrics(self) -> None:
+        """在事件循环中启动指标输出端，插件在事件循环外加载时推迟到收到第一个事件"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        asyncio.ensure_future(self.metrics.start())
+
+    def _create_precompute_scheduler(self, precompute_config: Dict[str, Any]) -> Optional[PrecomputeScheduler]:
+        """根据配置创建后台预计算调度器
+        
+        Args:
+            precompute_config: 预计算配置
+            
+        Returns:
+            预计算调度器，未启用或结果无处保存时返回None
+        """
+        if not precompute_config.get("enabled", False):
+            return None
+        if self.summary_cache is None and not (self.rolling_enabled and self.message_store_enabled):
+            logger.warning("Precompute requires the summary cache or rolling summaries, disabled")
+            return None
+        windows = [min(int(count), self.max_records)
+                   for count in precompute_config.get("windows", [100]) if int(count) > 0]
+        if not windows:
+            return None
+        return PrecomputeScheduler(
+            self._precompute,
+            windows,
+            groups=precompute_config.get("groups", []),
+            top_groups=precompute_config.get("top_groups", 5),
+            active_hours=precompute_config.get("active_hours", []),
+            idle_seconds=precompute_config.get("idle_seconds", 300),
+            min_new_messages=precompute_config.get("min_new_messages", 50),
+            interval=precompute_config.get("check_interval", 60),
+            daily_llm_calls=precompute_config.get("daily_llm_calls", 100),
+            metrics=self.metrics
+        )
+
     def _load_prompt(self) -> str:
-        """从配置文件中加载提示词
+        """获取配置文件中的提示词
+        
+        配置文件由配置服务缓存，这里不进行磁盘读写。启用结构化输出时附加 JSON 格式要求，
+        缓存键和滚动检查点因此与非结构化的总结区分开。
         
         Returns:
             加载的提示词
         """
         try:
-            if os.path.exists(self.config_path):
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    return config.get('prompt', 'Default prompt')
-            return 'Default prompt'
+            prompt = self.config_service.prompt
+            if self.structured_output:
+                prompt = f"{prompt}\n\n{STRUCTURED_OUTPUT_PROMPT}"
+            return prompt
         except Exception as e:
             logger.error(f"Error loading prompt: {e}")
             return 'Default prompt'
     
-    def _is_admin(self, user_id: str) -> bool:
+    def _is_admin_user(self, user_id: str) -> bool:
         """检查用户是否是管理员
         
         Args:
@@ -110,17 +412,13 @@ class EnhancedChatSummary(MockStar if not ASTRBOT_AVAILABLE else Star):
             是否为管理员
         """
         try:
-            if os.path.exists(self.admin_config_path):
-                with open(self.admin_config_path, 'r', encoding='utf-8') as f:
-                    admin_config = json.load(f)
-                    return user_id in admin_config.get('admins_id', [])
-            return False
+            return self.config_service.is_admin(user_id)
         except Exception as e:
             logger.error(f"Error checking admin status: {e}")
             return False
             
     async def _is_admin(self, event) -> bool:
-        """异步检查用户是否是管理员
+        """异步检查用户是否是管理员，管理员配置有更新时在工作线程中重新加载
         
         Args:
             event: 消息事件
@@ -129,9 +427,9 @@ class EnhancedChatSummary(MockStar if not ASTRBOT_AVAILABLE else Star):
             是否为管理员
         """
         try:
-            user_id = event.get_sender_id()
-            return self._is_admin(user_id)
-        except:
+            await self.config_service.refresh()
+            return self._is_admin_user(event.get_sender_id())
+        except Exception:
             return False  # 在测试环境中返回false
 
     def _extract_message_text(self, message_segments: List[Dict[str, Any]]) -> str:
@@ -143,132 +441,710 @@ class EnhancedChatSummary(MockStar if not ASTRBOT_AVAILABLE else Star):
         Returns:
             提取的文本内容
         """
-        result = ""
         try:
-            for segment in message_segments:
-                msg_type = segment.get('type', '')
-                data = segment.get('data', {})
-                
-                if msg_type == 'text':
-                    result += data.get('text', '') + ' '
-                elif msg_type == 'face':
-                    result += '[表情] '
-                elif msg_type == 'image':
-                    # 如果开启了图片文本提取功能，未来可以调用OCR服务
-                    result += '[图片] '
-                else:
-                    result += f'[{msg_type}] '
+            return self.formatter.extract_text(message_segments)
         except Exception as e:
             logger.error(f"Error extracting message text: {e}")
+            return ""
+    
+    def _group_id(self, event) -> Optional[str]:
+        """获取事件所在的群组ID
+        
+        Args:
+            event: 消息事件
             
-        return result
+        Returns:
+            群组ID，无法获取时返回None
+        """
+        try:
+            group_id = event.get_group_id()
+            return str(group_id) if group_id else None
+        except Exception:
+            return None
     
-    async def _get_message_history(self, event, count: int) -> List[Dict[str, Any]]:
-        """获取消息历史
+    def _get_history_sync(self) -> HistorySync:
+        """获取消息增量同步器，首次调用时打开本地存储
+        
+        Returns:
+            消息增量同步器
+        """
+        if self._history_sync is None:
+            store = MessageStore(self.message_store_path, self.max_stored_messages)
+            self._history_sync = HistorySync(store, self.history_fetcher)
+        return self._history_sync
+    
+    def _get_archive(self) -> SummaryArchive:
+        """获取总结归档，首次调用时打开数据库
+        
+        Returns:
+            总结归档
+        """
+        if self._archive is None:
+            self._archive = SummaryArchive(self.archive_path)
+        return self._archive
+    
+    async def _iter_message_history(self, event, count: int) -> AsyncIterator[Dict[str, Any]]:
+        """以消息流的形式获取消息历史
         
         Args:
             event: 消息事件
             count: 要获取的消息数量
             
-        Returns:
-            消息历史列表
+        Yields:
+            按从新到旧排序的消息
         """
         try:
             if not ASTRBOT_AVAILABLE:
-                # 在测试环境中返回模拟数据
-                return [
-                    {
-                        'sender': {'nickname': '测试用户A'},
-                        'time': int(time.time()),
-                        'message': [{'type': 'text', 'data': {'text': '你好，这是测试消息'}}]
-                    },
-                    {
-                        'sender': {'nickname': '测试用户B'},
-                        'time': int(time.time()) - 60,
-                        'message': [{'type': 'text', 'data': {'text': '这是一条回复消息'}}]
-                    }
-                ]
+                # 在测试环境中使用模拟数据
+                for msg in await self._get_message_history(event, count):
+                    yield msg
+                return
                 
-            # 实际环境中的代码
             group_id = event.get_group_id()
-            messages = await event.bot.api.call_action(
-                'get_group_msg_history',
-                group_id=group_id,
-                count=count
-            )
-            return messages.get('messages', [])
+            call_action = event.bot.api.call_action
+            if self.message_store_enabled:
+                # 只拉取同步游标之后的新消息，其余从本地存储读取
+                source = self._get_history_sync().stream(call_action, group_id, count)
+            else:
+                source = self.history_fetcher.iter_messages(call_action, group_id, count)
+            async for msg in source:
+                yield msg
         except Exception as e:
             logger.error(f"Error getting message history: {e}")
-            return []
+            self.metrics.increment("errors_total", stage="fetch")
     
-    async def _process_messages(self, event, messages: List[Dict[str, Any]]) -> List[str]:
+    async def _get_message_history(self, event, count: int) -> List[Dict[str, Any]]:
+        """获取消息历史
+        
+        Args:
+            event: 消息事件
+            count: 要获取的消息数量
+            
+        Returns:
+            消息历史列表
+        """
+        if not ASTRBOT_AVAILABLE:
+            # 在测试环境中返回模拟数据
+            return [
+                {
+                    'sender': {'nickname': '测试用户A'},
+                    'time': int(time.time()),
+                    'message': [{'type': 'text', 'data': {'text': '你好，这是测试消息'}}]
+                },
+                {
+                    'sender': {'nickname': '测试用户B'},
+                    'time': int(time.time()) - 60,
+                    'message': [{'type': 'text', 'data': {'text': '这是一条回复消息'}}]
+                }
+            ]
+        return [msg async for msg in self._iter_message_history(event, count)]
+    
+    def _format_message(self, msg: Dict[str, Any]) -> str:
+        """格式化单条消息
+        
+        Args:
+            msg: 消息字典
+            
+        Returns:
+            格式化后的聊天记录行
+        """
+        return self.formatter.format(msg)
+    
+    async def _process_messages(self, event,
+                                messages: Union[Iterable[Dict[str, Any]], AsyncIterator[Dict[str, Any]]]) -> List[str]:
         """处理消息历史记录
         
         Args:
             event: 消息事件
-            messages: 消息历史列表
+            messages: 按从新到旧排序的消息列表或异步消息流，
+                      传入消息流时每条消息到达后立即格式化
             
         Returns:
-            处理后的聊天记录列表
+            按从旧到新排序的聊天记录列表
         """
-        chat_records = []
         try:
-            for msg in messages:
-                # 获取发送者昵称
-                sender = msg.get('sender', {}).get('nickname', 'Unknown')
-                # 获取消息时间
-                msg_time = msg.get('time', 0)
-                time_str = datetime.fromtimestamp(msg_time).strftime('%Y-%m-%d %H:%M:%S')
-                # 获取消息内容
-                message = msg.get('message', [])
-                text = self._extract_message_text(message)
-                
-                # 格式化聊天记录
-                chat_records.append(f"[{time_str}]「{sender}」: {text}")
-                
-            # 反转消息顺序（从旧到新）
-            chat_records.reverse()
-            return chat_records
+            return await self.formatter.format_stream(messages)
         except Exception as e:
             logger.error(f"Error processing messages: {e}")
+            self.metrics.increment("errors_total", stage="format")
             return []
     
-    async def _generate_summary(self, chat_lines: List[str]) -> str:
+    def _model_name(self) -> str:
+        """获取当前使用的模型名称，用于区分缓存
+        
+        Returns:
+            模型名称
+        """
+        try:
+            return str(self.context.get_using_provider().get_model())
+        except Exception:
+            return self.config.get("llm", {}).get("model", "")
+    
+    def _providers(self) -> List[Any]:
+        """获取本次调用使用的LLM提供商，配置了对冲提供商时追加在后面
+        
+        Returns:
+            主提供商和可选的对冲提供商
+        """
+        provider = self.context.get_using_provider()
+        providers = [provider]
+        if self.llm_hedge_provider_id and hasattr(self.context, 'get_provider_by_id'):
+            try:
+                backup = self.context.get_provider_by_id(self.llm_hedge_provider_id)
+            except Exception as e:
+                logger.warning(f"Error getting hedge provider {self.llm_hedge_provider_id}: {e}")
+                backup = None
+            if backup is not None and backup is not provider:
+                providers.append(backup)
+        return providers
+    
+    async def _complete(self, input_text: str) -> str:
+        """通过LLM调用执行器完成一次文本生成
+        
+        Args:
+            input_text: 完整的输入文本
+            
+        Returns:
+            生成的文本
+        """
+        async def call(provider) -> str:
+            response = await provider.text_chat(
+                input=input_text,
+                max_tokens=self.llm_max_tokens,
+                temperature=self.llm_temperature
+            )
+            return response.completion_text
+        
+        self._record_prompt(input_text)
+        with trace_stage("llm"):
+            return await self.llm_executor.run(call, self._providers())
+    
+    def _record_prompt(self, input_text: str) -> None:
+        """记录一次LLM调用的输入规模
+        
+        Args:
+            input_text: 完整的输入文本
+        """
+        # 预计算任务中的调用从预计算预算中扣减，预算用完时抛出异常
+        budget = current_budget.get()
+        if budget is not None:
+            budget.charge()
+        self.metrics.increment("llm_calls_total")
+        self.metrics.increment("prompt_chars_total", len(input_text))
+        self.metrics.increment("prompt_tokens_total", self.token_estimator.count(input_text, cache=False))
+    
+    async def _complete_final(self, input_text: str) -> str:
+        """调用LLM生成最终总结，发送方等待流式输出且提供商支持时逐步写入生成的文本
+        
+        Args:
+            input_text: 完整的输入文本
+            
+        Returns:
+            生成的完整文本
+        """
+        stream = current_stream.get()
+        provider = self.context.get_using_provider()
+        if stream is None or not hasattr(provider, 'text_chat_stream'):
+            return await self._complete(input_text)
+        
+        parts: List[str] = []
+        final_text = None
+        
+        async def call(provider) -> str:
+            nonlocal final_text
+            async for response in provider.text_chat_stream(
+                    input=input_text,
+                    max_tokens=self.llm_max_tokens,
+                    temperature=self.llm_temperature):
+                text = response.completion_text or ""
+                if getattr(response, 'is_chunk', True):
+                    parts.append(text)
+                    stream.put(text)
+                else:
+                    # 流结束时的完整结果
+                    final_text = text
+            return final_text if final_text is not None else "".join(parts)
+        
+        self._record_prompt(input_text)
+        try:
+            # 已经发送出去的文本无法撤回，流式调用不重试也不发送对冲请求
+            with trace_stage("llm"):
+                return await self.llm_executor.run(call, [provider], hedge=False, retries=0)
+        except Exception as e:
+            if stream.started:
+                raise
+            logger.warning(f"Streaming completion failed, falling back to one-shot: {e}")
+            return await self._complete(input_text)
+    
+    def _render_records(self, chat_lines: List[str]) -> str:
+        """将聊天记录行转换为发送给LLM的文本，启用压缩时先压缩
+        
+        Args:
+            chat_lines: 按时间顺序排列的聊天记录行
+            
+        Returns:
+            聊天记录文本
+        """
+        if self.compactor is not None:
+            return self.compactor.render(chat_lines)
+        return "\n".join(chat_lines)
+    
+    async def _summarize_full(self, prompt: str, chat_lines: List[str],
+                              window: Optional[MessageStream] = None) -> str:
+        """完整总结整个消息窗口
+        
+        Args:
+            prompt: 总结提示词
+            chat_lines: 聊天记录行
+            window: 产生 ``chat_lines`` 的消息流，提供话题切分使用的时间和回复关系
+            
+        Returns:
+            生成的总结文本
+        """
+        # 启用话题切分时，多个话题分别并发总结；只有一个话题时按原方式总结
+        if (self.topic_summarizer is not None and not self.structured_output
+                and self.summarization_mode != "single" and len(chat_lines) >= self.topics_min_lines):
+            times = ids = replies = None
+            if window is not None and window.count == len(chat_lines):
+                # 消息流按从新到旧记录，聊天记录按从旧到新排列
+                times, ids, replies = (list(reversed(values))
+                                       for values in (window.times, window.ids, window.replies))
+            summary = await self.topic_summarizer.summarize(chat_lines, times, ids, replies, prompt)
+            if summary is not None:
+                return summary
+        
+        # 记录过长时分块并发总结后再归约
+        if self.summarization_mode == "map_reduce" or (
+                self.summarization_mode == "auto" and self.map_reduce.needs_split(chat_lines)):
+            return await self.map_reduce.summarize(prompt, chat_lines)
+        
+        # 构建输入文本
+        input_text = f"{prompt}\n\n" + self._render_records(chat_lines)
+        
+        # 调用LLM生成总结
+        return await self._complete_final(input_text)
+    
+    def _get_rolling_summarizer(self) -> RollingSummarizer:
+        """获取增量滚动总结器，检查点与消息保存在同一个本地存储中
+        
+        Returns:
+            增量滚动总结器
+        """
+        if self._rolling_summarizer is None:
+            self._rolling_summarizer = RollingSummarizer(
+                self._get_history_sync().store, self._complete_final, self.rolling_max_new_ratio,
+                render=self._render_records)
+        return self._rolling_summarizer
+    
+    async def _generate_summary(self, chat_lines: List[str], group_id: Optional[str] = None,
+                                window: Optional[MessageStream] = None, prompt: Optional[str] = None) -> str:
         """生成聊天总结
         
         Args:
             chat_lines: 聊天记录行
+            group_id: 群组ID，与 ``window`` 一起提供时启用结果缓存和增量总结
+            window: 产生 ``chat_lines`` 的消息流，记录了窗口首尾消息和各行对应的消息序号
+            prompt: 可选的总结提示词，默认使用配置的提示词
             
         Returns:
             生成的总结文本
         """
         try:
             # 加载提示词
-            prompt = self._load_prompt()
-            
-            # 构建输入文本
-            input_text = f"{prompt}\n\n{''.join(chat_lines)}"
+            prompt = prompt or self._load_prompt()
             
-            # 如果没有AstrBot环境，返回模拟响应
-            if not ASTRBOT_AVAILABLE:
+            # 如果没有AstrBot环境且没有提供LLM提供商，返回模拟响应
+            if not ASTRBOT_AVAILABLE and isinstance(self.context, MockContext):
                 return "模拟的总结结果 - 测试环境"  # 用于测试
             
-            # 获取LLM提供商
-            provider = self.context.get_using_provider()
+            model = self._model_name()
             
-            # 调用LLM生成总结
-            response = await provider.text_chat(
-                input=input_text,
-                max_tokens=1024,
-                temperature=0.7
-            )
+            # 相同窗口、提示词和模型的总结直接使用缓存
+            cache_key = None
+            if self.summary_cache is not None and group_id and window and window.count:
+                cache_key = self.summary_cache.make_key(group_id, prompt, model, *window.bounds())
+                cached = await self.summary_cache.get(cache_key)
+                if cached is not None:
+                    logger.info(f"Summary cache hit for group {group_id}")
+                    self.metrics.increment("cache_hits_total")
+                    return cached
+                self.metrics.increment("cache_misses_total")
             
-            # 返回生成的总结
-            return response.completion_text
+            seqs = list(reversed(window.seqs)) if window else []
+            if (self.rolling_enabled and self.message_store_enabled and group_id
+                    and len(seqs) == len(chat_lines) and seqs and seqs[0] > 0):
+                # 只总结检查点之后的新消息并合并到已有总结中
+                summary = await self._get_rolling_summarizer().summarize(
+                    group_id, prompt, model, chat_lines, seqs,
+                    lambda lines: self._summarize_full(prompt, lines, window))
+            else:
+                summary = await self._summarize_full(prompt, chat_lines, window)
+            
+            if cache_key is not None:
+                await self.summary_cache.put(cache_key, summary)
+            return summary
         except Exception as e:
             logger.error(f"Error generating summary: {e}")
-            return f"生成总结时出错: {str(e)}"
+            self.metrics.increment("errors_total", stage="summarize")
+            return f"{SUMMARY_ERROR_PREFIX}{str(e)}"
+
+    async def summarize_records(self, chat_lines: List[str]) -> str:
+        """为已格式化的聊天记录生成总结，供命令行工具等没有消息事件的调用方使用
+        
+        Args:
+            chat_lines: 按时间顺序排列的聊天记录行
+            
+        Returns:
+            生成的总结文本
+            
+        Raises:
+            RuntimeError: 生成失败
+        """
+        await self.config_service.refresh()
+        if self.extractive_selector is not None:
+            chat_lines = await asyncio.get_running_loop().run_in_executor(None, self._select_records, chat_lines)
+        elif self.summarization_mode == "single":
+            chat_lines, _ = self.token_estimator.pack_recent(chat_lines, self._prompt_budget(self._load_prompt()))
+        summary = await self._generate_summary(chat_lines)
+        if summary.startswith(SUMMARY_ERROR_PREFIX):
+            raise RuntimeError(summary[len(SUMMARY_ERROR_PREFIX):])
+        return summary
 
+    def render_summary(self, summary: str, fmt: Optional[str] = None) -> str:
+        """将LLM输出的结构化总结渲染为指定格式
+        
+        同一份总结可以多次渲染为不同格式而不再调用LLM；输出不是合法的结构化总结时，
+        整段输出作为概述渲染。
+        
+        Args:
+            summary: LLM输出
+            fmt: 输出格式，默认为配置的 ``output.format``
+            
+        Returns:
+            渲染结果，渲染失败时返回原始输出
+        """
+        try:
+            return self.renderer.render(parse_structured(summary), fmt or self.output_format,
+                                        title=self.i18n.get("summary_title"))
+        except Exception as e:
+            logger.error(f"Error rendering summary: {e}")
+            return summary
+    
+    def _prompt_budget(self, prompt: str) -> int:
+        """计算一次总结中聊天记录可用的令牌预算
+        
+        Args:
+            prompt: 总结提示词
+            
+        Returns:
+            上下文窗口扣除提示词和输出令牌后的余量
+        """
+        return self.context_window - self.llm_max_tokens - self.token_estimator.count(prompt) - 2
+    
+    async def _fit_records(self, chat_records: List[str], messages: MessageStream,
+                           prompt: Optional[str] = None) -> List[str]:
+        """让聊天记录适应令牌预算
+        
+        启用抽取式预选时在工作线程中选出最重要的消息，否则一次总结模式只保留能放入上下文窗口的最新记录，
+        其他模式由分块总结处理超长的记录。
+        
+        Args:
+            chat_records: 按时间顺序排列的聊天记录
+            messages: 产生这些记录的消息流
+            prompt: 可选的总结提示词，默认使用配置的提示词
+            
+        Returns:
+            发送给LLM的聊天记录
+        """
+        if self.extractive_selector is not None:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self._select_records, chat_records, messages, prompt)
+        if self.summarization_mode == "single":
+            return self._pack_records(chat_records, messages, prompt)
+        return chat_records
+    
+    def _pack_records(self, chat_records: List[str], messages: MessageStream,
+                      prompt: Optional[str] = None) -> List[str]:
+        """丢弃放不进上下文窗口的较早记录
+        
+        Args:
+            chat_records: 按时间顺序排列的聊天记录
+            messages: 产生这些记录的消息流，会同步截断以保持窗口首尾一致
+            prompt: 可选的总结提示词，默认使用配置的提示词
+            
+        Returns:
+            保留的聊天记录
+        """
+        budget = self._prompt_budget(prompt or self._load_prompt())
+        packed, used = self.token_estimator.pack_recent(chat_records, budget)
+        if len(packed) < len(chat_records):
+            logger.info(f"Packed {len(packed)}/{len(chat_records)} records into {used} tokens (budget {budget})")
+            messages.truncate(len(packed))
+        return packed
+    
+    def _select_records(self, chat_records: List[str], messages: Optional[MessageStream] = None,
+                        prompt: Optional[str] = None) -> List[str]:
+        """聊天记录超出预算时抽取最重要的消息及其上下文，保持时间顺序
+        
+        预算为一次总结的上下文余量，配置了 ``extractive.max_tokens`` 时取两者中较小的值，
+        因此抽取后只需一次LLM调用。选出的消息不连续，消息流保持完整，缓存和归档仍以整个窗口为准。
+        
+        Args:
+            chat_records: 按时间顺序排列的聊天记录
+            messages: 可选的产生这些记录的消息流，提供各行的消息ID和回复关系
+            prompt: 可选的总结提示词，默认使用配置的提示词
+            
+        Returns:
+            选出的聊天记录
+        """
+        budget = self._prompt_budget(prompt or self._load_prompt())
+        if self.extractive_max_tokens > 0:
+            budget = min(budget, self.extractive_max_tokens)
+        ids = replies = None
+        if messages is not None and messages.count == len(chat_records):
+            # 消息流按从新到旧记录，聊天记录按从旧到新排列
+            ids, replies = list(reversed(messages.ids)), list(reversed(messages.replies))
+        selected = self.extractive_selector.select(chat_records, budget, ids, replies)
+        if len(selected) < len(chat_records):
+            logger.info(f"Selected {len(selected)}/{len(chat_records)} records by extractive ranking "
+                        f"(budget {budget})")
+            self.metrics.increment("extractive_selections_total")
+        return [chat_records[index] for index in selected]
+    
+    def _token_report(self, chat_records: List[str], summary: str) -> str:
+        """生成调试模式下的令牌统计
+        
+        Args:
+            chat_records: 发送给LLM的聊天记录
+            summary: 生成的总结
+            
+        Returns:
+            令牌统计文本
+        """
+        prompt_tokens = self.token_estimator.count(self._load_prompt()) + 2
+        record_tokens = self.token_estimator.count_lines(chat_records)
+        completion_tokens = self.token_estimator.count(summary, cache=False)
+        compaction = ""
+        if self.compactor is not None:
+            _, stats = self.compactor.compact(chat_records)
+            record_tokens = stats.tokens_out
+            compaction = (f"\n压缩：{stats.lines_in} 行 -> {stats.lines_out} 行，"
+                          f"字节减少 {stats.bytes_saved:.1f}%，令牌减少 {stats.tokens_saved:.1f}%")
+        return (f"调试模式：令牌统计（{self.token_estimator.backend}）\n"
+                f"提示词：{prompt_tokens + record_tokens}（其中聊天记录 {len(chat_records)} 行，{record_tokens}）\n"
+                f"输出：{completion_tokens} / {self.llm_max_tokens}" + compaction)
+    
+    async def _run_summary(self, event, count: int,
+                           group_id: Optional[str]) -> Tuple[Optional[str], List[str], str]:
+        """获取消息历史并生成总结
+        
+        Args:
+            event: 发起请求的消息事件
+            count: 要获取的聊天记录数量
+            group_id: 群组ID
+            
+        Returns:
+            (错误提示, 聊天记录, 总结)，成功时错误提示为None
+        """
+        trace = current_trace.get()
+        
+        # 在工作线程中检查提示词配置是否有更新
+        with trace_stage("prompt"):
+            await self.config_service.refresh()
+        
+        # 以消息流的形式边获取边处理消息历史记录，被过滤的消息不会进入格式化
+        dropped: Dict[str, int] = {}
+        source = self._iter_message_history(event, count)
+        if trace is not None:
+            source = trace.timed(source, "fetch")
+        if self.message_filter.active:
+            source = self.message_filter.stream(source, dropped, self._self_id(event))
+        messages = MessageStream(source)
+        started = time.perf_counter()
+        chat_records = await self._process_messages(event, messages)
+        if trace is not None:
+            # 获取与格式化交替进行，格式化耗时需扣除等待消息的时间
+            trace.add("format", time.perf_counter() - started - trace.stages.get("fetch", 0.0))
+        
+        self.metrics.increment("messages_fetched_total", messages.count + sum(dropped.values()))
+        for rule, dropped_count in dropped.items():
+            self.metrics.increment("messages_filtered_total", dropped_count, rule=rule)
+        if dropped:
+            logger.info(f"Filtered {sum(dropped.values())} messages: {dropped}")
+        if messages.count == 0:
+            return ("未找到有效的消息记录" if dropped else "未找到消息历史记录"), [], ""
+        if not chat_records:
+            return "未找到有效的消息记录", [], ""
+        
+        with trace_stage("prompt"):
+            chat_records = await self._fit_records(chat_records, messages)
+        
+        # 调用LLM生成总结
+        with trace_stage("summarize"):
+            summary = await self._generate_summary(chat_records, group_id, messages)
+        if self.archive_enabled and group_id and not summary.startswith(SUMMARY_ERROR_PREFIX):
+            await self._archive_summary(group_id, messages, chat_records, summary)
+        return None, chat_records, summary
+    
+    async def _archive_summary(self, group_id: str, messages: MessageStream,
+                               chat_records: List[str], summary: str) -> None:
+        """将生成的总结写入归档，归档失败不影响总结结果
+        
+        Args:
+            group_id: 群组ID
+            messages: 产生聊天记录的消息流，提供窗口首尾的时间和序号
+            chat_records: 发送给LLM的聊天记录
+            summary: 生成的总结
+        """
+        if self.structured_output:
+            # 归档渲染后的纯文本，搜索结果可以直接发送
+            summary = self.render_summary(summary, "text")
+        model = self._model_name()
+        
+        def write() -> Optional[int]:
+            # 令牌数与调试模式的统计口径一致，在工作线程中计算
+            prompt_tokens = (self.token_estimator.count(self._load_prompt()) + 2
+                             + self.token_estimator.count_lines(chat_records))
+            return self._get_archive().add(
+                group_id, summary,
+                start_time=messages.times[-1], end_time=messages.times[0],
+                oldest_seq=messages.seqs[-1], newest_seq=messages.seqs[0],
+                message_count=messages.count, model=model, prompt_tokens=prompt_tokens,
+                completion_tokens=self.token_estimator.count(summary, cache=False))
+        
+        try:
+            if await asyncio.get_running_loop().run_in_executor(None, write) is not None:
+                self.metrics.increment("archived_summaries_total")
+        except Exception as e:
+            logger.warning(f"Failed to archive summary for group {group_id}: {e}")
+            self.metrics.increment("errors_total", stage="archive")
+    
+    def _traced(self, trace: StageTrace, factory, stream: Optional[SummaryStream] = None) -> asyncio.Future:
+        """在独立任务中执行协程，使其中的LLM调用等深层代码能找到当前命令的阶段记录和流式通道
+        
+        Args:
+            trace: 当前命令的阶段记录
+            factory: 创建协程的函数
+            stream: 可选的流式通道
+            
+        Returns:
+            执行协程的任务
+        """
+        async def run():
+            current_trace.set(trace)
+            current_stream.set(stream)
+            return await factory()
+        # 任务复制当前上下文，设置的值只在任务内可见
+        return asyncio.ensure_future(run())
+    
+    def _timing_report(self, trace: StageTrace) -> str:
+        """生成调试模式下的阶段耗时
+        
+        Args:
+            trace: 当前命令的阶段记录
+            
+        Returns:
+            阶段耗时文本
+        """
+        lines = ["调试模式：阶段耗时"]
+        for stage, name in STAGE_NAMES:
+            if stage in trace.stages:
+                lines.append(f"{name}：{trace.stages[stage] * 1000:.1f} ms")
+        lines.append(f"总计：{trace.elapsed * 1000:.1f} ms")
+        return "\n".join(lines)
+    
+    def _coalesced_summary(self, event, count: int, group_id: str):
+        """合并同一群组中数量相近的并发请求，只执行一次获取和生成
+        
+        Args:
+            event: 消息事件
+            count: 要获取的聊天记录数量
+            group_id: 群组ID
+            
+        Returns:
+            等待 ``_run_summary`` 结果的协程
+        """
+        tolerance = count * self.coalescing_count_tolerance
+        
+        def compatible(key) -> bool:
+            return key[0] == group_id and abs(key[1] - count) <= tolerance
+        
+        return self.summary_flights.do(
+            (group_id, count), lambda: self._run_summary(event, count, group_id), compatible)
+    
+    def _sender_id(self, event) -> str:
+        """获取事件发送者ID
+        
+        Args:
+            event: 消息事件
+            
+        Returns:
+            发送者ID，无法获取时返回空字符串
+        """
+        try:
+            return str(event.get_sender_id())
+        except Exception:
+            return ""
+    
+    def _self_id(self, event) -> Optional[str]:
+        """获取当前机器人账号
+        
+        Args:
+            event: 消息事件
+            
+        Returns:
+            机器人账号，无法获取时返回None
+        """
+        try:
+            self_id = event.get_self_id()
+            return str(self_id) if self_id else None
+        except Exception:
+            return None
+    
+    async def _precompute(self, activity: GroupActivity, count: int) -> bool:
+        """为群组预先生成总结，结果写入总结缓存和滚动检查点
+        
+        Args:
+            activity: 群组活跃度，包含最近一次收到的消息事件
+            count: 要总结的聊天记录数量
+            
+        Returns:
+            是否成功生成
+        """
+        event, group_id = activity.event, activity.group_id
+        if self.coalescing_enabled:
+            # 与同时到达的交互请求共享同一次执行
+            error, _, summary = await self._coalesced_summary(event, count, group_id)
+        else:
+            error, _, summary = await self._run_summary(event, count, group_id)
+        if error or summary.startswith(SUMMARY_ERROR_PREFIX):
+            logger.info(f"Precompute for group {group_id} ({count} messages) failed: {error or summary}")
+            return False
+        logger.info(f"Precomputed summary for group {group_id} ({count} messages)")
+        return True
+    
+    @filter.event_message_type(filter.EventMessageType.GROUP_MESSAGE)
+    async def on_group_message(self, event):
+        """确保指标输出端已启动，并记录群消息活跃度，供后台预计算选择群组
+        
+        Args:
+            event: 消息事件
+        """
+        await self.metrics.start()
+        if self.precompute is None:
+            return
+        group_id = self._group_id(event)
+        if group_id:
+            self.precompute.record(group_id, event)
+    
+    async def terminate(self):
+        """插件卸载时停止后台任务并释放资源"""
+        if self.precompute is not None:
+            await self.precompute.stop()
+        if self._archive is not None:
+            self._archive.close()
+        await self.metrics.close()
+    
     @filter.command("消息总结")
     async def summary(self, event, count: Optional[int] = None, debug: Optional[str] = None):
         """触发消息总结，命令加空格，后面跟获取聊天记录的数量
@@ -278,8 +1154,35 @@ class EnhancedChatSummary(MockStar if not ASTRBOT_AVAILABLE else Star):
             count: 要获取的聊天记录数量
             debug: 调试参数，输入"debug"开启调试模式
         """
+        trace = StageTrace(self.metrics)
+        # 交互请求执行期间后台预计算不会开始新的任务
+        interactive = self.precompute.interactive() if self.precompute is not None else nullcontext()
+        try:
+            with interactive:
+                async for result in self._summary(event, count, debug, trace):
+                    # 产出结果到恢复执行之间的时间用于发送回复
+                    started = time.perf_counter()
+                    yield result
+                    trace.add("send", time.perf_counter() - started)
+        finally:
+            trace.finish()
+            await self.metrics.flush()
+    
+    async def _summary(self, event, count: Optional[int], debug: Optional[str], trace: StageTrace):
+        """执行消息总结命令
+        
+        Args:
+            event: 消息事件
+            count: 要获取的聊天记录数量
+            debug: 调试参数
+            trace: 本次命令的阶段记录
+            
+        Yields:
+            发送给用户的结果
+        """
         # 检查参数
         if count is None:
+            self.metrics.increment("requests_total", result="invalid")
             if hasattr(event, 'plain_result'):
                 yield event.plain_result("请提供要获取的消息数量，例如：消息总结 100")
             if hasattr(event, 'stop_event'):
@@ -297,27 +1200,83 @@ class EnhancedChatSummary(MockStar if not ASTRBOT_AVAILABLE else Star):
         if is_debug:
             # 检查是否有管理员权限
             if not await self._is_admin(event):
+                self.metrics.increment("requests_total", result="denied")
                 if hasattr(event, 'plain_result'):
                     yield event.plain_result("只有管理员可以使用调试模式")
                 if hasattr(event, 'stop_event'):
                     event.stop_event()
                 return
                 
-        # 获取消息历史
-        try:
-            messages = await self._get_message_history(event, count)
-            if not messages:
+        # 检查冷却时间
+        group_id = self._group_id(event)
+        sender_id = self._sender_id(event)
+        remaining = self.cooldowns.remaining(group_id or "", sender_id)
+        if remaining > 0:
+            self.metrics.increment("requests_total", result="cooldown")
+            if hasattr(event, 'plain_result'):
+                yield event.plain_result(self.i18n.get("summary_cooldown", seconds=int(remaining) + 1))
+            if hasattr(event, 'stop_event'):
+                event.stop_event()
+            return
+        
+        # 进入全局任务队列，同一群组中可以合并的请求加入已有任务
+        ticket = None
+        if self.job_queue is not None:
+            join = None
+            if self.coalescing_enabled and group_id and not is_debug:
+                tolerance = count * self.coalescing_count_tolerance
+                join = lambda job: abs(job.count - count) <= tolerance
+            try:
+                ticket = self.job_queue.submit(group_id or "", sender_id, count, join)
+            except QueueRejected as e:
+                self.metrics.increment("requests_total", result="rejected")
                 if hasattr(event, 'plain_result'):
-                    yield event.plain_result("未找到消息历史记录")
+                    yield event.plain_result(self.i18n.get(f"summary_queue_{e.reason}", limit=e.limit))
                 if hasattr(event, 'stop_event'):
                     event.stop_event()
                 return
+        self.cooldowns.record(group_id or "", sender_id)
                 
-            # 处理消息历史记录
-            chat_records = await self._process_messages(event, messages)
-            if not chat_records:
+        # 获取消息历史
+        try:
+            if ticket is not None:
+                position = ticket.position
+                if position > 0 and hasattr(event, 'plain_result'):
+                    yield event.plain_result(self.i18n.get("summary_queued", position=position))
+                trace.add("queue", await ticket.wait())
+            
+            if self.coalescing_enabled and group_id and not is_debug:
+                # 同一群组中正在执行的相近请求直接共享结果
+                factory = lambda: self._coalesced_summary(event, count, group_id)
+            else:
+                factory = lambda: self._run_summary(event, count, group_id)
+            
+            chunker = None
+            if (self.streaming_enabled and not self.structured_output and not is_debug
+                    and hasattr(event, 'plain_result')):
+                # 生成的同时按段落发送，最后一次LLM调用不支持流式输出时退回一次性发送
+                stream = SummaryStream()
+                task = self._traced(trace, factory, stream)
+                chunker = ParagraphChunker(self.streaming_first_chunk_chars, self.streaming_min_chunk_chars,
+                                           self.streaming_max_chunk_chars)
+                streamed: List[str] = []
+                try:
+                    async for delta in stream.iterate(task):
+                        streamed.append(delta)
+                        for chunk in chunker.feed(delta):
+                            if "first_chunk" not in trace.stages:
+                                trace.add("first_chunk", trace.elapsed)
+                            yield event.plain_result(chunk)
+                finally:
+                    if not task.done():
+                        task.cancel()
+                error, chat_records, summary = await task
+            else:
+                error, chat_records, summary = await self._traced(trace, factory)
+            if error:
+                self.metrics.increment("requests_total", result="empty")
                 if hasattr(event, 'plain_result'):
-                    yield event.plain_result("未找到有效的消息记录")
+                    yield event.plain_result(error)
                 if hasattr(event, 'stop_event'):
                     event.stop_event()
                 return
@@ -326,22 +1285,288 @@ class EnhancedChatSummary(MockStar if not ASTRBOT_AVAILABLE else Star):
             if is_debug:
                 if hasattr(event, 'plain_result'):
                     yield event.plain_result("调试模式：原始消息记录" + "\n\n" + "\n".join(chat_records))
-                
-            # 调用LLM生成总结
-            summary = await self._generate_summary(chat_records)
+                    yield event.plain_result(self._token_report(chat_records, summary))
             
             # 发送总结结果
-            if hasattr(event, 'plain_result'):
+            self.metrics.increment("requests_total", result="ok")
+            if self.structured_output and not summary.startswith(SUMMARY_ERROR_PREFIX):
+                summary = self.render_summary(summary)
+            if chunker is not None and chunker.chunks:
+                # 已经逐段发送的内容无法撤回，只发送剩余部分或错误提示，不重复发送完整总结
+                text = "".join(streamed)
+                sent = text[:chunker.delivered].strip()
+                if summary.strip() == text.strip():
+                    rest = chunker.flush()
+                elif summary.startswith(SUMMARY_ERROR_PREFIX):
+                    rest = summary
+                elif summary.lstrip().startswith(sent):
+                    rest = summary.lstrip()[len(sent):].strip()
+                else:
+                    logger.warning("Final summary differs from the streamed chunks, not resending it")
+                    rest = None
+                if rest:
+                    yield event.plain_result(rest)
+            elif hasattr(event, 'plain_result'):
                 yield event.plain_result(summary)
             else:
                 yield summary
             
+            # 调试模式下附上各阶段耗时
+            if is_debug and hasattr(event, 'plain_result'):
+                yield event.plain_result(self._timing_report(trace))
+            
         except Exception as e:
             logger.error(f"Error in summary command: {str(e)}", exc_info=True)
+            self.metrics.increment("requests_total", result="error")
+            self.metrics.increment("errors_total", stage="command")
             if hasattr(event, 'plain_result'):
-                yield event.plain_result(f"生成总结时出错: {str(e)}")
+                yield event.plain_result(f"{SUMMARY_ERROR_PREFIX}{str(e)}")
             if hasattr(event, 'stop_event'):
                 event.stop_event()
+        finally:
+            if ticket is not None:
+                ticket.release()
+
+    @filter.command("总结搜索")
+    async def search_summaries(self, event, query: Optional[str] = None, date: Optional[str] = None):
+        """在本群归档的总结中按关键词或日期搜索，命令后跟关键词、日期或 ``#编号``
+        
+        Args:
+            event: 消息事件
+            query: 关键词、日期（``2024-05-01``、``2024-05``、``2024-05-01..2024-05-07``）或 ``#编号``
+            date: 可选的第二个条件，格式同 ``query``
+        """
+        text = " ".join(str(part) for part in (query, date) if part is not None)
+        group_id = self._group_id(event)
+        if not self.archive_enabled:
+            reply = self.i18n.get("archive_disabled")
+        elif not group_id:
+            reply = self.i18n.get("archive_group_only")
+        elif not text.strip():
+            reply = self.i18n.get("archive_search_usage")
+        else:
+            reply = await self._search_archive(group_id, text)
+        if hasattr(event, 'plain_result'):
+            yield event.plain_result(reply)
+        else:
+            yield reply
+    
+    async def _search_archive(self, group_id: str, text: str) -> str:
+        """执行总结搜索并生成回复
+        
+        Args:
+            group_id: 群组ID，只搜索该群组的总结
+            text: 搜索文本
+        
+        Returns:
+            回复文本
+        """
+        parsed = parse_query(text)
+        started = time.perf_counter()
+        
+        def lookup():
+            archive = self._get_archive()
+            if parsed.summary_id is not None:
+                return archive.get(parsed.summary_id, group_id)
+            return archive.search(parsed.keywords, group_id, parsed.since, parsed.until,
+                                  self.archive_search_limit)
+        
+        try:
+            found = await asyncio.get_running_loop().run_in_executor(None, lookup)
+        except Exception as e:
+            logger.error(f"Error searching summary archive: {e}")
+            self.metrics.increment("errors_total", stage="archive")
+            return f"{SUMMARY_ERROR_PREFIX}{str(e)}"
+        elapsed = (time.perf_counter() - started) * 1000
+        self.metrics.increment("archive_searches_total", result="hit" if found else "miss")
+        
+        def window(entry) -> str:
+            start = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.start_time))
+            end = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.end_time))
+            return start if start == end else f"{start} ~ {end}"
+        
+        if parsed.summary_id is not None:
+            if found is None:
+                return self.i18n.get("archive_not_found", id=parsed.summary_id)
+            return self.i18n.get("archive_entry_header", id=found.id, window=window(found),
+                                 count=found.message_count, model=found.model or "-") + "\n\n" + found.summary
+        if not found:
+            return self.i18n.get("archive_no_results")
+        lines = [self.i18n.get("archive_results", count=len(found), ms=f"{elapsed:.1f}")]
+        for entry in found:
+            lines.append(f"#{entry.id} {window(entry)}（{entry.message_count}）\n{entry.snippet(parsed.keywords)}")
+        lines.append(self.i18n.get("archive_results_hint"))
+        return "\n\n".join(lines)
+
+    @filter.command("用户总结")
+    async def user_summary(self, event, target: Optional[str] = None, count: Optional[str] = None):
+        """总结某个群成员最近的发言，命令后 @ 群成员或填写账号，可选跟发言条数
+        
+        Args:
+            event: 消息事件
+            target: 被总结的群成员账号，@ 群成员时可以省略
+            count: 可选的发言条数，默认为 ``user_summary.default_count``
+        """
+        # 交互请求执行期间后台预计算不会开始新的任务
+        interactive = self.precompute.interactive() if self.precompute is not None else nullcontext()
+        try:
+            with interactive:
+                async for reply in self._user_summary(event, target, count):
+                    if hasattr(event, 'plain_result'):
+                        yield event.plain_result(reply)
+                    else:
+                        yield reply
+        finally:
+            await self.metrics.flush()
+    
+    async def _user_summary(self, event, target: Optional[str], count: Optional[str]):
+        """执行用户总结命令
+        
+        Args:
+            event: 消息事件
+            target: 第一个参数
+            count: 第二个参数
+            
+        Yields:
+            发送给用户的文本
+        """
+        group_id = self._group_id(event)
+        user_id, count = self._user_summary_arguments(event, target, count)
+        sender_id = self._sender_id(event)
+        if not group_id:
+            yield self.i18n.get("user_summary_group_only")
+            return
+        if not self.message_store_enabled:
+            yield self.i18n.get("user_summary_store_disabled")
+            return
+        if user_id is None or count is None:
+            self.metrics.increment("requests_total", result="invalid")
+            yield self.i18n.get("user_summary_usage")
+            return
+        remaining = self.cooldowns.remaining(group_id, sender_id)
+        if remaining > 0:
+            self.metrics.increment("requests_total", result="cooldown")
+            yield self.i18n.get("summary_cooldown", seconds=int(remaining) + 1)
+            return
+        
+        count = min(count, self.max_records)
+        ticket = None
+        try:
+            if self.job_queue is not None:
+                ticket = self.job_queue.submit(group_id, sender_id, count)
+            self.cooldowns.record(group_id, sender_id)
+            if ticket is not None:
+                position = ticket.position
+                if position > 0:
+                    yield self.i18n.get("summary_queued", position=position)
+                await ticket.wait()
+            error, _, summary = await self._run_user_summary(event, group_id, user_id, count)
+            self.metrics.increment("requests_total", result="empty" if error else "ok")
+            if not error and self.structured_output and not summary.startswith(SUMMARY_ERROR_PREFIX):
+                summary = self.render_summary(summary)
+            yield error or summary
+        except QueueRejected as e:
+            self.metrics.increment("requests_total", result="rejected")
+            yield self.i18n.get(f"summary_queue_{e.reason}", limit=e.limit)
+        except Exception as e:
+            logger.error(f"Error in user summary command: {str(e)}", exc_info=True)
+            self.metrics.increment("requests_total", result="error")
+            self.metrics.increment("errors_total", stage="command")
+            yield f"{SUMMARY_ERROR_PREFIX}{str(e)}"
+        finally:
+            if ticket is not None:
+                ticket.release()
+    
+    def _user_summary_arguments(self, event, target: Optional[str],
+                                count: Optional[str]) -> Tuple[Optional[str], Optional[int]]:
+        """解析用户总结命令的参数
+        
+        @ 群成员时消息中带有 at 消息段，平台可能把它的文本也作为第一个参数传入，此时跳过该参数。
+        
+        Args:
+            event: 消息事件
+            target: 第一个参数
+            count: 第二个参数
+            
+        Returns:
+            (群成员账号, 发言条数)，无法解析时对应的值为None
+        """
+        args = [str(arg).strip() for arg in (target, count) if arg is not None and str(arg).strip()]
+        user_id = self._mentioned_user(event)
+        if user_id is None:
+            user_id = args.pop(0).lstrip('@') if args else None
+        elif args and (len(args) > 1 or not args[0].isdigit() or args[0].lstrip('@') == user_id):
+            args.pop(0)
+        if not args:
+            return user_id or None, self.user_summary_default_count
+        return user_id or None, int(args[0]) if args[0].isdigit() and int(args[0]) > 0 else None
+    
+    def _mentioned_user(self, event) -> Optional[str]:
+        """获取消息中 @ 的第一个群成员，忽略 @全体成员 和机器人自己
+        
+        Args:
+            event: 消息事件
+            
+        Returns:
+            群成员账号，没有 @ 时返回None
+        """
+        try:
+            segments = event.message_obj.message
+        except Exception:
+            return None
+        self_id = self._self_id(event)
+        for segment in segments or []:
+            if isinstance(segment, dict):
+                user_id = segment.get('data', {}).get('qq') if segment.get('type') == 'at' else None
+            else:
+                user_id = getattr(segment, 'qq', None) if type(segment).__name__ == 'At' else None
+            if user_id and str(user_id) != 'all' and str(user_id) != self_id:
+                return str(user_id)
+        return None
+    
+    async def _run_user_summary(self, event, group_id: str, user_id: str,
+                                count: int) -> Tuple[Optional[str], List[str], str]:
+        """从本地存储中取出群成员最近的发言及相关回复并生成总结
+        
+        先同步新消息，本地连续区间不足 ``user_summary.scan_limit`` 条时向前回填，
+        之后通过发言人索引直接读取该成员的消息，不逐条扫描群历史。
+        
+        Args:
+            event: 发起请求的消息事件
+            group_id: 群组ID
+            user_id: 群成员账号
+            count: 该成员的发言条数
+            
+        Returns:
+            (错误提示, 聊天记录, 总结)，成功时错误提示为None
+        """
+        history_sync = self._get_history_sync()
+        state = await history_sync.ensure(event.bot.api.call_action, group_id, self.user_summary_scan_limit)
+        history = await asyncio.get_running_loop().run_in_executor(
+            None, history_sync.store.by_sender, group_id, user_id, count,
+            state.oldest_seq if state else None, self.user_summary_with_replies)
+        
+        async def source():
+            for msg in history:
+                yield msg
+        
+        dropped: Dict[str, int] = {}
+        stream = source()
+        if self.message_filter.active:
+            stream = self.message_filter.stream(stream, dropped, self._self_id(event))
+        messages = MessageStream(stream)
+        chat_records = await self._process_messages(event, messages)
+        self.metrics.increment("messages_fetched_total", len(history))
+        own = [msg for msg in history if str(msg.get('sender', {}).get('user_id', '')) == user_id]
+        if not own or not chat_records:
+            return self.i18n.get("user_summary_no_messages", count=self.user_summary_scan_limit), [], ""
+        
+        sender = own[0].get('sender', {})
+        name = sender.get('card') or sender.get('nickname') or user_id
+        prompt = USER_SUMMARY_PROMPT.format(name=name, prompt=self._load_prompt())
+        chat_records = await self._fit_records(chat_records, messages, prompt)
+        summary = await self._generate_summary(chat_records, prompt=prompt)
+        return None, chat_records, summary
 
 # 为了兼容测试，提供ChatSummary别名
 ChatSummary = EnhancedChatSummary
@@ -46,7 +46,7 @@ setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/jokeryuyc/astrbot-enhanced-chatsummary",
-    packages=find_packages(include=["i18n", "i18n.*"]),
+    packages=find_packages(include=["i18n", "i18n.*", "chatsummary", "chatsummary.*"]),
     py_modules=["main", "cli"],
     include_package_data=True,
     classifiers=[
@@ -70,6 +70,7 @@ setup(
             "data/config/*.json",
             "data/templates/*.md",
             "data/templates/*.html",
+            "data/templates/*.txt",
             "i18n/*.json"
         ],
     },
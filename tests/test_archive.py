@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试总结归档和全文搜索
+"""
+
+import os
+import sys
+import json
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cli
+from chatsummary.archive import SummaryArchive, parse_query, tokenize
+
+
+def local_time(text):
+    """本地时间字符串转换为时间戳"""
+    return int(datetime.strptime(text, "%Y-%m-%d %H:%M").timestamp())
+
+
+class TestSummaryArchive(unittest.TestCase):
+    """测试归档写入和搜索"""
+
+    def setUp(self):
+        self.archive = SummaryArchive(":memory:")
+        self.addCleanup(self.archive.close)
+        self.first = self.archive.add(
+            "g1", "【今日速览】大家确定周五发布 v2 版本，Deployment 由小明负责",
+            start_time=local_time("2024-05-01 09:00"), end_time=local_time("2024-05-01 18:00"),
+            message_count=120, model="gpt", prompt_tokens=900, completion_tokens=80)
+        self.second = self.archive.add(
+            "g1", "讨论了午饭吃什么，最后决定去吃火锅",
+            start_time=local_time("2024-05-02 11:00"), end_time=local_time("2024-05-02 12:00"))
+        self.other = self.archive.add("g2", "另一个群也在讨论发布",
+                                      start_time=local_time("2024-05-01 10:00"),
+                                      end_time=local_time("2024-05-01 11:00"))
+
+    def ids(self, *args, **kwargs):
+        return [entry.id for entry in self.archive.search(*args, **kwargs)]
+
+    def test_tokenize_cjk_bigrams_and_words(self):
+        self.assertEqual(tokenize("v2发布计划 Deploy, 好"), ["v2", "发布", "布计", "计划", "划", "deploy", "好"])
+
+    def test_keyword_search(self):
+        self.assertEqual(self.ids(["发布"], "g1"), [self.first])
+        # 单字、多字、英文单词前缀，所有关键词都必须匹配
+        self.assertEqual(self.ids(["火"], "g1"), [self.second])
+        self.assertEqual(self.ids(["周五发布"], "g1"), [self.first])
+        self.assertEqual(self.ids(["deploy", "小明"], "g1"), [self.first])
+        self.assertEqual(self.ids(["发布", "火锅"], "g1"), [])
+        # 关键词的字必须在原文中相邻
+        self.assertEqual(self.ids(["五周"], "g1"), [])
+        self.assertEqual(sorted(self.ids(["发布"])), sorted([self.first, self.other]))
+        self.assertEqual(self.ids(["!!"]), [])
+
+    def test_date_search_and_order(self):
+        since, until = local_time("2024-05-02 00:00"), local_time("2024-05-03 00:00")
+        self.assertEqual(self.ids(group_id="g1", since=since, until=until), [self.second])
+        self.assertEqual(self.ids(group_id="g1"), [self.second, self.first])
+        self.assertEqual(self.ids(group_id="g1", limit=1), [self.second])
+
+    def test_duplicates_are_stored_once(self):
+        self.assertIsNone(self.archive.add("g1", "讨论了午饭吃什么，最后决定去吃火锅"))
+        entry = self.archive.get(self.first, "g1")
+        self.assertEqual((entry.message_count, entry.model, entry.prompt_tokens), (120, "gpt", 900))
+        self.assertIsNone(self.archive.get(self.first, "g2"))
+        # 没有窗口时间时使用归档时间
+        summary_id = self.archive.add("g3", "没有时间", created_at=1000.0)
+        self.assertEqual(self.archive.get(summary_id).start_time, 1000)
+
+    def test_like_fallback_matches_fts(self):
+        self.archive.fts_enabled = False
+        self.assertEqual(self.ids(["周五发布"], "g1"), [self.first])
+        self.assertEqual(self.ids(["DEPLOY", "小明"], "g1"), [self.first])
+        self.assertEqual(self.ids(["100%"], "g1"), [])
+
+    def test_snippet(self):
+        entry = self.archive.get(self.second)
+        self.assertEqual(entry.snippet(["火锅"], width=8), "…去吃火锅")
+        self.assertEqual(entry.snippet([], width=100), entry.summary)
+
+
+class TestParseQuery(unittest.TestCase):
+    """测试搜索文本的解析"""
+
+    def test_dates_ids_and_keywords(self):
+        query = parse_query("发布 2024-05-01 #12")
+        self.assertEqual(query.keywords, ["发布"])
+        self.assertEqual(query.summary_id, 12)
+        self.assertEqual((query.since, query.until), (local_time("2024-05-01 00:00"), local_time("2024-05-02 00:00")))
+
+        query = parse_query("2024-12..")
+        self.assertEqual((query.since, query.until), (local_time("2024-12-01 00:00"), None))
+        query = parse_query("..2024-05-07")
+        self.assertEqual((query.since, query.until), (None, local_time("2024-05-08 00:00")))
+        self.assertEqual(parse_query("2024-13-01 a..b").keywords, ["2024-13-01", "a..b"])
+
+
+class TestSearchCommand(unittest.TestCase):
+    """测试命令行的 search 子命令"""
+
+    def test_search_prints_matches(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "archive.db")
+            archive = SummaryArchive(path)
+            summary_id = archive.add("g1", "大家确定周五发布", model="gpt")
+            archive.close()
+
+            with patch("builtins.print") as output, self.assertRaises(SystemExit) as exited:
+                cli.main(["search", "发布", "--archive", path, "--json"])
+            self.assertEqual(exited.exception.code, 0)
+            entry = json.loads(output.call_args_list[0].args[0])
+            self.assertEqual((entry["id"], entry["summary"]), (summary_id, "大家确定周五发布"))
+
+            with patch("builtins.print"), self.assertRaises(SystemExit) as exited:
+                cli.main(["search", "火锅", "--archive", path])
+            self.assertEqual(exited.exception.code, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
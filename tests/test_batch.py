@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试命令行批量总结
+"""
+
+import os
+import sys
+import json
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cli
+from chatsummary.batch import BatchRunner, BatchState, STATE_FILE, expand_inputs, plan_outputs
+
+
+def onebot_message(seq, text, ts=1700000000):
+    return {"message_seq": seq, "time": ts + seq, "sender": {"nickname": f"用户{seq % 3}"},
+            "message": [{"type": "text", "data": {"text": text}}]}
+
+
+class BatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = self.tmp.name
+
+    def write(self, relative, text):
+        path = os.path.join(self.root, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+
+class TestExpandInputs(BatchTestCase):
+    """测试目录、通配符和清单文件的展开"""
+
+    def test_directories_globs_and_manifest(self):
+        a = self.write("logs/a.json", "[]")
+        b = self.write("logs/sub/b.txt", "x")
+        self.write("logs/ignored.bin", "x")
+        c = self.write("other/c.jsonl", "")
+        manifest = self.write("list.txt", "# 注释\nother/*.jsonl\nlogs/a.json\n")
+
+        entries = expand_inputs([os.path.join(self.root, "logs")], manifest)
+
+        self.assertEqual(entries, [(a, "a.json"), (b, os.path.join("sub", "b.txt")), (c, "c.jsonl")])
+        with self.assertRaises(FileNotFoundError):
+            expand_inputs([os.path.join(self.root, "missing.json")])
+
+    def test_output_names_do_not_collide(self):
+        items = plan_outputs([("x/a.json", "a.json"), ("y/a.json", "a.json")], "out", ".md")
+        self.assertEqual(items[0].output, os.path.join("out", "a_summary.md"))
+        self.assertNotEqual(items[0].output, items[1].output)
+
+
+class TestBatchRunner(BatchTestCase):
+    """测试并发总结、原子写出和按内容哈希跳过"""
+
+    def setUp(self):
+        super().setUp()
+        self.calls = []
+        for index in range(5):
+            self.write(f"logs/{index}.txt", f"用户: 第{index}个文件\n")
+        self.out = os.path.join(self.root, "out")
+
+    async def summarize(self, lines):
+        self.calls.append(lines)
+        await asyncio.sleep(0.01)
+        if "坏" in lines[0]:
+            raise RuntimeError("LLM failed")
+        return "总结：" + lines[0]
+
+    def run_batch(self, settings="v1", workers=0, **kwargs):
+        items = plan_outputs(expand_inputs([os.path.join(self.root, "logs")]), self.out, ".md")
+        runner = BatchRunner(self.summarize, settings, workers=workers, **kwargs)
+        state = BatchState(os.path.join(self.out, STATE_FILE))
+        return {os.path.basename(result.item.source): result.status
+                for result in asyncio.run(runner.run(items, state))}
+
+    def test_skips_unchanged_inputs(self):
+        self.assertEqual(set(self.run_batch().values()), {"ok"})
+        with open(os.path.join(self.out, "3_summary.md"), encoding='utf-8') as f:
+            self.assertEqual(f.read(), "总结：用户: 第3个文件")
+        self.assertEqual(set(self.run_batch().values()), {"skipped"})
+
+        self.write("logs/3.txt", "用户: 改过了\n")
+        os.remove(os.path.join(self.out, "1_summary.md"))
+        statuses = self.run_batch()
+        self.assertEqual(statuses["3.txt"], "ok")
+        self.assertEqual(statuses["1.txt"], "ok")
+        self.assertEqual(statuses["0.txt"], "skipped")
+        self.assertEqual(len(self.calls), 7)
+
+        self.assertEqual(set(self.run_batch(settings="v2").values()), {"ok"})
+        self.assertEqual(set(self.run_batch(settings="v2", force=True).values()), {"ok"})
+
+    def test_failures_are_retried_on_next_run(self):
+        self.write("logs/bad.txt", "坏\n")
+        self.write("logs/empty.txt", "\n")
+        statuses = self.run_batch(workers=1)
+        self.assertEqual(statuses["bad.txt"], "failed")
+        self.assertEqual(statuses["empty.txt"], "empty")
+        self.assertFalse(os.path.exists(os.path.join(self.out, "bad_summary.md")))
+        self.assertEqual(self.run_batch()["bad.txt"], "failed")
+        self.assertEqual([name for name in os.listdir(self.out) if name.endswith(".tmp")], [])
+
+    def test_concurrency_limit(self):
+        active = []
+        peak = []
+
+        async def summarize(lines):
+            active.append(1)
+            peak.append(len(active))
+            await asyncio.sleep(0.01)
+            active.pop()
+            return "ok"
+
+        self.summarize = summarize
+        self.run_batch(concurrency=2)
+        self.assertEqual(max(peak), 2)
+
+
+class FakeProvider:
+    instances = []
+
+    def __init__(self, **kwargs):
+        self.inputs = []
+        FakeProvider.instances.append(self)
+
+    def get_model(self):
+        return "fake-model"
+
+    async def text_chat(self, input, max_tokens=None, temperature=None):
+        self.inputs.append(input)
+
+        class Response:
+            completion_text = '{"title": "周末安排", "summary": "总结完成", "action_items": ["订场地"]}'
+        return Response()
+
+
+class TestCLI(BatchTestCase):
+    """测试命令行入口"""
+
+    def test_single_file_and_directory(self):
+        log = self.write("chat.json", json.dumps([onebot_message(1, "你好")], ensure_ascii=False))
+        output = os.path.join(self.root, "summary.md")
+
+        with patch.object(cli, 'OpenAICompatibleProvider', FakeProvider):
+            with self.assertRaises(SystemExit) as exit_info:
+                cli.main([log, "-o", output, "-j", "0"])
+        self.assertEqual(exit_info.exception.code, 0)
+        with open(output, encoding='utf-8') as f:
+            text = f.read()
+        self.assertTrue(text.startswith("# 周末安排\n"))
+        self.assertIn("- [ ] 订场地", text)
+
+        out_dir = os.path.join(self.root, "out")
+        with patch.object(cli, 'OpenAICompatibleProvider', FakeProvider):
+            with self.assertRaises(SystemExit) as exit_info:
+                cli.main([os.path.join(self.root, "*.json"), "-o", out_dir, "-j", "0", "-f", "plain"])
+        self.assertEqual(exit_info.exception.code, 0)
+        self.assertTrue(os.path.exists(os.path.join(out_dir, "chat_summary.txt")))
+
+    def test_several_formats_from_one_generation(self):
+        log = self.write("logs/chat.json", json.dumps([onebot_message(1, "你好")], ensure_ascii=False))
+        out_dir = os.path.join(self.root, "out")
+        FakeProvider.instances.clear()
+        with patch.object(cli, 'OpenAICompatibleProvider', FakeProvider):
+            with self.assertRaises(SystemExit) as exit_info:
+                cli.main([log, "-o", out_dir, "-j", "0", "-f", "markdown,html,plain"])
+        self.assertEqual(exit_info.exception.code, 0)
+        self.assertEqual(len(FakeProvider.instances[0].inputs), 1)
+        with open(os.path.join(out_dir, "chat_summary.html"), encoding='utf-8') as f:
+            self.assertIn("<li><input type=\"checkbox\"> 订场地</li>", f.read())
+        with open(os.path.join(out_dir, "chat_summary.txt"), encoding='utf-8') as f:
+            self.assertTrue(f.read().startswith("周末安排\n"))
+        self.assertTrue(os.path.exists(os.path.join(out_dir, "chat_summary.md")))
+
+        # 缺少任一格式的输出时重新总结
+        os.remove(os.path.join(out_dir, "chat_summary.html"))
+        with patch.object(cli, 'OpenAICompatibleProvider', FakeProvider):
+            with self.assertRaises(SystemExit):
+                cli.main([log, "-o", out_dir, "-j", "0", "-f", "markdown,html,plain"])
+        self.assertEqual(len(FakeProvider.instances[1].inputs), 1)
+        self.assertTrue(os.path.exists(os.path.join(out_dir, "chat_summary.html")))
+
+
+if __name__ == '__main__':
+    unittest.main()
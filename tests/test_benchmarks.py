@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试性能基准测试工具
+"""
+
+import os
+import sys
+import json
+import tempfile
+import unittest
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.synthetic import generate_history, SyntheticPlatform
+from benchmarks.run import run_benchmarks, compare, main_cli
+
+
+class TestSyntheticHistory(unittest.IsolatedAsyncioTestCase):
+    """测试合成历史和模拟平台"""
+
+    def test_history_is_deterministic(self):
+        """相同参数应生成相同的历史，且包含各种消息段类型"""
+        history = generate_history(500, seed=1)
+
+        self.assertEqual(history, generate_history(500, seed=1))
+        self.assertEqual([msg['message_seq'] for msg in history], list(range(1, 501)))
+        types = {segment['type'] for msg in history for segment in msg['message']}
+        self.assertTrue({'text', 'face', 'image', 'reply', 'forward', 'at'} <= types)
+
+    async def test_platform_pages_backwards(self):
+        """模拟平台应按序号向前分页"""
+        platform = SyntheticPlatform(generate_history(100))
+
+        latest = await platform.call_action('get_group_msg_history', 'g1', count=20)
+        older = await platform.call_action('get_group_msg_history', 'g1', message_seq=50, count=20)
+
+        self.assertEqual([msg['message_seq'] for msg in latest['messages']], list(range(81, 101)))
+        self.assertEqual([msg['message_seq'] for msg in older['messages']], list(range(31, 51)))
+
+
+class TestBenchmarkRunner(unittest.IsolatedAsyncioTestCase):
+    """测试基准测试报告"""
+
+    async def test_report_contains_all_benchmarks(self):
+        """报告应包含每种规模下的各项基准"""
+        report = await run_benchmarks([100, 300], repeat=1)
+
+        names = {(entry['benchmark'], entry['size']) for entry in report['results']}
+        for size in (100, 300):
+            for name in ("extract_message_text", "process_messages", "prompt_build", "extractive_select",
+                         "summary_end_to_end"):
+                self.assertIn((name, size), names)
+        self.assertIn("version", report)
+        self.assertEqual(len(compare(report, report)), len(report['results']))
+
+    def test_cli_writes_json(self):
+        """命令行入口应写入 JSON 结果"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output = os.path.join(temp_dir, 'bench.json')
+            self.assertEqual(main_cli(["--sizes", "100", "--repeat", "1", "--e2e-max", "0",
+                                       "--output", output]), 0)
+            with open(output, 'r', encoding='utf-8') as f:
+                report = json.load(f)
+        self.assertEqual(len(report['results']), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试总结结果缓存功能
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatsummary import SummaryCache
+
+
+def window_key(cache, oldest, newest, prompt="提示词", model="model-a"):
+    """按首尾消息序号构造缓存键"""
+    return cache.make_key("g1", prompt, model, (str(oldest), oldest), (str(newest), newest))
+
+
+class TestSummaryCache(unittest.IsolatedAsyncioTestCase):
+    """测试缓存命中规则"""
+
+    async def test_exact_hit(self):
+        """窗口、提示词和模型完全一致时应命中"""
+        cache = SummaryCache()
+        await cache.put(window_key(cache, 1, 100), "总结")
+
+        self.assertEqual(await cache.get(window_key(cache, 1, 100)), "总结")
+        self.assertIsNone(await cache.get(window_key(cache, 1, 100, prompt="其他提示词")))
+        self.assertIsNone(await cache.get(window_key(cache, 1, 100, model="model-b")))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    async def test_near_hit_within_tolerance(self):
+        """窗口偏移不超过容差时应复用"""
+        cache = SummaryCache(tolerance=5)
+        await cache.put(window_key(cache, 1, 100), "总结")
+
+        self.assertEqual(await cache.get(window_key(cache, 4, 103)), "总结")
+        self.assertIsNone(await cache.get(window_key(cache, 10, 109)))
+
+    async def test_ttl_expiry(self):
+        """过期条目不应命中"""
+        cache = SummaryCache(ttl=60)
+        with patch('chatsummary.cache.time.time', return_value=1000.0):
+            await cache.put(window_key(cache, 1, 100), "总结")
+        with patch('chatsummary.cache.time.time', return_value=1061.0):
+            self.assertIsNone(await cache.get(window_key(cache, 1, 100)))
+
+    async def test_lru_eviction(self):
+        """超出容量时应淘汰最久未使用的条目"""
+        cache = SummaryCache(max_entries=2)
+        await cache.put(window_key(cache, 1, 10), "a")
+        await cache.put(window_key(cache, 1, 20), "b")
+        await cache.get(window_key(cache, 1, 10))
+        await cache.put(window_key(cache, 1, 30), "c")
+
+        self.assertEqual(await cache.get(window_key(cache, 1, 10)), "a")
+        self.assertIsNone(await cache.get(window_key(cache, 1, 20)))
+
+    async def test_disk_tier_survives_restart(self):
+        """磁盘缓存应在新的缓存实例中命中"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            first = SummaryCache(disk_path=temp_dir)
+            await first.put(window_key(first, 1, 100), "总结")
+
+            second = SummaryCache(disk_path=temp_dir)
+            self.assertEqual(await second.get(window_key(second, 1, 100)), "总结")
+
+
+if __name__ == "__main__":
+    unittest.main()
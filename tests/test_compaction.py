@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试聊天记录压缩功能
+"""
+
+import os
+import sys
+import unittest
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatsummary import TranscriptCompactor
+from chatsummary.compaction import alias_name
+
+
+def line(time_str, sender, text):
+    """按插件的聊天记录格式构造一行"""
+    return f"[2025-03-20 {time_str}]「{sender}」: {text} "
+
+
+class TestTranscriptCompactor(unittest.TestCase):
+    """测试压缩规则"""
+
+    def setUp(self):
+        self.compactor = TranscriptCompactor()
+
+    def test_aliases_and_day_header(self):
+        """发言人应替换为别名并附上对照表，时间改为日期标题加时分"""
+        text, _ = self.compactor.compact([
+            line("12:30:05", "长长的昵称一号", "今晚开会"),
+            line("12:35:00", "另一个昵称", "好的"),
+        ])
+
+        self.assertEqual(text.split("\n"), [
+            "发言人对照（总结中请使用原名）：A=长长的昵称一号，B=另一个昵称",
+            "--- 2025-03-20 ---",
+            "[12:30] A: 今晚开会",
+            "[12:35] B: 好的",
+        ])
+
+    def test_merges_consecutive_messages(self):
+        """同一发言人的连续消息应合并，同一分钟内省略时间"""
+        text, _ = self.compactor.compact([
+            line("12:30:05", "张三", "今晚开会"),
+            line("12:30:40", "张三", "记得带电脑"),
+            line("12:30:50", "李四", "收到"),
+            line("12:45:00", "李四", "几点？"),
+        ])
+
+        self.assertIn("[12:30] A: 今晚开会 / 记得带电脑", text)
+        self.assertIn("\nB: 收到", text)
+        self.assertIn("[12:45] B: 几点？", text)
+
+    def test_drops_repeats_and_placeholders(self):
+        """复读只保留首条并标注次数，只有占位符的消息应去除"""
+        text, stats = self.compactor.compact([
+            line("12:30:00", "张三", "+1"),
+            line("12:30:10", "李四", "+1"),
+            line("12:30:20", "王五", "+1"),
+            line("12:31:00", "赵六", "[表情] [图片]"),
+            line("12:32:00", "赵六", "[图片] 看这个"),
+        ])
+
+        self.assertIn("A: +1 ×3", text)
+        self.assertNotIn("[表情]", text)
+        self.assertIn("[图片] 看这个", text)
+        self.assertEqual((stats.lines_in, stats.lines_out), (5, 4))
+
+    def test_unrecognized_lines_are_kept(self):
+        """无法识别格式的行应原样保留"""
+        text, _ = self.compactor.compact(["其他格式的记录"])
+        self.assertEqual(text, "其他格式的记录")
+
+    def test_reports_savings(self):
+        """典型群聊记录应显著减少字节和令牌"""
+        lines = [line(f"12:{i // 6:02d}:{i % 6 * 10:02d}", f"群友昵称{i % 3}", f"第{i}条消息")
+                 for i in range(60)]
+
+        _, stats = self.compactor.compact(lines)
+
+        self.assertGreater(stats.bytes_saved, 30)
+        self.assertGreater(stats.tokens_saved, 30)
+        self.assertLess(stats.tokens_out, stats.tokens_in)
+
+    def test_alias_names(self):
+        """别名应按 A..Z、AA.. 递增"""
+        self.assertEqual([alias_name(i) for i in (0, 25, 26, 27)], ["A", "Z", "AA", "AB"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试请求合并与冷却时间功能
+"""
+
+import os
+import sys
+import asyncio
+import unittest
+from unittest.mock import patch
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatsummary import SingleFlight, CooldownTracker
+
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+    """测试相同请求的合并执行"""
+
+    async def test_concurrent_calls_share_one_execution(self):
+        """相同键的并发请求只执行一次"""
+        flights = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "结果"
+
+        results = await asyncio.gather(*(flights.do("k", work) for _ in range(5)))
+
+        self.assertEqual(results, ["结果"] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flights.shared, 4)
+        self.assertEqual(len(flights), 0)
+
+    async def test_compatible_key_joins(self):
+        """兼容的键应加入正在执行的请求"""
+        flights = SingleFlight()
+
+        async def work(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        first = asyncio.ensure_future(flights.do(("g1", 100), lambda: work(100)))
+        await asyncio.sleep(0)
+        second = await flights.do(("g1", 105), lambda: work(105), lambda key: key[0] == "g1")
+
+        self.assertEqual(second, 100)
+        self.assertEqual(await first, 100)
+
+    async def test_errors_propagate_to_all_waiters(self):
+        """执行失败时所有等待者都应收到异常"""
+        flights = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("失败")
+
+        results = await asyncio.gather(flights.do("k", fail), flights.do("k", fail), return_exceptions=True)
+
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+
+    async def test_cancelled_caller_does_not_cancel_others(self):
+        """发起者被取消时其他等待者仍能获得结果"""
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return "结果"
+
+        leader = asyncio.ensure_future(flights.do("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do("k", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        self.assertEqual(await follower, "结果")
+
+
+class TestCooldownTracker(unittest.TestCase):
+    """测试冷却时间跟踪"""
+
+    def test_user_cooldown(self):
+        """同一用户在冷却时间内应被限制，其他用户不受影响"""
+        tracker = CooldownTracker(user_seconds=60)
+        with patch('chatsummary.concurrency.time.monotonic', return_value=100.0):
+            tracker.record("g1", "u1")
+            self.assertEqual(tracker.remaining("g1", "u1"), 60)
+            self.assertEqual(tracker.remaining("g1", "u2"), 0)
+            self.assertEqual(tracker.remaining("g2", "u1"), 0)
+        with patch('chatsummary.concurrency.time.monotonic', return_value=161.0):
+            self.assertEqual(tracker.remaining("g1", "u1"), 0)
+
+    def test_group_cooldown(self):
+        """群组冷却应限制群内所有用户"""
+        tracker = CooldownTracker(group_seconds=30)
+        with patch('chatsummary.concurrency.time.monotonic', return_value=100.0):
+            tracker.record("g1", "u1")
+            self.assertEqual(tracker.remaining("g1", "u2"), 30)
+
+    def test_expired_entries_are_swept(self):
+        """条目过多时应清理过期条目"""
+        tracker = CooldownTracker(user_seconds=10, sweep_threshold=3)
+        with patch('chatsummary.concurrency.time.monotonic', return_value=0.0):
+            for user in ("u1", "u2", "u3"):
+                tracker.record("g1", user)
+        with patch('chatsummary.concurrency.time.monotonic', return_value=100.0):
+            tracker.record("g1", "u4")
+        self.assertEqual(len(tracker._users), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试抽取式预选
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatsummary import extractive
+from chatsummary.extractive import ExtractiveSelector
+
+LINES = [
+    "[t]「甲」: 周五发布新版本之前要跑回归测试",
+    "[t]「乙」: 哈哈",
+    "[t]「丙」: 回归测试发现登录页面有问题",
+    "[t]「丁」: 今天天气不错",
+    "[t]「甲」: 登录页面的问题修复后重新跑回归测试",
+    "[t]「乙」: [图片]",
+    "[t]「丙」: 回归测试通过就发布新版本",
+    "[t]「丁」: 中午吃什么",
+]
+
+
+def cost(line):
+    """每行固定计9个令牌，加上换行令牌正好10个"""
+    return 9
+
+
+class TestExtractiveSelector(unittest.TestCase):
+    """测试 TextRank 打分和预算内的选择"""
+
+    def test_rank_prefers_central_messages(self):
+        scores = ExtractiveSelector().rank(LINES)
+        self.assertAlmostEqual(sum(scores), 1.0)
+        central = {0, 2, 4, 6}
+        self.assertEqual(set(sorted(range(len(LINES)), key=scores.__getitem__)[-4:]), central)
+        # 没有相似消息的行得分相同
+        self.assertAlmostEqual(scores[1], scores[5])
+        self.assertEqual(ExtractiveSelector().rank([]), [])
+
+    @unittest.skipIf(extractive.numpy is None, "numpy is not installed")
+    def test_numpy_matches_pure_python(self):
+        selector = ExtractiveSelector()
+        vectorized = selector.rank(LINES * 5)
+        with patch.object(extractive, "numpy", None):
+            expected = selector.rank(LINES * 5)
+        for value, reference in zip(vectorized, expected):
+            self.assertAlmostEqual(value, reference)
+
+    def test_select_within_budget_in_chronological_order(self):
+        selector = ExtractiveSelector(context_lines=0, estimate=cost)
+        self.assertEqual(selector.select(LINES, 80), list(range(len(LINES))))
+        selected = selector.select(LINES, 40)
+        self.assertEqual(selected, [0, 2, 4, 6])
+        self.assertEqual(selector.select(LINES, 5), [])
+
+    def test_context_and_reply_targets_are_included(self):
+        selector = ExtractiveSelector(context_lines=1, estimate=cost)
+        # 第7行回复第2行：选中第7行时连同前一行和被回复的消息一起加入
+        ids = [str(index) for index in range(len(LINES))]
+        replies = [None] * len(LINES)
+        replies[6] = "1"
+        self.assertEqual(selector.select(LINES, 40, ids, replies), [0, 1, 5, 6])
+        # 整组放不下时只加入消息本身
+        self.assertEqual(selector.select(LINES, 20, ids, replies), [0, 6])
+
+
+if __name__ == '__main__':
+    unittest.main()
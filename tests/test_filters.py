@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试消息过滤功能
+"""
+
+import os
+import sys
+import unittest
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatsummary import MessageFilter
+
+
+def make_message(text, user_id="10001", **extra):
+    """构造一条 OneBot 群消息"""
+    msg = {
+        'sender': {'user_id': user_id, 'nickname': f'用户{user_id}'},
+        'message': [{'type': 'text', 'data': {'text': text}}],
+    }
+    msg.update(extra)
+    return msg
+
+
+async def aiter(messages):
+    for msg in messages:
+        yield msg
+
+
+class TestMessageFilter(unittest.IsolatedAsyncioTestCase):
+    """测试过滤规则"""
+
+    def test_rules(self):
+        """各条规则应返回对应的名称"""
+        message_filter = MessageFilter(ignore_patterns=["^https?://", "签到"], bot_ids=[20002])
+
+        self.assertIsNone(message_filter.match(make_message("你好")))
+        self.assertEqual(message_filter.match(make_message("通知", user_id="10000")), "system")
+        self.assertEqual(message_filter.match(make_message("你好", user_id="20002")), "bot")
+        self.assertEqual(message_filter.match(make_message("你好", user_id="30003", self_id=30003)), "bot")
+        self.assertEqual(message_filter.match(make_message(" /消息总结 100")), "commands")
+        self.assertEqual(message_filter.match(make_message("https://example.com")), "pattern:^https?://")
+        self.assertEqual(message_filter.match(make_message("今日签到")), "pattern:签到")
+
+    def test_disabled_rules(self):
+        """关闭的规则不应丢弃消息"""
+        message_filter = MessageFilter(ignore_system=False, ignore_bot=False, ignore_commands=False)
+
+        self.assertFalse(message_filter.active)
+        self.assertIsNone(message_filter.match(make_message("/help", user_id="10000")))
+
+    def test_invalid_pattern_is_skipped(self):
+        """无效的表达式应被跳过，其余表达式仍然生效"""
+        message_filter = MessageFilter(ignore_patterns=["([", "广告"])
+
+        self.assertEqual(message_filter.patterns, ["广告"])
+        self.assertEqual(message_filter.match(make_message("广告位招租")), "pattern:广告")
+
+    def test_malformed_messages(self):
+        """格式异常的消息段和发送者不应导致异常，其余文本仍参与匹配"""
+        message_filter = MessageFilter(ignore_patterns=["广告"])
+        segments = ['hi', None, {'type': 'text', 'data': None}, {'type': 'text'},
+                    {'type': 'text', 'data': {'text': '广告'}}]
+
+        self.assertEqual(message_filter.match({'sender': {}, 'message': segments}), "pattern:广告")
+        self.assertIsNone(message_filter.match({'sender': {}, 'message': ['hi', None]}))
+        self.assertIsNone(message_filter.match({'sender': {}, 'message': [{'type': 'text', 'data': None}]}))
+        self.assertIsNone(message_filter.match(make_message("你好", sender=None)))
+        self.assertEqual(message_filter.match(make_message("/help", sender=None, user_id="10001")), "commands")
+
+    async def test_stream_counts_dropped(self):
+        """过滤消息流时应按规则统计丢弃数量"""
+        message_filter = MessageFilter()
+        messages = [make_message("你好"), make_message("/help"), make_message("/ping"),
+                    make_message("机器人回复", user_id="99", self_id="99")]
+        dropped = {}
+
+        kept = [msg async for msg in message_filter.stream(aiter(messages), dropped)]
+
+        self.assertEqual(kept, messages[:1])
+        self.assertEqual(dropped, {"commands": 2, "bot": 1})
+        self.assertEqual(message_filter.dropped, dropped)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试消息格式化功能
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatsummary import MessageFormatter
+
+
+def make_message(index, ts):
+    """构造一条包含文本、表情和未知消息段的消息"""
+    return {
+        'sender': {'nickname': f'用户{index}'},
+        'time': ts,
+        'message': [
+            {'type': 'text', 'data': {'text': f'消息{index}'}},
+            {'type': 'face', 'data': {'id': '21'}},
+            {'type': 'at', 'data': {'qq': '10001'}},
+        ],
+    }
+
+
+async def aiter(messages):
+    for msg in messages:
+        yield msg
+
+
+class TestMessageFormatter(unittest.IsolatedAsyncioTestCase):
+    """测试格式化结果和顺序"""
+
+    def test_format_matches_datetime(self):
+        """缓存的时间戳应与逐条格式化的结果一致"""
+        formatter = MessageFormatter(memo_size=2)
+        for ts in (1700000000, 1700000059, 1700000060, 1700003599, 1700003600, 1700090000, 1700000001):
+            expected = datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
+            self.assertEqual(formatter.timestamp(ts), expected)
+        self.assertLessEqual(len(formatter._hours), 2)
+
+    def test_format_line(self):
+        """消息应格式化为带时间和昵称的聊天记录行"""
+        formatter = MessageFormatter()
+        ts = 1700000000
+        time_str = datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
+
+        self.assertEqual(formatter.format(make_message(1, ts)),
+                         f"[{time_str}]「用户1」: 消息1 [表情] [at] ")
+        self.assertEqual(formatter.extract_text([]), "")
+
+    async def test_malformed_messages_do_not_break_the_stream(self):
+        """CQ 码字符串消息和格式异常的消息段只影响该条消息"""
+        formatter = MessageFormatter()
+        self.assertEqual(formatter.extract_text('[CQ:face,id=1]hi &#91;ok&#93;'), "[表情] hi [ok] ")
+        self.assertEqual(formatter.extract_text('[CQ:image,file=a.jpg]'), "[图片] ")
+        self.assertEqual(formatter.extract_text([{'type': 'text', 'data': None}, "bad",
+                                                 {'type': 'text', 'data': {'text': '好'}}]), " 好 ")
+
+        messages = [
+            {'sender': {'nickname': '甲'}, 'time': 1700000000, 'message': '[CQ:face,id=1]hi'},
+            {'sender': None, 'time': 1700000001, 'message': [{'type': 'text', 'data': {'text': '丢失发言人'}}]},
+            make_message(3, 1700000002),
+        ]
+        lines = await formatter.format_stream(aiter(messages))
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith("[") and lines[0].endswith("「用户3」: 消息3 [表情] [at] "))
+        self.assertTrue(lines[1].endswith("「Unknown」: "))
+        self.assertTrue(lines[2].endswith("「甲」: [表情] hi "))
+
+    async def test_list_and_stream_are_oldest_first(self):
+        """列表和消息流都应输出从旧到新的聊天记录"""
+        formatter = MessageFormatter()
+        messages = [make_message(index, 1700000000 - index * 30) for index in range(2500)]
+
+        from_list = await formatter.format_stream(messages)
+        from_stream = await formatter.format_stream(aiter(messages))
+
+        self.assertEqual(from_list, from_stream)
+        self.assertIn("「用户2499」", from_list[0])
+        self.assertIn("「用户0」", from_list[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
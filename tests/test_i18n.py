@@ -16,6 +16,8 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 # 简化测试，导入i18n模块中的I18n类
 from i18n import I18n
+from i18n.catalog import Catalog, Message, normalize_language
+from i18n.i18n import I18nManager
 
 class TestI18n(unittest.TestCase):
     """测试I18n模块的基本功能"""
@@ -78,5 +80,77 @@ class TestI18n(unittest.TestCase):
         # 语言应该保持不变
         self.assertEqual(self.i18n.lang, "zh_CN")
 
+class TestCatalog(unittest.TestCase):
+    """测试翻译目录的懒加载、回退合并、占位符预解析和编译缓存"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.write("zh_CN", {"hello": "你好", "count": "共 {count} 条", "only_zh": "仅中文"})
+        self.write("en_US", {"hello": "Hello", "count": "{count} records", "only_en": "English only",
+                             "spec": "{value:.1f}%"})
+        self.write("ja_JP", {"hello": "こんにちは"})
+        self.cache_path = os.path.join(self.temp_dir.name, "cache", "i18n.json")
+
+    def write(self, lang, data):
+        with open(os.path.join(self.temp_dir.name, f"{lang}.json"), 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    def test_lazy_load_and_fallback_chain(self):
+        catalog = Catalog(self.temp_dir.name, fallbacks=("zh_CN", "en_US"))
+        self.assertIsNone(catalog._raw)
+
+        self.assertEqual(catalog.translate("ja_JP", "hello"), "こんにちは")
+        self.assertEqual(catalog.translate("ja_JP", "only_zh"), "仅中文")
+        # 回退链之外的语言也会被合并
+        self.assertEqual(catalog.translate("ja_JP", "only_en"), "English only")
+        self.assertEqual(catalog.translate("fr_FR", "hello"), "你好")
+        self.assertEqual(catalog.translate("en_US", "missing", "默认"), "默认")
+        self.assertEqual(catalog.translate("en_US", "missing"), "missing")
+
+    def test_preparsed_placeholders(self):
+        catalog = Catalog(self.temp_dir.name)
+        entry = catalog.lookup("en_US")["count"]
+        self.assertIsInstance(entry, Message)
+        self.assertEqual(entry.segments, [("", "count"), (" records", None)])
+        self.assertEqual(catalog.translate("en_US", "count", count=3), "3 records")
+        self.assertEqual(catalog.translate("en_US", "spec", value=12.345), "12.3%")
+        # 缺少参数时返回未格式化的文本
+        self.assertEqual(catalog.translate("en_US", "count", other=1), "{count} records")
+        self.assertIsInstance(catalog.lookup("en_US")["hello"], str)
+
+    def test_compiled_cache(self):
+        catalog = Catalog(self.temp_dir.name, cache_path=self.cache_path)
+        self.assertEqual(catalog.translate("ja_JP", "count", count=2), "共 2 条")
+        self.assertTrue(os.path.exists(self.cache_path))
+
+        with patch.object(Catalog, 'raw', side_effect=AssertionError("should use cache")):
+            cached = Catalog(self.temp_dir.name, cache_path=self.cache_path)
+            self.assertEqual(cached.translate("ja_JP", "count", count=2), "共 2 条")
+            self.assertEqual(cached.translate("en_US", "spec", value=1), "1.0%")
+
+        # 语言文件变化后重新编译
+        self.write("ja_JP", {"hello": "こんにちは", "count": "{count} 件"})
+        os.utime(os.path.join(self.temp_dir.name, "ja_JP.json"), ns=(1, 1))
+        self.assertEqual(Catalog(self.temp_dir.name, cache_path=self.cache_path)
+                         .translate("ja_JP", "count", count=2), "2 件")
+
+    def test_language_codes_and_manager(self):
+        self.assertEqual(normalize_language("ja-JP"), "ja_JP")
+        self.assertEqual(normalize_language("en_us"), "en_US")
+        self.assertEqual(I18n("ja-JP").lang, "ja_JP")
+        self.assertEqual(I18n("ja-JP").get("summary_cooldown", seconds=3),
+                         "コマンドはクールダウン中です。3 秒後にもう一度お試しください")
+        self.assertEqual(I18n("en-US").get("summary_title"), "Chat Summary")
+
+        manager = I18nManager("ja_JP")
+        self.assertEqual(manager.get_text("summary_title"), "チャット要約")
+        self.assertEqual(manager.get_text("not_exist", "Default"), "Default")
+        self.assertTrue(manager.change_language("en-US"))
+        self.assertEqual(manager.lang_code, "en_US")
+        self.assertFalse(manager.change_language("fr_FR"))
+        self.assertIn("ja_JP", manager.get_available_languages())
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试全局总结任务队列
+"""
+
+import os
+import sys
+import asyncio
+import unittest
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatsummary.jobqueue import FairJobQueue, QueueRejected
+from chatsummary.metrics import PrometheusRegistry
+
+
+class TestFairJobQueue(unittest.IsolatedAsyncioTestCase):
+    """测试执行名额、优先级、配额和合并"""
+
+    async def test_small_requests_and_idle_groups_first(self):
+        queue = FairJobQueue(max_in_flight=1, group_quota=0, user_quota=0)
+        first = queue.submit("g1", "u1", 500)
+        self.assertEqual(first.position, 0)
+        large = queue.submit("g2", "u2", 1000)
+        small = queue.submit("g3", "u3", 50)
+        busy_group = queue.submit("g1", "u4", 10)
+
+        # 正在执行任务的群组排在最后，其余按消息数量排序
+        self.assertEqual((small.position, large.position, busy_group.position), (1, 2, 3))
+        self.assertEqual(queue.waiting, 3)
+
+        # g1 的任务结束后不再排在最后，按消息数量先于其他群组执行
+        first.release()
+        self.assertEqual(busy_group.state, "running")
+        self.assertGreaterEqual(await busy_group.wait(), 0)
+        busy_group.release()
+        self.assertEqual((small.state, large.state), ("running", "waiting"))
+        small.release()
+        self.assertEqual(large.state, "running")
+        large.release()
+        self.assertEqual((queue.running, queue.waiting), (0, 0))
+
+    async def test_aged_requests_are_not_starved(self):
+        queue = FairJobQueue(max_in_flight=1, aging_seconds=0, group_quota=0, user_quota=0)
+        queue.submit("g1", "u1", 10)
+        large = queue.submit("g2", "u2", 1000)
+        small = queue.submit("g3", "u3", 10)
+        self.assertEqual((large.position, small.position), (1, 2))
+
+    async def test_quotas_and_load_shedding(self):
+        metrics = PrometheusRegistry()
+        queue = FairJobQueue(max_in_flight=1, max_waiting=2, group_quota=2, user_quota=1, metrics=metrics)
+        queue.submit("g1", "u1", 10)
+        with self.assertRaises(QueueRejected) as rejected:
+            queue.submit("g1", "u1", 10)
+        self.assertEqual(rejected.exception.reason, "user_quota")
+
+        queue.submit("g1", "u2", 10)
+        with self.assertRaises(QueueRejected) as rejected:
+            queue.submit("g1", "u3", 10)
+        self.assertEqual(rejected.exception.reason, "group_quota")
+
+        queue.submit("g2", "u1", 10)
+        with self.assertRaises(QueueRejected) as rejected:
+            queue.submit("g3", "u1", 10)
+        self.assertEqual((rejected.exception.reason, rejected.exception.limit), ("overloaded", 2))
+        self.assertEqual(metrics.value("queue_rejections_total", reason="user_quota"), 1)
+        self.assertEqual(metrics.value("queue_rejections_total", reason="overloaded"), 1)
+
+    async def test_cancelled_waiter_leaves_queue(self):
+        queue = FairJobQueue(max_in_flight=1)
+        running = queue.submit("g1", "u1", 10)
+        waiting = queue.submit("g2", "u2", 10)
+        task = asyncio.ensure_future(waiting.wait())
+        await asyncio.sleep(0)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(queue.waiting, 0)
+        # 用户配额也已归还
+        queue.submit("g2", "u2", 10)
+        running.release()
+
+    async def test_compatible_requests_join_one_job(self):
+        queue = FairJobQueue(max_in_flight=1, group_quota=1, user_quota=1)
+        blocker = queue.submit("g0", "u0", 10)
+        leader = queue.submit("g1", "u1", 100)
+        follower = queue.submit("g1", "u2", 105, join=lambda job: abs(job.count - 105) <= 10)
+        self.assertEqual(follower.position, leader.position)
+        self.assertEqual(queue.waiting, 1)
+
+        # 发起者取消等待后由跟随者接替
+        leader.release()
+        self.assertEqual(queue.waiting, 1)
+        self.assertEqual(follower.position, 1)
+        late = queue.submit("g1", "u3", 100, join=lambda job: True)
+
+        blocker.release()
+        self.assertGreaterEqual(await follower.wait(), 0)
+        self.assertEqual(await late.wait(), 0.0)
+        self.assertEqual(queue.running, 1)
+        late.release()
+        follower.release()
+        self.assertEqual((queue.running, queue.waiting), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试LLM调用执行器
+"""
+
+import os
+import sys
+import asyncio
+import unittest
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatsummary import LLMExecutor, LLMError, LatencyTracker, PrometheusRegistry, is_transient
+
+
+class RateLimitError(Exception):
+    """模拟SDK的限流异常"""
+
+
+class FakeProvider:
+    """按预设的延迟和异常依次响应的提供商"""
+
+    def __init__(self, name, delays=(), errors=()):
+        self.id = name
+        self.delays = list(delays)
+        self.errors = list(errors)
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self.cancelled = 0
+
+    async def call(self, text):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            delay = self.delays.pop(0) if self.delays else 0
+            await asyncio.sleep(delay)
+            if self.errors:
+                error = self.errors.pop(0)
+                if error is not None:
+                    raise error
+            return f"{self.id}:{text}"
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.active -= 1
+
+
+def call(provider):
+    return provider.call("x")
+
+
+class TestTransient(unittest.TestCase):
+    """测试临时错误的判断"""
+
+    def test_classification(self):
+        self.assertTrue(is_transient(asyncio.TimeoutError()))
+        self.assertTrue(is_transient(ConnectionResetError()))
+        self.assertTrue(is_transient(RateLimitError("slow down")))
+        error = RuntimeError("bad gateway")
+        error.status_code = 502
+        self.assertTrue(is_transient(error))
+        self.assertFalse(is_transient(ValueError("bad request")))
+
+    def test_percentile(self):
+        tracker = LatencyTracker()
+        self.assertIsNone(tracker.percentile(0.95))
+        for value in range(1, 101):
+            tracker.add(value / 100)
+        self.assertAlmostEqual(tracker.percentile(0.5), 0.51, places=2)
+        self.assertAlmostEqual(tracker.percentile(0.95), 0.95, places=2)
+
+
+class TestLLMExecutor(unittest.IsolatedAsyncioTestCase):
+    """测试并发限制、超时、重试和对冲请求"""
+
+    async def test_retries_transient_errors(self):
+        metrics = PrometheusRegistry()
+        executor = LLMExecutor(retries=2, backoff=0.001, metrics=metrics)
+        provider = FakeProvider("a", errors=[RateLimitError("429"), ConnectionError("reset"), None])
+        self.assertEqual(await executor.run(call, [provider]), "a:x")
+        self.assertEqual(provider.calls, 3)
+        self.assertEqual(metrics.value("llm_retries_total"), 2)
+
+    async def test_does_not_retry_permanent_errors(self):
+        executor = LLMExecutor(retries=3, backoff=0.001)
+        provider = FakeProvider("a", errors=[ValueError("invalid request")])
+        with self.assertRaises(LLMError):
+            await executor.run(call, [provider])
+        self.assertEqual(provider.calls, 1)
+
+    async def test_timeout_is_retried_then_raised(self):
+        metrics = PrometheusRegistry()
+        executor = LLMExecutor(timeout=0.01, retries=1, backoff=0.001, metrics=metrics)
+        provider = FakeProvider("a", delays=[1, 1])
+        with self.assertRaises(LLMError):
+            await executor.run(call, [provider])
+        self.assertEqual(provider.calls, 2)
+        self.assertEqual(metrics.value("llm_timeouts_total"), 2)
+
+    async def test_concurrency_limits(self):
+        executor = LLMExecutor(max_concurrency=3, per_provider_concurrency=2)
+        first = FakeProvider("a", delays=[0.01] * 6)
+        second = FakeProvider("b", delays=[0.01] * 6)
+        await asyncio.gather(*[executor.run(call, [provider]) for provider in [first, second] * 6])
+        self.assertEqual(first.peak, 2)
+        self.assertEqual(second.peak, 2)
+        self.assertLessEqual(first.peak + second.peak, 4)
+
+    async def test_global_limit(self):
+        executor = LLMExecutor(max_concurrency=1, per_provider_concurrency=4)
+        first = FakeProvider("a", delays=[0.01] * 3)
+        second = FakeProvider("b", delays=[0.01] * 3)
+        active = []
+
+        async def tracked(provider):
+            active.append(first.active + second.active + 1)
+            return await provider.call("x")
+
+        await asyncio.gather(*[executor.run(tracked, [provider]) for provider in [first, second] * 3])
+        self.assertEqual(max(active), 1)
+
+    async def test_hedges_slow_primary(self):
+        metrics = PrometheusRegistry()
+        executor = LLMExecutor(hedge_percentile=0.9, hedge_min_samples=5, metrics=metrics)
+        primary = FakeProvider("a", delays=[0.01] * 5 + [1])
+        backup = FakeProvider("b", delays=[0.01])
+        for _ in range(5):
+            await executor.run(call, [primary, backup])
+        self.assertEqual(backup.calls, 0)
+
+        self.assertEqual(await executor.run(call, [primary, backup]), "b:x")
+        self.assertEqual(backup.calls, 1)
+        self.assertEqual(primary.cancelled, 1)
+        self.assertEqual(metrics.value("llm_hedges_total"), 1)
+        self.assertEqual(metrics.value("llm_hedge_wins_total", provider="backup"), 1)
+
+    async def test_hedge_failure_falls_back_to_primary(self):
+        executor = LLMExecutor(hedge_percentile=0.5, hedge_min_samples=1)
+        primary = FakeProvider("a", delays=[0.01, 0.05])
+        backup = FakeProvider("b", errors=[ValueError("down")])
+        await executor.run(call, [primary, backup])
+        self.assertEqual(await executor.run(call, [primary, backup]), "a:x")
+        self.assertEqual(backup.calls, 1)
+
+    async def test_no_hedge_without_samples(self):
+        executor = LLMExecutor(hedge_percentile=0.5, hedge_min_samples=3)
+        primary = FakeProvider("a", delays=[0.02])
+        backup = FakeProvider("b")
+        self.assertEqual(await executor.run(call, [primary, backup]), "a:x")
+        self.assertEqual(backup.calls, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试本地消息存储与增量同步功能
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import asyncio
+import tempfile
+import unittest
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatsummary import MessageStore, HistorySync, PagedHistoryFetcher
+
+
+def make_message(seq, user_id="10001"):
+    """构造一条OneBot格式的测试消息"""
+    return {
+        'message_id': seq,
+        'message_seq': seq,
+        'time': 1700000000 + seq,
+        'sender': {'user_id': user_id, 'nickname': f'用户{user_id}'},
+        'message': [{'type': 'text', 'data': {'text': f'消息{seq}'}}]
+    }
+
+
+class FakePlatform:
+    """模拟 get_group_msg_history 接口，按序号向前分页返回消息"""
+
+    def __init__(self, total, max_page=None, missing=()):
+        self.messages = [make_message(seq) for seq in range(1, total + 1) if seq not in missing]
+        self.max_page = max_page
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def post(self, count):
+        start = len(self.messages) + 1
+        self.messages.extend(make_message(seq) for seq in range(start, start + count))
+
+    async def call_action(self, action, group_id, message_seq=0, count=20):
+        self.calls.append(message_seq)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0)
+        self.in_flight -= 1
+        if self.max_page:
+            count = min(count, self.max_page)
+        end = message_seq or self.messages[-1]['message_seq']
+        page = [m for m in self.messages if m['message_seq'] <= end][-count:]
+        return {'messages': page}
+
+
+class TestMessageStore(unittest.IsolatedAsyncioTestCase):
+    """测试消息存储与同步游标"""
+
+    def setUp(self):
+        self.store = MessageStore(':memory:', max_messages_per_group=1000)
+        self.sync = HistorySync(self.store, PagedHistoryFetcher(page_size=20))
+
+    def tearDown(self):
+        self.store.close()
+
+    async def test_first_sync_fetches_requested_count(self):
+        """首次同步应拉取足够数量的消息并按从新到旧返回"""
+        platform = FakePlatform(100)
+        messages = await self.sync.sync(platform.call_action, 'g1', 50)
+
+        self.assertEqual(len(messages), 50)
+        self.assertEqual(messages[0]['message_seq'], 100)
+        self.assertEqual(messages[-1]['message_seq'], 51)
+        state = self.store.get_state('g1')
+        self.assertEqual((state.newest_seq, state.oldest_seq), (100, 51))
+
+    async def test_second_sync_only_fetches_delta(self):
+        """再次同步时只应拉取游标之后的新消息"""
+        platform = FakePlatform(100)
+        await self.sync.sync(platform.call_action, 'g1', 50)
+        platform.calls.clear()
+        platform.post(5)
+
+        messages = await self.sync.sync(platform.call_action, 'g1', 50)
+
+        self.assertEqual(platform.calls, [0])
+        self.assertEqual(messages[0]['message_seq'], 105)
+        self.assertEqual(len(messages), 50)
+
+    async def test_backfill_when_local_range_too_small(self):
+        """本地连续区间不足时应向前回填"""
+        platform = FakePlatform(100)
+        await self.sync.sync(platform.call_action, 'g1', 20)
+        messages = await self.sync.sync(platform.call_action, 'g1', 70)
+
+        self.assertEqual(len(messages), 70)
+        self.assertEqual(messages[-1]['message_seq'], 31)
+
+    async def test_stream_yields_fresh_before_local(self):
+        """消息流应先产出新消息，再产出本地已有消息"""
+        platform = FakePlatform(100)
+        await self.sync.sync(platform.call_action, 'g1', 30)
+        platform.post(3)
+
+        seqs = [m['message_seq'] async for m in self.sync.stream(platform.call_action, 'g1', 10)]
+
+        self.assertEqual(seqs, list(range(103, 93, -1)))
+
+    def test_prune_keeps_newest_messages(self):
+        """超出保留数量时应删除最旧的消息并收缩区间"""
+        store = MessageStore(':memory:', max_messages_per_group=10)
+        store.save_messages('g1', [make_message(seq) for seq in range(1, 31)], 30, 1)
+
+        self.assertEqual(store.count_range('g1', 0), 10)
+        self.assertEqual(store.get_state('g1').oldest_seq, 21)
+        store.close()
+
+
+    async def test_ensure_backfills_without_reading_local(self):
+        """ensure 只同步新消息，本地区间不足时回填"""
+        platform = FakePlatform(100)
+        await self.sync.sync(platform.call_action, 'g1', 20)
+        platform.post(5)
+
+        state = await self.sync.ensure(platform.call_action, 'g1', 60)
+
+        self.assertEqual((state.newest_seq, state.oldest_seq), (105, 46))
+        self.assertEqual(self.store.count_range('g1', state.oldest_seq), 60)
+        calls = len(platform.calls)
+        await self.sync.ensure(platform.call_action, 'g1', 60)
+        self.assertEqual(len(platform.calls), calls + 1)
+
+    def test_by_sender_with_replies(self):
+        """按发言人读取消息，并附带其回复的消息和回复它的消息"""
+        messages = [make_message(seq, "10001" if seq % 3 else "10002") for seq in range(1, 31)]
+        # 10002 的第 9 条消息回复第 8 条，第 10 条消息回复 10002 的第 24 条
+        messages[8]['message'].insert(0, {'type': 'reply', 'data': {'id': 8}})
+        messages[9]['message'].insert(0, {'type': 'reply', 'data': {'id': 24}})
+        self.store.save_messages('g1', messages, 30, 1)
+
+        seqs = [m['message_seq'] for m in self.store.by_sender('g1', '10002', 3)]
+        self.assertEqual(seqs, [30, 27, 24, 10])
+        seqs = [m['message_seq'] for m in self.store.by_sender('g1', '10002', 10, oldest_seq=5)]
+        self.assertEqual(seqs, [30, 27, 24, 21, 18, 15, 12, 10, 9, 8, 6])
+        seqs = [m['message_seq'] for m in self.store.by_sender('g1', '10002', 2, with_replies=False)]
+        self.assertEqual(seqs, [30, 27])
+        self.assertEqual(self.store.by_sender('g1', '99999', 10), [])
+        plan = " ".join(row[3] for row in self.store._conn.execute(
+            'EXPLAIN QUERY PLAN SELECT seq FROM messages WHERE group_id = ? AND sender_id = ? '
+            'ORDER BY seq DESC LIMIT 3', ('g1', '10002')))
+        self.assertIn("idx_messages_group_sender_seq", plan)
+
+    def test_old_database_is_migrated(self):
+        """旧版本的数据库打开时补充 reply_to 列并回填"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'messages.db')
+            conn = sqlite3.connect(path)
+            conn.execute('CREATE TABLE messages (group_id TEXT NOT NULL, message_id TEXT NOT NULL, '
+                         'seq INTEGER NOT NULL, time INTEGER NOT NULL DEFAULT 0, sender_id TEXT, '
+                         'payload TEXT NOT NULL, PRIMARY KEY (group_id, message_id))')
+            reply = make_message(2, "10002")
+            reply['message'].insert(0, {'type': 'reply', 'data': {'id': 1}})
+            for msg in (make_message(1), reply):
+                conn.execute('INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?)',
+                             ('g1', str(msg['message_id']), msg['message_seq'], msg['time'],
+                              msg['sender']['user_id'], json.dumps(msg, ensure_ascii=False)))
+            conn.commit()
+            conn.close()
+
+            store = MessageStore(path)
+            self.assertEqual([m['message_seq'] for m in store.by_sender('g1', '10001', 5)], [2, 1])
+            store.close()
+
+
+class TestPagedHistoryFetcher(unittest.IsolatedAsyncioTestCase):
+    """测试并发分页获取"""
+
+    async def collect(self, fetcher, platform, count, **kwargs):
+        return [m['message_seq'] async for m in fetcher.iter_messages(platform.call_action, 'g1', count, **kwargs)]
+
+    async def test_pages_past_platform_limit(self):
+        """平台每页返回数量少于请求数量时应继续分页直到满足数量"""
+        platform = FakePlatform(500, max_page=30)
+        fetcher = PagedHistoryFetcher(page_size=50, max_concurrency=3)
+
+        seqs = await self.collect(fetcher, platform, 200)
+
+        self.assertEqual(seqs, list(range(500, 300, -1)))
+        self.assertLessEqual(platform.max_in_flight, 3)
+        self.assertGreater(platform.max_in_flight, 1)
+
+    async def test_fills_gaps_from_missing_messages(self):
+        """消息序号存在空洞时应补齐并去重"""
+        missing = set(range(60, 70))
+        platform = FakePlatform(120, missing=missing)
+        fetcher = PagedHistoryFetcher(page_size=20)
+
+        seqs = await self.collect(fetcher, platform, 80)
+
+        expected = [seq for seq in range(120, 0, -1) if seq not in missing][:80]
+        self.assertEqual(seqs, expected)
+
+    async def test_stops_at_sync_cursor(self):
+        """到达同步游标后应停止"""
+        platform = FakePlatform(100)
+        fetcher = PagedHistoryFetcher(page_size=20)
+
+        seqs = await self.collect(fetcher, platform, 50, stop_seq=95)
+
+        self.assertEqual(seqs, [100, 99, 98, 97, 96])
+
+
+if __name__ == "__main__":
+    unittest.main()
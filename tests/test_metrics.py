@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试阶段耗时与指标导出功能
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+import unittest
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatsummary import (
+    PrometheusRegistry, PrometheusFileExporter, PrometheusHTTPExporter, StageTrace,
+    current_trace, trace_stage,
+)
+
+
+async def aiter(items):
+    for item in items:
+        await asyncio.sleep(0)
+        yield item
+
+
+class TestPrometheusRegistry(unittest.IsolatedAsyncioTestCase):
+    """测试指标汇总和导出"""
+
+    def test_render_counters_and_histograms(self):
+        """计数器和直方图应渲染为 Prometheus 文本格式"""
+        registry = PrometheusRegistry()
+        registry.increment("messages_filtered_total", 3, rule='pattern:"x"')
+        registry.increment("messages_filtered_total", 2, rule='pattern:"x"')
+        registry.observe("stage_seconds", 0.02, stage="fetch")
+        registry.observe("stage_seconds", 3.0, stage="fetch")
+
+        text = registry.render()
+
+        self.assertIn("# TYPE chatsummary_messages_filtered_total counter", text)
+        self.assertIn('chatsummary_messages_filtered_total{rule="pattern:\\"x\\""} 5', text)
+        self.assertIn('chatsummary_stage_seconds_bucket{stage="fetch",le="0.025"} 1', text)
+        self.assertIn('chatsummary_stage_seconds_bucket{stage="fetch",le="+Inf"} 2', text)
+        self.assertIn('chatsummary_stage_seconds_count{stage="fetch"} 2', text)
+        self.assertEqual(registry.value("stage_seconds", stage="fetch"), 2)
+
+    async def test_file_exporter_writes_text(self):
+        """文件导出应写出完整的指标文本"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'metrics', 'chatsummary.prom')
+            exporter = PrometheusFileExporter(path)
+            exporter.increment("requests_total", result="ok")
+
+            await exporter.flush()
+
+            with open(path, 'r', encoding='utf-8') as f:
+                self.assertIn('chatsummary_requests_total{result="ok"} 1', f.read())
+
+    async def test_http_exporter_serves_metrics(self):
+        """HTTP 导出应在 /metrics 上返回指标文本"""
+        exporter = PrometheusHTTPExporter(port=0)
+        exporter.increment("llm_calls_total")
+        await exporter.flush()
+        try:
+            reader, writer = await asyncio.open_connection(exporter.host, exporter.port)
+            writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+            await writer.drain()
+            response = (await reader.read()).decode('utf-8')
+            writer.close()
+        finally:
+            await exporter.close()
+
+        self.assertTrue(response.startswith("HTTP/1.1 200 OK"))
+        self.assertIn("chatsummary_llm_calls_total 1", response)
+
+    async def test_http_exporter_start_failure_is_not_retried(self):
+        """端口被占用时只记录一次错误，之后的写出不再尝试启动"""
+        first = PrometheusHTTPExporter(port=0)
+        await first.start()
+        second = PrometheusHTTPExporter(port=first.port)
+        try:
+            with self.assertLogs("astrbot.plugin.chatsummary", level="ERROR") as logs:
+                await second.start()
+                await second.flush()
+                await second.flush()
+        finally:
+            await first.close()
+            await second.close()
+
+        self.assertTrue(second.failed)
+        self.assertEqual(len(logs.records), 1)
+
+
+class TestStageTrace(unittest.IsolatedAsyncioTestCase):
+    """测试阶段耗时记录"""
+
+    async def test_stages_accumulate_and_report(self):
+        """同一阶段多次计时应累加，结束时每个阶段报告一次"""
+        registry = PrometheusRegistry()
+        trace = StageTrace(registry)
+
+        items = [item async for item in trace.timed(aiter([1, 2, 3]), "fetch")]
+        with trace.stage("prompt"):
+            pass
+        with trace.stage("prompt"):
+            pass
+        trace.finish()
+
+        self.assertEqual(items, [1, 2, 3])
+        self.assertEqual(set(trace.stages), {"fetch", "prompt"})
+        self.assertEqual(registry.value("stage_seconds", stage="prompt"), 1)
+        self.assertEqual(registry.value("stage_seconds", stage="total"), 1)
+
+    def test_errors_are_counted_by_stage(self):
+        """阶段内的异常应按阶段计数并继续抛出"""
+        registry = PrometheusRegistry()
+        trace = StageTrace(registry)
+
+        with self.assertRaises(ValueError):
+            with trace.stage("llm"):
+                raise ValueError("boom")
+
+        self.assertEqual(registry.value("errors_total", stage="llm"), 1)
+        self.assertIn("llm", trace.stages)
+
+    async def test_trace_stage_uses_current_trace(self):
+        """trace_stage 应记录到当前任务的阶段记录，没有记录时不做任何事"""
+        with trace_stage("llm"):
+            pass
+
+        trace = StageTrace(PrometheusRegistry())
+
+        async def run():
+            current_trace.set(trace)
+            with trace_stage("llm"):
+                await asyncio.sleep(0)
+
+        await asyncio.ensure_future(run())
+
+        self.assertIn("llm", trace.stages)
+        self.assertIsNone(current_trace.get())
+
+
+if __name__ == "__main__":
+    unittest.main()
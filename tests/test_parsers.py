@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试聊天记录导出文件的流式解析
+"""
+
+import io
+import os
+import sys
+import json
+import tempfile
+import unittest
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatsummary.parsers import iter_json_array, iter_records, read_chat_lines
+
+
+def onebot_message(seq, text, ts=1700000000):
+    return {"message_seq": seq, "time": ts + seq, "sender": {"nickname": f"用户{seq % 3}"},
+            "message": [{"type": "text", "data": {"text": text}}]}
+
+
+QQ_EXPORT = """\ufeff消息记录（此消息记录为文本格式，不支持重新导入）
+
+================================================================
+消息分组:我的群聊
+================================================================
+消息对象:测试群
+================================================================
+
+2024-01-01 9:00:00 小明(10001)
+早上好
+
+2024-01-01 9:01:30 小红<red@example.com>
+今天开会吗
+下午三点
+
+2024-01-01 9:02:00 系统消息(10000)
+[图片]
+"""
+
+
+class TestJSONArray(unittest.TestCase):
+    """测试增量 JSON 数组解析"""
+
+    def test_small_chunks(self):
+        items = [onebot_message(i, "消息" * i) for i in range(50)] + [12345, "文本", None, [1, 2]]
+        text = json.dumps(items, ensure_ascii=False, indent=1)
+        for chunk_size in (1, 3, 7, 64, 4096):
+            self.assertEqual(list(iter_json_array(io.StringIO(text), chunk_size=chunk_size)), items)
+
+    def test_wrapped_and_invalid(self):
+        items = [onebot_message(1, "a"), onebot_message(2, "b")]
+        text = json.dumps({"status": "ok", "data": {"messages": items}})
+        self.assertEqual(list(iter_json_array(io.StringIO(text), wrapped=True, chunk_size=5)), items)
+        self.assertEqual(list(iter_json_array(io.StringIO("[]"))), [])
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('[{"a": 1}, {"b": ')))
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('{"a": 1}')))
+
+
+class TestExportFiles(unittest.TestCase):
+    """测试各种导出格式的识别和格式化"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def test_json_formats_produce_same_lines(self):
+        messages = [onebot_message(2, "第二条"), onebot_message(1, "第一条")]
+        lines = read_chat_lines(self.write("a.json", json.dumps(messages, ensure_ascii=False)))
+        self.assertEqual(len(lines), 2)
+        # 从新到旧的导出会被反转
+        self.assertIn("第一条", lines[0])
+
+        wrapped = json.dumps({"data": {"messages": messages}}, ensure_ascii=False)
+        self.assertEqual(read_chat_lines(self.write("b.json", wrapped)), lines)
+        jsonl = "\n".join(json.dumps(msg, ensure_ascii=False) for msg in messages)
+        self.assertEqual(read_chat_lines(self.write("c.log", jsonl)), lines)
+        self.assertEqual(read_chat_lines(self.write("d.jsonl", jsonl + "\nnot json\n")), lines)
+
+    def test_cq_string_messages(self):
+        """消息为 CQ 码字符串的 OneBot 导出逐条格式化，不会整个文件失败"""
+        messages = [{"message_seq": 1, "time": 1700000001, "sender": {"nickname": "甲"},
+                     "message": "[CQ:face,id=1]早上好"},
+                    {"message_seq": 2, "time": 1700000002, "sender": {"nickname": "乙"},
+                     "message": "[CQ:reply,id=1]开会&#91;10点&#93;"}]
+        lines = read_chat_lines(self.write("cq.json", json.dumps(messages, ensure_ascii=False)))
+        self.assertEqual([line.split(": ", 1)[1] for line in lines], ["[表情] 早上好 ", "[reply] 开会[10点] "])
+        jsonl = "\n".join(json.dumps(msg, ensure_ascii=False) for msg in messages)
+        self.assertEqual(read_chat_lines(self.write("cq.jsonl", jsonl)), lines)
+
+    def test_qq_text_export(self):
+        records = list(iter_records(self.write("qq.txt", QQ_EXPORT)))
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[0]['sender'], {'nickname': '小明', 'user_id': '10001'})
+        self.assertEqual(records[1]['sender']['user_id'], 'red@example.com')
+        self.assertEqual(records[1]['message'][0]['data']['text'], "今天开会吗 下午三点")
+
+        lines = read_chat_lines(self.write("qq2.txt", QQ_EXPORT))
+        self.assertEqual(lines[0], "[2024-01-01 09:00:00]「小明」: 早上好 ")
+
+    def test_plain_text_and_empty(self):
+        self.assertEqual(read_chat_lines(self.write("p.txt", "a: 你好\n\nb: 在\n")), ["a: 你好", "b: 在"])
+        self.assertEqual(read_chat_lines(self.write("e.txt", "")), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,510 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试消息总结命令的完整处理流程
+使用模拟的平台接口和LLM提供商，覆盖AstrBot环境下的代码路径
+"""
+
+import os
+import sys
+import time
+import asyncio
+import unittest
+from unittest.mock import patch, AsyncMock
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import main
+from main import MIN_CHUNK_TOKENS, SUMMARY_ERROR_PREFIX, EnhancedChatSummary
+from tests.test_message_store import FakePlatform
+
+
+class FakeProvider:
+    """记录调用情况的模拟LLM提供商"""
+
+    def __init__(self, failures=0):
+        self.inputs = []
+        self.params = []
+        self.failures = failures
+
+    async def text_chat(self, input, max_tokens=None, temperature=None):
+        self.params.append((max_tokens, temperature))
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("connection reset")
+        self.inputs.append(input)
+
+        class Response:
+            completion_text = f"总结{len(self.inputs)}"
+        return Response()
+
+    def get_model(self):
+        return "fake-model"
+
+
+class StreamingProvider(FakeProvider):
+    """逐段返回生成结果的模拟LLM提供商"""
+
+    TEXT = "【今日速览】群里讨论了开会安排。\n\n【热门话题】\n- 会议时间定在晚上八点\n\n【群聊温度计】气氛热烈"
+
+    async def text_chat_stream(self, input, max_tokens=None, temperature=None):
+        self.inputs.append(input)
+
+        class Response:
+            def __init__(self, text, is_chunk):
+                self.completion_text = text
+                self.is_chunk = is_chunk
+
+        for index in range(0, len(self.TEXT), 7):
+            await asyncio.sleep(0)
+            yield Response(self.TEXT[index:index + 7], True)
+        yield Response(self.TEXT, False)
+
+
+class BrokenStreamProvider(StreamingProvider):
+    """发送出第一段后连接中断的模拟LLM提供商"""
+
+    async def text_chat_stream(self, input, max_tokens=None, temperature=None):
+        count = 0
+        async for response in super().text_chat_stream(input, max_tokens, temperature):
+            count += len(response.completion_text)
+            if count > 30:
+                raise ConnectionError("stream reset")
+            yield response
+
+
+class StructuredProvider(FakeProvider):
+    """返回 JSON 结构化总结的模拟LLM提供商"""
+
+    TEXT = '```json\n{"title": "开会安排", "summary": "群里讨论了开会安排。", "key_points": ["八点开会"]}\n```'
+
+    async def text_chat(self, input, max_tokens=None, temperature=None):
+        self.inputs.append(input)
+
+        class Response:
+            completion_text = self.TEXT
+        return Response()
+
+
+class FakeContext:
+    def __init__(self, provider):
+        self.provider = provider
+
+    def get_using_provider(self):
+        return self.provider
+
+
+class FakeBot:
+    def __init__(self, platform):
+        self.api = platform
+
+
+class FakeEvent:
+    """模拟群消息事件"""
+
+    def __init__(self, platform, group_id="g1", sender_id="10001"):
+        self.bot = FakeBot(platform)
+        self.group_id = group_id
+        self.sender_id = sender_id
+        self.stopped = False
+
+    def get_group_id(self):
+        return self.group_id
+
+    def get_sender_id(self):
+        return self.sender_id
+
+    def plain_result(self, text):
+        return text
+
+    def stop_event(self):
+        self.stopped = True
+
+
+class TestSummaryPipeline(unittest.IsolatedAsyncioTestCase):
+    """在模拟的AstrBot环境中测试总结命令"""
+
+    def setUp(self):
+        patcher = patch.object(main, 'ASTRBOT_AVAILABLE', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.provider = FakeProvider()
+        self.platform = FakePlatform(300)
+        self.plugin = EnhancedChatSummary(FakeContext(self.provider), self.make_config())
+
+    def make_config(self, **overrides):
+        config = {
+            "max_records": 500,
+            "message_store": {"path": ":memory:"},
+            "archive": {"path": ":memory:"},
+            "history_fetch": {"page_size": 20},
+            "cooldown_seconds": 0,
+            "i18n_cache_path": "",
+        }
+        config.update(overrides)
+        return config
+
+    async def run_summary(self, count, event=None):
+        event = event or FakeEvent(self.platform)
+        return [result async for result in self.plugin.summary(event, count)]
+
+    async def test_summary_uses_history_and_provider(self):
+        """总结命令应获取历史记录并调用LLM"""
+        results = await self.run_summary(50)
+
+        self.assertEqual(results, ["总结1"])
+        self.assertIn("消息300", self.provider.inputs[0])
+        self.assertIn("消息251", self.provider.inputs[0])
+        self.assertNotIn("消息250", self.provider.inputs[0])
+
+    async def test_repeated_summary_hits_cache(self):
+        """相同窗口的重复请求不应再次调用LLM"""
+        await self.run_summary(50)
+        results = await self.run_summary(50)
+
+        self.assertEqual(results, ["总结1"])
+        self.assertEqual(len(self.provider.inputs), 1)
+
+    async def test_new_messages_are_merged_incrementally(self):
+        """有少量新消息时只把新消息交给LLM"""
+        await self.run_summary(50)
+        self.platform.post(5)
+
+        results = await self.run_summary(50)
+
+        self.assertEqual(results, ["总结2"])
+        self.assertIn("总结1", self.provider.inputs[1])
+        self.assertIn("消息305", self.provider.inputs[1])
+        self.assertNotIn("消息299", self.provider.inputs[1])
+
+    async def test_concurrent_requests_share_one_llm_call(self):
+        """同一群组的并发请求只调用一次LLM"""
+        results = await asyncio.gather(*(
+            self.run_summary(50, FakeEvent(self.platform, sender_id=str(i))) for i in range(5)))
+
+        self.assertEqual(results, [["总结1"]] * 5)
+        self.assertEqual(len(self.provider.inputs), 1)
+
+    async def test_single_mode_keeps_newest_records_within_budget(self):
+        """一次总结模式下应只保留能放入上下文窗口的最新记录"""
+        self.plugin = EnhancedChatSummary(FakeContext(self.provider), self.make_config(
+            summarization={"mode": "single"},
+            llm={"context_window": 1300, "max_tokens": 1000}))
+        await self.run_summary(200)
+
+        input_text = self.provider.inputs[0]
+        self.assertIn("消息300", input_text)
+        self.assertNotIn("消息101", input_text)
+        self.assertLessEqual(self.plugin.token_estimator.count(input_text), 300)
+
+    def test_chunk_budget_has_a_floor(self):
+        """上下文窗口小于输出上限时分块预算不应降到0或负数"""
+        with self.assertLogs("astrbot.plugin.chatsummary", level="WARNING"):
+            plugin = EnhancedChatSummary(FakeContext(self.provider), self.make_config(
+                llm={"context_window": 1024, "max_tokens": 2000}))
+        self.assertEqual(plugin.map_reduce.chunk_tokens, MIN_CHUNK_TOKENS)
+
+    async def test_compaction_applies_to_llm_input(self):
+        """启用压缩时发送给LLM的记录应使用发言人别名"""
+        self.plugin = EnhancedChatSummary(FakeContext(self.provider), self.make_config(
+            compaction={"enabled": True}))
+        await self.run_summary(50)
+
+        self.assertIn("发言人对照", self.provider.inputs[0])
+        self.assertIn("消息300", self.provider.inputs[0])
+        self.assertNotIn("」: ", self.provider.inputs[0])
+        # 整段聊天记录的令牌统计不应留在缓存中
+        cached = self.plugin.token_estimator._count_cached.cache_info().currsize
+        self.plugin.compactor.render([f"[t]「用户{i}」: 消息{i}" for i in range(500)])
+        self.assertEqual(self.plugin.token_estimator._count_cached.cache_info().currsize, cached)
+
+    async def test_http_metrics_served_before_any_command(self):
+        """HTTP 指标导出应在插件加载后即可访问，不必等到第一次总结"""
+        self.plugin = EnhancedChatSummary(FakeContext(self.provider), self.make_config(
+            metrics={"enabled": True, "exporter": "http", "http_port": 0}))
+        exporter = self.plugin.metrics
+        try:
+            for _ in range(100):
+                if exporter._server is not None:
+                    break
+                await asyncio.sleep(0.01)
+            reader, writer = await asyncio.open_connection(exporter.host, exporter.port)
+            writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+            await writer.drain()
+            response = (await reader.read()).decode('utf-8')
+            writer.close()
+        finally:
+            await self.plugin.terminate()
+
+        self.assertTrue(response.startswith("HTTP/1.1 200 OK"))
+
+    async def test_metrics_and_debug_timing(self):
+        """指标应记录获取和LLM调用，调试模式应附上阶段耗时"""
+        self.plugin = EnhancedChatSummary(FakeContext(self.provider), self.make_config(
+            metrics={"enabled": True, "exporter": "memory"}))
+        self.plugin._is_admin = AsyncMock(return_value=True)
+
+        event = FakeEvent(self.platform)
+        results = [result async for result in self.plugin.summary(event, 50, "debug")]
+
+        self.assertIn("总结1", results)
+        self.assertTrue(results[-1].startswith("调试模式：阶段耗时"))
+        self.assertIn("获取消息", results[-1])
+        self.assertIn("其中 LLM 调用累计", results[-1])
+        metrics = self.plugin.metrics
+        self.assertEqual(metrics.value("messages_fetched_total"), 50)
+        self.assertEqual(metrics.value("llm_calls_total"), 1)
+        self.assertEqual(metrics.value("requests_total", result="ok"), 1)
+        self.assertEqual(metrics.value("stage_seconds", stage="llm"), 1)
+        self.assertEqual(metrics.value("stage_seconds", stage="send"), 1)
+
+    async def test_streaming_delivers_paragraphs(self):
+        """流式输出应按段落逐步发送，拼接后与完整总结一致"""
+        provider = StreamingProvider()
+        self.plugin = EnhancedChatSummary(FakeContext(provider), self.make_config(
+            streaming={"enabled": True, "first_chunk_chars": 10, "min_chunk_chars": 10}))
+
+        results = await self.run_summary(50)
+
+        self.assertGreater(len(results), 1)
+        self.assertEqual("\n\n".join(results), StreamingProvider.TEXT)
+        self.assertEqual(len(provider.inputs), 1)
+
+    async def test_streaming_failure_sends_only_the_error(self):
+        """流式输出中途失败时只发送错误提示，不重复发送已送达的段落"""
+        self.plugin = EnhancedChatSummary(FakeContext(BrokenStreamProvider()), self.make_config(
+            streaming={"enabled": True, "first_chunk_chars": 10, "min_chunk_chars": 10}))
+
+        results = await self.run_summary(50)
+
+        self.assertEqual(results[0], "【今日速览】群里讨论了开会安排。")
+        self.assertEqual(len(results), 2)
+        self.assertTrue(results[1].startswith(SUMMARY_ERROR_PREFIX))
+        self.assertIn("stream reset", results[1])
+
+    async def test_streaming_sends_only_the_remainder(self):
+        """最终结果在已送达的内容之后还有文本时只发送剩余部分"""
+        provider = StreamingProvider()
+        stream = provider.text_chat_stream
+
+        async def extended(input, max_tokens=None, temperature=None):
+            async for response in stream(input, max_tokens, temperature):
+                if not response.is_chunk:
+                    response.completion_text += "\n\n【补充】明天继续讨论"
+                yield response
+
+        provider.text_chat_stream = extended
+        self.plugin = EnhancedChatSummary(FakeContext(provider), self.make_config(
+            streaming={"enabled": True, "first_chunk_chars": 10, "min_chunk_chars": 10}))
+
+        results = await self.run_summary(50)
+
+        self.assertEqual("\n\n".join(results), StreamingProvider.TEXT + "\n\n【补充】明天继续讨论")
+
+    async def test_streaming_falls_back_without_stream_support(self):
+        """提供商不支持流式输出时应一次性发送"""
+        self.plugin = EnhancedChatSummary(FakeContext(self.provider), self.make_config(
+            streaming={"enabled": True}))
+
+        self.assertEqual(await self.run_summary(50), ["总结1"])
+
+    async def test_llm_config_and_transient_retry(self):
+        """模型调用应使用配置的参数，并重试临时错误"""
+        provider = FakeProvider(failures=1)
+        self.plugin = EnhancedChatSummary(FakeContext(provider), self.make_config(
+            llm={"max_tokens": 500, "temperature": 0.2, "retry_backoff": 0.001}))
+
+        self.assertEqual(await self.run_summary(50), ["总结1"])
+        self.assertEqual(provider.params, [(500, 0.2), (500, 0.2)])
+
+    async def test_precompute_serves_later_request(self):
+        """预计算的总结应被之后的相同请求直接使用"""
+        self.plugin = EnhancedChatSummary(FakeContext(self.provider), self.make_config(
+            precompute={"enabled": True, "windows": [50], "idle_seconds": 0, "min_new_messages": 1}))
+        self.addAsyncCleanup(self.plugin.terminate)
+        event = FakeEvent(self.platform)
+        await self.plugin.on_group_message(event)
+
+        self.assertEqual(await self.plugin.precompute.tick(), 1)
+        self.assertEqual(len(self.provider.inputs), 1)
+        self.assertEqual(await self.run_summary(50), ["总结1"])
+        self.assertEqual(len(self.provider.inputs), 1)
+
+    async def test_structured_output_rendered_with_template(self):
+        """结构化输出应按配置的格式渲染，流式输出不会发送原始 JSON"""
+        provider = StructuredProvider()
+        self.plugin = EnhancedChatSummary(FakeContext(provider), self.make_config(
+            output={"format": "text", "structured": True, "template_cache_dir": ""},
+            streaming={"enabled": True}))
+
+        results = await self.run_summary(50)
+
+        self.assertEqual(len(results), 1)
+        self.assertTrue(results[0].startswith("开会安排\n"))
+        self.assertIn("Key Points:\n- 八点开会", results[0])
+        self.assertIn("JSON", provider.inputs[0])
+        html = self.plugin.render_summary(StructuredProvider.TEXT, "html")
+        self.assertIn("<li>八点开会</li>", html)
+        self.assertEqual(len(provider.inputs), 1)
+
+    async def test_queue_reports_position_and_sheds_load(self):
+        """超过执行名额的请求应排队并告知位置，队列过长时直接拒绝"""
+        self.plugin = EnhancedChatSummary(FakeContext(self.provider), self.make_config(
+            queue={"max_in_flight": 1, "max_waiting": 1}))
+
+        results = await asyncio.gather(*(
+            self.run_summary(50, FakeEvent(self.platform, group_id=f"g{i}")) for i in range(3)))
+
+        self.assertEqual(results[0], ["总结1"])
+        self.assertEqual(results[1][0], "当前总结请求较多，已排队，排在第 1 位")
+        self.assertEqual(len(results[1]), 2)
+        self.assertEqual(results[2], ["当前总结请求过多，请稍后再试"])
+        self.assertEqual(len(self.provider.inputs), 2)
+        self.assertEqual((self.plugin.job_queue.running, self.plugin.job_queue.waiting), (0, 0))
+
+    async def test_cooldown_blocks_repeated_requests(self):
+        """冷却时间内同一用户的请求应被拒绝"""
+        self.plugin = EnhancedChatSummary(FakeContext(self.provider), self.make_config(cooldown_seconds=60))
+        await self.run_summary(50)
+        results = await self.run_summary(50)
+
+        self.assertEqual(len(results), 1)
+        self.assertIn("冷却", results[0])
+        self.assertEqual(len(self.provider.inputs), 1)
+
+    async def test_summaries_are_archived_and_searchable(self):
+        """生成的总结应连同窗口写入归档，总结搜索只在本群的归档中查找，不调用LLM"""
+        await self.run_summary(50)
+        # 缓存命中返回相同的总结，不会重复归档
+        await self.run_summary(50)
+
+        entries = self.plugin._get_archive().search(group_id="g1")
+        self.assertEqual(len(entries), 1)
+        entry = entries[0]
+        self.assertEqual((entry.start_time, entry.end_time), (1700000251, 1700000300))
+        self.assertEqual((entry.message_count, entry.model, entry.summary), (50, "fake-model", "总结1"))
+        self.assertGreater(entry.prompt_tokens, entry.completion_tokens)
+
+        day = time.strftime("%Y-%m-%d", time.localtime(entry.end_time))
+        next_day = time.strftime("%Y-%m-%d", time.localtime(entry.end_time + 86400))
+        event = FakeEvent(self.platform)
+        results = [result async for result in self.plugin.search_summaries(event, "总结", day)]
+        self.assertTrue(results[0].startswith("找到 1 条历史总结"))
+        self.assertIn(f"#{entry.id} ", results[0])
+        results = [result async for result in self.plugin.search_summaries(event, f"#{entry.id}")]
+        self.assertTrue(results[0].endswith("\n\n总结1"))
+        results = [result async for result in self.plugin.search_summaries(event, next_day)]
+        self.assertEqual(results, ["没有找到符合条件的历史总结"])
+        other = FakeEvent(self.platform, group_id="g2")
+        results = [result async for result in self.plugin.search_summaries(other, f"#{entry.id}")]
+        self.assertEqual(results, [f"本群没有编号为 {entry.id} 的总结"])
+        self.assertEqual(len(self.provider.inputs), 1)
+
+    async def test_interleaved_topics_summarized_separately(self):
+        """启用话题切分时，交错的对话按话题分别总结，回复归入被回复消息的话题"""
+        from tests.test_topics import RELEASE, DINNER
+        platform = FakePlatform(13)
+        texts = [text for pair in zip(RELEASE, DINNER) for text in pair] + ["好的"]
+        for message, text in zip(platform.messages, texts):
+            message['message'] = [{'type': 'text', 'data': {'text': text}}]
+        # 最后一条回复第二条消息（晚饭话题）
+        platform.messages[-1]['message'].insert(0, {'type': 'reply', 'data': {'id': 2}})
+        self.platform = platform
+        self.plugin = EnhancedChatSummary(FakeContext(self.provider), self.make_config(
+            topics={"enabled": True, "min_lines": 10, "min_topic_lines": 3}))
+
+        results = await self.run_summary(13)
+
+        self.assertEqual(len(self.provider.inputs), 2)
+        self.assertIn("话题 1/2", self.provider.inputs[0])
+        self.assertIn("回归测试", self.provider.inputs[0])
+        self.assertNotIn("火锅", self.provider.inputs[0])
+        self.assertIn("好的", self.provider.inputs[1])
+        self.assertEqual(len(results), 1)
+        self.assertIn("【话题1】（6 条消息）", results[0])
+        self.assertIn("【话题2】（7 条消息）", results[0])
+        # 配置的总结提示词出现在每个话题的调用中
+        prompt = self.plugin._load_prompt()
+        for llm_input in self.provider.inputs:
+            self.assertIn(prompt, llm_input)
+
+        # 自定义提示词（如用户总结）同样传入每个话题
+        lines = [line for llm_input in self.provider.inputs for line in llm_input.splitlines()
+                 if line.startswith("[")]
+        await self.plugin._summarize_full("只总结小明的发言", sorted(lines))
+        self.assertEqual(len(self.provider.inputs), 4)
+        for llm_input in self.provider.inputs[2:]:
+            self.assertIn("只总结小明的发言", llm_input)
+            self.assertNotIn(prompt, llm_input)
+
+    async def test_extractive_selection_shrinks_long_windows(self):
+        """启用抽取式预选时，超出预算的记录在本地筛选后一次总结，保持时间顺序"""
+        self.plugin = EnhancedChatSummary(FakeContext(self.provider), self.make_config(
+            extractive={"enabled": True, "max_tokens": 200}))
+
+        results = await self.run_summary(300)
+
+        self.assertEqual(results, ["总结1"])
+        self.assertEqual(len(self.provider.inputs), 1)
+        numbers = [int(line.rsplit("消息", 1)[1]) for line in self.provider.inputs[0].splitlines()
+                   if line.startswith("[") and "消息" in line]
+        self.assertLess(len(numbers), 300)
+        self.assertGreater(len(numbers), 0)
+        self.assertEqual(numbers, sorted(numbers))
+        self.assertLessEqual(self.plugin.token_estimator.count_lines(
+            [line for line in self.provider.inputs[0].splitlines() if line.startswith("[")]), 200)
+
+
+    async def test_user_summary_uses_sender_index(self):
+        """用户总结只把该成员的发言和相关回复发送给LLM"""
+        for message in self.platform.messages:
+            if message['message_seq'] % 10 == 0:
+                message['sender'] = {'user_id': '20002', 'nickname': '小明'}
+        # 消息 295 回复小明的消息 290
+        self.platform.messages[294]['message'].insert(0, {'type': 'reply', 'data': {'id': 290}})
+        event = FakeEvent(self.platform)
+        event.message_obj = type("Message", (), {"message": [{'type': 'at', 'data': {'qq': '20002'}}]})()
+
+        results = [result async for result in self.plugin.user_summary(event, "@小明", "3")]
+
+        self.assertEqual(results, ["总结1"])
+        prompt = self.provider.inputs[0]
+        self.assertIn("「小明」", prompt)
+        for number in (300, 290, 295, 280):
+            self.assertIn(f"消息{number}", prompt)
+        self.assertNotIn("消息299", prompt)
+        self.assertNotIn("消息270", prompt)
+
+        self.assertEqual(await self.run_user_summary("30003"), ["最近 2000 条消息中没有找到该成员的发言"])
+        self.assertEqual(await self.run_user_summary(), [self.plugin.i18n.get("user_summary_usage")])
+        self.assertEqual(len(self.provider.inputs), 1)
+
+    async def test_user_summary_queues_and_pauses_precompute(self):
+        """用户总结与消息总结一样排队告知位置，执行期间后台预计算暂停"""
+        self.plugin = EnhancedChatSummary(FakeContext(self.provider), self.make_config(
+            queue={"max_in_flight": 1, "max_waiting": 4},
+            precompute={"enabled": True, "windows": [50]}))
+        self.addAsyncCleanup(self.plugin.terminate)
+        interactive = []
+        text_chat = self.provider.text_chat
+
+        async def record(*args, **kwargs):
+            interactive.append(self.plugin.precompute.interactive_requests)
+            return await text_chat(*args, **kwargs)
+        self.provider.text_chat = record
+
+        results = await asyncio.gather(self.run_summary(50, FakeEvent(self.platform, group_id="g2")),
+                                       self.run_user_summary("10001", "5"))
+
+        self.assertEqual(results[0], ["总结1"])
+        self.assertEqual(results[1], [self.plugin.i18n.get("summary_queued", position=1), "总结2"])
+        self.assertEqual(interactive, [2, 1])
+
+    async def run_user_summary(self, *args):
+        event = FakeEvent(self.platform)
+        return [result async for result in self.plugin.user_summary(event, *args)]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试结构化总结的解析和模板渲染
+"""
+
+import os
+import sys
+import json
+import tempfile
+import unittest
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatsummary import rendering
+from chatsummary.rendering import (
+    SimpleTemplate, StructuredSummary, SummaryRenderer, normalize_format, parse_structured,
+)
+
+STRUCTURED = {
+    "title": "周会讨论",
+    "summary": "大家讨论了发布计划。",
+    "key_points": ["周五发布", "  ", 3],
+    "action_items": "小明整理发布说明",
+    "questions": [],
+    "participants": ["小明", "小红"],
+}
+
+
+class TestParseStructured(unittest.TestCase):
+    """测试LLM输出的校验"""
+
+    def test_json_in_code_fence_and_prose(self):
+        text = json.dumps(STRUCTURED, ensure_ascii=False)
+        for output in (text, f"```json\n{text}\n```", f"好的，以下是总结：\n{text}\n希望有帮助"):
+            summary = parse_structured(output)
+            self.assertTrue(summary.structured)
+            self.assertEqual(summary.title, "周会讨论")
+            self.assertEqual(summary.key_points, ["周五发布", "3"])
+            self.assertEqual(summary.action_items, ["小明整理发布说明"])
+            self.assertEqual(summary.participants, ["小明", "小红"])
+
+    def test_invalid_output_falls_back_to_text(self):
+        for output in ("【今日速览】没有 JSON", '{"title": "缺少概述"}', '{"summary": "a", "key_points": {"x": 1}}',
+                       '{"summary": "a",'):
+            summary = parse_structured(output)
+            self.assertFalse(summary.structured)
+            self.assertEqual(summary.summary, output)
+            self.assertEqual(summary.key_points, [])
+
+    def test_normalize_format(self):
+        self.assertEqual(normalize_format("plain"), "text")
+        self.assertEqual(normalize_format("MD"), "markdown")
+        with self.assertRaises(ValueError):
+            normalize_format("pdf")
+
+
+class TestSimpleTemplate(unittest.TestCase):
+    """测试内置模板引擎"""
+
+    def test_blocks_and_whitespace(self):
+        template = SimpleTemplate("# {{ title }}\n{% if items %}\n  {% for item in items %}\n- {{ item }}\n"
+                                  "  {% endfor %}\n{% else %}\nnone\n{% endif %}\nend")
+        self.assertEqual(template.render(title="T", items=["a", "b"]), "# T\n- a\n- b\nend")
+        self.assertEqual(template.render(title="T", items=[]), "# T\nnone\nend")
+
+    def test_escape_and_errors(self):
+        template = SimpleTemplate("<p>{{ text }}</p>", autoescape=True)
+        self.assertEqual(template.render(text="<b>&"), "<p>&lt;b&gt;&amp;</p>")
+        for source in ("{% for x in items %}", "{{ a | upper }}", "{% set x = 1 %}", "{% endif %}"):
+            with self.assertRaises(ValueError):
+                SimpleTemplate(source)
+
+
+class TestSummaryRenderer(unittest.TestCase):
+    """测试模板渲染"""
+
+    def setUp(self):
+        self.summary = parse_structured(json.dumps(STRUCTURED, ensure_ascii=False))
+
+    def test_one_summary_renders_every_format(self):
+        outputs = SummaryRenderer().render_all(self.summary, ["markdown", "html", "plain"], date="2024-01-01")
+        self.assertEqual(set(outputs), {"markdown", "html", "text"})
+        self.assertIn("# 周会讨论", outputs["markdown"])
+        self.assertIn("- [ ] 小明整理发布说明", outputs["markdown"])
+        self.assertIn("**Participants:** 小明, 小红", outputs["markdown"])
+        # 没有内容的部分不输出标题
+        self.assertNotIn("Questions Raised", outputs["markdown"])
+        self.assertIn("<li>周五发布</li>", outputs["html"])
+        self.assertNotIn("{%", outputs["html"])
+        self.assertTrue(outputs["text"].startswith("周会讨论\nDate: 2024-01-01\n"))
+
+    def test_html_is_escaped_and_fallback_title(self):
+        summary = StructuredSummary(summary="<script>alert(1)</script>")
+        renderer = SummaryRenderer()
+        self.assertIn("&lt;script&gt;", renderer.render(summary, "html", title="聊天记录总结"))
+        self.assertTrue(renderer.render(summary, "markdown", title="聊天记录总结").startswith("# 聊天记录总结\n"))
+
+    def test_custom_templates_and_compile_once(self):
+        with tempfile.TemporaryDirectory() as custom:
+            with open(os.path.join(custom, "markdown_template.md"), 'w', encoding='utf-8') as f:
+                f.write("自定义：{{ title }}")
+            os.makedirs(os.path.join(custom, "brief"))
+            with open(os.path.join(custom, "brief", "text_template.txt"), 'w', encoding='utf-8') as f:
+                f.write("{{ summary }}")
+
+            renderer = SummaryRenderer(custom_templates_dir=custom)
+            self.assertEqual(renderer.render(self.summary, "markdown"), "自定义：周会讨论\n")
+            # 自定义目录中没有的模板使用自带模板
+            self.assertIn("<html", renderer.render(self.summary, "html"))
+            compiled = renderer._load(renderer.template_name("markdown"))
+            renderer.render(self.summary, "markdown")
+            self.assertIs(renderer._load(renderer.template_name("markdown")), compiled)
+
+            brief = SummaryRenderer(custom_templates_dir=custom, template="brief")
+            self.assertEqual(brief.render(self.summary, "text"), "大家讨论了发布计划。\n")
+            with self.assertRaises(FileNotFoundError):
+                brief.render(self.summary, "markdown")
+
+    @unittest.skipIf(rendering.jinja2 is None, "jinja2 is not installed")
+    def test_builtin_engine_matches_jinja2(self):
+        for fmt, name in rendering.FORMAT_TEMPLATES.items():
+            with open(os.path.join(rendering.DEFAULT_TEMPLATES_DIR, name), encoding='utf-8') as f:
+                source = f.read()
+            values = dict(title="T", date="D", summary="S <b>", key_points=["a"], action_items=[],
+                          questions=["q"], participants="x")
+            environment = rendering.jinja2.Environment(
+                trim_blocks=True, lstrip_blocks=True, keep_trailing_newline=True, autoescape=fmt == "html")
+            self.assertEqual(SimpleTemplate(source, name, autoescape=fmt == "html").render(**values),
+                             environment.from_string(source).render(**values))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试增量滚动总结功能
+"""
+
+import os
+import sys
+import unittest
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatsummary import MessageStore, RollingSummarizer, prompt_hash
+
+
+class TestRollingSummarizer(unittest.IsolatedAsyncioTestCase):
+    """测试检查点复用规则"""
+
+    def setUp(self):
+        self.store = MessageStore(':memory:')
+        self.prompts = []
+        self.full_calls = []
+        self.rolling = RollingSummarizer(self.store, self.complete, max_new_ratio=0.5)
+
+    def tearDown(self):
+        self.store.close()
+
+    async def complete(self, prompt):
+        self.prompts.append(prompt)
+        return f"合并总结{len(self.prompts)}"
+
+    async def full(self, lines):
+        self.full_calls.append(lines)
+        return f"完整总结{len(self.full_calls)}"
+
+    async def summarize(self, first, last):
+        seqs = list(range(first, last + 1))
+        lines = [f"消息{seq}" for seq in seqs]
+        return await self.rolling.summarize("g1", "提示词", "model", lines, seqs, self.full)
+
+    async def test_first_request_builds_checkpoint(self):
+        """首次请求应完整总结并保存检查点"""
+        self.assertEqual(await self.summarize(1, 100), "完整总结1")
+        checkpoint = self.store.get_checkpoint("g1", prompt_hash("提示词"), "model")
+        self.assertEqual((checkpoint.oldest_seq, checkpoint.newest_seq), (1, 100))
+
+    async def test_only_new_messages_are_merged(self):
+        """检查点可用时只把新消息交给LLM"""
+        await self.summarize(1, 100)
+
+        result = await self.summarize(11, 110)
+
+        self.assertEqual(result, "合并总结1")
+        self.assertIn("完整总结1", self.prompts[0])
+        self.assertIn("消息110", self.prompts[0])
+        self.assertNotIn("消息100\n", self.prompts[0])
+        self.assertEqual(len(self.full_calls), 1)
+
+    async def test_unchanged_window_returns_checkpoint(self):
+        """没有新消息时直接返回检查点中的总结"""
+        await self.summarize(1, 100)
+        self.assertEqual(await self.summarize(1, 100), "完整总结1")
+        self.assertEqual(self.prompts, [])
+
+    async def test_too_many_new_messages_triggers_full_summary(self):
+        """新消息过多时应重新完整总结"""
+        await self.summarize(1, 100)
+        self.assertEqual(await self.summarize(61, 160), "完整总结2")
+
+    async def test_smaller_window_is_not_answered_from_checkpoint(self):
+        """请求窗口比检查点短时不能返回或合并检查点中的总结"""
+        await self.summarize(1, 100)
+
+        self.assertEqual(await self.summarize(51, 100), "完整总结2")
+        self.assertEqual(await self.summarize(71, 110), "完整总结3")
+        self.assertEqual(self.prompts, [])
+        checkpoint = self.store.get_checkpoint("g1", prompt_hash("提示词"), "model")
+        self.assertEqual((checkpoint.oldest_seq, checkpoint.newest_seq), (71, 110))
+
+    async def test_sliding_window_keeps_merging(self):
+        """窗口随新消息滑动时应连续增量合并"""
+        await self.summarize(1, 100)
+        await self.summarize(11, 110)
+
+        self.assertEqual(await self.summarize(21, 120), "合并总结2")
+        self.assertEqual(len(self.full_calls), 1)
+
+    async def test_stale_checkpoint_is_not_reused(self):
+        """检查点早于窗口起点的部分超过窗口长度时不再复用"""
+        await self.summarize(1, 100)
+        self.assertEqual(await self.summarize(96, 140), "完整总结2")
+
+
+if __name__ == "__main__":
+    unittest.main()
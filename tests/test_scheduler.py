@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试后台预计算调度
+"""
+
+import os
+import sys
+import time
+import unittest
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatsummary import (
+    PrecomputeScheduler, ActivityTracker, CallBudget, BudgetExhausted, PrometheusRegistry, current_budget,
+)
+from chatsummary.scheduler import parse_hours, in_hours
+
+
+def local_timestamp(hour, minute=0):
+    """今天指定本地时间的时间戳"""
+    now = time.localtime()
+    return time.mktime((now.tm_year, now.tm_mon, now.tm_mday, hour, minute, 0, 0, 0, -1))
+
+
+class TestSchedulerHelpers(unittest.TestCase):
+    """测试预算、时间段和活跃度统计"""
+
+    def test_budget(self):
+        budget = CallBudget(2)
+        budget.charge()
+        budget.charge()
+        self.assertEqual(budget.remaining(), 0)
+        with self.assertRaises(BudgetExhausted):
+            budget.charge()
+        self.assertEqual(CallBudget(0).remaining(), float("inf"))
+
+    def test_hours(self):
+        hours = parse_hours(["01:00-07:30", "23:00-00:30"])
+        self.assertEqual(hours, [(60, 450), (1380, 30)])
+        self.assertTrue(in_hours(hours, local_timestamp(3)))
+        self.assertTrue(in_hours(hours, local_timestamp(23, 30)))
+        self.assertTrue(in_hours(hours, local_timestamp(0, 10)))
+        self.assertFalse(in_hours(hours, local_timestamp(12)))
+        self.assertTrue(in_hours([], local_timestamp(12)))
+        with self.assertRaises(ValueError):
+            parse_hours(["8-9"])
+
+    def test_busiest_decays_old_activity(self):
+        tracker = ActivityTracker(half_life=3600)
+        for _ in range(10):
+            tracker.record("old", now=0)
+        for _ in range(4):
+            tracker.record("new", now=4 * 3600)
+        self.assertEqual([a.group_id for a in tracker.busiest(2, now=4 * 3600)], ["new", "old"])
+        self.assertEqual([a.group_id for a in tracker.busiest(1, allowed=["old"], now=4 * 3600)], ["old"])
+
+
+class TestPrecomputeScheduler(unittest.IsolatedAsyncioTestCase):
+    """测试调度规则"""
+
+    def make_scheduler(self, **kwargs):
+        self.jobs = []
+
+        async def run_job(activity, count):
+            self.jobs.append((activity.group_id, count))
+            budget = current_budget.get()
+            budget.charge()
+            return True
+
+        options = dict(windows=[100, 50], top_groups=2, idle_seconds=60, min_new_messages=3,
+                       daily_llm_calls=0, metrics=PrometheusRegistry())
+        options.update(kwargs)
+        scheduler = PrecomputeScheduler(run_job, **options)
+        self.addAsyncCleanup(scheduler.stop)
+        return scheduler
+
+    def feed(self, scheduler, group_id, count, now):
+        for _ in range(count):
+            scheduler.record(group_id, event=object(), now=now)
+
+    async def test_precomputes_idle_busy_groups(self):
+        scheduler = self.make_scheduler()
+        now = time.time()
+        self.feed(scheduler, "busy", 10, now - 120)
+        self.feed(scheduler, "quiet", 2, now - 120)
+        self.feed(scheduler, "talking", 10, now)
+
+        self.assertEqual(await scheduler.tick(now), 2)
+        self.assertEqual(self.jobs, [("busy", 50), ("busy", 100)])
+        self.assertEqual(scheduler.budget.used, 2)
+        # 没有新消息时不会重复预计算
+        self.assertEqual(await scheduler.tick(now + 120), 2)
+        self.assertEqual(self.jobs[2:], [("talking", 50), ("talking", 100)])
+        self.assertEqual(await scheduler.tick(now + 240), 0)
+
+    async def test_allowlist_and_hours(self):
+        scheduler = self.make_scheduler(groups=["g2"], active_hours=["02:00-04:00"])
+        at_night = local_timestamp(3)
+        self.feed(scheduler, "g1", 10, at_night - 120)
+        self.feed(scheduler, "g2", 10, at_night - 120)
+
+        self.assertEqual(await scheduler.tick(local_timestamp(12)), 0)
+        self.assertEqual(await scheduler.tick(at_night), 2)
+        self.assertEqual({group_id for group_id, _ in self.jobs}, {"g2"})
+
+    async def test_backs_off_for_interactive_requests(self):
+        scheduler = self.make_scheduler()
+        now = time.time()
+        self.feed(scheduler, "g1", 10, now - 120)
+
+        with scheduler.interactive():
+            self.assertEqual(await scheduler.tick(now), 0)
+        self.assertEqual(self.jobs, [])
+        self.assertEqual(await scheduler.tick(now), 2)
+
+    async def test_stops_when_budget_is_exhausted(self):
+        scheduler = self.make_scheduler(daily_llm_calls=3)
+        now = time.time()
+        self.feed(scheduler, "g1", 10, now - 120)
+        self.feed(scheduler, "g2", 5, now - 120)
+
+        self.assertEqual(await scheduler.tick(now), 3)
+        self.assertEqual(scheduler.budget.remaining(now), 0)
+        self.assertEqual(await scheduler.tick(now), 0)
+        self.assertEqual(len(self.jobs), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
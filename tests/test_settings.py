@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试配置文件服务
+"""
+
+import os
+import sys
+import json
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatsummary import ConfigService
+from main import EnhancedChatSummary
+
+
+class TestConfigService(unittest.IsolatedAsyncioTestCase):
+    """测试配置文件的缓存和重新加载"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.temp_dir.name, 'config.json')
+        self.admin_path = os.path.join(self.temp_dir.name, 'admin_config.json')
+        self.write(self.config_path, {'prompt': '提示词1'})
+        self.write(self.admin_path, {'admins_id': [123456, '654321']})
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, path, data):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    async def test_values_are_cached(self):
+        """未修改的文件只解析一次"""
+        service = ConfigService(self.config_path, self.admin_path, check_interval=0)
+
+        self.assertEqual(service.prompt, '提示词1')
+        await service.refresh()
+        await service.refresh()
+
+        self.assertEqual(service.prompt, '提示词1')
+        self.assertEqual(service.prompt_file.loads, 1)
+        self.assertIsInstance(service.admin_file.value.admins, frozenset)
+
+    async def test_modified_file_is_reloaded(self):
+        """文件内容变化后刷新应读取新内容"""
+        service = ConfigService(self.config_path, self.admin_path, check_interval=0)
+        self.assertEqual(service.prompt, '提示词1')
+
+        self.write(self.config_path, {'prompt': '新的提示词'})
+        await service.refresh()
+
+        self.assertEqual(service.prompt, '新的提示词')
+
+    async def test_check_interval_skips_stat(self):
+        """检查间隔内刷新不应访问文件"""
+        service = ConfigService(self.config_path, self.admin_path, check_interval=3600)
+        self.assertEqual(service.prompt, '提示词1')
+
+        self.write(self.config_path, {'prompt': '新的提示词'})
+        await service.refresh()
+
+        self.assertEqual(service.prompt, '提示词1')
+
+    def test_admin_ids_are_normalized(self):
+        """数字和字符串形式的管理员账号都应识别"""
+        service = ConfigService(self.config_path, self.admin_path)
+
+        self.assertTrue(service.is_admin('123456'))
+        self.assertTrue(service.is_admin(654321))
+        self.assertFalse(service.is_admin('111111'))
+
+    def test_missing_or_invalid_files_use_defaults(self):
+        """文件不存在或无法解析时使用默认值"""
+        with open(self.config_path, 'w', encoding='utf-8') as f:
+            f.write('{invalid')
+        service = ConfigService(self.config_path, os.path.join(self.temp_dir.name, 'missing.json'))
+
+        self.assertEqual(service.prompt, 'Default prompt')
+        self.assertFalse(service.is_admin('123456'))
+
+
+class TestPluginAdminCheck(unittest.IsolatedAsyncioTestCase):
+    """测试插件的管理员检查"""
+
+    async def test_async_is_admin_checks_sender(self):
+        """异步管理员检查应返回布尔结果而不是协程"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            admin_path = os.path.join(temp_dir, 'admin_config.json')
+            with open(admin_path, 'w', encoding='utf-8') as f:
+                json.dump({'admins_id': ['123456']}, f)
+            plugin = EnhancedChatSummary(MagicMock(), {})
+            plugin.config_service = ConfigService(plugin.config_path, admin_path)
+
+            admin_event = MagicMock()
+            admin_event.get_sender_id.return_value = 123456
+            other_event = MagicMock()
+            other_event.get_sender_id.return_value = 654321
+
+            self.assertIs(await plugin._is_admin(admin_event), True)
+            self.assertIs(await plugin._is_admin(other_event), False)
+
+
+if __name__ == "__main__":
+    unittest.main()
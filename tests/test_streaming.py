@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试流式输出功能
+"""
+
+import os
+import sys
+import asyncio
+import unittest
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatsummary import ParagraphChunker, SummaryStream
+
+
+class TestParagraphChunker(unittest.TestCase):
+    """测试段落切分规则"""
+
+    def test_first_chunk_at_paragraph_boundary(self):
+        """第一段遇到段落边界应立即输出"""
+        chunker = ParagraphChunker(first_chunk_chars=80, min_chunk_chars=30)
+
+        self.assertEqual(chunker.feed("【今日速览】"), [])
+        self.assertEqual(chunker.feed("大家在讨论开会。\n\n【热门"), ["【今日速览】大家在讨论开会。"])
+
+    def test_first_chunk_at_sentence_end(self):
+        """第一段足够长后应在句末输出，不必等待段落边界"""
+        chunker = ParagraphChunker(first_chunk_chars=10, min_chunk_chars=30)
+
+        self.assertEqual(chunker.feed("今天群里非常热闹，大家讨论了很多话题。然后"), ["今天群里非常热闹，大家讨论了很多话题。"])
+        self.assertEqual(chunker.delivered, len("今天群里非常热闹，大家讨论了很多话题。"))
+        self.assertEqual(chunker.flush(), "然后")
+        self.assertEqual(chunker.chunks, 2)
+        self.assertEqual(chunker.delivered, len("今天群里非常热闹，大家讨论了很多话题。然后"))
+
+    def test_later_chunks_wait_for_min_size(self):
+        """之后的段落应累计到最少字符数再输出"""
+        chunker = ParagraphChunker(first_chunk_chars=5, min_chunk_chars=15)
+        chunker.feed("第一段。\n\n")
+
+        self.assertEqual(chunker.feed("短段落\n\n"), [])
+        ready = chunker.feed("又一个比较长的段落内容在这里\n\n")
+
+        self.assertEqual(ready, ["短段落\n\n又一个比较长的段落内容在这里"])
+
+    def test_long_text_without_boundaries_is_split(self):
+        """没有段落边界的长文本应按最大长度截断"""
+        chunker = ParagraphChunker(first_chunk_chars=1000, min_chunk_chars=10, max_chunk_chars=20)
+
+        ready = chunker.feed("一" * 50)
+
+        self.assertEqual([len(chunk) for chunk in ready], [20, 20])
+        self.assertEqual(chunker.flush(), "一" * 10)
+
+
+class TestSummaryStream(unittest.IsolatedAsyncioTestCase):
+    """测试流式通道"""
+
+    async def test_iterate_until_task_done(self):
+        """应读取任务写入的所有片段，并在任务结束后停止"""
+        stream = SummaryStream()
+
+        async def produce():
+            for delta in ("a", "b", "c"):
+                stream.put(delta)
+                await asyncio.sleep(0)
+            return "abc"
+
+        task = asyncio.ensure_future(produce())
+        deltas = [delta async for delta in stream.iterate(task)]
+
+        self.assertEqual("".join(deltas), "abc")
+        self.assertTrue(stream.started)
+
+    async def test_task_without_output(self):
+        """任务没有写入任何片段时应直接结束"""
+        stream = SummaryStream()
+        task = asyncio.ensure_future(asyncio.sleep(0, result="done"))
+
+        self.assertEqual([delta async for delta in stream.iterate(task)], [])
+        self.assertFalse(stream.started)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试分层映射-归约总结功能
+"""
+
+import os
+import sys
+import asyncio
+import unittest
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatsummary import MapReduceSummarizer
+
+
+class FakeLLM:
+    """记录调用情况的模拟LLM"""
+
+    def __init__(self):
+        self.prompts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def complete(self, prompt):
+        self.prompts.append(prompt)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0)
+        self.in_flight -= 1
+        return f"摘要{len(self.prompts)}"
+
+
+class TestMapReduceSummarizer(unittest.IsolatedAsyncioTestCase):
+    """测试分块与归约逻辑"""
+
+    def test_split_respects_budget(self):
+        """分块应保持顺序且不超出预算"""
+        summarizer = MapReduceSummarizer(None, chunk_tokens=25)
+        lines = [f"第{i:02d}行聊天内容" for i in range(10)]
+
+        chunks = summarizer.split(lines)
+
+        self.assertEqual([line for chunk in chunks for line in chunk], lines)
+        for chunk in chunks:
+            self.assertLessEqual(sum(summarizer.estimate(line) + 1 for line in chunk), 25)
+
+    def test_oversized_line_gets_own_chunk(self):
+        """单行超出预算时应独占一个分块"""
+        summarizer = MapReduceSummarizer(None, chunk_tokens=10)
+        chunks = summarizer.split(["短", "很" * 30, "短"])
+        self.assertEqual(len(chunks), 3)
+
+    async def test_short_input_uses_single_call(self):
+        """未超出预算时只调用一次LLM"""
+        llm = FakeLLM()
+        summarizer = MapReduceSummarizer(llm.complete, chunk_tokens=1000)
+
+        result = await summarizer.summarize("提示词", ["a", "b"])
+
+        self.assertEqual(result, "摘要1")
+        self.assertEqual(llm.prompts, ["提示词\n\na\nb"])
+
+    async def test_map_reduce_with_concurrency_limit(self):
+        """分块摘要应并发执行且不超过并发上限，最终归约使用原提示词"""
+        llm = FakeLLM()
+        summarizer = MapReduceSummarizer(llm.complete, chunk_tokens=30, max_concurrency=3)
+        lines = [f"消息内容{i:03d}" for i in range(40)]
+
+        result = await summarizer.summarize("提示词", lines)
+
+        self.assertLessEqual(llm.max_in_flight, 3)
+        self.assertGreater(llm.max_in_flight, 1)
+        self.assertTrue(llm.prompts[-1].startswith("提示词"))
+        self.assertEqual(result, f"摘要{len(llm.prompts)}")
+
+    async def test_recursive_reduce_when_parts_exceed_budget(self):
+        """摘要总量超出预算时应先分组合并"""
+        llm = FakeLLM()
+        summarizer = MapReduceSummarizer(llm.complete, chunk_tokens=12, max_concurrency=2)
+        lines = [f"消息{i:02d}" for i in range(30)]
+
+        await summarizer.summarize("提示词", lines)
+
+        combine_calls = [p for p in llm.prompts if p.startswith("以下是同一段群聊记录")]
+        self.assertTrue(combine_calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试令牌估算功能
+"""
+
+import os
+import sys
+import unittest
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatsummary import TokenEstimator, heuristic_tokens
+
+
+class TestHeuristicTokens(unittest.TestCase):
+    """测试启发式令牌估算"""
+
+    def test_cjk_counts_per_character(self):
+        """中日韩字符应按每字一个令牌计算"""
+        self.assertEqual(heuristic_tokens("今天吃什么"), 5)
+        self.assertEqual(heuristic_tokens("こんにちは"), 5)
+        self.assertEqual(heuristic_tokens("안녕하세요"), 5)
+
+    def test_latin_words_and_symbols(self):
+        """拉丁单词按4个字符一个令牌，符号各计一个令牌"""
+        self.assertEqual(heuristic_tokens("hello world"), 4)
+        self.assertEqual(heuristic_tokens("ok!"), 2)
+        self.assertEqual(heuristic_tokens(""), 0)
+
+    def test_mixed_text_exceeds_character_ratio(self):
+        """中文文本的估算不应低于按字符数除以4的估算"""
+        text = "[12:30] 张三: 今晚八点开会，记得带电脑"
+        self.assertGreater(heuristic_tokens(text), len(text) // 4)
+
+
+class TestTokenEstimator(unittest.TestCase):
+    """测试令牌估算器"""
+
+    def test_unknown_backend_falls_back(self):
+        """未知或不可用的后端应退回启发式估算"""
+        estimator = TokenEstimator(backend="unknown")
+        self.assertEqual(estimator.backend, "heuristic")
+        self.assertEqual(estimator.count("你好"), 2)
+
+    def test_count_lines_includes_separators(self):
+        """多行计数应包含换行分隔符"""
+        estimator = TokenEstimator()
+        self.assertEqual(estimator.count_lines(["你好", "再见"]), 5)
+        self.assertEqual(estimator.count_lines([]), 0)
+
+    def test_pack_recent_keeps_newest(self):
+        """打包应从最新记录向前保留，并保持时间顺序"""
+        estimator = TokenEstimator()
+        lines = ["一一一", "二二二", "三三三", "四四四"]
+
+        packed, used = estimator.pack_recent(lines, 9)
+
+        self.assertEqual(packed, ["三三三", "四四四"])
+        self.assertEqual(used, 8)
+
+    def test_pack_recent_empty_budget(self):
+        """预算不足一行时不保留任何记录"""
+        packed, used = TokenEstimator().pack_recent(["你好"], 1)
+        self.assertEqual((packed, used), ([], 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
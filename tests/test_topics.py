@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+测试话题切分和按话题总结
+"""
+
+import os
+import sys
+import asyncio
+import unittest
+from unittest.mock import patch
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatsummary import topics
+from chatsummary.topics import TopicSegmenter, TopicSummarizer, ngrams
+
+RELEASE = ["周五发布新版本之前要跑回归测试", "回归测试发现登录页面有问题", "登录页面的问题今天修复",
+           "修复之后重新跑回归测试", "回归测试通过就发布新版本", "新版本发布说明我来写"]
+DINNER = ["今晚一起去吃火锅吧", "火锅店要提前打电话订位", "我来打电话订位今晚七点",
+          "七点的火锅店订好了", "吃完火锅再去唱歌", "唱歌的地方也订好了"]
+
+
+def interleaved():
+    """两段交错进行的对话，以及混在其中的简短回应"""
+    lines, truth = [], []
+    for release, dinner in zip(RELEASE, DINNER):
+        lines += [f"[2024-05-01 10:00:00]「小明」: {release}", f"[2024-05-01 10:00:30]「小红」: {dinner}"]
+        truth += ["release", "dinner"]
+    lines.append("[2024-05-01 10:01:00]「小刚」: 好的")
+    truth.append("dinner")
+    return lines, truth
+
+
+class TestTopicSegmenter(unittest.TestCase):
+    """测试话题切分"""
+
+    def test_ngrams(self):
+        self.assertEqual(ngrams("[2024-05-01 10:00:00]「小明」: 吃火锅 [图片] OK 吗"),
+                         ["吃火", "火锅", "ok", "吗"])
+
+    def test_interleaved_conversations_are_separated(self):
+        lines, truth = interleaved()
+        segments = TopicSegmenter(min_topic_lines=3).segment(lines)
+        self.assertEqual(len(segments), 2)
+        for segment in segments:
+            self.assertEqual(len({truth[index] for index in segment}), 1)
+        self.assertEqual(sorted(index for segment in segments for index in segment), list(range(len(lines))))
+
+    def test_reply_links_and_time_gaps(self):
+        lines = ["[t]「甲」: 周五发布新版本", "[t]「乙」: 晚上吃火锅", "[t]「丙」: 收到没问题"]
+        ids = ["1", "2", "3"]
+        segmenter = TopicSegmenter(min_topic_lines=1)
+        # 内容不相关的回复仍然归入被回复消息的话题
+        self.assertEqual(segmenter.segment(lines, ids=ids, replies=[None, None, "1"]), [[0, 2], [1]])
+        self.assertEqual(segmenter.segment(lines, ids=ids, replies=[None, None, "2"]), [[0], [1, 2]])
+        # 间隔过长时即使内容相似也开始新话题
+        lines = ["[t]「甲」: 周五发布新版本", "[t]「乙」: 周五发布新版本吗"]
+        self.assertEqual(segmenter.segment(lines, times=[0, 100]), [[0, 1]])
+        self.assertEqual(segmenter.segment(lines, times=[1000, 5000]), [[0], [1]])
+
+    def test_small_and_excess_topics_are_merged(self):
+        lines, _ = interleaved()
+        self.assertEqual(TopicSegmenter(max_topics=1).segment(lines), [list(range(len(lines)))])
+        self.assertEqual(TopicSegmenter(min_topic_lines=100).segment(lines), [list(range(len(lines)))])
+        self.assertEqual(TopicSegmenter().segment([]), [])
+
+    @unittest.skipIf(topics.numpy is None, "numpy is not installed")
+    def test_numpy_matches_pure_python(self):
+        lines, _ = interleaved()
+        segmenter = TopicSegmenter(min_topic_lines=1)
+        vectorized = segmenter.segment(lines)
+        with patch.object(topics, "numpy", None):
+            self.assertEqual(segmenter.segment(lines), vectorized)
+
+
+class TestTopicSummarizer(unittest.IsolatedAsyncioTestCase):
+    """测试按话题并发总结和组装"""
+
+    async def test_topics_summarized_concurrently(self):
+        running = []
+        peak = []
+        prompts = []
+
+        async def complete(prompt):
+            prompts.append(prompt)
+            running.append(prompt)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.remove(prompt)
+            if "火锅" in prompt:
+                return "话题：晚饭安排\n- 七点吃火锅"
+            return "- 修复登录问题后发布"
+
+        lines, _ = interleaved()
+        summarizer = TopicSummarizer(complete, TopicSegmenter(min_topic_lines=3))
+        summary = await summarizer.summarize(lines)
+
+        self.assertEqual(len(prompts), 2)
+        self.assertEqual(max(peak), 2)
+        self.assertEqual(summary, "【话题1】（6 条消息）\n- 修复登录问题后发布\n\n【晚饭安排】（7 条消息）\n- 七点吃火锅")
+
+    async def test_single_topic_returns_none(self):
+        async def complete(prompt):
+            raise AssertionError("should not be called")
+
+        summarizer = TopicSummarizer(complete, TopicSegmenter())
+        self.assertIsNone(await summarizer.summarize(["[t]「甲」: 周五发布新版本"] * 10))
+
+
+if __name__ == '__main__':
+    unittest.main()